@@ -5,7 +5,7 @@ from marshmallow import fields, ValidationError
 from model.user import User
 from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
 from model.mixed_traffic_scenario import MixedTrafficScenario
-from model.vehicle_state import VehicleState
+from model.vehicle_state import VehicleState, VehicleStatusEnum
 from model.driver import Driver
 
 from commonroad.geometry.shape import Rectangle
@@ -92,3 +92,39 @@ class DriverSchema(ma.SQLAlchemyAutoSchema):
         include_fk = True
 
     goal_region = RectangleField()
+
+
+def dump_vehicle_states_by_driver(scenario_id, from_timestamp, to_timestamp, vehicle_states) -> dict:
+    """
+    Serialize the given vehicle states in a compact, columnar, layout: for each driver, one list per attribute.
+    The names of the lists are the same used to submit the states. The states must be sorted by driver and timestamp.
+    """
+    drivers = {}
+    for vehicle_state in vehicle_states:
+        if vehicle_state.driver_id not in drivers:
+            drivers[vehicle_state.driver_id] = {
+                "driver_id": vehicle_state.driver_id,
+                "user_id": vehicle_state.user_id,
+                "timestamps": [],
+                "statuses": [],
+                "positions_x": [],
+                "positions_y": [],
+                "rotations": [],
+                "speeds_ms": [],
+                "accelerations_m2s": []
+            }
+        driver_states = drivers[vehicle_state.driver_id]
+        driver_states["timestamps"].append(vehicle_state.timestamp)
+        driver_states["statuses"].append(VehicleStatusEnum(vehicle_state.status).value)
+        driver_states["positions_x"].append(vehicle_state.position_x)
+        driver_states["positions_y"].append(vehicle_state.position_y)
+        driver_states["rotations"].append(vehicle_state.rotation)
+        driver_states["speeds_ms"].append(vehicle_state.speed_ms)
+        driver_states["accelerations_m2s"].append(vehicle_state.acceleration_m2s)
+
+    return {
+        "scenario_id": scenario_id,
+        "from_timestamp": from_timestamp,
+        "to_timestamp": to_timestamp,
+        "drivers": list(drivers.values())
+    }
@@ -0,0 +1,74 @@
+# The jobs that run inside the processes of the "rendering" executor.
+#
+# Jobs carry only the template_id (and the hash of its XML) and the plain vehicle states, not the CommonRoad scenario.
+# Each rendering process parses the active templates when it starts, and loads from the database the templates that
+# it does not know yet, e.g., the ones uploaded after it started.
+from model.scenario_cache import scenario_cache
+
+from visualization.mixed_traffic_scenario import generate_frames
+
+# The configuration and the instance path of the app that started the rendering processes (see init_rendering_process)
+_app_config = None
+_instance_path = None
+
+
+def _app_context():
+    # Avoid circular deps. The rendering processes access the database like the driving ones
+    from controller.av_transport import _get_worker_app
+    return _get_worker_app(_app_config, _instance_path).app_context()
+
+
+def init_rendering_process(app_config, instance_path):
+    """
+    Initialize a rendering process: remember how to access the database, and warm up the cache with the active
+    templates
+    """
+    global _app_config, _instance_path
+    _app_config, _instance_path = app_config, instance_path
+
+    # Avoid circular deps
+    from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
+
+    try:
+        with _app_context():
+            for scenario_template in MixedTrafficScenarioTemplateDAO(_app_config).get_templates():
+                scenario_cache.warm_up(scenario_template.template_id, scenario_template.xml)
+    except Exception as ex_info:
+        # For instance, the database is not there yet. The jobs will load the templates they need
+        print(f"Cannot warm up the rendering process. Reason {ex_info}")
+
+
+def _get_commonroad_scenario(template_id, xml_hash):
+    """ Return the CommonRoad scenario of the given template, and the key of its road layout """
+    commonroad_scenario = scenario_cache.get_scenario_by_xml_hash(template_id, xml_hash)
+    if commonroad_scenario is not None:
+        return commonroad_scenario, (template_id, xml_hash)
+
+    # Avoid circular deps
+    from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
+
+    with _app_context():
+        # The template of a scenario might have been disabled in the meanwhile
+        scenario_template = MixedTrafficScenarioTemplateDAO(_app_config).get_template_by_id(template_id,
+                                                                                            skip_active_check=True)
+        assert scenario_template is not None, f"Template {template_id} does not exist"
+        # If the template was uploaded again, we render its latest version
+        return scenario_template.as_commonroad_scenario(), scenario_template.get_road_layer_key()
+
+
+def render_scenario_state(output_folder, template_id, xml_hash,
+                          mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
+                          scenario_state,
+                          focus_on_driver_user_ids, goal_regions_as_rectangles):
+    """
+    Render the views of the given scenario state, like generate_frames, but resolve the CommonRoad
+    scenario in this process
+    """
+    commonroad_scenario, road_layer_key = _get_commonroad_scenario(template_id, xml_hash)
+
+    generate_frames(output_folder,
+                    commonroad_scenario, mixed_traffic_scenario_duration,
+                    mixed_traffic_scenario_scenario_id,
+                    scenario_state,
+                    focus_on_driver_user_ids, goal_regions_as_rectangles,
+                    road_layer_key=road_layer_key)
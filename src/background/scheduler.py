@@ -1,15 +1,20 @@
 import uuid
 import shutil
+import threading
 
 from flask_apscheduler import APScheduler
 import os
 
-from visualization.mixed_traffic_scenario import generate_embeddable_html_snippet
-from controller.internalav import drive
+from typing import NamedTuple
+
+from visualization.mixed_traffic_scenario import generate_frames, generate_planning_picture
+from background.rendering import init_rendering_process, render_scenario_state
+from controller.internalav import drive_scenario, VISUALIZATION_OFF
+from controller.av_transport import create_transport, HTTP_TRANSPORT
 
 from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.base import STATE_RUNNING
-from apscheduler.events import EVENT_JOB_ERROR
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES
 
 from datetime import datetime, timedelta, timezone
 
@@ -22,11 +27,66 @@ from sqlalchemy import orm
 # initialize the global scheduler
 scheduler = APScheduler()
 
+# Depending on the start method, the worker processes of the executors might be forked from the process that started
+# the scheduler, so they see it as running even if it is not. This is the id of the process where the scheduler runs.
+_scheduler_pid = None
+
+
+def is_scheduler_running():
+    return scheduler.state == STATE_RUNNING and _scheduler_pid == os.getpid()
+
+
+# The AVs of a scenario are driven together by one job (see deploy_av_in_background). The jobs are woken up as soon
+# as the AVs can plan (see dispatch_scenario_in_background) and poll the scenarios only as a safety net.
+# Planning more than once for the same timestamp is useless, so we track the last dispatched timestamps of each job,
+# until the job is removed
+_last_dispatched_timestamps = {}
+# The jobs that were woken up while still planning. Those must be woken up again as soon as they are done
+_pending_wakeups = set()
+_dispatch_lock = threading.Lock()
+# Deploying an AV updates the job of its scenario
+_deploy_lock = threading.Lock()
+
+# The AVs running inside the driving processes cannot wake up the other AVs or use the rendering processes, so they
+# collect what to dispatch and what to visualize here while driving and return them to the scheduler
+_worker_dispatches = None
+_worker_visualizations = None
+
+
+class DrivingResult(NamedTuple):
+    # The (scenario_id, timestamp) of the scenarios to wake up
+    dispatches: list
+    # The planning results to visualize
+    visualizations: list
+    # The driver_id of the AVs that must stop
+    stopped_driver_ids: list
+
+
+def _configure_rendering_processes(app):
+    """
+    Let the rendering processes access the database and warm up their templates cache as soon as they start, so the
+    rendering jobs need not carry the CommonRoad scenarios
+    """
+    executors = dict(app.config.get("SCHEDULER_EXECUTORS", {}))
+    if executors.get("rendering", {}).get("type") != "processpool":
+        return
+
+    # Copy the configuration before updating it, so it does not contain itself
+    pool_kwargs = {
+        "initializer": init_rendering_process,
+        "initargs": (dict(app.config), app.instance_path)
+    }
+    # Do not modify the (shared) dictionaries of the configuration module
+    executors["rendering"] = dict(executors["rendering"], pool_kwargs=pool_kwargs)
+    app.config["SCHEDULER_EXECUTORS"] = executors
+
+
 def init_app(app):
     """
     Init the scheduler
     """
     app.logger.debug("Initialize Background Scheduler")
+    _configure_rendering_processes(app)
     scheduler.init_app(app)
 
     if "AVS_CACHE_FOLDER" in app.config and not os.path.exists(app.config["AVS_CACHE_FOLDER"]):
@@ -34,17 +94,21 @@ def init_app(app):
         os.makedirs(app.config["AVS_CACHE_FOLDER"], exist_ok=True)
 
     scheduler.start()
+    global _scheduler_pid
+    _scheduler_pid = os.getpid()
     print(f"Initialize Background Scheduler {scheduler}")
 
     def listener(event):
-        if str(event.job_id).startswith("Driver_"):
-            # print(f'Driver Job {event.job_id} raised {event.exception.__class__.__name__}')
+        if str(event.job_id).startswith(DRIVING_JOB_PREFIX):
+            # print(f'Driving Job {event.job_id} raised {event.exception.__class__.__name__}')
             if event.exception.__class__.__name__ == "StopMeException":
                 # run_date = datetime.now(timezone.utc) + timedelta(seconds=3)
                 # https://viniciuschiele.github.io/flask-apscheduler/rst/api.html
                 # scheduler.modify_job(event.job_id, trigger="date", run_date=run_date )
-                scheduler.remove_job(event.job_id)
-                print(f'Driver Job {event.job_id} stopped')
+                with _deploy_lock:
+                    scheduler.remove_job(event.job_id)
+                _forget_dispatches(event.job_id)
+                print(f'Driving Job {event.job_id} stopped')
 
         else:
             print(f'Rendering Job {event.job_id} raised {event.exception.__class__.__name__}')
@@ -52,11 +116,35 @@ def init_app(app):
 
     scheduler.add_listener(listener, EVENT_JOB_ERROR)
 
+    def driver_listener(event):
+        if not str(event.job_id).startswith(DRIVING_JOB_PREFIX):
+            return
+
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            # The AVs were woken up while planning, so APScheduler skipped this run
+            with _dispatch_lock:
+                _pending_wakeups.add(event.job_id)
+            return
+
+        if event.code == EVENT_JOB_EXECUTED and event.retval:
+            for scenario_id, timestamp in event.retval.dispatches:
+                dispatch_scenario_in_background(scenario_id, timestamp)
+            for driver_id, timestamp, planning_result in event.retval.visualizations:
+                visualize_planning_in_background(driver_id, timestamp, planning_result)
+            if event.retval.stopped_driver_ids:
+                _remove_avs(event.job_id, event.retval.stopped_driver_ids)
+
+        with _dispatch_lock:
+            wakeup_again = event.job_id in _pending_wakeups
+            _pending_wakeups.discard(event.job_id)
+
+        if wakeup_again:
+            _wakeup_avs(event.job_id)
+
+    scheduler.add_listener(driver_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MAX_INSTANCES)
+
 # Note: We do not automatically resume the jobs to rendere png and similar.
-# We'll do that "on the fly" in case some image is still missing
-# Otherwise, we need to compute what are the ACTIVE states in ALL the SCENARIOS, check that
-# they are not present in anyform inside the scenario_images folder and generate them.
-# TODO This actually might be something to do always? Lazily generate the images ?
+# Images are generated "on the fly" the first time someone asks for them (see ScenarioFrameDAO)
 
 def rewamp_jobs(scenario=None):
     # TODO When we deploy in uWSGI, it will creates many different copies of this code, thus running many
@@ -130,15 +218,112 @@ def _eager_load_scenario_state(vehicle_state: VehicleState):
     return VehicleState.query.where(VehicleState.vehicle_state_id == vehicle_state.vehicle_state_id).first()
 
 
+DRIVING_JOB_PREFIX = "Driving_"
+
+
 def get_job_id(driver):
-    return f"Driver_{driver.driver_id}"
+    return _get_job_id_by_scenario_id(driver.scenario_id)
+
+
+def _get_job_id_by_scenario_id(scenario_id):
+    return f"{DRIVING_JOB_PREFIX}scenario_{scenario_id}"
+
+
+def _wakeup_avs(job_id):
+    try:
+        # Run the job now. Its following runs are scheduled according to the polling interval as usual
+        scheduler.modify_job(job_id, next_run_time=datetime.now(timezone.utc))
+    except JobLookupError:
+        # The AVs are over, or they are driving in another process
+        pass
+
+
+def _remove_avs(job_id, driver_ids):
+    """
+    Stop driving the given AVs, and the entire job if no AV is left
+    """
+    with _deploy_lock:
+        job = scheduler.get_job(job_id)
+        if job is None:
+            return
+
+        scenario_id, avs, cache_dir = job.args
+        remaining_avs = [av for av in avs if av[0] not in driver_ids]
+        if len(remaining_avs) > 0:
+            scheduler.modify_job(job_id, args=[scenario_id, remaining_avs, cache_dir])
+        else:
+            scheduler.remove_job(job_id)
+            _forget_dispatches(job_id)
+    print(f'Driving Job {job_id} stopped AVs {driver_ids}')
+
+
+def _forget_dispatches(job_id):
+    """
+    The job is over: forget what we dispatched to it, so the AVs deployed again in the same scenario are woken up
+    """
+    with _dispatch_lock:
+        _last_dispatched_timestamps.pop(job_id, None)
+        _pending_wakeups.discard(job_id)
 
 
-def _get_rendering_job_id(mixed_traffic_scenario_scenario_id, scenario_state, focus_on_driver_user_id):
-    if focus_on_driver_user_id:
-        return f"Rendering_scenario_{mixed_traffic_scenario_scenario_id}_timestamp_{scenario_state[0].timestamp}_driver_{focus_on_driver_user_id}"
+def dispatch_scenario_in_background(scenario_id, timestamp):
+    """
+    Wake up the AVs of the given scenario, so they plan their next state as soon as they can. Dispatching the same
+    scenario for the same timestamp more than once has no effect.
+    """
+    if is_scheduler_running():
+        job_id = _get_job_id_by_scenario_id(scenario_id)
+        with _dispatch_lock:
+            if _last_dispatched_timestamps.get(job_id, -1) >= timestamp:
+                return
+            _last_dispatched_timestamps[job_id] = timestamp
+        _wakeup_avs(job_id)
+    elif _worker_dispatches is not None:
+        # This is one of the driving processes, see drive_scenario_and_dispatch
+        _worker_dispatches.append((scenario_id, timestamp))
+
+
+def drive_scenario_and_dispatch(*args, **kwargs):
+    """
+    Drive the AVs of a scenario and return the scenarios that must be woken up because of the states that these AVs
+    submitted, what the AVs planned if it must be visualized, and the AVs that must stop
+    """
+    global _worker_dispatches, _worker_visualizations
+    driving_result = DrivingResult([], [], [])
+    _worker_dispatches, _worker_visualizations = driving_result.dispatches, driving_result.visualizations
+    try:
+        driving_result.stopped_driver_ids.extend(drive_scenario(*args, **kwargs))
+        return driving_result
+    finally:
+        _worker_dispatches = None
+        _worker_visualizations = None
+
+
+def visualize_planning_in_background(driver_id, timestamp, planning_result):
+    """
+    Render what the AV planned at the given timestamp using the rendering processes
+    """
+    if is_scheduler_running():
+        job_id = f"Visualizing_driver_{driver_id}_timestamp_{timestamp}"
+        scheduler.add_job(
+            id=job_id,
+            executor="rendering",
+            func=generate_planning_picture,
+            replace_existing=True,
+            args=[planning_result],
+            misfire_grace_time=30
+        )
+    elif _worker_visualizations is not None:
+        # This is one of the driving processes, see drive_scenario_and_dispatch
+        _worker_visualizations.append((driver_id, timestamp, planning_result))
     else:
-        return f"Rendering_scenario_{mixed_traffic_scenario_scenario_id}_timestamp_{scenario_state[0].timestamp}"
+        # Invoke it directly in case the scheduler does is not running
+        generate_planning_picture(planning_result)
+
+
+def _get_rendering_job_id(mixed_traffic_scenario_scenario_id, scenario_state):
+    # One job renders all the views of a timestamp
+    return f"Rendering_scenario_{mixed_traffic_scenario_scenario_id}_timestamp_{scenario_state[0].timestamp}"
 
 
 # THIS IS PROBLEMATIC BECAUSE WE HAVE NO IDEA WHERE THE JOB MIGHT BE RUNNING!
@@ -166,7 +351,8 @@ def undeploy_av(driver):
 
 def deploy_av_in_background(driver, auth_token):
     """
-    Deploy a new AV in background. This job takes the scheduler and reschedule itself after X seconds if necessary
+    Deploy a new AV in background. The AVs of the same scenario are driven by the same job, which takes the scheduler
+    and reschedule itself after X seconds if necessary
 
     :param mixed_traffic_scenario:
     :param user:
@@ -180,37 +366,52 @@ def deploy_av_in_background(driver, auth_token):
     # TODO Remove this in the next future
     assert driver.user.username.startswith("bot_"), "Cannot deploy a non AV driver"
 
-    if scheduler.state == STATE_RUNNING:
+    if is_scheduler_running():
         cache_dir = scheduler.app.config["AVS_CACHE_FOLDER"] if "AVS_CACHE_FOLDER" in scheduler.app.config else None
 
-        # The job ID is the unique id of the Driver
+        # The AVs of the same scenario are driven by the same job, whose ID is the unique id of the Scenario
         job_id = get_job_id(driver)
 
-        args = [driver.driver_id, driver.user_id, driver.scenario_id, auth_token, cache_dir]
-
         # Patch because the port is not available inside current_app.config natively
+        port = scheduler.app.config["PORT"] if "PORT" in scheduler.app.config else 5000
+        av_transport = scheduler.app.config["AV_TRANSPORT"] if "AV_TRANSPORT" in scheduler.app.config else HTTP_TRANSPORT
+
+        transport = create_transport(av_transport, auth_token, scheduler.app.config, scheduler.app.instance_path, port=port)
+        av = (driver.driver_id, driver.user_id, auth_token, transport)
+
         kwargs = {
-            "port": scheduler.app.config["PORT"] if "PORT" in scheduler.app.config else 5000
+            "visualization_mode": scheduler.app.config["AV_VISUALIZATION_MODE"] if "AV_VISUALIZATION_MODE" in scheduler.app.config else VISUALIZATION_OFF,
+            "visualization_sampling": scheduler.app.config["AV_VISUALIZATION_SAMPLING"] if "AV_VISUALIZATION_SAMPLING" in scheduler.app.config else 10
         }
 
-        scheduler.app.logger.info(
-            f'Listening to port {scheduler.app.config["PORT"] if "PORT" in scheduler.app.config else 5000}')
-
-        # scheduler.add_job(id=INTERVAL_TASK_ID, func=interval_task, trigger='interval', seconds=2)
-        run_date = datetime.now(timezone.utc) + timedelta(seconds=3)
-        job = scheduler.add_job(
-            job_id,
-            drive,
-            # trigger = 'date',
-            # run_date= run_date,
-            # misfire_grace_time = None,
-            trigger='interval',
-            seconds=3,
-            executor="driving",
-            replace_existing=False,
-            args=args,
-            kwargs=kwargs
-        )
+        scheduler.app.logger.info(f'AV {driver.user_id} uses {transport} transport')
+
+        # The AVs are woken up every time they can plan (see dispatch_scenario_in_background), and poll the scenario
+        # only as a safety net. The first run is immediate, as the AVs might already be able to plan
+        polling_interval = scheduler.app.config["AV_POLLING_INTERVAL_IN_SECONDS"] if "AV_POLLING_INTERVAL_IN_SECONDS" in scheduler.app.config else 30
+        run_date = datetime.now(timezone.utc)
+        with _deploy_lock:
+            job = scheduler.get_job(job_id)
+            if job is None:
+                job = scheduler.add_job(
+                    job_id,
+                    drive_scenario_and_dispatch,
+                    # trigger = 'date',
+                    # run_date= run_date,
+                    # misfire_grace_time = None,
+                    trigger='interval',
+                    seconds=polling_interval,
+                    next_run_time=run_date,
+                    executor="driving",
+                    replace_existing=False,
+                    args=[driver.scenario_id, [av], cache_dir],
+                    kwargs=kwargs
+                )
+            else:
+                # (Re)Deploying an AV replaces it
+                scenario_id, avs, cache_dir = job.args
+                avs = [other_av for other_av in avs if other_av[0] != driver.driver_id] + [av]
+                job = scheduler.modify_job(job_id, args=[scenario_id, avs, cache_dir], next_run_time=run_date)
         print(f">>>> Background AV Driving will start in {run_date - datetime.now(timezone.utc)})."
               f"User {driver.user_id} in scenario {driver.scenario_id}. Job id: {job_id} - {job.id}")
     else:
@@ -220,52 +421,57 @@ def deploy_av_in_background(driver, auth_token):
 
 
 def render_in_background(output_folder, mixed_traffic_scenario, scenario_state,
-                                     focus_on_driver=None, goal_region_as_rectangle=None,
-                                     force_render_now = False):
+                         goal_regions_as_rectangles=None, global_view=True,
+                         force_render_now = False):
+    """
+    Render the global view of the scenario state (unless global_view is False) and the view of each driver in
+    goal_regions_as_rectangles, which maps their user_id to their goal region, as PNG. All the views are rendered by
+    one job, which carries only the template of the scenario (its template_id and the hash of its XML) and the plain
+    states: the rendering processes resolve the templates by themselves (see background.rendering)
+    """
 
-    # Convert to the new parameters:
-    commonroad_scenario = mixed_traffic_scenario.scenario_template.as_commonroad_scenario()
+    scenario_template = mixed_traffic_scenario.scenario_template
     mixed_traffic_scenario_duration = mixed_traffic_scenario.duration
     mixed_traffic_scenario_scenario_id = mixed_traffic_scenario.scenario_id
 
-    args = []
-    args.append(output_folder)
-    args.append(commonroad_scenario)
-    args.append(mixed_traffic_scenario_duration)
-    args.append(mixed_traffic_scenario_scenario_id)
+    # Transform the states in plain tuples with the same attributes!
+    plain_scenario_state = [s.as_plain_state() for s in scenario_state]
 
-    # Transform the states in plain objects with the same attributes!
-    args.append([s.as_plain_state() for s in scenario_state])
+    if goal_regions_as_rectangles is None:
+        goal_regions_as_rectangles = {}
 
-    kwargs = {}
-    if focus_on_driver is not None:
-        focus_on_driver_user_id = focus_on_driver.user_id
-        kwargs["focus_on_driver_user_id"] = focus_on_driver_user_id
-    else:
-        focus_on_driver_user_id = None
+    # None is the global view
+    focus_on_driver_user_ids = ([None] if global_view else []) + list(goal_regions_as_rectangles.keys())
 
-    if goal_region_as_rectangle is not None:
-        kwargs["goal_region_as_rectangle"] = goal_region_as_rectangle
+    # The template (and its road layout) changes only if it is uploaded again, i.e., with another XML
+    template_id, xml_hash = scenario_template.get_road_layer_key()
 
     # Schedule it (now). Probably better to generate a place holder image first and then replace it with the actual one...?
     # https://viniciuschiele.github.io/flask-apscheduler/rst/usage.html
     # https://apscheduler.readthedocs.io/en/3.x/modules/triggers/date.html#module-apscheduler.triggers.date
 
-    job_id = _get_rendering_job_id(mixed_traffic_scenario_scenario_id, scenario_state, focus_on_driver_user_id)
+    job_id = _get_rendering_job_id(mixed_traffic_scenario_scenario_id, scenario_state)
 
-    if scheduler.state == STATE_RUNNING and not force_render_now:
+    if is_scheduler_running() and not force_render_now:
         job = scheduler.add_job(
             id=job_id,
             executor="rendering",
-            func=generate_embeddable_html_snippet,
+            func=render_scenario_state,
             replace_existing=False,
-            args=args,
-            kwargs=kwargs,
+            args=[output_folder, template_id, xml_hash,
+                  mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
+                  plain_scenario_state,
+                  focus_on_driver_user_ids, goal_regions_as_rectangles],
             misfire_grace_time=30
         )
         print(f">>> Background rendering started. Job id: {job.id} - {job_id}")
         scheduler.app.logger.debug(f">>> Background rendering started. Job id: {job.id} - {job_id}")
     else:
         print(f">>> Direct rendering started. Job id: {job_id}")
-        # Invoke it directly in case the scheduler does is not running
-        generate_embeddable_html_snippet(*args, **kwargs)
+        # Invoke it directly in case the scheduler does is not running. This process has the template already
+        generate_frames(output_folder,
+                        scenario_template.as_commonroad_scenario(), mixed_traffic_scenario_duration,
+                        mixed_traffic_scenario_scenario_id,
+                        plain_scenario_state,
+                        focus_on_driver_user_ids, goal_regions_as_rectangles,
+                        road_layer_key=(template_id, xml_hash))
@@ -0,0 +1,88 @@
+"""
+Compare checking the kinematics of the sampled trajectories one step at a time, as we used to do, against checking all
+of them at once with array operations (TrajectorySampler.check_kinematics).
+
+Both implementations check the same trajectory bundles, sampled from a straight (linear) and a road-following
+reference path at different initial speeds, and must accept the same trajectories. The original implementation lives
+in benchmarks/legacy_check_kinematics.py; tests/unit/test_check_kinematics.py checks that the two produce the same
+results.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_check_kinematics
+"""
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# Import flexcrash first, so interpolate_angle is monkey patched
+from benchmarks.utils import read_template_xml
+from benchmarks.legacy_check_kinematics import legacy_check_kinematics
+
+from commonroad.geometry.shape import Rectangle
+
+from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
+from model.trajectory import TrajectorySampler
+from model.vehicle_state import VehicleState
+
+SPEEDS = [1.0, 5.0, 10.0, 20.0]
+REPETITIONS = 20
+
+
+def _sample_trajectory_bundle(sampler, initial_state):
+    """ Sample the trajectories from the initial state, but capture their bundle instead of checking it """
+    trajectory_bundles = []
+
+    def _capture(trajectory_bundle, accept_all=False):
+        trajectory_bundles.append(trajectory_bundle)
+        return [], [], []
+
+    sampler.check_kinematics = _capture
+    sampler.sample_trajectories(initial_state)
+    del sampler.check_kinematics
+    return trajectory_bundles[0]
+
+
+def _measure_ms(check_kinematics, trajectory_bundle):
+    start = time.perf_counter()
+    for _ in range(0, REPETITIONS):
+        feasible_trajectories, infeasible_trajectories, _ = check_kinematics(trajectory_bundle)
+    return (time.perf_counter() - start) * 1000 / REPETITIONS, feasible_trajectories, infeasible_trajectories
+
+
+def _initial_states(scenario_template, speed_ms):
+    """ Start on the first lanelet of the template, looking along it """
+    center_vertices = scenario_template.as_commonroad_scenario().lanelet_network.lanelets[0].center_vertices
+    (position_x, position_y), (next_x, next_y) = center_vertices[1], center_vertices[2]
+    return VehicleState(timestamp=0, position_x=position_x, position_y=position_y,
+                        rotation=math.atan2(next_y - position_y, next_x - position_x),
+                        speed_ms=speed_ms, acceleration_m2s=0.0)
+
+
+def main():
+    scenario_template = MixedTrafficScenarioTemplate(template_id=1, name="benchmark", description="benchmark",
+                                                     xml=read_template_xml())
+    mixed_traffic_scenario = SimpleNamespace(scenario_id=1, duration=100, scenario_template=scenario_template)
+
+    print(f"{'ref path':>8} | {'speed':>5} | {'trajectories':>12} | {'feasible':>8} | {'legacy ms':>9} | {'vectorized ms':>13} | {'same':>5}")
+    for snap_to_road in [False, True]:
+        for speed_ms in SPEEDS:
+            initial_state = _initial_states(scenario_template, speed_ms)
+            goal_region_as_rectangle = Rectangle(4.0, 4.0, np.array([initial_state.position_x, initial_state.position_y]),
+                                                 initial_state.rotation)
+            sampler = TrajectorySampler(mixed_traffic_scenario, initial_state, goal_region_as_rectangle, snap_to_road)
+            trajectory_bundle = _sample_trajectory_bundle(sampler, initial_state)
+
+            legacy_ms, legacy_feasible, legacy_infeasible = _measure_ms(
+                lambda bundle: legacy_check_kinematics(sampler, bundle), trajectory_bundle)
+            vectorized_ms, feasible, infeasible = _measure_ms(sampler.check_kinematics, trajectory_bundle)
+
+            same = [id(t) for t in legacy_feasible] == [id(t) for t in feasible] and \
+                   [id(t) for t in legacy_infeasible] == [id(t) for t in infeasible]
+            print(f"{'road' if snap_to_road else 'linear':>8} | {speed_ms:>5.1f} | {len(trajectory_bundle.trajectories):>12} | "
+                  f"{len(feasible):>8} | {legacy_ms:>9.2f} | {vectorized_ms:>13.2f} | {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
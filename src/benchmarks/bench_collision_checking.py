@@ -0,0 +1,95 @@
+"""
+Compare checking all the pairs of vehicles for collisions, as we used to do, against checking only the pairs whose
+bounding circles overlap (CollisionChecker.check_for_collisions).
+
+Both implementations check the same scenario states, with the vehicles placed at random on roads of increasing
+length and number of lanes, and must report the same crashed vehicles in the same order.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_collision_checking
+"""
+import random
+import time
+from types import SimpleNamespace
+
+import commonroad_dc.pycrcc as pycrcc
+
+from configuration.config import VEHICLE_WIDTH, VEHICLE_LENGTH
+from model.collision_checking import CollisionChecker
+
+# Number of vehicles, and how many meters of road (each lane) each vehicle has on average
+N_VEHICLES = [10, 50, 100, 250, 500]
+METERS_PER_VEHICLE = 10.0
+LANES = 4
+LANE_WIDTH = 3.5
+REPETITIONS = 5
+
+
+def _legacy_check_for_collisions(vehicles_state_at_timestamp, drivers):
+    """ The all-pairs check that CollisionChecker.check_for_collisions used to do """
+    sorted_vehicles_state = sorted(vehicles_state_at_timestamp, key=lambda vs: vs.user_id)
+    sorted_drivers = sorted(drivers, key=lambda d: d.user_id)
+
+    drivers_map = {}
+    crashed_drivers_and_their_state = []
+    for driver, vehicle_state in zip(sorted_drivers, sorted_vehicles_state):
+        if vehicle_state.status == "GOAL_REACHED":
+            continue
+        drivers_map[driver.user_id] = {}
+        drivers_map[driver.user_id]["driver"] = driver
+        drivers_map[driver.user_id]["obstacle"] = pycrcc.RectOBB(VEHICLE_LENGTH/2, VEHICLE_WIDTH/2,
+                                                                 vehicle_state.rotation,
+                                                                 vehicle_state.position_x, vehicle_state.position_y)
+        drivers_map[driver.user_id]["state"] = vehicle_state
+
+    done = []
+    for v1_key, v1_dict in drivers_map.items():
+        done.append(v1_key)
+        for v2_key, v2_dict in [(k, v) for (k, v) in drivers_map.items() if k not in done]:
+            if v1_dict["obstacle"].collide(v2_dict["obstacle"]):
+                crashed_drivers_and_their_state.append((v1_dict["driver"], v1_dict["state"]))
+                crashed_drivers_and_their_state.append((v2_dict["driver"], v2_dict["state"]))
+
+    return crashed_drivers_and_their_state
+
+
+def _scenario_state(n_vehicles, rng):
+    road_length = n_vehicles * METERS_PER_VEHICLE / LANES
+    vehicle_states = [SimpleNamespace(user_id=user_id, status="ACTIVE",
+                                      position_x=rng.uniform(0.0, road_length),
+                                      position_y=rng.randrange(LANES) * LANE_WIDTH + rng.uniform(-0.5, 0.5),
+                                      rotation=rng.uniform(-0.2, 0.2))
+                      for user_id in range(1, n_vehicles + 1)]
+    drivers = [SimpleNamespace(user_id=vehicle_state.user_id) for vehicle_state in vehicle_states]
+    return vehicle_states, drivers
+
+
+def _measure_ms(check, *args):
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        result = check(*args)
+    return (time.perf_counter() - start) * 1000 / REPETITIONS, result
+
+
+def main():
+    rng = random.Random(0)
+
+    print(f"{'vehicles':>8} | {'crashed':>7} | {'legacy ms':>9} | {'broad phase ms':>14} | {'same':>5}")
+    for n_vehicles in N_VEHICLES:
+        vehicle_states, drivers = _scenario_state(n_vehicles, rng)
+        scenario = SimpleNamespace(scenario_id=1, drivers=drivers)
+        # The checker reads the states from the DAO
+        vehicle_state_dao = SimpleNamespace(
+            get_vehicle_states_by_scenario_id_at_timestamp=lambda scenario_id, timestamp, nested: vehicle_states)
+        collision_checker = CollisionChecker(vehicle_state_dao)
+
+        legacy_ms, legacy_crashed = _measure_ms(_legacy_check_for_collisions, vehicle_states, drivers)
+        broad_phase_ms, crashed = _measure_ms(collision_checker.check_for_collisions, scenario, 1)
+
+        same = [(d.user_id, id(s)) for d, s in legacy_crashed] == [(d.user_id, id(s)) for d, s in crashed]
+        print(f"{n_vehicles:>8} | {len(set(d.user_id for d, _ in crashed)):>7} | {legacy_ms:>9.2f} | "
+              f"{broad_phase_ms:>14.2f} | {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare the UPDATE that propagates the state of a driver until the end of the scenario (as propagation and crashes
+do) when the timestamps are filtered with an OR of equalities, as we used to do, against a single range predicate.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_range_predicates
+"""
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.utils import create_benchmark_app, create_scenario, read_template_xml
+
+from model.vehicle_state import VehicleState
+
+from persistence.database import db
+from persistence.utils import inject_where_statement_using_attributes, Between
+
+DURATIONS = [100, 300, 1000, 3000]
+N_DRIVERS = 4
+REPETITIONS = 20
+
+
+def _legacy_update_statement(scenario_id, user_id, from_timestamp, duration):
+    """ The original statement: "t1|t2|...|tN" turned into an OR of equalities """
+    stmt = db.update(VehicleState).values(**{VehicleState.status.name: "CRASHED"}). \
+        where(VehicleState.scenario_id == scenario_id). \
+        where(VehicleState.user_id == user_id)
+    return stmt.where(or_(*[VehicleState.timestamp == str(t) for t in range(from_timestamp, duration + 1)]))
+
+
+def _range_update_statement(scenario_id, user_id, from_timestamp, duration):
+    stmt = db.update(VehicleState).values(**{VehicleState.status.name: "CRASHED"})
+    kwargs = {
+        "scenario_id": scenario_id,
+        "user_id": user_id,
+        "timestamp": Between(from_timestamp, duration)
+    }
+    return inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+
+
+def _measure(build_statement, scenario_id, user_id, from_timestamp, duration):
+    statement = build_statement(scenario_id, user_id, from_timestamp, duration)
+    compiled = statement.compile(dialect=db.engine.dialect)
+    size, n_params = len(str(compiled)), len(compiled.params)
+
+    start = time.perf_counter()
+    try:
+        for _ in range(0, REPETITIONS):
+            # Build the statement every time, as the DAO does
+            db.session.execute(build_statement(scenario_id, user_id, from_timestamp, duration))
+            db.session.rollback()
+    except OperationalError:
+        # SQLite refuses expressions deeper than 1000, i.e., scenarios longer than 1000 timestamps
+        db.session.rollback()
+        return size, n_params, None
+    elapsed_ms = (time.perf_counter() - start) * 1000 / REPETITIONS
+    return size, n_params, elapsed_ms
+
+
+def _format_ms(elapsed_ms, width):
+    return f"{'FAILED':>{width}}" if elapsed_ms is None else f"{elapsed_ms:>{width}.2f}"
+
+
+def main():
+    app = create_benchmark_app()
+    template_xml = read_template_xml()
+
+    print(f"{'duration':>8} | {'OR chars':>8} | {'OR params':>9} | {'OR ms':>7} | "
+          f"{'range chars':>11} | {'range params':>12} | {'range ms':>8}")
+    for scenario_id, duration in enumerate(DURATIONS, start=1):
+        create_scenario(scenario_id, template_xml, N_DRIVERS, duration, active_until=1)
+        user_id = db.session.execute(db.select(VehicleState.user_id).where(VehicleState.scenario_id == scenario_id)).scalar()
+        # Propagate the crash from the beginning of the scenario
+        from_timestamp = 1
+
+        legacy = _measure(_legacy_update_statement, scenario_id, user_id, from_timestamp, duration)
+        ranged = _measure(_range_update_statement, scenario_id, user_id, from_timestamp, duration)
+
+        print(f"{duration:>8} | {legacy[0]:>8} | {legacy[1]:>9} | {_format_ms(legacy[2], 7)} | "
+              f"{ranged[0]:>11} | {ranged[1]:>12} | {_format_ms(ranged[2], 8)}")
+
+
+if __name__ == "__main__":
+    main()
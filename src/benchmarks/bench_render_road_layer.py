@@ -0,0 +1,114 @@
+"""
+Compare rendering the frames of a scenario by drawing the whole road layout every time, as we used to do, against
+loading the road layout drawn once per template (RoadLayerCache) and drawing only the vehicles on top of it.
+
+Both implementations render the same global and focused frames as PNG (16x6); the PNGs must have the same pixels.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_render_road_layer
+"""
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+
+from commonroad.common.file_reader import CommonRoadFileReader
+from commonroad.geometry.shape import Rectangle
+from commonroad.visualization.mp_renderer import MPRenderer
+
+import visualization.mixed_traffic_scenario
+from visualization.mixed_traffic_scenario import generate_picture
+from visualization.road_layer_cache import road_layer_cache
+
+TEMPLATES = ["template_3.xml", "template_1.xml", "ZAM_Urban-3_3.xml"]
+N_VEHICLES = 8
+REPETITIONS = 10
+FRAMES = [("png", (16, 6), False), ("png", (16, 6), True)]
+
+
+class _LegacyRoadLayer():
+    """ Draw the whole road layout for every frame, and compute the bounding box of every PNG, as we used to do """
+
+    def __init__(self, commonroad_scenario, figsize):
+        self.commonroad_scenario = commonroad_scenario
+        self.figsize = figsize
+
+    def new_figure(self):
+        fig, ax = plt.subplots(figsize=self.figsize)
+        rnd = MPRenderer(ax=ax)
+        self.commonroad_scenario.draw(rnd)
+        rnd.render(show=False)
+        return fig, ax
+
+    def savefig(self, fig, filename):
+        fig.savefig(filename, bbox_inches="tight")
+
+
+class _LegacyRoadLayerCache():
+
+    def get(self, road_layer_key, commonroad_scenario, figsize):
+        return _LegacyRoadLayer(commonroad_scenario, figsize)
+
+
+def _scenario_state(commonroad_scenario):
+    """ Place the vehicles along the first lanelet of the template, but not at its ends """
+    center_vertices = commonroad_scenario.lanelet_network.lanelets[0].center_vertices
+    scenario_state = []
+    for index in range(0, N_VEHICLES):
+        position_x, position_y = center_vertices[(index + 1) * (len(center_vertices) - 1) // (N_VEHICLES + 1)]
+        scenario_state.append(SimpleNamespace(user_id=index + 1, driver_id=index + 1, scenario_id=1, timestamp=3,
+                                              position_x=float(position_x), position_y=float(position_y),
+                                              rotation=0.0, speed_ms=10.0, acceleration_m2s=0.0, status="ACTIVE"))
+    return scenario_state
+
+
+def _measure_ms(road_layers, output_folder, commonroad_scenario, scenario_state, figsize, focus):
+    visualization.mixed_traffic_scenario.road_layer_cache = road_layers
+    goal_region_as_rectangle = Rectangle(4.0, 2.0, center=np.array([scenario_state[0].position_x,
+                                                                    scenario_state[0].position_y]))
+    args = (figsize, output_folder, commonroad_scenario, 10, 1, scenario_state,
+            1 if focus else None, goal_region_as_rectangle if focus else None, str(commonroad_scenario.scenario_id))
+    # Warm up the cache
+    generate_picture(*args)
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        generate_picture(*args)
+    return (time.perf_counter() - start) * 1000 / REPETITIONS
+
+
+def _same_pngs(legacy_folder, cached_folder):
+    for file_name in [f for f in os.listdir(legacy_folder) if f.endswith(".png")]:
+        if not np.array_equal(mpimg.imread(os.path.join(legacy_folder, file_name)),
+                              mpimg.imread(os.path.join(cached_folder, file_name))):
+            return False
+    return True
+
+
+def main():
+    templates_folder = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "scenario_templates")
+
+    print(f"{'template':>17} | {'lanelets':>8} | {'frame':>10} | {'legacy ms':>9} | {'cached ms':>9} | {'same':>5}")
+    for template_file_name in TEMPLATES:
+        commonroad_scenario, _ = CommonRoadFileReader(os.path.join(templates_folder, template_file_name)).open()
+        scenario_state = _scenario_state(commonroad_scenario)
+        legacy_folder, cached_folder = tempfile.mkdtemp(), tempfile.mkdtemp()
+
+        for format_name, figsize, focus in FRAMES:
+            legacy_ms = _measure_ms(_LegacyRoadLayerCache(), legacy_folder, commonroad_scenario, scenario_state,
+                                    figsize, focus)
+            cached_ms = _measure_ms(road_layer_cache, cached_folder, commonroad_scenario, scenario_state,
+                                    figsize, focus)
+            same = _same_pngs(legacy_folder, cached_folder)
+            frame = f"{format_name}{' focus' if focus else ''}"
+            print(f"{template_file_name:>17} | {len(commonroad_scenario.lanelet_network.lanelets):>8} | {frame:>10} | "
+                  f"{legacy_ms:>9.2f} | {cached_ms:>9.2f} | {str(same):>5}")
+
+    print(road_layer_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
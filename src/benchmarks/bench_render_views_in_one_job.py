@@ -0,0 +1,118 @@
+"""
+Compare rendering the global view and the view of each driver at a timestamp with one job per view, as we used to do,
+against rendering all of them with a single job (generate_frames).
+
+Every job sends its arguments, including the CommonRoad scenario, to the rendering processes, so we pickle and unpickle
+them once per job. Both implementations render the PNGs (16x6) of the same views, which must have the same pixels.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_render_views_in_one_job
+"""
+import os
+import pickle
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import matplotlib.image as mpimg
+
+from commonroad.common.file_reader import CommonRoadFileReader
+from commonroad.geometry.shape import Rectangle
+
+from visualization.mixed_traffic_scenario import generate_picture, generate_frames
+from visualization.road_layer_cache import road_layer_cache
+
+TEMPLATES = ["template_3.xml", "ZAM_Urban-3_3.xml"]
+N_DRIVERS = [2, 4, 8]
+REPETITIONS = 3
+
+
+def _legacy_generate_frame(output_folder, commonroad_scenario, duration, scenario_id, scenario_state,
+                           focus_on_driver_user_id=None, goal_region_as_rectangle=None, road_layer_key=None):
+    """ The job that rendered one view, as we used to do """
+    generate_picture((16, 6), output_folder, commonroad_scenario, duration, scenario_id, scenario_state,
+                     focus_on_driver_user_id, goal_region_as_rectangle, road_layer_key)
+
+
+def _run_job(func, args, kwargs):
+    # Like sending the job to the process pool
+    func, args, kwargs = pickle.loads(pickle.dumps((func, args, kwargs)))
+    func(*args, **kwargs)
+
+
+def _legacy_render(output_folder, commonroad_scenario, scenario_state, goal_regions_as_rectangles, road_layer_key):
+    for focus_on_driver_user_id in [None] + list(goal_regions_as_rectangles.keys()):
+        _run_job(_legacy_generate_frame,
+                 [output_folder, commonroad_scenario, 10, 1, scenario_state],
+                 {"focus_on_driver_user_id": focus_on_driver_user_id,
+                  "goal_region_as_rectangle": goal_regions_as_rectangles.get(focus_on_driver_user_id),
+                  "road_layer_key": road_layer_key})
+
+
+def _render(output_folder, commonroad_scenario, scenario_state, goal_regions_as_rectangles, road_layer_key):
+    _run_job(generate_frames,
+             [output_folder, commonroad_scenario, 10, 1, scenario_state,
+              [None] + list(goal_regions_as_rectangles.keys()), goal_regions_as_rectangles],
+             {"road_layer_key": road_layer_key})
+
+
+def _scenario_state(commonroad_scenario, n_drivers):
+    """ Place the vehicles along the first lanelet of the template, but not at its ends """
+    center_vertices = commonroad_scenario.lanelet_network.lanelets[0].center_vertices
+    scenario_state = []
+    for index in range(0, n_drivers):
+        position_x, position_y = center_vertices[(index + 1) * (len(center_vertices) - 1) // (n_drivers + 1)]
+        scenario_state.append(SimpleNamespace(user_id=index + 1, driver_id=index + 1, scenario_id=1, timestamp=3,
+                                              position_x=float(position_x), position_y=float(position_y),
+                                              rotation=0.0, speed_ms=10.0, acceleration_m2s=0.0, status="ACTIVE"))
+    return scenario_state
+
+
+def _measure_ms(render, *args):
+    # Warm up the cache
+    render(*args)
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        render(*args)
+    return (time.perf_counter() - start) * 1000 / REPETITIONS
+
+
+def _same_pngs(legacy_folder, one_job_folder):
+    for file_name in [f for f in os.listdir(legacy_folder) if f.endswith(".png")]:
+        if not np.array_equal(mpimg.imread(os.path.join(legacy_folder, file_name)),
+                              mpimg.imread(os.path.join(one_job_folder, file_name))):
+            return False
+    return sorted(os.listdir(legacy_folder)) == sorted(os.listdir(one_job_folder))
+
+
+def main():
+    templates_folder = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "scenario_templates")
+
+    print(f"{'template':>17} | {'drivers':>7} | {'views':>5} | {'legacy ms':>9} | {'one job ms':>10} | {'same':>5}")
+    for template_file_name in TEMPLATES:
+        commonroad_scenario, _ = CommonRoadFileReader(os.path.join(templates_folder, template_file_name)).open()
+        road_layer_key = template_file_name
+
+        for n_drivers in N_DRIVERS:
+            scenario_state = _scenario_state(commonroad_scenario, n_drivers)
+            goal_regions_as_rectangles = {
+                vehicle_state.user_id: Rectangle(4.0, 2.0, center=np.array([vehicle_state.position_x + 5.0,
+                                                                            vehicle_state.position_y]))
+                for vehicle_state in scenario_state
+            }
+            legacy_folder, one_job_folder = tempfile.mkdtemp(), tempfile.mkdtemp()
+
+            legacy_ms = _measure_ms(_legacy_render, legacy_folder, commonroad_scenario, scenario_state,
+                                    goal_regions_as_rectangles, road_layer_key)
+            one_job_ms = _measure_ms(_render, one_job_folder, commonroad_scenario, scenario_state,
+                                     goal_regions_as_rectangles, road_layer_key)
+            same = _same_pngs(legacy_folder, one_job_folder)
+            print(f"{template_file_name:>17} | {n_drivers:>7} | {n_drivers + 1:>5} | {legacy_ms:>9.2f} | "
+                  f"{one_job_ms:>10.2f} | {str(same):>5}")
+
+    print(road_layer_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare preallocating the vehicle states of a scenario, as the activation does, by adding one ORM object per driver
+per timestamp, as we used to do, against a single bulk insert.
+
+The initial states are made up, since we are interested only in the database.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_scenario_activation
+"""
+import time
+
+from benchmarks.utils import create_benchmark_app, create_scenario_without_states, read_template_xml
+
+from model.mixed_traffic_scenario import MixedTrafficScenario
+from model.vehicle_state import VehicleState, VehicleStatusEnum
+
+from persistence.database import db
+from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+
+DURATIONS = [100, 300, 600, 2000]
+N_DRIVERS = 8
+
+
+def _legacy_preallocate_vehicle_states(scenario, all_initial_states):
+    """ The original implementation: one ORM object per state """
+    for driver_id in all_initial_states.keys():
+        state_id, status, timestamp, user_id, scenario_id, position_x, position_y, rotation, speed_ms, acceleration_m2s = all_initial_states[driver_id]
+        db.session.add(VehicleState(status=status, timestamp=timestamp, user_id=user_id, driver_id=driver_id,
+                                    scenario_id=scenario_id, position_x=position_x, position_y=position_y,
+                                    rotation=rotation, speed_ms=speed_ms, acceleration_m2s=acceleration_m2s))
+
+    for driver in scenario.drivers:
+        for timestamp in range(1, scenario.duration + 1):
+            db.session.add(VehicleState(status="PENDING", timestamp=timestamp, driver_id=driver.driver_id,
+                                        user_id=driver.user_id, scenario_id=scenario.scenario_id))
+
+
+def _initial_states(scenario):
+    return {driver.driver_id: (None, VehicleStatusEnum.ACTIVE, 0, driver.user_id, scenario.scenario_id,
+                               0.0, 0.0, 0.0, 1.0, 0.0) for driver in scenario.drivers}
+
+
+def _measure_ms(preallocate, scenario):
+    start = time.perf_counter()
+    preallocate(scenario, _initial_states(scenario))
+    db.session.commit()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    app = create_benchmark_app()
+    vehicle_state_dao = MixedTrafficScenarioDAO(app.config).vehicle_state_dao
+    template_xml = read_template_xml()
+
+    print(f"{'duration':>8} | {'states':>6} | {'legacy ms':>9} | {'bulk ms':>7}")
+    for index, duration in enumerate(DURATIONS):
+        legacy_scenario_id, bulk_scenario_id = 2 * index + 1, 2 * index + 2
+        create_scenario_without_states(legacy_scenario_id, template_xml, N_DRIVERS, duration)
+        create_scenario_without_states(bulk_scenario_id, template_xml, N_DRIVERS, duration)
+        db.session.commit()
+
+        legacy_scenario = db.session.get(MixedTrafficScenario, legacy_scenario_id)
+        legacy_ms = _measure_ms(_legacy_preallocate_vehicle_states, legacy_scenario)
+        bulk_scenario = db.session.get(MixedTrafficScenario, bulk_scenario_id)
+        bulk_ms = _measure_ms(vehicle_state_dao._preallocate_vehicle_states, bulk_scenario)
+
+        print(f"{duration:>8} | {N_DRIVERS * (duration + 1):>6} | {legacy_ms:>9.1f} | {bulk_ms:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare what a hit of the cache of the parsed templates (ParsedScenarioCache) costs: parsing the XML again, as we did
+before caching, deep copying the cached scenario, as the first version of the cache did, or creating a scenario over
+the cached lanelet network and obstacles (create_overlay_scenario), as we do now.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_scenario_cache
+"""
+import copy
+import os
+import time
+
+from model.scenario_cache import ParsedScenarioCache, _parse_xml, create_overlay_scenario, hash_xml
+
+TEMPLATES = ["template_3.xml", "template_1.xml", "ZAM_Tjunction-1_100_T-1.xml", "ZAM_Urban-3_3.xml"]
+REPETITIONS = 50
+
+
+def _measure(get_scenario):
+    """ Return the average time to get the scenario (ms) """
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        get_scenario()
+    return (time.perf_counter() - start) * 1000 / REPETITIONS
+
+
+def main():
+    templates_folder = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "scenario_templates")
+
+    print(f"{'template':>27} | {'lanelets':>8} | {'parse ms':>8} | {'deepcopy ms':>11} | {'overlay ms':>10}")
+    for template_id, template_file_name in enumerate(TEMPLATES):
+        with open(os.path.join(templates_folder, template_file_name)) as template_file:
+            xml = template_file.read()
+
+        cache = ParsedScenarioCache()
+        cache.warm_up(template_id, xml)
+        cached_scenario = cache.get((template_id, hash_xml(xml)))
+
+        parse_ms = _measure(lambda: _parse_xml(xml))
+        deepcopy_ms = _measure(lambda: copy.deepcopy(cached_scenario))
+        overlay_ms = _measure(lambda: create_overlay_scenario(cached_scenario))
+        print(f"{template_file_name:>27} | {len(cached_scenario.lanelet_network.lanelets):>8} | {parse_ms:>8.2f} | "
+              f"{deepcopy_ms:>11.2f} | {overlay_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
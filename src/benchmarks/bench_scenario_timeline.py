@@ -0,0 +1,59 @@
+"""
+Compare the number of queries and the latency of computing the scenario timeline (i.e., the state of the scenario
+at each timestamp) one timestamp at the time, as scenario_overview used to do, against the single grouped query.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_scenario_timeline
+"""
+from benchmarks.utils import create_benchmark_app, create_scenario, count_queries, read_template_xml
+
+from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
+from model.vehicle_state import VehicleStatusEnum
+
+from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+
+DURATIONS = [10, 50, 100, 300]
+N_DRIVERS = 4
+
+
+def _legacy_scenario_state_at_timestamp(scenario_dao, scenario_id, timestamp, propagate=True):
+    """ The original recursive implementation: one query per timestamp, plus one for the next timestamp """
+    vehicle_states = scenario_dao.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario_id, timestamp)
+    if len(vehicle_states) == 0:
+        return MixedTrafficScenarioStatusEnum.WAITING if propagate else None
+
+    not_actionable = [VehicleStatusEnum.ACTIVE, VehicleStatusEnum.CRASHED, VehicleStatusEnum.GOAL_REACHED]
+    if all(vs.status in not_actionable for vs in vehicle_states):
+        if propagate:
+            next_state = _legacy_scenario_state_at_timestamp(scenario_dao, scenario_id, timestamp + 1, propagate=False)
+            if next_state == VehicleStatusEnum.ACTIVE or next_state is None:
+                return MixedTrafficScenarioStatusEnum.DONE
+        return MixedTrafficScenarioStatusEnum.ACTIVE
+    return MixedTrafficScenarioStatusEnum.PENDING
+
+
+def main():
+    app = create_benchmark_app()
+    scenario_dao = MixedTrafficScenarioDAO(app.config)
+    template_xml = read_template_xml()
+
+    print(f"{'duration':>8} | {'legacy queries':>14} | {'legacy ms':>9} | {'timeline queries':>16} | {'timeline ms':>11}")
+    for scenario_id, duration in enumerate(DURATIONS, start=1):
+        # Put the frontier in the middle of the scenario
+        create_scenario(scenario_id, template_xml, N_DRIVERS, duration, active_until=duration // 2)
+
+        with count_queries() as legacy:
+            legacy_timeline = [_legacy_scenario_state_at_timestamp(scenario_dao, scenario_id, t)
+                               for t in range(0, duration + 1)]
+
+        with count_queries() as grouped:
+            timeline = scenario_dao.get_scenario_timeline(scenario_id, duration)
+
+        assert legacy_timeline == timeline, "The two implementations disagree!"
+
+        print(f"{duration:>8} | {legacy['queries']:>14} | {legacy['seconds'] * 1000:>9.1f} | "
+              f"{grouped['queries']:>16} | {grouped['seconds'] * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
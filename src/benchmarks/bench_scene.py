@@ -0,0 +1,123 @@
+"""
+Compare producing the interactive view of a driver as an mpld3 HTML snippet, as we used to do, against producing its
+scene (generate_scene), which the browser draws over the road spec of the template.
+
+The HTML snippet carries the whole road layout, the vehicles, the tooltips, and the lines that the trajectory
+visualizer needs, including the placeholders of the visible trajectories. The scene carries only the vehicles, the
+goal region, and the tooltips; the road spec is generated once per template and the browser caches it, so we report
+its size aside. The legacy view draws the vehicles as boxes instead of icons, so it underestimates the old cost.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_scene
+"""
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import matplotlib.pyplot as plt
+import mpld3
+
+from matplotlib.patches import Polygon
+
+from commonroad.common.file_reader import CommonRoadFileReader
+from commonroad.geometry.shape import Rectangle
+
+from frontend.mpld3_plugins import TrajectoryView, ZoomEgoCarPlugin
+from visualization.road_layer_cache import road_layer_cache
+from visualization.scene import ROAD_FIGSIZE, generate_road_spec, generate_scene
+
+TEMPLATES = ["template_3.xml", "ZAM_Urban-3_3.xml"]
+N_DRIVERS = [2, 4, 8]
+REPETITIONS = 10
+# The placeholders that the legacy view pre-allocated for the visible trajectories
+VISIBLE_TRAJECTORIES = 100
+
+
+def _legacy_view(commonroad_scenario, road_layer_key, scenario_state, focus_on_driver_user_id,
+                 goal_region_as_rectangle) -> str:
+    """ Render the interactive view of the driver as embeddable HTML, as we used to do """
+    road_layer = road_layer_cache.get(road_layer_key, commonroad_scenario, ROAD_FIGSIZE)
+    fig, ax = road_layer.new_figure()
+    try:
+        # The scene has the boxes, colors, and tooltips we used to plot
+        scene = generate_scene(scenario_state, focus_on_driver_user_id, goal_region_as_rectangle)
+        goal_region = scene["goal_region"]
+        ax.add_patch(Polygon(goal_region["box"], closed=True, zorder=20))
+        for vehicle in scene["vehicles"]:
+            ax.add_patch(Polygon(vehicle["box"], closed=True, linewidth=vehicle["linewidth"], zorder=50))
+
+        x, y = [scene["ego"][0]], [scene["ego"][1]]
+        reference_path_line, = ax.plot(x, y, linestyle='-', lw=4, alpha=0.3, color="green", zorder=49)
+        trajectory_line, = ax.plot(x, y, linestyle='-', lw=2, alpha=0.5, color="black", zorder=50)
+        selected_line, = ax.plot(x, y, linestyle='-', lw=4, alpha=1, color="black", zorder=51)
+        mpld3.plugins.connect(fig, TrajectoryView(trajectory_line, selected_line, reference_path_line))
+        for _ in range(0, VISIBLE_TRAJECTORIES):
+            ax.plot(x, y, linestyle='--', lw=2, alpha=0.2, color="blue", zorder=49)
+        mpld3.plugins.connect(fig, ZoomEgoCarPlugin(x, y))
+
+        points = ax.plot([vehicle["position"][0] for vehicle in scene["vehicles"]],
+                         [vehicle["position"][1] for vehicle in scene["vehicles"]],
+                         'o', color='b', mec='k', ms=15, mew=1, alpha=0, zorder=52)
+        mpld3.plugins.connect(fig, mpld3.plugins.PointHTMLTooltip(points[0], labels=[vehicle["tooltip"] for vehicle in
+                                                                                     scene["vehicles"]]))
+        return mpld3.fig_to_html(fig, template_type="simple")
+    finally:
+        plt.close(fig)
+
+
+def _scene(scenario_state, focus_on_driver_user_id, goal_region_as_rectangle) -> str:
+    return json.dumps(generate_scene(scenario_state, focus_on_driver_user_id, goal_region_as_rectangle))
+
+
+def _scenario_state(commonroad_scenario, n_drivers):
+    """ Place the vehicles along the first lanelet of the template, but not at its ends """
+    center_vertices = commonroad_scenario.lanelet_network.lanelets[0].center_vertices
+    scenario_state = []
+    for index in range(0, n_drivers):
+        position_x, position_y = center_vertices[(index + 1) * (len(center_vertices) - 1) // (n_drivers + 1)]
+        scenario_state.append(SimpleNamespace(user_id=index + 1, driver_id=index + 1, scenario_id=1, timestamp=3,
+                                              position_x=float(position_x), position_y=float(position_y),
+                                              rotation=0.0, speed_ms=10.0, acceleration_m2s=0.0, status="ACTIVE"))
+    return scenario_state
+
+
+def _measure(render, *args):
+    """ Return the average time to render the view (ms) and its size (bytes) """
+    # Warm up the cache
+    view = render(*args)
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        render(*args)
+    return (time.perf_counter() - start) * 1000 / REPETITIONS, len(view.encode("utf-8"))
+
+
+def main():
+    templates_folder = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "scenario_templates")
+    road_specs_folder = tempfile.mkdtemp()
+
+    print(f"{'template':>17} | {'drivers':>7} | {'legacy ms':>9} | {'scene ms':>8} | {'legacy bytes':>12} | "
+          f"{'scene bytes':>11} | {'road bytes':>10}")
+    for template_file_name in TEMPLATES:
+        commonroad_scenario, _ = CommonRoadFileReader(os.path.join(templates_folder, template_file_name)).open()
+        road_layer_key = (template_file_name, "xml hash")
+        road_spec_bytes = os.path.getsize(generate_road_spec(road_specs_folder, commonroad_scenario, road_layer_key))
+
+        for n_drivers in N_DRIVERS:
+            scenario_state = _scenario_state(commonroad_scenario, n_drivers)
+            goal_region_as_rectangle = Rectangle(4.0, 2.0, center=np.array([scenario_state[0].position_x + 5.0,
+                                                                            scenario_state[0].position_y]))
+
+            legacy_ms, legacy_bytes = _measure(_legacy_view, commonroad_scenario, road_layer_key, scenario_state, 1,
+                                               goal_region_as_rectangle)
+            scene_ms, scene_bytes = _measure(_scene, scenario_state, 1, goal_region_as_rectangle)
+            print(f"{template_file_name:>17} | {n_drivers:>7} | {legacy_ms:>9.2f} | {scene_ms:>8.2f} | "
+                  f"{legacy_bytes:>12} | {scene_bytes:>11} | {road_spec_bytes:>10}")
+
+    print(road_layer_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure how reading the states of a scenario at a given timestamp, and updating the state of a driver, scale as the
+Vehicle_State table grows, with and without the composite indexes declared on VehicleState.
+
+We only measure the database: collision checking, goal checking and rendering are disabled during update.
+
+Usage (from the src folder):
+    python -m benchmarks.bench_vehicle_state_indexes [--scenarios 100 1000 2000] [--drivers 4] [--duration 300]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import create_benchmark_app, create_scenario, fill_scenarios, read_template_xml
+
+from model.vehicle_state import VehicleState
+
+from persistence.database import db
+from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+
+# The scenario that we use to measure the queries
+PROBE_SCENARIO_ID = 1
+REPETITIONS = 200
+
+
+def _average_ms(function, repetitions=REPETITIONS):
+    start = time.perf_counter()
+    for _ in range(0, repetitions):
+        function()
+    return (time.perf_counter() - start) * 1000 / repetitions
+
+
+def _measure(vehicle_state_dao, scenario, driver, duration):
+    # The probe scenario is ACTIVE until half of its duration and the other drivers did not submit any state after
+    # the next one, so the driver can submit over and over the same state without activating the timestamp
+    next_timestamp = duration // 2 + 2
+    state = VehicleState(timestamp=next_timestamp, position_x=1.0, position_y=1.0, rotation=0.0, speed_ms=1.0,
+                         acceleration_m2s=0.0)
+
+    read_ms = _average_ms(lambda: vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(
+        PROBE_SCENARIO_ID, random.randint(0, duration)))
+    update_ms = _average_ms(lambda: vehicle_state_dao.update_driver_state_in_scenario(scenario, driver, state))
+    return read_ms, update_ms
+
+
+def _drop_indexes():
+    for index in VehicleState.__table__.indexes:
+        index.drop(bind=db.engine)
+
+
+def _create_indexes():
+    for index in VehicleState.__table__.indexes:
+        index.create(bind=db.engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", type=int, default=[100, 1000, 2000],
+                        help="Measure when the database contains these many scenarios")
+    parser.add_argument("--drivers", type=int, default=4)
+    parser.add_argument("--duration", type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    scenario_dao = MixedTrafficScenarioDAO(app.config)
+    vehicle_state_dao = scenario_dao.vehicle_state_dao
+
+    # Measure only the database
+    vehicle_state_dao._vehicles_that_collided = lambda *args, **kwargs: []
+    vehicle_state_dao._vehicles_that_reached_goal = lambda *args, **kwargs: []
+    vehicle_state_dao._render_scenario_state = lambda *args, **kwargs: None
+
+    create_scenario(PROBE_SCENARIO_ID, read_template_xml(), args.drivers, args.duration, active_until=args.duration // 2)
+    scenario = scenario_dao.get_scenario_by_scenario_id(PROBE_SCENARIO_ID)
+    driver = scenario.drivers[0]
+
+    print(f"{'scenarios':>9} | {'states':>9} | {'read ms':>7} | {'update ms':>9} | "
+          f"{'read ms (no idx)':>16} | {'update ms (no idx)':>18}")
+    n_scenarios = 1
+    for target in sorted(args.scenarios):
+        if target > n_scenarios:
+            fill_scenarios(n_scenarios + 1, target - n_scenarios, args.drivers, args.duration)
+            n_scenarios = target
+        n_states = db.session.execute(db.select(db.func.count(VehicleState.vehicle_state_id))).scalar()
+
+        read_ms, update_ms = _measure(vehicle_state_dao, scenario, driver, args.duration)
+        _drop_indexes()
+        try:
+            read_no_idx_ms, update_no_idx_ms = _measure(vehicle_state_dao, scenario, driver, args.duration)
+        finally:
+            _create_indexes()
+
+        print(f"{n_scenarios:>9} | {n_states:>9} | {read_ms:>7.2f} | {update_ms:>9.2f} | "
+              f"{read_no_idx_ms:>16.2f} | {update_no_idx_ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+The original implementation of TrajectorySampler.check_kinematics, which converts and checks one step of one
+trajectory at a time. tests/unit/test_check_kinematics.py checks that the vectorized implementation produces the same
+results, and benchmarks/bench_check_kinematics.py compares their timing.
+"""
+import numpy as np
+
+from commonroad_rp.trajectories import CartesianSample, CurviLinearSample
+from commonroad_rp.utils import interpolate_angle
+
+from model.trajectory import _LOW_VEL_MODE, logger
+
+
+def legacy_check_kinematics(sampler, trajectory_bundle):
+    """ The original implementation: convert and check one step of one trajectory at a time """
+    feasible_trajectories = list()
+    infeasible_trajectories = list()
+    infeasibility_reasons = list()
+
+    for tr_index, trajectory in enumerate(trajectory_bundle.trajectories):
+
+        feasible = True
+
+        try:
+            # create time array and precompute time interval information
+            t = np.arange(0, np.round(trajectory.trajectory_long.delta_tau + sampler.dT, 5), sampler.dT)
+            t2 = np.square(t)
+            t3 = t2 * t
+            t4 = np.square(t2)
+            t5 = t4 * t
+
+            # Why do we care about the 4th power of time? space, velocity, acceralation, jerk, ??
+
+            # compute position, velocity, acceleration from trajectory sample
+            s = trajectory.trajectory_long.calc_position(t, t2, t3, t4, t5)  # lon pos
+            # Speed goes down, why?
+            s_velocity = trajectory.trajectory_long.calc_velocity(t, t2, t3, t4)  # lon velocity
+            # Acceleration is not constant... why? The methods are not explained...
+            s_acceleration = trajectory.trajectory_long.calc_acceleration(t, t2, t3)  # lon acceleration
+
+            # At low speeds, we have to sample the lateral motion over the travelled distance rather than time.
+            if not _LOW_VEL_MODE:
+                d = trajectory.trajectory_lat.calc_position(t, t2, t3, t4, t5)  # lat pos
+                d_velocity = trajectory.trajectory_lat.calc_velocity(t, t2, t3, t4)  # lat velocity
+                d_acceleration = trajectory.trajectory_lat.calc_acceleration(t, t2, t3)  # lat acceleration
+
+            else:
+                # compute normalized travelled distance for low velocity mode of lateral planning
+                s1 = s - s[0]
+                s2 = np.square(s1)
+                s3 = s2 * s1
+                s4 = np.square(s2)
+                s5 = s4 * s1
+
+                d = trajectory.trajectory_lat.calc_position(s1, s2, s3, s4, s5)  # lat pos
+                # in LOW_VEL_MODE d_velocity is actually d' (see Diss. Moritz Werling  p.124)
+                d_velocity = trajectory.trajectory_lat.calc_velocity(s1, s2, s3, s4)  # lat velocity
+                d_acceleration = trajectory.trajectory_lat.calc_acceleration(s1, s2, s3)  # lat acceleration
+
+            # Compute cartesian information of trajectory
+            s_length = len(s)
+            x = np.zeros(s_length)
+            y = np.zeros(s_length)
+            theta_gl = np.zeros(s_length)
+            theta_cl = np.zeros(s_length)
+            v = np.zeros(s_length)
+            a = np.zeros(s_length)
+            kappa_gl = np.zeros(s_length)
+            kappa_cl = np.zeros(s_length)
+
+            oopd = False # Out of Projection Domain
+
+            for i in range(0, s_length):
+                # compute Global position from the coordinate system defined by the reference path. Not sure what is s and d, maybe longitudinal and lateral/latitudinal positions?
+                pos: np.ndarray = sampler._co.convert_to_cartesian_coords(s[i], d[i])
+
+                if pos is not None:
+                    x[i] = pos[0]
+                    y[i] = pos[1]
+                else:
+                    feasible = False
+                    oopd = True
+                    # TODO What's this? When this triggers we cannot generate the Cartesian Trajectory
+                    # This happens when the ref path is shorter than the plannable trajectory
+                    logger.info("Out of projection domain")
+                    break
+
+                # compute orientations - what dp is supposed to be?
+                if not _LOW_VEL_MODE:
+                    if s_velocity[i] > 0.001:
+                        dp = d_velocity[i] / s_velocity[i]
+                    else:
+                        if d_velocity[i] > 0.001:
+                            dp = None
+                        else:
+                            dp = 0.
+                    ddot = d_acceleration[i] - dp * s_acceleration[i]
+                    # What dpp is supposed to be?
+                    if s_velocity[i] > 0.001:
+                        dpp = ddot / (s_velocity[i] ** 2)
+                    else:
+                        if np.abs(ddot) > 0.00003:
+                            # TODO When this happens everything crashes.
+                            # THIS CONDITION IS TRIGGERED BY SOME SPECIFIC INITIAL STATE, WHICH IS RANDOM AT THE MOMENT
+                            dpp = None
+                        else:
+                            dpp = 0.
+                else:
+                    dp = d_velocity[i]
+                    dpp = d_acceleration[i]
+
+                # At this point dpp might not have been initialized?
+
+                s_idx = np.argmin(np.abs(sampler._co.ref_pos() - s[i]))
+                if sampler._co.ref_pos()[s_idx] < s[i]:
+                    s_idx += 1
+
+                if s_idx + 1 >= len(sampler._co.ref_pos()):
+                    feasible = False
+                    break
+
+                s_lambda = (sampler._co.ref_pos()[s_idx] - s[i]) / (
+                        sampler._co.ref_pos()[s_idx + 1] - sampler._co.ref_pos()[s_idx])
+
+                # add cl and gl orientation
+                if s_velocity[i] > 0.005:
+                    if _LOW_VEL_MODE:
+                        theta_cl[i] = np.arctan2(dp, 1.0)
+                    else:
+                        theta_cl[i] = np.arctan2(d_velocity[i], s_velocity[i])
+                    theta_gl[i] = theta_cl[i] + interpolate_angle(
+                        s[i],
+                        sampler._co.ref_pos()[s_idx],
+                        sampler._co.ref_pos()[s_idx + 1],
+                        sampler._co.ref_theta()[s_idx],
+                        sampler._co.ref_theta()[s_idx + 1]
+                    )
+                    if theta_gl[i] < -np.pi:
+                        theta_gl[i] += 2 * np.pi
+                    if theta_gl[i] > np.pi:
+                        theta_gl[i] -= 2 * np.pi
+                    # theta_gl[i] = theta_cl[i] + (
+                    #         sampler._co.ref_theta()[s_idx + 1] - sampler._co.ref_theta()[s_idx]) * s_lambda + \
+                    #               sampler._co.ref_theta()[s_idx]
+
+                else:
+                    # theta_cl.append(np.interp(s[i], sampler._co.ref_pos(), sampler._co.ref_theta()))
+                    # theta_cl[i] = (sampler._co.ref_theta()[s_idx + 1] - sampler._co.ref_theta()[s_idx]) * s_lambda + \
+                    #               sampler._co.ref_theta()[s_idx]
+                    theta_cl[i] = interpolate_angle(
+                        s[i],
+                        sampler._co.ref_pos()[s_idx],
+                        sampler._co.ref_pos()[s_idx + 1],
+                        sampler._co.ref_theta()[s_idx],
+                        sampler._co.ref_theta()[s_idx + 1]
+                    )
+                    if theta_cl[i] < -np.pi:
+                        theta_cl[i] += 2 * np.pi
+                    if theta_cl[i] > np.pi:
+                        theta_cl[i] -= 2 * np.pi
+                    theta_gl[i] = theta_cl[i]
+
+                # Compute curvature of reference at current position
+                k_r = (sampler._co.ref_curv()[s_idx + 1] - sampler._co.ref_curv()[s_idx]) * s_lambda + \
+                      sampler._co.ref_curv()[
+                          s_idx]
+                k_r_d = (sampler._co.ref_curv_d()[s_idx + 1] - sampler._co.ref_curv_d()[s_idx]) * s_lambda + \
+                        sampler._co.ref_curv_d()[s_idx]
+
+                # compute global curvature based on appendix A of Moritz Werling's PhD thesis ... well sadly this is written in German!
+                # TODO What happens if dpp is None?
+                oneKrD = (1 - k_r * d[i])
+                cosTheta = np.cos(theta_cl[i])
+                tanTheta = np.tan(theta_cl[i])
+                kappa_gl[i] = (dpp + k_r * dp * tanTheta) * cosTheta * (cosTheta / oneKrD) ** 2 + (
+                        cosTheta / oneKrD) * k_r
+                kappa_cl[i] = kappa_gl[i] - k_r
+
+                # velocity
+                v[i] = s_velocity[i] * (oneKrD / (np.cos(theta_cl[i])))
+
+                # compute acceleration
+                a[i] = s_acceleration[i] * oneKrD / cosTheta + ((s_velocity[i] ** 2) / cosTheta) * (
+                        oneKrD * tanTheta * (kappa_gl[i] * oneKrD / cosTheta - k_r) - (
+                        k_r_d * d[i] + k_r * d_velocity[i]))
+
+                # check kinematics to already discard infeasible trajectories
+                infeasibility_reason = None
+                if abs(kappa_gl[i] > sampler.constraints.kappa_max):
+                    infeasibility_reason = f"Rejected trajectory for Kappa {kappa_gl[i]} at step {i}"
+                    feasible = False
+                    break
+                if abs((kappa_gl[i] - kappa_gl[i - 1]) / sampler.dT if i > 0 else 0.) > sampler.constraints.kappa_dot_max:
+                    infeasibility_reason = f"Rejected trajectory for KappaDOT {abs((kappa_gl[i] - kappa_gl[i - 1]) / sampler.dT if i > 0 else 0.)} between step {i - 1} and {i}"
+                    feasible = False
+                    break
+                if abs(a[i]) > sampler.constraints.a_max:
+                    infeasibility_reason = f"Rejected trajectory for Acceleration {a[i]} at step {i}"
+                    feasible = False
+                    break
+                if abs(v[i]) < -0.01:
+                    infeasibility_reason = f"Rejected trajectory for Velocity {v[i]} at step {i}"
+                    feasible = False
+                    break
+
+                # de-normalization
+                theta_gl = np.unwrap(theta_gl)
+
+                if abs((theta_gl[i - 1] - theta_gl[i]) / sampler.dT if i > 0 else 0.) > sampler.constraints.theta_dot_max:
+                    infeasibility_reason =f"Rejected trajectory for Theta_dot {(theta_gl[i - 1] - theta_gl[i]) / sampler.dT if i > 0 else 0.} between step {i - 1} and {i}"
+                    feasible = False
+                    break
+
+            if oopd:
+                # Do not show the one Out of Projection Domain!
+                continue
+
+            # store Cartesian trajectory
+            trajectory.cartesian = CartesianSample(x, y, theta_gl, v, a, kappa_gl,
+                                                   np.append([0], np.diff(kappa_gl)))
+            # store Curvilinear trajectory
+            trajectory.curvilinear = CurviLinearSample(s, d, theta_gl, ss=s_velocity, sss=s_acceleration,
+                                                       dd=d_velocity,
+                                                       ddd=d_acceleration)
+
+            # check if trajectories planning horizon is shorter than expected and extend if necessary
+            # if sampler.horizon > trajectory.trajectory_long.delta_tau:
+            # NOT SURE WHY THIS HAPPENS? FEW SAMPLING POINTS?
+            if sampler.N + 1 > len(trajectory.cartesian.x):
+                trajectory.enlarge(sampler.N + 1 - len(trajectory.cartesian.x), sampler.dT)
+            elif sampler.N + 1 < len(trajectory.cartesian.x):
+                trajectory.reduce(len(trajectory.cartesian.x) - (sampler.N + 1))
+
+            if sampler.N + 1 == len(trajectory.cartesian.x) == len(trajectory.cartesian.y) == len(trajectory.cartesian.theta):
+                if feasible:
+                    feasible_trajectories.append(trajectory)
+                else:
+                    infeasible_trajectories.append(trajectory)
+                    infeasibility_reasons.append(infeasibility_reason)
+                    logger.debug(f"infeasibility_reason= {infeasibility_reason}" )
+            else:
+                logger.warning("Error in generating the Cartesian Trajectory {} - {} - {}. Skip trajectory!".format(
+                    trajectory.the_v, trajectory.the_d, trajectory.the_t
+                ))
+                infeasible_trajectories.append(trajectory)
+                infeasibility_reasons.append("Cannot generate the Cartesian Trajectory")
+
+        except Exception as ex_info:
+            infeasible_trajectories.append(trajectory)
+            infeasibility_reasons.append(f"Error {ex_info.args}")
+            logger.error("Failed to handle trajectory ! {}".format(tr_index))
+
+    logger.debug(
+        '<ReactivePlanner>: Kinematic check of %s trajectories done' % len(trajectory_bundle.trajectories))
+
+    return feasible_trajectories, infeasible_trajectories, infeasibility_reasons
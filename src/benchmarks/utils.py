@@ -0,0 +1,160 @@
+"""
+Helpers shared by the benchmarks. They create a throw-away app backed by SQLite and fill the database directly,
+without going through the API, so we can quickly build scenarios of arbitrary duration.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event, func
+
+from flexcrash import create_app
+
+from persistence.database import db
+
+from model.user import User
+from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
+from model.mixed_traffic_scenario import MixedTrafficScenario, MixedTrafficScenarioStatusEnum
+from model.driver import Driver
+from model.vehicle_state import VehicleState, VehicleStatusEnum
+
+BENCHMARK_CONFIGURATION = """
+DATABASE_NAME = '{database_file}'
+SQLALCHEMY_DATABASE_URI = 'sqlite:///{database_file}'
+MARIA_DB = False
+SERVER_NAME = 'localhost:5000'
+TESTING = True
+SECRET_KEY = "Bogus"
+IMAGES_FOLDER = '{images_folder}'
+TEMPLATE_IMAGES_FOLDER = '{images_folder}'
+SCENARIO_IMAGES_FOLDER = '{images_folder}'
+SCHEDULER_API_ENABLED = False
+"""
+
+# Keep the ids far from the ones assigned at startup (e.g., the admin)
+FIRST_USER_ID = 1000
+# The users driving in the scenarios that only fill up the database
+FIRST_FILLER_USER_ID = 500
+
+
+def create_benchmark_app():
+    """ Create an app that stores everything into a temporary folder and push its context """
+    tmp_dir = tempfile.mkdtemp(prefix="flexcrash_benchmark_")
+    cfg_file = os.path.join(tmp_dir, "flexcrash.cfg")
+    with open(cfg_file, "w") as output_file:
+        output_file.write(BENCHMARK_CONFIGURATION.format(database_file=os.path.join(tmp_dir, "database.db"),
+                                                         images_folder=tmp_dir))
+    app = create_app(cfg_file)
+    app.app_context().push()
+    return app
+
+
+def create_scenario_without_states(scenario_id, template_xml, n_drivers, duration):
+    """ Store an ACTIVE scenario with n_drivers drivers, but without vehicle states. Return the drivers """
+    if db.session.get(MixedTrafficScenarioTemplate, 1) is None:
+        db.session.add(MixedTrafficScenarioTemplate(template_id=1, name="benchmark", description="benchmark", xml=template_xml))
+
+    user_ids = []
+    for index in range(0, n_drivers):
+        user_id = FIRST_USER_ID + scenario_id * 100 + index
+        db.session.add(User(user_id=user_id, username=f"bench_{user_id}", email=f"bench_{user_id}@flexcrash.eu", password="1234"))
+        user_ids.append(user_id)
+
+    db.session.add(MixedTrafficScenario(scenario_id=scenario_id, name=f"benchmark_{scenario_id}", description=None,
+                                        created_by=user_ids[0], max_players=n_drivers, n_users=n_drivers, n_avs=0,
+                                        status=MixedTrafficScenarioStatusEnum.ACTIVE, template_id=1, duration=duration))
+    db.session.flush()
+
+    drivers = []
+    for user_id in user_ids:
+        driver = Driver(user_id=user_id, scenario_id=scenario_id)
+        db.session.add(driver)
+        drivers.append(driver)
+    db.session.flush()
+    return drivers
+
+
+def create_scenario(scenario_id, template_xml, n_drivers, duration, active_until):
+    """
+    Store a scenario with n_drivers drivers and all their states. States up to active_until are ACTIVE, the
+    following one is WAITING, the others are PENDING.
+    """
+    for driver in create_scenario_without_states(scenario_id, template_xml, n_drivers, duration):
+        user_id = driver.user_id
+        for timestamp in range(0, duration + 1):
+            if timestamp <= active_until:
+                status = VehicleStatusEnum.ACTIVE
+            elif timestamp == active_until + 1:
+                status = VehicleStatusEnum.WAITING
+            else:
+                status = VehicleStatusEnum.PENDING
+            db.session.add(VehicleState(status=status, timestamp=timestamp, driver_id=driver.driver_id,
+                                        user_id=user_id, scenario_id=scenario_id,
+                                        position_x=0.0, position_y=0.0, rotation=0.0, speed_ms=1.0, acceleration_m2s=0.0))
+    db.session.commit()
+
+
+def fill_scenarios(first_scenario_id, n_scenarios, n_drivers, duration):
+    """
+    Quickly store n_scenarios scenarios that are ACTIVE up to half of their duration, using bulk inserts. Those
+    scenarios are not meant to be used, only to make the tables grow.
+    """
+    if db.session.get(MixedTrafficScenarioTemplate, 1) is None:
+        raise AssertionError("Create at least one scenario before filling the database")
+
+    user_ids = [FIRST_FILLER_USER_ID + index for index in range(0, n_drivers)]
+    for user_id in user_ids:
+        if db.session.get(User, user_id) is None:
+            db.session.add(User(user_id=user_id, username=f"filler_{user_id}", email=f"filler_{user_id}@flexcrash.eu", password="1234"))
+    db.session.flush()
+
+    scenario_ids = list(range(first_scenario_id, first_scenario_id + n_scenarios))
+    db.session.execute(db.insert(MixedTrafficScenario), [
+        {"scenario_id": scenario_id, "name": f"filler_{scenario_id}", "created_by": user_ids[0],
+         "max_players": n_drivers, "n_users": n_drivers, "n_avs": 0,
+         "status": MixedTrafficScenarioStatusEnum.ACTIVE, "template_id": 1, "duration": duration}
+        for scenario_id in scenario_ids])
+
+    # Driver ids follow the order of insertion, so we can compute them instead of reading them back
+    first_driver_id = (db.session.execute(db.select(func.max(Driver.driver_id))).scalar() or 0) + 1
+    db.session.execute(db.insert(Driver), [
+        {"user_id": user_id, "scenario_id": scenario_id} for scenario_id in scenario_ids for user_id in user_ids])
+
+    active_until = duration // 2
+    driver_id = first_driver_id
+    for scenario_id in scenario_ids:
+        vehicle_states = []
+        for user_id in user_ids:
+            for timestamp in range(0, duration + 1):
+                status = VehicleStatusEnum.ACTIVE if timestamp <= active_until else VehicleStatusEnum.PENDING
+                vehicle_states.append({"status": status, "timestamp": timestamp, "driver_id": driver_id,
+                                       "user_id": user_id, "scenario_id": scenario_id})
+            driver_id += 1
+        db.session.execute(db.insert(VehicleState), vehicle_states)
+    db.session.commit()
+
+
+@contextmanager
+def count_queries():
+    """ Count the SQL statements executed (and the time spent) inside the with block """
+    stats = {"queries": 0, "seconds": 0.0}
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        stats["queries"] += 1
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats["seconds"] = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+def read_template_xml():
+    """ Use the same template the app uploads at startup """
+    template_file = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "scenario_templates", "template_3.xml")
+    with open(template_file, "r") as input_file:
+        return input_file.read()
@@ -50,6 +50,29 @@ TEMPLATE_IMAGES_FOLDER = os.path.join(IMAGES_FOLDER, "scenario_template_images")
 SCENARIO_IMAGES_FOLDER = os.path.join(IMAGES_FOLDER, "scenario_images")
 
 AVS_CACHE_FOLDER = "avs_cache"
+# How the internal AVs access the platform: "in_process" uses the database directly, "http" goes through the API
+# like the remote bots do
+AV_TRANSPORT = "in_process"
+# The AVs plan as soon as they can. Additionally, they poll the scenarios with this interval
+AV_POLLING_INTERVAL_IN_SECONDS = 30
+# Whether the AVs render what they planned into their cache folder: "off", "sampled" (once every
+# AV_VISUALIZATION_SAMPLING timestamps, which must be at least 1, otherwise it is "off"), or "on_emergency" (only when
+# they fall back to emergency planning)
+AV_VISUALIZATION_MODE = "off"
+AV_VISUALIZATION_SAMPLING = 10
+
+# How many parsed CommonRoad scenarios (one per template) each process keeps in memory
+SCENARIO_CACHE_SIZE = 16
+# How many road layouts (one per template, figure size, and format) each rendering process keeps in memory
+ROAD_LAYER_CACHE_SIZE = 8
+# How many configured planners (one per AV) each driving process keeps in memory
+AV_PLANNER_CACHE_SIZE = 32
+# How many reference paths (one per driver and snap to road option) each process keeps in memory
+REFERENCE_PATH_CACHE_SIZE = 64
+# The SQLite file where all the processes cache the trajectories they sampled, and how many trajectories it keeps.
+# Relative paths are w.r.t. the instance folder of the app, like the SQLite database
+TRAJECTORY_CACHE_FILE = "trajectory_cache.sqlite"
+TRAJECTORY_CACHE_SIZE = 4096
 
 # Scheduler configuration
 SCHEDULER_API_ENABLED = True
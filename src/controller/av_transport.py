@@ -0,0 +1,276 @@
+# The transports used by the (internal) AVs to read the scenarios and submit their states.
+#
+# The HTTPTransport uses the public API like any other (remote) bot. The InProcessTransport instead uses the DAOs
+# directly, thus skipping the HTTP round trips, the token validation and the serialization to JSON. Both transports
+# return the same (plain) objects, so the AV does not need to know which one it is using.
+import json
+from types import SimpleNamespace
+from typing import List
+
+import requests
+from flask import Flask
+
+from exceptions.exceptions import StopMeException
+from persistence.database import db
+
+# TODO: Not refactoring safe!
+GET_SCENARIO_BY_SCENARIO_ID = "/api/scenarios/{scenario_id}/"
+GET_DRIVER_INITIAL_STATE = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/0/"
+
+GET_DRIVER_BY_SCENARIO_AND_USER_IDS = "/api/scenarios/{scenario_id}/drivers/{user_id}/"
+
+# This is all the states at the vehicle
+GET_VEHICLE_STATES = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/"
+# This is all the states between the timestamps, grouped by driver
+GET_VEHICLES_STATES_BETWEEN_TIMESTAMPS = "/api/scenarios/{scenario_id}/states/{from_timestamp}/{to_timestamp}/"
+
+# We need to access the template from within the scenario, because templates might have been disabled in the meanwhile
+GET_SCENARIO_TEMPLATE_BY_SCENARIO_ID = "/api/scenarios/{scenario_id}/template/xml/"
+
+PUT_UPDATE_VEHICLES_STATES = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/"
+
+IN_PROCESS_TRANSPORT = "in_process"
+HTTP_TRANSPORT = "http"
+
+
+def _as_plain_object(data):
+    """ Convert the given (serialized) data into SimpleNamespace objects, exactly as the HTTP Transport does """
+    return json.loads(json.dumps(data), object_hook=lambda d: SimpleNamespace(**d))
+
+
+def _as_states_data(planned_states) -> dict:
+    """ Encode the given CommonRoad states as the form expected by the API """
+    return {
+        "timestamps": ",".join([str(s.time_step) for s in planned_states]),
+        "positions_x": ",".join([str(s.position[0]) for s in planned_states]),
+        "positions_y": ",".join([str(s.position[1]) for s in planned_states]),
+        "rotations": ",".join([str(s.orientation) for s in planned_states]),
+        "speeds_ms": ",".join([str(s.velocity) for s in planned_states]),
+        "accelerations_m2s": ",".join([str(s.acceleration) for s in planned_states])
+    }
+
+
+class HTTPTransport:
+    """
+    Access the platform using its API. Every request is authenticated with the auth_token of the AV
+    """
+
+    def __init__(self, auth_token, protocol="http", host="localhost", port=5000):
+        self.auth_token = auth_token
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+
+    def __str__(self):
+        return f"{self.protocol}://{self.host}:{self.port}"
+
+    ### TODO Make sure we handle 404, 401, etc.
+    def _do_get_request(self, the_request, data=None):
+        response = requests.get(f"{self}{the_request}", data=data,
+                                headers={'Authorization': self.auth_token})
+
+        if response.status_code > 400:
+            raise StopMeException()
+
+        return response
+
+    def _do_put_request(self, the_request, data=None):
+        return requests.put(f"{self}{the_request}",
+                            data=data,
+                            headers={'Authorization': self.auth_token})
+
+    def _get_plain_object(self, the_request):
+        return json.loads(self._do_get_request(the_request).text, object_hook=lambda d: SimpleNamespace(**d))
+
+    def get_scenario(self, scenario_id):
+        return self._get_plain_object(GET_SCENARIO_BY_SCENARIO_ID.format(scenario_id=scenario_id))
+
+    def get_template_xml(self, scenario_id) -> str:
+        return self._do_get_request(GET_SCENARIO_TEMPLATE_BY_SCENARIO_ID.format(scenario_id=scenario_id)).text
+
+    def get_driver(self, scenario_id, user_id):
+        return self._get_plain_object(GET_DRIVER_BY_SCENARIO_AND_USER_IDS.format(scenario_id=scenario_id, user_id=user_id))
+
+    def get_initial_state(self, scenario_id, user_id):
+        return self._get_plain_object(GET_DRIVER_INITIAL_STATE.format(scenario_id=scenario_id, user_id=user_id))
+
+    def get_vehicle_states(self, scenario_id, user_id) -> List:
+        return self._get_plain_object(GET_VEHICLE_STATES.format(scenario_id=scenario_id, user_id=user_id))
+
+    def get_vehicle_states_by_driver_between_timestamps(self, scenario_id, from_timestamp, to_timestamp):
+        return self._get_plain_object(GET_VEHICLES_STATES_BETWEEN_TIMESTAMPS.format(
+            scenario_id=scenario_id, from_timestamp=from_timestamp, to_timestamp=to_timestamp))
+
+    def update_vehicle_states(self, scenario_id, user_id, planned_states) -> None:
+        response = self._do_put_request(PUT_UPDATE_VEHICLES_STATES.format(scenario_id=scenario_id, user_id=user_id),
+                                        data=_as_states_data(planned_states))
+
+        assert response.status_code == 204, f"Failed to update the states. Reason: {response.text}"
+
+
+# The AVs run in the worker processes of the "driving" executor, so they cannot use the app that scheduled them.
+# Instead, each worker process lazily creates a minimal app (no scheduler, no blueprints) to access the database
+_worker_apps = {}
+
+# The configuration that the worker app and the DAOs need. Every driving job pickles it, so we do not send the entire
+# app configuration (e.g., the secrets and the configuration of the executors)
+WORKER_APP_CONFIG_KEYS = [
+    "SQLALCHEMY_DATABASE_URI", "SQLALCHEMY_ENGINE_OPTIONS",
+    "IMAGES_FOLDER", "TEMPLATE_IMAGES_FOLDER", "SCENARIO_IMAGES_FOLDER",
+    "GOAL_REGION_LENGTH", "GOAL_REGION_WIDTH", "GOAL_REGION_DIST_TO_END", "MIN_INIT_SPEED_M_S", "MAX_INIT_SPEED_M_S",
+    "TRAJECTORY_CACHE_FILE", "TRAJECTORY_CACHE_SIZE"
+]
+
+
+def _get_worker_app(app_config, instance_path) -> Flask:
+    # Relative SQLite databases are resolved against the instance path, so this must match the one of the main app
+    key = (instance_path, app_config["SQLALCHEMY_DATABASE_URI"])
+    if key not in _worker_apps:
+        app = Flask(__name__, instance_path=instance_path)
+        app.config.update(app_config)
+        db.init_app(app)
+        _worker_apps[key] = app
+    return _worker_apps[key]
+
+
+class InProcessTransport:
+    """
+    Access the platform using the DAOs and the database of the app that deployed the AV.
+
+    Only the app configuration needed by the DAOs (WORKER_APP_CONFIG_KEYS) and the instance path are stored, so this
+    transport can be pickled and sent to the worker processes that run the AVs.
+    """
+
+    def __init__(self, app_config, instance_path):
+        self.app_config = {key: app_config[key] for key in WORKER_APP_CONFIG_KEYS if key in app_config}
+        self.instance_path = instance_path
+
+    def __str__(self):
+        return f"in-process ({self.app_config['SQLALCHEMY_DATABASE_URI']})"
+
+    def _app_context(self):
+        return _get_worker_app(self.app_config, self.instance_path).app_context()
+
+    def _get_scenario_and_driver(self, scenario_id, user_id):
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+
+        scenario = MixedTrafficScenarioDAO(self.app_config).get_scenario_by_scenario_id(scenario_id)
+        if scenario is None:
+            raise StopMeException()
+
+        drivers = [d for d in scenario.drivers if d.user_id == user_id]
+        if len(drivers) == 0:
+            raise StopMeException()
+
+        return scenario, drivers[0]
+
+    def get_scenario(self, scenario_id):
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from api.serialization import MixedTrafficScenarioSchema
+
+        with self._app_context():
+            scenario = MixedTrafficScenarioDAO(self.app_config).get_scenario_by_scenario_id(scenario_id)
+            if scenario is None:
+                raise StopMeException()
+            return _as_plain_object(MixedTrafficScenarioSchema().dump(scenario))
+
+    def get_template_xml(self, scenario_id) -> str:
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
+
+        with self._app_context():
+            scenario = MixedTrafficScenarioDAO(self.app_config).get_scenario_by_scenario_id(scenario_id)
+            if scenario is None:
+                raise StopMeException()
+            # Get the template used in this scenario even if it has been disabled
+            scenario_template = MixedTrafficScenarioTemplateDAO(self.app_config).get_template_by_id(scenario.template_id, skip_active_check=True)
+            return scenario_template.xml
+
+    def get_driver(self, scenario_id, user_id):
+        # Avoid circular deps
+        from api.serialization import DriverSchema
+
+        with self._app_context():
+            _, driver = self._get_scenario_and_driver(scenario_id, user_id)
+            return _as_plain_object(DriverSchema().dump(driver))
+
+    def get_initial_state(self, scenario_id, user_id):
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from persistence.vehicle_state_data_access import VehicleStateDAO
+        from api.serialization import VehicleStateSchema
+
+        with self._app_context():
+            scenario, driver = self._get_scenario_and_driver(scenario_id, user_id)
+            vehicle_state_dao = VehicleStateDAO(self.app_config, MixedTrafficScenarioDAO(self.app_config))
+            initial_state = vehicle_state_dao.get_vehicle_state_by_scenario_timestamp_driver(scenario, 0, driver)
+            if initial_state is None:
+                raise StopMeException()
+            return _as_plain_object(VehicleStateSchema().dump(initial_state))
+
+    def get_vehicle_states(self, scenario_id, user_id) -> List:
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from persistence.vehicle_state_data_access import VehicleStateDAO
+        from api.serialization import VehicleStateSchema
+
+        with self._app_context():
+            _, driver = self._get_scenario_and_driver(scenario_id, user_id)
+            vehicle_state_dao = VehicleStateDAO(self.app_config, MixedTrafficScenarioDAO(self.app_config))
+            all_states = vehicle_state_dao.get_states_in_scenario_of_driver(scenario_id, driver.driver_id)
+            all_states.sort(key=lambda s: s.timestamp)
+            return _as_plain_object(VehicleStateSchema(many=True).dump(all_states))
+
+    def get_vehicle_states_by_driver_between_timestamps(self, scenario_id, from_timestamp, to_timestamp):
+        # Avoid circular deps
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from persistence.vehicle_state_data_access import VehicleStateDAO
+        from api.serialization import dump_vehicle_states_by_driver
+
+        with self._app_context():
+            vehicle_state_dao = VehicleStateDAO(self.app_config, MixedTrafficScenarioDAO(self.app_config))
+            vehicle_states = vehicle_state_dao.get_vehicle_states_by_scenario_id_between_timestamps(scenario_id, from_timestamp, to_timestamp)
+            return _as_plain_object(dump_vehicle_states_by_driver(scenario_id, from_timestamp, to_timestamp, vehicle_states))
+
+    def update_vehicle_states(self, scenario_id, user_id, planned_states) -> None:
+        # Avoid circular deps
+        from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
+        from model.vehicle_state import VehicleState, VehicleStatusEnum
+        from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+        from persistence.vehicle_state_data_access import VehicleStateDAO
+
+        with self._app_context():
+            scenario, driver = self._get_scenario_and_driver(scenario_id, user_id)
+
+            # Same checks of the API
+            assert scenario.status == MixedTrafficScenarioStatusEnum.ACTIVE, f"Cannot update the states. Scenario is {scenario.status}"
+
+            vehicle_states = [VehicleState(status=VehicleStatusEnum.PENDING, timestamp=s.time_step,
+                                           driver_id=driver.driver_id, user_id=driver.user_id, scenario_id=driver.scenario_id,
+                                           position_x=float(s.position[0]), position_y=float(s.position[1]),
+                                           rotation=float(s.orientation), speed_ms=float(s.velocity),
+                                           acceleration_m2s=float(s.acceleration))
+                              for s in sorted(planned_states, key=lambda s: s.time_step)]
+
+            assert vehicle_states[0].timestamp <= scenario.duration, "Cannot update the states beyond the end of the scenario"
+
+            mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(self.app_config)
+            vehicle_state_dao = VehicleStateDAO(self.app_config, mixed_traffic_scenario_dao)
+            vehicle_state_dao.update_driver_states_in_scenario(scenario, driver, vehicle_states)
+
+            mixed_traffic_scenario_dao.close_scenario_if_over(scenario)
+
+
+def create_transport(transport, auth_token, app_config, instance_path, port=5000):
+    """
+    Create the transport used by the internal AVs according to the AV_TRANSPORT configuration
+    """
+    if transport == IN_PROCESS_TRANSPORT:
+        return InProcessTransport(app_config, instance_path)
+    elif transport == HTTP_TRANSPORT:
+        return HTTPTransport(auth_token, port=port)
+    else:
+        raise AssertionError(f"Unknown AV transport {transport}")
@@ -1,33 +1,22 @@
 import os.path
-from copy import deepcopy
 import logging
 
 
-import requests
 from typing import List, Optional
 
 from exceptions.exceptions import StopMeException
 from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
-from model.vehicle_state import VehicleStatusEnum
+from controller.av_transport import HTTPTransport
+from controller.planner_cache import planner_cache, PlannerBundle
+from model.scenario_cache import create_overlay_scenario
 
 # Make sure CR does not complain about overlapping IDs!
 DYNAMIC_OBSTACLE_STARTING_ID = 10000
 
-# TODO: Not refactoring safe!
-GET_SCENARIO_BY_SCENARIO_ID = "/api/scenarios/{scenario_id}/"
-GET_DRIVER_INITIAL_STATE = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/0/"
-
-GET_DRIVER_BY_SCENARIO_AND_USER_IDS = "/api/scenarios/{scenario_id}/drivers/{user_id}/"
-
-# This is all the states at the vehicle
-GET_VEHICLE_STATES = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/"
-# This is all the states at the timestamp
-GET_VEHICLES_STATE_AT_TIMESTAMP = "/api/scenarios/{scenario_id}/states/{timestamp}/"
-
-# We need to access the template from within the scenario, because templates might have been disabled in the meanwhile
-GET_SCENARIO_TEMPLATE_BY_SCENARIO_ID = "/api/scenarios/{scenario_id}/template/xml/"
-
-PUT_UPDATE_VEHICLES_STATES = "/api/scenarios/{scenario_id}/drivers/{user_id}/states/"
+# When the AVs render what they planned
+VISUALIZATION_OFF = "off"
+VISUALIZATION_SAMPLED = "sampled"
+VISUALIZATION_ON_EMERGENCY = "on_emergency"
 
 # Logging
 FORMATTER = logging.Formatter("%(asctime)s — %(name)s — %(levelname)s — %(message)s")
@@ -51,12 +40,11 @@ from commonroad.prediction.prediction import Trajectory, TrajectoryPrediction
 from commonroad_route_planner.route_planner import RoutePlanner
 
 from commonroad_rp.reactive_planner import ReactivePlanner
-from commonroad_rp.visualization import visualize_planning_result
 
-from commonroad_rp.prediction import linear_prediction
+from controller.prediction import as_state_array, as_commonroad_states, constant_velocity, X, Y, ROTATION, SPEED, ACCELERATION
 
 from commonroad_dc.boundary.boundary import create_road_boundary_obstacle
-from commonroad_dc.collision.collision_detection.pycrcc_collision_dispatch import create_collision_checker
+from commonroad_dc.collision.collision_detection.pycrcc_collision_dispatch import create_collision_checker, create_collision_object
 
 import io
 
@@ -67,29 +55,6 @@ delta_t = 0.1
 # TODO Using replanning_frequency = 3 the AV goes back in time...
 time_horizon = 2 # seconds
 
-### TODO Make sure we handle 404, 401, etc.
-# TODO How can we inject the token directly here without passing it as parameter?
-def _do_get_request(the_request, auth_token, data=None):
-    response = requests.get(the_request, data=data,
-                        headers = {'Authorization': auth_token})
-
-    if response.status_code > 400:
-        raise StopMeException()
-
-    return response
-
-# def _do_post_request(the_request, auth_token, data=None):
-#     return requests.post(the_request,
-#                         data=data,
-#                         headers={'Authorization': auth_token})
-
-def _do_put_request(the_request, auth_token, data=None):
-    return requests.put(the_request,
-                        data=data,
-                        headers = {'Authorization': auth_token})
-#####
-
-
 def as_commonroad_scenario(xml):
     with io.BytesIO(xml.encode('utf8')) as binary_file:
         with io.TextIOWrapper(binary_file, encoding='utf8') as file_obj:
@@ -99,11 +64,13 @@ def as_commonroad_scenario(xml):
 
 
 # Get current state
-def get_current_state(protocol, host, port, scenario_id, user_id, auth_token, logger) -> Optional[State]:
-    response = _do_get_request(f"{protocol}://{host}:{port}{GET_VEHICLE_STATES.format(scenario_id=scenario_id, user_id=user_id)}", auth_token)
-
+def get_current_state(transport, scenario_id, user_id, logger) -> Optional[State]:
     vehicle_states: List
-    vehicle_states = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+    vehicle_states = transport.get_vehicle_states(scenario_id, user_id)
+    return find_current_state(vehicle_states, scenario_id, user_id, logger)
+
+
+def find_current_state(vehicle_states, scenario_id, user_id, logger) -> Optional[State]:
     vehicle_states.sort(key=lambda vs: vs.timestamp)
     # Process them in pairs looking for the pattern t=N, state=ACTIVE, t=N+1, state=PENDING
     # TODO Crashed? TODO Goal Reached? -> Undeploy AV!
@@ -160,7 +127,7 @@ def _extend_ref_path_by(ref_path, step, times):
 
 def create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user_id, auth_token,
                                      replanning_frequency, cost_function_parameters,
-                                     protocol, host, port, logger):
+                                     transport, logger):
 
     if not os.path.exists(driver_cache_dir):
 
@@ -177,15 +144,11 @@ def create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user
         # 3. Define the CommonRoad Scenario and CommonRoad PlanningProblem for the Planner
 
         # Get the lanelets network XML, aka the template used for this scenario
-        response = _do_get_request(f"{protocol}://{host}:{port}{GET_SCENARIO_TEMPLATE_BY_SCENARIO_ID.format(scenario_id=scenario.scenario_id)}", auth_token)
-
-        template_xml = response.text
+        template_xml = transport.get_template_xml(scenario.scenario_id)
         base_commonroad_scenario = as_commonroad_scenario(template_xml)
 
         # Get the Driver Goal Region
-        response = _do_get_request(f"{protocol}://{host}:{port}{GET_DRIVER_BY_SCENARIO_AND_USER_IDS.format(scenario_id=scenario.scenario_id, user_id=user_id)}",
-                                       auth_token)
-        driver = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+        driver = transport.get_driver(scenario.scenario_id, user_id)
         length, width, center_x, center_y, orientation = [float(v) for v in driver.goal_region.split(",")]
         center = np.array([center_x, center_y])
         goal_region_as_rectangle = Rectangle(length, width, center, orientation)
@@ -193,9 +156,7 @@ def create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user
         commonroad_goal_region = GoalRegion(goal_state_list)
 
         # Get the Driver Initial State
-        response = _do_get_request(f"{protocol}://{host}:{port}{GET_DRIVER_INITIAL_STATE.format(scenario_id=scenario.scenario_id, user_id=user_id)}",
-                                       auth_token)
-        initial_state = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+        initial_state = transport.get_initial_state(scenario.scenario_id, user_id)
         commonroad_initial_state = State(**{
             "time_step": 0,
             "position": np.array([initial_state.position_x, initial_state.position_y]),
@@ -277,9 +238,16 @@ def create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user
     road_boundary_obstacle_original_scenario, road_boundary_sg_rectangles_original_scenario = create_road_boundary_obstacle(base_commonroad_scenario, open_lane_ends=False)  # Note this option!!
     road_collision_checker_original_scenario.add_collision_object(road_boundary_sg_rectangles_original_scenario)
 
+    # Create the collision checker that the planner uses for the base scenario (road boundary and the obstacles
+    # defined in the template). At every tick, we clone it and add only the other vehicles to it
+    base_collision_checker = create_collision_checker(base_commonroad_scenario)
+    road_boundary_obstacle, road_boundary_sg_triangles = create_road_boundary_obstacle(base_commonroad_scenario)
+    base_collision_checker.add_collision_object(road_boundary_sg_triangles)
 
     # Return a configured planner
-    return base_commonroad_scenario, commonroad_planning_problem, planner, road_collision_checker_original_scenario
+    return base_commonroad_scenario, commonroad_planning_problem, planner, road_collision_checker_original_scenario, \
+        base_collision_checker
+
 
 def to_common_road_state(vehicle_state):
     return State(**{
@@ -302,269 +270,348 @@ def to_predicted_common_road_state(vehicle_state):
     })
 
 
-def _augment_scenarios_with_past_driver_data_safety_buffer_and_prediction(
-        ego_vehicle_commonroad_scenario, original_commonroad_scenario,
-        driver_id, scenario, user_id, auth_token,
-        protocol, host,
-                                                              port, planning_from_timestamp,
-                                                              predict_with: callable, lookahead_limit: int,
-                                                              lookback_limit, safety_buffer):
-    # Get the stat of all the drivers in the past "lookback_limit" timestamp, create Dynamic obstacles with them
-    # Note: the scenario object here is NOT a MixedTrafficScenario, but only a deserialized dictionary obtained using the API
-
-    # Accumulate the states of all the drivers that are NOT the ego_vehicles (AV)
-    all_drivers_states = {}
-    # Note: we need +1 to include planning_from_timestamp
-    for timestamp in range(max(planning_from_timestamp-lookback_limit, 0), planning_from_timestamp+1):
-        response = _do_get_request(
-            f"{protocol}://{host}:{port}{GET_VEHICLES_STATE_AT_TIMESTAMP.format(scenario_id=scenario.scenario_id, timestamp=timestamp)}",
-            auth_token)
-        vehicle_states: List
-        vehicle_states = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
-
-        for vehicle_state in [npc_state for npc_state in vehicle_states if npc_state.user_id != user_id]:
-            if vehicle_state.user_id not in all_drivers_states:
-                all_drivers_states[vehicle_state.user_id] = []
-
-            all_drivers_states[vehicle_state.user_id].append(vehicle_state)
-
-    # At this point we have all the past states of all the users that are NOT the ego_vehicle.
-
-    # We can build a DynamicObstacle for each of them by predicting their future states and applying the safety buffer
-
-    for the_user_id in all_drivers_states:
-        past_vehicle_states = all_drivers_states[the_user_id]
-        obstacle_shape = Rectangle(VEHICLE_LENGTH, VEHICLE_WIDTH)
-
-        # Add the safety buffer around the DynamicObstacle
-        obstacle_shape_with_safety_buffer = Rectangle(VEHICLE_LENGTH + 2.0 * safety_buffer,
-                                                      VEHICLE_WIDTH + 2.0 * safety_buffer)
-        # Predict the DynamicObstacle's future states using "predict_with". We predict "lookahead_limit" future states
-        # We consider the entire trajectory here, the past, the current, and the future states
-        # Past states: [to_predicted_common_road_state(past_vehicle_state) for past_vehicle_state in past_vehicle_states] + \
-        predicted_state_list = [commonroad_vehicle_state for commonroad_vehicle_state in predict_with(past_vehicle_states, lookahead_limit)]
-
-        assert predicted_state_list[0].time_step == past_vehicle_states[-1].timestamp + 1
-
-        initial_state = to_common_road_state(past_vehicle_states[-1])
-
-        if len(predicted_state_list) > 0:
-            # state_list[0].time_step=1 != self.initial_time_step=2
-            # The new trajectory - prediction starts at the timestamp of its first element
-            # The beginning of this trajectory is the timestemp of the initial state
+def _as_vehicle_states(scenario_id, driver_states) -> List[SimpleNamespace]:
+    """
+    Transform the (columnar) states of a driver into a list of vehicle states
+    """
+    return [SimpleNamespace(status=status, timestamp=timestamp, driver_id=driver_states.driver_id,
+                            user_id=driver_states.user_id, scenario_id=scenario_id,
+                            position_x=position_x, position_y=position_y, rotation=rotation,
+                            speed_ms=speed_ms, acceleration_m2s=acceleration_m2s)
+            for status, timestamp, position_x, position_y, rotation, speed_ms, acceleration_m2s in
+            zip(driver_states.statuses, driver_states.timestamps, driver_states.positions_x, driver_states.positions_y,
+                driver_states.rotations, driver_states.speeds_ms, driver_states.accelerations_m2s)]
+
+
+def create_dynamic_obstacles(scenario_id, scenario_states, planning_from_timestamp,
+                             predict_with: callable, lookahead_limit: int, lookback_limit, safety_buffer):
+    """
+    Create the dynamic obstacles of all the drivers in the scenario using their states in the past "lookback_limit"
+    timestamps. For each driver (user_id), return the obstacle as the AVs see it, i.e., including safety buffers
+    and predictions, its collision object, and the obstacle as it really is.
+    """
+    # Note: the scenario_states here are NOT VehicleStates, but only deserialized dictionaries obtained using the API
+    dynamic_obstacles = {}
+
+    # Predict the future states of all the drivers at once using "predict_with". We predict "lookahead_limit" future
+    # states from the past ones. Note: both timestamps are included, so planning_from_timestamp is there
+    past_states = as_state_array(scenario_states.drivers, max(planning_from_timestamp - lookback_limit, 0),
+                                 planning_from_timestamp)
+    predicted_states = predict_with(past_states, lookahead_limit, delta_t)
+
+    obstacle_shape = Rectangle(VEHICLE_LENGTH, VEHICLE_WIDTH)
+    # Add the safety buffer around the DynamicObstacle
+    obstacle_shape_with_safety_buffer = Rectangle(VEHICLE_LENGTH + 2.0 * safety_buffer,
+                                                  VEHICLE_WIDTH + 2.0 * safety_buffer)
+
+    for index, driver_states in enumerate(scenario_states.drivers):
+        current_state = past_states[index, -1]
+        initial_state = State(**{
+            "time_step": planning_from_timestamp,
+            "position": np.array([current_state[X], current_state[Y]]),
+            "velocity": current_state[SPEED],
+            "acceleration": current_state[ACCELERATION],
+            "orientation": current_state[ROTATION],
+            "yaw_rate": 0,
+            "slip_angle": 0
+        })
+
+        if lookahead_limit > 0:
+            # The new trajectory - prediction starts right after the current state
+            predicted_state_list = as_commonroad_states(predicted_states[index], planning_from_timestamp + 1)
             trajectory = Trajectory(predicted_state_list[0].time_step, predicted_state_list)
             prediction = TrajectoryPrediction(trajectory, obstacle_shape_with_safety_buffer)
         else:
             prediction = None
 
-        # Note we use the_user_id but probably we should use the_driver_id corresponding to this DO vehicles' driver_id
-        # Configure the ego_vehicle_commonroad_scenario
-        dynamic_obstacle_with_safety_buffer_and_predictions = DynamicObstacle(DYNAMIC_OBSTACLE_STARTING_ID + the_user_id,
+        # Note we use the user_id but probably we should use the driver_id corresponding to this DO vehicles' driver_id
+        # This is what the AVs see
+        dynamic_obstacle_with_safety_buffer_and_predictions = DynamicObstacle(DYNAMIC_OBSTACLE_STARTING_ID + driver_states.user_id,
                                                                               ObstacleType.CAR, obstacle_shape_with_safety_buffer,
                                                                               initial_state, prediction)
-        ego_vehicle_commonroad_scenario.add_objects(dynamic_obstacle_with_safety_buffer_and_predictions)
+        # This is the original obstacle, no predictions, no safety buffer
+        dynamic_obstacle = DynamicObstacle(DYNAMIC_OBSTACLE_STARTING_ID + driver_states.user_id, ObstacleType.CAR,
+                                           obstacle_shape, initial_state, None)
 
-        # Configure the original_commonroad_scenario, no predictions, no safety buffer
-        dynamic_obstacle = DynamicObstacle(DYNAMIC_OBSTACLE_STARTING_ID + the_user_id, ObstacleType.CAR, obstacle_shape,
-                                                                              initial_state, None)
-        original_commonroad_scenario.add_objects(dynamic_obstacle)
+        dynamic_obstacles[driver_states.user_id] = (dynamic_obstacle_with_safety_buffer_and_predictions,
+                                                    create_collision_object(dynamic_obstacle_with_safety_buffer_and_predictions),
+                                                    dynamic_obstacle)
 
+    return dynamic_obstacles
 
-def get_scenario(protocol, host, port, scenario_id, user_id, auth_token, logger):
-    # Try to get the resorse of trigger a StopMeException()
-    response = _do_get_request(
-        f"{protocol}://{host}:{port}{GET_SCENARIO_BY_SCENARIO_ID.format(scenario_id=scenario_id)}",
-        auth_token)
 
-    # At this point, the scenario exists
-    scenario = json.loads(response.text, object_hook=lambda d: SimpleNamespace(**d))
+def get_scenario(transport, scenario_id, logger):
+    # Try to get the resorse of trigger a StopMeException()
+    scenario = transport.get_scenario(scenario_id)
 
     if scenario.status == MixedTrafficScenarioStatusEnum.WAITING or scenario.status == MixedTrafficScenarioStatusEnum.DONE:
-        logger.info(f"Background AV {user_id} in Scenario {scenario_id}. Scenario is {scenario.status}. Stop.")
+        logger.info(f"Background AVs in Scenario {scenario_id}. Scenario is {scenario.status}. Stop.")
         # Note: We do not reschedule the job, so it naturally stops
         raise StopMeException()
 
     return scenario
 
 
-def drive(driver_id, user_id, scenario_id,
-          auth_token,
-          cache_dir,
-          lookback_limit=10, # TODO: Not really sure about this one...
-          lookahead_limit=20,  # Mow many future states to predict
-          safety_buffer = 0.0, # Force a minimum distance between ego and the other vehicles
-          replanning_frequency=1,
-          predict_with=linear_prediction,
-          cost_function_parameters=[[5], [5, 50, 100], [0.25, 20], [0.25, 5]],
-          protocol="http", host="localhost", port=5000):
+def _should_visualize(visualization_mode, visualization_sampling, planning_from_timestamp, emergency):
+    if visualization_mode == VISUALIZATION_SAMPLED:
+        # Sampling less than once every timestamp means no sampling at all
+        return visualization_sampling >= 1 and planning_from_timestamp % visualization_sampling == 0
+    if visualization_mode == VISUALIZATION_ON_EMERGENCY:
+        return emergency
+    return False
 
-    # This function is invoked automatically and repeatedly by the Scheduler until the StopMeException is raised.
 
+def _get_logger(name):
     # Create a custom logger, configure it, and share it with all the dependent functions. Not ideal
-    driver_logger = logging.getLogger(f"Driver {user_id}.{driver_id}")
+    logger = logging.getLogger(name)
     # Set Logging Level
-    driver_logger.setLevel(logging.DEBUG)
+    logger.setLevel(logging.DEBUG)
     # Do not propagate to parent logger
-    driver_logger.propagate = False
+    logger.propagate = False
 
     # The logger is a singleton, but its handlers are not.
-    if len(driver_logger.handlers) < 1:
+    if len(logger.handlers) < 1:
         # Create Stream Handler - INFO
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(FORMATTER)
         console_handler.setLevel(logging.WARNING)
-        driver_logger.addHandler(console_handler)
+        logger.addHandler(console_handler)
 
-    driver_logger.warning(f"Triggered. Connecting on {host}:{port}.")
+    return logger
 
-    try:
 
-        # 1. Get scenario state or fail with a StopMeException.
-        scenario = get_scenario(protocol, host, port, scenario_id, user_id, auth_token, driver_logger)
+def _drive_av(driver_id, user_id, auth_token, transport,
+              scenario, scenario_states, dynamic_obstacles_by_timestamp,
+              cache_dir, lookback_limit, lookahead_limit, safety_buffer, replanning_frequency, predict_with,
+              cost_function_parameters, visualization_mode, visualization_sampling,
+              driver_logger):
+    """
+    Plan and submit the next states of one AV. The dynamic obstacles are shared by all the AVs of the scenario,
+    so we create them only for the first AV that plans from a given timestamp
+    """
+    # At this point, the scenario is assumed to exist. We can ensure the cache directory exist and instantiate
+    # the objects
+    driver_cache_dir = os.path.join(cache_dir, f"av_user_id_{user_id}_driver_{driver_id}")
+
+    # The planner and its inputs do not change during the scenario, so we build them only if this process
+    # does not have them already. Scenario without any vehicle
+    planner_bundle = planner_cache.get(driver_id)
+    if planner_bundle is None:
+        planner_bundle = PlannerBundle(
+            *create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user_id, auth_token,
+                                              replanning_frequency, cost_function_parameters, transport,
+                                              driver_logger))
+        planner_cache.put(driver_id, planner_bundle)
+
+    base_commonroad_scenario, commonroad_planning_problem, motion_planner, road_collision_checker, \
+        base_collision_checker = planner_bundle
+
+    driver_logger.warning(f"Logging to {driver_cache_dir}")
+    # The logger is a singleton, but its handlers are not.
+    if len(driver_logger.handlers) < 2:
+        # This ensures the directories are created so we can create the file handler
+        # We need to ensure that logging information goes to the correct file
+        # File Handler - DEBUG
+        file_handler = logging.FileHandler(os.path.join(driver_cache_dir, "output.log"))
+        file_handler.setFormatter(FORMATTER)
+        file_handler.setLevel(logging.DEBUG)
+        driver_logger.addHandler(file_handler)
+
+    # 2. Get current/last action submitted by THIS AV/Planner
+    ego_states = [driver_states for driver_states in scenario_states.drivers if driver_states.user_id == user_id]
+    if len(ego_states) == 0:
+        driver_logger.warning(f"Cannot find user {user_id} in scenario {scenario.scenario_id}. Stop.")
+        raise StopMeException()
 
-        # At this point, the scenario is assumed to exist. We can ensure the cache directory exist and instantiate
-        # the objects
+    current_state = find_current_state(_as_vehicle_states(scenario.scenario_id, ego_states[0]),
+                                       scenario.scenario_id, user_id, driver_logger)
 
-        driver_cache_dir = os.path.join(cache_dir, f"av_user_id_{user_id}_driver_{driver_id}")
+    if current_state is None:
+        # Wait for the next round
+        return
 
+    planning_from_timestamp = current_state.timestamp
 
-        # Scenario without any vehicle
-        base_commonroad_scenario, commonroad_planning_problem, motion_planner, road_collision_checker = \
-            create_motion_or_get_planner_for(driver_cache_dir, driver_id, scenario, user_id, auth_token,
-                                             replanning_frequency, cost_function_parameters, protocol, host, port,
-                                             driver_logger)
+    # Create the other vehicles as Dynamic Obstacles, including their safety buffers and predictions.
+    # Not currently logged
+    if planning_from_timestamp not in dynamic_obstacles_by_timestamp:
+        dynamic_obstacles_by_timestamp[planning_from_timestamp] = create_dynamic_obstacles(
+            scenario.scenario_id, scenario_states, planning_from_timestamp, predict_with, lookahead_limit,
+            lookback_limit, safety_buffer)
 
-        driver_logger.warning(f"Logging to {driver_cache_dir}")
-        # The logger is a singleton, but its handlers are not.
-        if len(driver_logger.handlers) < 2:
-            # This ensures the directories are created so we can create the file handler
-            # We need to ensure that logging information goes to the correct file
-            # File Handler - DEBUG
-            file_handler = logging.FileHandler(os.path.join(driver_cache_dir, "output.log"))
-            file_handler.setFormatter(FORMATTER)
-            file_handler.setLevel(logging.DEBUG)
-            driver_logger.addHandler(file_handler)
+    other_vehicles = [dynamic_obstacles for the_user_id, dynamic_obstacles in
+                      dynamic_obstacles_by_timestamp[planning_from_timestamp].items() if the_user_id != user_id]
 
-        # 2. Get current/last action submitted by THIS AV/Planner or fail with a StopMeException
-        current_state = get_current_state(protocol, host, port, scenario_id, user_id, auth_token, driver_logger)
+    # Create the updated collision checker
+    collision_checker_scenario = base_collision_checker.clone()
+    for _, collision_object, _ in other_vehicles:
+        collision_checker_scenario.add_collision_object(collision_object)
 
-        if current_state is None:
-            # Wait for the next round
-            return
+    x_0: State
+    x_0 = to_common_road_state(current_state)
 
-        planning_from_timestamp = current_state.timestamp
+    # This is maintaining the current velocity, but we can use something else...
+    # set desired velocity - TODO Read this from the reference path maybe?
+    current_velocity = x_0.velocity
+    motion_planner.set_desired_velocity(current_velocity)
 
-        # Inject the other vehicles inside the scenario.
-        # TODO: This is what the export function does to some extent
+    # What's X_CL ? Previously computed states?
+    # Plan trajectory using the just configured collision_checker. This will set the emergency flag if necessary
+    optimal = motion_planner.plan(x_0, collision_checker_scenario, draw_traj_set=False) # cl_states=x_cl,
 
-        # Alter the scenario by including the other drivers as Dynamic Obstacles
+    # if the planner fails to find an optimal trajectory -> terminate. At this point, planner has switched to emergency mode
+    emergency = optimal is None
+    if emergency:
+        optimal = motion_planner.emergency_plan(x_0, collision_checker_scenario, draw_traj_set=True) # cl_states=x_cl,
 
-        # This represents what the ego_vehicle sees, including safety buffers and predictions
-        actual_scenario = deepcopy(base_commonroad_scenario)
+        # What we do now?! Retry to job is useless, but cannot find any thing else.
+        # TODO Maybe go straight?
+        assert optimal is not None, "The planner cannot find ANY trajectory!"
+
+        # The planner is now in emergency mode, so do not reuse it for the next plan
+        planner_cache.evict(driver_id)
+
+    # comp_time_end = time.time()
+
+    # Correct orientation angle
+    new_state_list = motion_planner.shift_orientation(optimal[0])
+
+    # Decide how many states to driver based on the replanning frequency parameter. Once we store them, AV will not replan them
+    planned_states = []
+    for idx, planned_state in enumerate(new_state_list.state_list[1:1+replanning_frequency], start=1):
+        planned_state.time_step = planning_from_timestamp + idx
+        # Make sure we do not go reverse!
+        if planned_state.velocity < 0.0:
+            driver_logger.warning(f"Detected negative speed for {user_id} in scenario {scenario.scenario_id}")
 
+            planned_state.velocity = 0.0
+            planned_state.acceleration = 0.0
+
+        planned_states.append(planned_state)
+
+    transport.update_vehicle_states(scenario.scenario_id, user_id, planned_states)
+
+    if _should_visualize(visualization_mode, visualization_sampling, planning_from_timestamp, emergency):
+        # Avoid circular deps
+        from background.scheduler import visualize_planning_in_background
+
+        # This represents what the ego_vehicle sees, including safety buffers and predictions
+        actual_scenario = create_overlay_scenario(base_commonroad_scenario)
         # This represents what the scenario really is
-        original_scenario = deepcopy(base_commonroad_scenario)
-
-        # Retrieve all the data about the other drivers and add them to the scenario
-        # Maybe split this into:
-        # retrieve the data,
-        # apply the safety buffer,
-        # make the prediction,
-        # create the dynamic obstacle
-        # create the collision checker
-        # Predict the future trajectories of the various obstacles
-
-
-        # Include all the info about NPC
-        # Not currently logged
-        _augment_scenarios_with_past_driver_data_safety_buffer_and_prediction(
-            actual_scenario, original_scenario, driver_id, scenario, user_id, auth_token,
-                                                protocol, host, port,
-                                                planning_from_timestamp,
-                                                predict_with, lookahead_limit,
-                                                lookback_limit, safety_buffer)
-
-        # Create the updated collision checker
-        collision_checker_scenario = create_collision_checker(actual_scenario)
-        road_boundary_obstacle, road_boundary_sg_triangles = create_road_boundary_obstacle(actual_scenario)
-        collision_checker_scenario.add_collision_object(road_boundary_sg_triangles)
-
-        x_0: State
-        x_0 = to_common_road_state(current_state)
-
-        # This is maintaining the current velocity, but we can use something else...
-        # set desired velocity - TODO Read this from the reference path maybe?
-        current_velocity = x_0.velocity
-        motion_planner.set_desired_velocity(current_velocity)
-
-        # What's X_CL ? Previously computed states?
-        # Plan trajectory using the just configured collision_checker. This will set the emergency flag if necessary
-        optimal = motion_planner.plan(x_0, collision_checker_scenario, draw_traj_set=False) # cl_states=x_cl,
-
-        # if the planner fails to find an optimal trajectory -> terminate. At this point, planner has switched to emergency mode
-        if optimal is None:
-            optimal = motion_planner.emergency_plan(x_0, collision_checker_scenario, draw_traj_set=True) # cl_states=x_cl,
-
-            # What we do now?! Retry to job is useless, but cannot find any thing else.
-            # TODO Maybe go straight?
-            assert optimal is not None, "The planner cannot find ANY trajectory!"
-
-        # comp_time_end = time.time()
-
-        # Correct orientation angle
-        new_state_list = motion_planner.shift_orientation(optimal[0])
-
-        # Decide how many states to driver based on the replanning frequency parameter. Once we store them, AV will not replan them
-        planned_states = []
-        for idx, planned_state in enumerate(new_state_list.state_list[1:1+replanning_frequency], start=1):
-            planned_state.time_step = planning_from_timestamp + idx
-            # Make sure we do not go reverse!
-            if planned_state.velocity < 0.0:
-                driver_logger.warning(f"Detected negative speed for {user_id} in scenario {scenario_id}")
-
-                planned_state.velocity = 0.0
-                planned_state.acceleration = 0.0
-
-            planned_states.append(planned_state)
+        original_scenario = create_overlay_scenario(base_commonroad_scenario)
+        for dynamic_obstacle_with_safety_buffer_and_predictions, _, dynamic_obstacle in other_vehicles:
+            actual_scenario.add_objects(dynamic_obstacle_with_safety_buffer_and_predictions)
+            original_scenario.add_objects(dynamic_obstacle)
 
         # # Visualize Planning using the "transformed" scenarios to represent the ego-vehicle POV
-        # # but include also the predictions and the actual trajectory of the NPC
-        visualize_planning_result(scenario=actual_scenario, # This one has the safety buffer active
-                                  original_scenario=original_scenario, # This one is the original one must also contain the data about NPC.
-                                  planning_problem=commonroad_planning_problem,
-                                  ego=motion_planner.convert_cr_trajectory_to_object(optimal[0]), # Create CommonRoad Obstacle for the ego Vehicle
-                                  pos=np.asarray([state.position for state in new_state_list.state_list]),  # Get positions of optimal trajectory
-                                  # Visualize Ground Truth = 0, no future vision
-                                  perfect_knowledge_limit = 0,
-                                  # traj_set=sampled_trajectory_bundle,
-                                  # feasible_traj=feasible_trajectories,
-                                  ref_path=motion_planner._original_co._reference,
-                                  emergency_ref_path=motion_planner._emergency_mode_co._reference if motion_planner._emergency_mode_co is not None else None,
-                                  timestep=planning_from_timestamp,
-                                  save_path=driver_cache_dir)
-
-        states_data = {
-            "timestamps": ",".join([str(s.time_step) for s in planned_states]),
-            "positions_x": ",".join([str(s.position[0]) for s in planned_states]),
-            "positions_y": ",".join([str(s.position[1]) for s in planned_states]),
-            "rotations": ",".join([str(s.orientation) for s in planned_states]),
-            "speeds_ms": ",".join([str(s.velocity) for s in planned_states]),
-            "accelerations_m2s": ",".join([str(s.acceleration) for s in planned_states])
+        # # but include also the predictions and the actual trajectory of the NPC.
+        # Rendering is slow, so it happens in background and after submitting the planned states
+        planning_result = {
+            "scenario": actual_scenario, # This one has the safety buffer active
+            "original_scenario": original_scenario, # This one is the original one must also contain the data about NPC.
+            "planning_problem": commonroad_planning_problem,
+            "ego": motion_planner.convert_cr_trajectory_to_object(optimal[0]), # Create CommonRoad Obstacle for the ego Vehicle
+            "pos": np.asarray([state.position for state in new_state_list.state_list]),  # Get positions of optimal trajectory
+            # Visualize Ground Truth = 0, no future vision
+            "perfect_knowledge_limit": 0,
+            # traj_set=sampled_trajectory_bundle,
+            # feasible_traj=feasible_trajectories,
+            "ref_path": motion_planner._original_co._reference,
+            "emergency_ref_path": motion_planner._emergency_mode_co._reference if motion_planner._emergency_mode_co is not None else None,
+            "timestep": planning_from_timestamp,
+            "save_path": driver_cache_dir
         }
+        try:
+            visualize_planning_in_background(driver_id, planning_from_timestamp, planning_result)
+        except Exception as e_vis:
+            # The states are already submitted, so this must not stop the AV
+            driver_logger.warning(f"Cannot visualize the planning result {e_vis}")
+
+
+def drive_scenario(scenario_id, avs,
+                   cache_dir,
+                   lookback_limit=10, # TODO: Not really sure about this one...
+                   lookahead_limit=20,  # Mow many future states to predict
+                   safety_buffer = 0.0, # Force a minimum distance between ego and the other vehicles
+                   replanning_frequency=1,
+                   predict_with=constant_velocity, # How to predict the future states of the other vehicles, see controller.prediction
+                   cost_function_parameters=[[5], [5, 50, 100], [0.25, 20], [0.25, 5]],
+                   visualization_mode=VISUALIZATION_OFF, # Whether to render what the AVs planned, e.g., to debug them
+                   visualization_sampling=10) -> List: # With VISUALIZATION_SAMPLED, render once every this many timestamps
+    """
+    Plan the next states of the given AVs, i.e., a list of (driver_id, user_id, auth_token, transport), driving in
+    the same scenario. The AVs share the scenario, the states of the drivers, and the dynamic obstacles created from
+    them, so we get and create them only once.
+
+    Raise a StopMeException if the scenario is over. Otherwise, return the driver_id of the AVs that must stop.
+    """
+
+    # This function is invoked automatically and repeatedly by the Scheduler until the StopMeException is raised.
 
-        response = _do_put_request(
-            f"{protocol}://{host}:{port}{PUT_UPDATE_VEHICLES_STATES.format(scenario_id=scenario_id, user_id=user_id)}",
-            auth_token,
-            data=states_data)
+    scenario_logger = _get_logger(f"Scenario {scenario_id}")
+    # Any transport can get the data shared by the AVs
+    transport = avs[0][3]
 
-        assert response.status_code == 204, f"Failed to update the states. Reason: {response.text}"
+    scenario_logger.warning(f"Triggered. Connecting on {transport}.")
+
+    try:
+        # 1. Get scenario state or fail with a StopMeException.
+        scenario = get_scenario(transport, scenario_id, scenario_logger)
+        # Get the states of all the drivers at once. The AVs find their current state and the past states of the
+        # other vehicles in there
+        scenario_states = transport.get_vehicle_states_by_driver_between_timestamps(scenario_id, 0, scenario.duration)
     except StopMeException as stop_me:
-        driver_logger.warning(f"Execution is over!")
+        scenario_logger.warning(f"Execution is over!")
+        for driver_id, _, _, _ in avs:
+            planner_cache.evict(driver_id)
         raise stop_me
     except Exception as e_inf:
-        driver_logger.error(f"Exception raised {e_inf}")
+        scenario_logger.error(f"Exception raised {e_inf}")
+        for driver_id, _, _, _ in avs:
+            planner_cache.evict(driver_id)
         raise StopMeException()
 
+    # Note: the AVs plan one after the other, since we cannot start processes from the driving processes.
+    #   Different scenarios plan in parallel.
+    stopped_driver_ids = []
+    dynamic_obstacles_by_timestamp = {}
+    for driver_id, user_id, auth_token, av_transport in avs:
+        driver_logger = _get_logger(f"Driver {user_id}.{driver_id}")
+        try:
+            _drive_av(driver_id, user_id, auth_token, av_transport,
+                      scenario, scenario_states, dynamic_obstacles_by_timestamp,
+                      cache_dir, lookback_limit, lookahead_limit, safety_buffer, replanning_frequency, predict_with,
+                      cost_function_parameters, visualization_mode, visualization_sampling,
+                      driver_logger)
+        except StopMeException:
+            driver_logger.warning(f"Execution is over!")
+            planner_cache.evict(driver_id)
+            stopped_driver_ids.append(driver_id)
+        except Exception as e_inf:
+            driver_logger.error(f"Exception raised {e_inf}")
+            planner_cache.evict(driver_id)
+            stopped_driver_ids.append(driver_id)
+
+    return stopped_driver_ids
+
+
+def drive(driver_id, user_id, scenario_id,
+          auth_token,
+          cache_dir,
+          protocol="http", host="localhost", port=5000,
+          transport=None,
+          **kwargs):
+    """
+    Plan the next states of a single AV. See drive_scenario for the other arguments
+    """
+
+    # Remote bots (and AVs deployed without a transport) go through the API
+    if transport is None:
+        transport = HTTPTransport(auth_token, protocol, host, port)
+
+    stopped_driver_ids = drive_scenario(scenario_id, [(driver_id, user_id, auth_token, transport)], cache_dir, **kwargs)
+    if driver_id in stopped_driver_ids:
+        raise StopMeException()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+from typing import NamedTuple, Optional
+
+from configuration.config import AV_PLANNER_CACHE_SIZE
+
+from model.lru_cache import LRUCache
+
+
+class PlannerBundle(NamedTuple):
+    """ Everything an AV needs to plan that does not change during the scenario """
+    base_commonroad_scenario: object
+    commonroad_planning_problem: object
+    motion_planner: object
+    road_collision_checker: object
+    base_collision_checker: object
+
+
+class PlannerBundleCache(LRUCache):
+    """
+    Cache of the planner bundles of the AVs, keyed by driver_id.
+
+    AVs are scheduled on any of the driving processes, so the same driver might have a bundle in more than one process.
+    Bundles are evicted when the AV stops; the ones left in the other processes are eventually evicted by the LRU.
+    """
+
+    def __init__(self, max_size=AV_PLANNER_CACHE_SIZE):
+        super().__init__(max_size)
+
+    def get(self, driver_id) -> Optional[PlannerBundle]:
+        return super().get(driver_id)
+
+
+# The bundles of the AVs driving in this process
+planner_cache = PlannerBundleCache()
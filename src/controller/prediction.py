@@ -0,0 +1,145 @@
+"""
+Vectorized prediction of the future states of the vehicles.
+
+The states of n vehicles over t timestamps are stored in (n x t x len(FEATURES)) arrays, so we can predict the
+future states of all the vehicles in one call. The prediction models take the past states of the vehicles and
+return their next lookahead_limit states.
+"""
+from typing import List
+
+import numpy as np
+
+from commonroad.scenario.scenario import State
+
+# The features of the states, and their position in the arrays
+FEATURES = ("position_x", "position_y", "rotation", "speed_ms", "acceleration_m2s")
+X, Y, ROTATION, SPEED, ACCELERATION = range(len(FEATURES))
+
+# The (columnar) attributes of the states of a driver, in the same order as FEATURES
+_COLUMNS = ("positions_x", "positions_y", "rotations", "speeds_ms", "accelerations_m2s")
+
+# Below this turn rate (rad/s), vehicles go straight
+_MIN_TURN_RATE = 1e-6
+
+
+def as_state_array(drivers_states, from_timestamp, to_timestamp) -> np.ndarray:
+    """
+    Stack the (columnar) states of the drivers between the given timestamps (both included). Drivers with fewer
+    states repeat their first one, so all the drivers have the same number of states
+    """
+    n_states = to_timestamp - from_timestamp + 1
+    state_array = np.empty((len(drivers_states), n_states, len(FEATURES)))
+
+    for index, driver_states in enumerate(drivers_states):
+        timestamps = np.asarray(driver_states.timestamps)
+        in_window = (timestamps >= from_timestamp) & (timestamps <= to_timestamp)
+        states = np.column_stack([np.asarray(getattr(driver_states, column), dtype=float)[in_window] for column in _COLUMNS])
+        state_array[index, n_states - len(states):] = states
+        state_array[index, :n_states - len(states)] = states[0]
+
+    return state_array
+
+
+def _allocate(out, state_array, lookahead_limit) -> np.ndarray:
+    shape = (state_array.shape[0], lookahead_limit, len(FEATURES))
+    if out is None:
+        return np.empty(shape)
+    assert out.shape == shape, f"Cannot store the predicted states {shape} in a buffer of shape {out.shape}"
+    return out
+
+
+def _elapsed_time(lookahead_limit, dt) -> np.ndarray:
+    # The time elapsed from the last known state, as a row to broadcast it over the vehicles
+    return (dt * np.arange(1, lookahead_limit + 1))[np.newaxis, :]
+
+
+def constant_velocity(state_array, lookahead_limit, dt, out=None) -> np.ndarray:
+    """
+    The vehicles keep their last speed and orientation. Pass out to reuse an existing (n x lookahead_limit x
+    len(FEATURES)) buffer
+    """
+    predicted_states = _allocate(out, state_array, lookahead_limit)
+    last_states = state_array[:, -1, :, np.newaxis]
+
+    distance = last_states[:, SPEED] * _elapsed_time(lookahead_limit, dt)
+
+    predicted_states[:, :, X] = last_states[:, X] + distance * np.cos(last_states[:, ROTATION])
+    predicted_states[:, :, Y] = last_states[:, Y] + distance * np.sin(last_states[:, ROTATION])
+    predicted_states[:, :, ROTATION] = last_states[:, ROTATION]
+    predicted_states[:, :, SPEED] = last_states[:, SPEED]
+    predicted_states[:, :, ACCELERATION] = 0.0
+    return predicted_states
+
+
+def constant_acceleration(state_array, lookahead_limit, dt, out=None) -> np.ndarray:
+    """
+    The vehicles keep their last acceleration and orientation. Decelerating vehicles stop, they do not go reverse.
+    Pass out to reuse an existing (n x lookahead_limit x len(FEATURES)) buffer
+    """
+    predicted_states = _allocate(out, state_array, lookahead_limit)
+    last_states = state_array[:, -1, :, np.newaxis]
+    speed, acceleration = last_states[:, SPEED], last_states[:, ACCELERATION]
+
+    elapsed_time = _elapsed_time(lookahead_limit, dt)
+    # When the decelerating vehicles stop
+    with np.errstate(divide="ignore"):
+        stop_time = np.where(acceleration < 0.0, speed / -acceleration, np.inf)
+    moving_time = np.minimum(elapsed_time, stop_time)
+    distance = speed * moving_time + 0.5 * acceleration * moving_time ** 2
+
+    predicted_states[:, :, X] = last_states[:, X] + distance * np.cos(last_states[:, ROTATION])
+    predicted_states[:, :, Y] = last_states[:, Y] + distance * np.sin(last_states[:, ROTATION])
+    predicted_states[:, :, ROTATION] = last_states[:, ROTATION]
+    predicted_states[:, :, SPEED] = speed + acceleration * moving_time
+    predicted_states[:, :, ACCELERATION] = np.where(elapsed_time < stop_time, acceleration, 0.0)
+    return predicted_states
+
+
+def constant_turn_rate_and_velocity(state_array, lookahead_limit, dt, out=None) -> np.ndarray:
+    """
+    The vehicles keep their last speed and turn rate (CTRV). The turn rate is estimated from the last two states,
+    so vehicles with a single state go straight. Pass out to reuse an existing (n x lookahead_limit x len(FEATURES))
+    buffer
+    """
+    predicted_states = _allocate(out, state_array, lookahead_limit)
+    last_states = state_array[:, -1, :, np.newaxis]
+    speed, rotation = last_states[:, SPEED], last_states[:, ROTATION]
+
+    if state_array.shape[1] > 1:
+        # Wrap the difference in [-pi, pi), or vehicles crossing pi turn the other way around
+        rotation_change = state_array[:, -1, ROTATION] - state_array[:, -2, ROTATION]
+        turn_rate = ((rotation_change + np.pi) % (2 * np.pi) - np.pi)[:, np.newaxis] / dt
+    else:
+        turn_rate = np.zeros_like(speed)
+
+    elapsed_time = _elapsed_time(lookahead_limit, dt)
+    predicted_rotation = rotation + turn_rate * elapsed_time
+
+    turning = np.abs(turn_rate) > _MIN_TURN_RATE
+    # Avoid dividing by zero for the vehicles that go straight, we do not use their radius anyway
+    radius = speed / np.where(turning, turn_rate, 1.0)
+    distance = speed * elapsed_time
+
+    predicted_states[:, :, X] = last_states[:, X] + np.where(turning,
+                                                             radius * (np.sin(predicted_rotation) - np.sin(rotation)),
+                                                             distance * np.cos(rotation))
+    predicted_states[:, :, Y] = last_states[:, Y] + np.where(turning,
+                                                             radius * (np.cos(rotation) - np.cos(predicted_rotation)),
+                                                             distance * np.sin(rotation))
+    predicted_states[:, :, ROTATION] = predicted_rotation
+    predicted_states[:, :, SPEED] = speed
+    predicted_states[:, :, ACCELERATION] = 0.0
+    return predicted_states
+
+
+def as_commonroad_states(predicted_states, initial_time_step) -> List[State]:
+    """
+    Convert the predicted states of one vehicle into CommonRoad states. The CommonRoad states do not share memory
+    with predicted_states, so its buffer can be reused
+    """
+    return [State(**{
+        "time_step": initial_time_step + index,
+        "position": np.array([predicted_state[X], predicted_state[Y]]),
+        "velocity": float(predicted_state[SPEED]),
+        "orientation": float(predicted_state[ROTATION])
+    }) for index, predicted_state in enumerate(predicted_states)]
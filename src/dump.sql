@@ -47,6 +47,34 @@ LOCK TABLES `Driver` WRITE;
 /*!40000 ALTER TABLE `Driver` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `Driver_Frontier`
+--
+
+-- DROP TABLE IF EXISTS `Driver_Frontier`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE IF NOT EXISTS  `Driver_Frontier` (
+  `driver_id` int(11) NOT NULL,
+  `scenario_id` int(11) NOT NULL,
+  `status` enum('PENDING','WAITING','ACTIVE','CRASHED','GOAL_REACHED') NOT NULL,
+  `timestamp` int(11) DEFAULT NULL,
+  PRIMARY KEY (`driver_id`),
+  KEY `scenario_id` (`scenario_id`),
+  CONSTRAINT `Driver_Frontier_ibfk_1` FOREIGN KEY (`driver_id`) REFERENCES `Driver` (`driver_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+  CONSTRAINT `Driver_Frontier_ibfk_2` FOREIGN KEY (`scenario_id`) REFERENCES `Mixed_Traffic_Scenario` (`scenario_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `Driver_Frontier`
+--
+
+LOCK TABLES `Driver_Frontier` WRITE;
+/*!40000 ALTER TABLE `Driver_Frontier` DISABLE KEYS */;
+/*!40000 ALTER TABLE `Driver_Frontier` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `Mixed_Traffic_Scenario`
 --
@@ -108,6 +136,30 @@ LOCK TABLES `Mixed_Traffic_Scenario_Template` WRITE;
 /*!40000 ALTER TABLE `Mixed_Traffic_Scenario_Template` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `Scenario_Frontier`
+--
+
+-- DROP TABLE IF EXISTS `Scenario_Frontier`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE IF NOT EXISTS  `Scenario_Frontier` (
+  `scenario_id` int(11) NOT NULL,
+  `timestamp` int(11) NOT NULL,
+  PRIMARY KEY (`scenario_id`),
+  CONSTRAINT `Scenario_Frontier_ibfk_1` FOREIGN KEY (`scenario_id`) REFERENCES `Mixed_Traffic_Scenario` (`scenario_id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `Scenario_Frontier`
+--
+
+LOCK TABLES `Scenario_Frontier` WRITE;
+/*!40000 ALTER TABLE `Scenario_Frontier` DISABLE KEYS */;
+/*!40000 ALTER TABLE `Scenario_Frontier` ENABLE KEYS */;
+UNLOCK TABLES;
+
 --
 -- Table structure for table `User`
 --
@@ -184,6 +236,9 @@ CREATE TABLE IF NOT EXISTS  `Vehicle_State` (
   `speed_ms` float DEFAULT NULL,
   `acceleration_m2s` float DEFAULT NULL,
   PRIMARY KEY (`vehicle_state_id`),
+  UNIQUE KEY `ix_vehicle_state_scenario_driver_timestamp` (`scenario_id`,`driver_id`,`timestamp`),
+  KEY `ix_vehicle_state_scenario_timestamp_status` (`scenario_id`,`timestamp`,`status`),
+  KEY `ix_vehicle_state_scenario_user_timestamp` (`scenario_id`,`user_id`,`timestamp`),
   KEY `driver_id` (`driver_id`),
   KEY `user_id` (`user_id`),
   KEY `scenario_id` (`scenario_id`),
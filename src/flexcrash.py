@@ -217,6 +217,11 @@ def create_app(config_filename=None):
         # Refresh the DATABASE URI
         app.config["SQLALCHEMY_DATABASE_URI"]=f'mariadb+mariadbconnector://{app.config["MARIA_DB_USER"]}:{app.config["MARIA_DB_PASSWORD"]}@{app.config["MARIA_DB_HOST"]}:{app.config["MARIA_DB_PORT"]}/{app.config["DATABASE_NAME"]}'
 
+    # The trajectory cache lives inside the instance folder, next to the SQLite database
+    if not os.path.isabs(app.config["TRAJECTORY_CACHE_FILE"]):
+        os.makedirs(app.instance_path, exist_ok=True)
+        app.config["TRAJECTORY_CACHE_FILE"] = os.path.join(app.instance_path, app.config["TRAJECTORY_CACHE_FILE"])
+
     # Patch to create a temporary databased to manual e2e testing
     if app.config["TESTING"] and app.config["RESET"]:
         # TODO This should reset whatever DB is there
@@ -231,6 +236,8 @@ def create_app(config_filename=None):
             shutil.rmtree(app.config["IMAGES_FOLDER"], ignore_errors=True)
         if "AVS_CACHE_FOLDER" in app.config and os.path.exists(app.config["AVS_CACHE_FOLDER"]):
             shutil.rmtree(app.config["AVS_CACHE_FOLDER"], ignore_errors=True)
+        if "TRAJECTORY_CACHE_FILE" in app.config and os.path.exists(app.config["TRAJECTORY_CACHE_FILE"]):
+            os.remove(app.config["TRAJECTORY_CACHE_FILE"])
 
     # Configure the Database - Note this must be done BEFORE marshmallow
     from persistence import database
@@ -81,87 +81,6 @@ class TrajectoryView(mpld3.plugins.PluginBase):
         }
 
 
-class AllTrajectoriesView(mpld3.plugins.PluginBase):
-    """
-    Make it possible to visualize a bundle of trajectories identified by trajectory_ids
-    This plugin assumes that the figure ALREADY contains a number of line-placeholders used to visualize the actual trajectories
-    This value is controlled by model.mixed_traffic_scenario.VISIBLE_TRAJECTORIES
-    """
-
-    JAVASCRIPT = """
-    mpld3.register_plugin("alltrajectoryview", AllTrajectoriesViewPlugin);
-    AllTrajectoriesViewPlugin.prototype = Object.create(mpld3.Plugin.prototype);
-    AllTrajectoriesViewPlugin.prototype.constructor = AllTrajectoriesViewPlugin;
-    AllTrajectoriesViewPlugin.prototype.requiredProps = ["trajectory_ids"];
-    AllTrajectoriesViewPlugin.prototype.defaultProps = {alpha_show: 0.2}
-
-    function AllTrajectoriesViewPlugin(fig, props){
-        mpld3.Plugin.call(this, fig, props);
-    };
-
-    // This is called at the beginning and must setup all the functions
-    AllTrajectoriesViewPlugin.prototype.draw = function(){
-        // We need a bridge to capture refresh events to refresh the visualization
-        var div = d3.select("#" + this.fig.figid);
-        div.append("input")
-            .attr("id","visible_trajectories_bridge")
-            .attr("type", "hidden");
-
-        // Get an handle on the visible trajectories lines and extend them by adding methods
-        var reset_me = function() {
-			this.elements().attr("d", this.datafunc({}));
-        };
-            
-        var update_me = function(trajectory_data){
-			this.elements().attr("d", this.datafunc(trajectory_data));
-        };
-        
-        // Prepare a variable to hold the ref of all the line/trajectories
-        var the_visible_trajectories = []
-        for(var i=0; i<this.props.trajectory_ids.length; i++){
-            
-            var obj = mpld3.get_element(this.props.trajectory_ids[i], this.fig);
-
-            // Register the new functions            
-            obj.reset_me = reset_me;
-            // obj.show_me = show_me
-            obj.update_me = update_me;
-            
-            // Store the object in the list
-            the_visible_trajectories.push(obj);
-        };
-        
-        // Register an Event Listener to trigger the refresh of all trajectories
-        var visible_trajectories_bridge_placeholder = document.getElementById("visible_trajectories_bridge");
-        
-        visible_trajectories_bridge_placeholder.addEventListener("Refresh", function(evt) {
-                // We assume that the trajectories to visualize are defined inside new_visible_trajectories as LIST
-                // The order does not matter 
-				var new_visible_trajectories = evt.detail.new_visible_trajectories
-
-                // First we make ALL possible visible trajectories not visible anymore
-                the_visible_trajectories.forEach(function(e){ e.reset_me(); });
-
-                // Next we make SOME of the visible trajectories visible. Skip the ones that are empty!
-                var visualized = 0
-                for(var i=0; i <  new_visible_trajectories.length; i++){
-                    // Visualize ONLY the one that exist and only if we have enough placeholders
-                    if (JSON.stringify(new_visible_trajectories[i]).length - 2 > 0 &&  visualized < the_visible_trajectories.length){
-                        the_visible_trajectories[visualized].update_me(new_visible_trajectories[i])
-                        visualized = visualized + 1
-                    }              
-                }
-          });         
-    };
-    """
-
-    def __init__(self, trajectory_ids):
-        self.dict_ = {
-            "type": "alltrajectoryview",
-            "trajectory_ids": [mpld3.utils.get_id(trajectory_id) for trajectory_id in trajectory_ids]
-        }
-
-
 class ZoomEgoCarPlugin(mpld3.plugins.PluginBase):
     """
     Large maps might show the ego car as a very small rectangle. This plugin automatically center the diagram
@@ -244,6 +163,85 @@ class ZoomEgoCarPlugin(mpld3.plugins.PluginBase):
             "vehiclePositionY": ego_vehicle_position_y}
 
 
+class SceneView():
+    """
+    Draw a scene, i.e., the compact description of a scenario at a given timestamp (see visualization.scene), over the
+    mpld3 figure of the road layout of its template. The browser adds the vehicles, the goal region, and the lines of
+    the trajectory to the figure, and connects the PointHTMLTooltip, TrajectoryView, and ZoomEgoCarPlugin plugins to
+    them, so the server does not render the figure at all.
+
+    Call mpld3.draw_scene(figid, road_spec, scene) instead of mpld3.draw_figure(figid, figure_spec)
+    """
+
+    JAVASCRIPT = """
+    // Invisible squares over the vehicles show the tooltips
+    var SCENE_MARKER_PATH = [[[-7.5, -7.5], [7.5, -7.5], [7.5, 7.5], [-7.5, 7.5]], ["M", "L", "L", "L", "Z"]];
+
+    mpld3.draw_scene = function(figid, road_spec, scene){
+        // Draw on a copy, the same road spec is used by many scenes
+        var spec = JSON.parse(JSON.stringify(road_spec));
+        var ax = spec.axes[0];
+
+        var add_data = function(points){
+            var name = "scene" + Object.keys(spec.data).length;
+            spec.data[name] = points;
+            return name;
+        };
+
+        var add_box = function(id, box, facecolor, edgecolor, linewidth, zorder){
+            ax.paths.push({"data": add_data(box), "xindex": 0, "yindex": 1, "coordinates": "data",
+                           "pathcodes": ["M", "L", "L", "L", "Z"], "id": id, "dasharray": "none", "alpha": 1,
+                           "facecolor": facecolor, "edgecolor": edgecolor, "edgewidth": linewidth, "zorder": zorder});
+        };
+
+        var add_line = function(id, points, color, linewidth, alpha, zorder){
+            ax.lines.push({"data": add_data(points), "xindex": 0, "yindex": 1, "coordinates": "data", "id": id,
+                           "color": color, "linewidth": linewidth, "dasharray": "none", "alpha": alpha,
+                           "zorder": zorder, "drawstyle": "default"});
+        };
+
+        // Like the PNGs, the goal region is below the vehicles
+        if (scene.goal_region){
+            add_box(figid + "_goal_region", scene.goal_region.box,
+                    scene.goal_region.facecolor, scene.goal_region.edgecolor, 0.5, 20);
+        }
+
+        scene.vehicles.forEach(function(vehicle, index){
+            add_box(figid + "_vehicle_" + index, vehicle.box, vehicle.facecolor, vehicle.edgecolor, vehicle.linewidth, 50);
+        });
+
+        ax.markers.push({"data": add_data(scene.vehicles.map(function(vehicle){ return vehicle.position; })),
+                         "xindex": 0, "yindex": 1, "coordinates": "data", "id": figid + "_vehicles",
+                         "facecolor": "#0000FF", "edgecolor": "#000000", "edgewidth": 1, "alpha": 0, "zorder": 52,
+                         "markerpath": SCENE_MARKER_PATH});
+        spec.plugins.push({"type": "htmltooltip", "id": figid + "_vehicles",
+                           "labels": scene.vehicles.map(function(vehicle){ return vehicle.tooltip; }),
+                           "targets": null, "hoffset": 0, "voffset": 10});
+
+        if (scene.ego){
+            // The trajectory lines start on the ego vehicle, the TrajectoryView plugin updates them
+            add_line(figid + "_reference_path", [scene.ego], "#008000", 4, 0.3, 49);
+            add_line(figid + "_trajectory", [scene.ego], "#000000", 2, 0.5, 50);
+            add_line(figid + "_selected_trajectory", [scene.ego], "#000000", 4, 1, 51);
+
+            spec.plugins.push({"type": "trajectoryview",
+                               "trajectory_line": figid + "_trajectory",
+                               "selected_line": figid + "_selected_trajectory",
+                               "reference_path_line": figid + "_reference_path"});
+            spec.plugins.push({"type": "zoomEgoCar", "vehiclePositionX": scene.ego[0], "vehiclePositionY": scene.ego[1]});
+        }
+
+        mpld3.draw_figure(figid, spec);
+    };
+    """
+
+    @staticmethod
+    def javascript():
+        """ The JavaScript to draw the scenes, including the one of the plugins they use """
+        return "\n".join([mpld3.plugins.PointHTMLTooltip.JAVASCRIPT, TrajectoryView.JAVASCRIPT,
+                          ZoomEgoCarPlugin.JAVASCRIPT, SceneView.JAVASCRIPT])
+
+
 class ScenarioDragPlugin(mpld3.plugins.PluginBase):
     """ Old Version of the Plugin. Deprecated!"""
     JAVASCRIPT = r"""
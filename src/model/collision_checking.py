@@ -1,3 +1,6 @@
+import math
+
+from collections import defaultdict
 from typing import List, Tuple, Dict
 
 # https://commonroad.in.tum.de/docs/commonroad-drivability-checker/sphinx/05_collision_checks_dynamic_obstacles.html
@@ -19,6 +22,43 @@ from commonroad.geometry.shape import Rectangle
 
 from configuration.config import VEHICLE_WIDTH, VEHICLE_LENGTH
 
+# All the vehicles have the same size, so they all fit a circle with this radius around their center
+_VEHICLE_RADIUS = math.hypot(VEHICLE_LENGTH / 2, VEHICLE_WIDTH / 2)
+# Vehicles whose centers are farther than this cannot collide. The slack covers the rounding errors
+_MAX_COLLISION_DISTANCE = 2 * _VEHICLE_RADIUS + 1e-6
+
+
+def _candidate_pairs(positions: List[Tuple[float, float]]) -> List[Tuple[int, int]]:
+    """
+    Broad phase: return the pairs (i, j), with i < j, of vehicles whose bounding circles overlap, sorted.
+
+    We hash the vehicles in a uniform grid whose cells are as large as the diameter of the circles, so only the
+    vehicles in the same or in the neighbouring cells can overlap
+    """
+    grid = defaultdict(list)
+    cells = []
+    for index, (position_x, position_y) in enumerate(positions):
+        cell = (math.floor(position_x / _MAX_COLLISION_DISTANCE), math.floor(position_y / _MAX_COLLISION_DISTANCE))
+        grid[cell].append(index)
+        cells.append(cell)
+
+    candidate_pairs = []
+    for index, (cell_x, cell_y) in enumerate(cells):
+        position_x, position_y = positions[index]
+        for neighbour_x in (cell_x - 1, cell_x, cell_x + 1):
+            for neighbour_y in (cell_y - 1, cell_y, cell_y + 1):
+                for other_index in grid.get((neighbour_x, neighbour_y), ()):
+                    if other_index > index and math.hypot(positions[other_index][0] - position_x,
+                                                          positions[other_index][1] - position_y) <= _MAX_COLLISION_DISTANCE:
+                        candidate_pairs.append((index, other_index))
+    return sorted(candidate_pairs)
+
+
+def _colliding_pairs(obstacles, positions) -> List[Tuple[int, int]]:
+    """ Return the pairs (i, j), with i < j, of obstacles that collide, in the order of the pairwise check """
+    # Narrow phase: check the actual shapes only for the candidates
+    return [(i, j) for i, j in _candidate_pairs(positions) if obstacles[i].collide(obstacles[j])]
+
 # TODO We do not really need a class for this, since there's no state here?
 class CollisionChecker():
 
@@ -40,14 +80,13 @@ class CollisionChecker():
                                                                      vehicle_state.position_x, vehicle_state.position_y)
             drivers_map[driver_id]["state"] = vehicle_state
 
-        # Now check all the possible combinations (note, this can be improved)
-        done = []
-        for v1_key, v1_dict in drivers_map.items():
-            done.append(v1_key)
-            for v2_key, v2_dict in [(k, v) for (k, v) in drivers_map.items() if k not in done]:
-                if v1_dict["obstacle"].collide(v2_dict["obstacle"]):
-                    crashed_drivers_and_their_state.append((v1_key, v1_dict["state"]))
-                    crashed_drivers_and_their_state.append((v2_key, v2_dict["state"]))
+        # Now check the combinations of vehicles that are close enough to collide
+        drivers = list(drivers_map.items())
+        for i, j in _colliding_pairs([v_dict["obstacle"] for _, v_dict in drivers],
+                                     [(v_dict["state"].position_x, v_dict["state"].position_y) for _, v_dict in drivers]):
+            (v1_key, v1_dict), (v2_key, v2_dict) = drivers[i], drivers[j]
+            crashed_drivers_and_their_state.append((v1_key, v1_dict["state"]))
+            crashed_drivers_and_their_state.append((v2_key, v2_dict["state"]))
 
         # Return the list of (driver, state) for reportedly CRASHED vehicles
         return crashed_drivers_and_their_state
@@ -97,14 +136,13 @@ class CollisionChecker():
                 obstacle.draw(rnd,  draw_params={'facecolor': color})
             rnd.render()
 
-        # Now check all the possible combinations (note, this can be improved)
-        done = []
-        for v1_key, v1_dict in drivers_map.items():
-            done.append(v1_key)
-            for v2_key, v2_dict in [(k, v) for (k, v) in drivers_map.items() if k not in done]:
-                if v1_dict["obstacle"].collide(v2_dict["obstacle"]):
-                    crashed_drivers_and_their_state.append((v1_dict["driver"], v1_dict["state"]))
-                    crashed_drivers_and_their_state.append((v2_dict["driver"], v2_dict["state"]))
+        # Now check the combinations of vehicles that are close enough to collide
+        drivers = list(drivers_map.values())
+        for i, j in _colliding_pairs([v_dict["obstacle"] for v_dict in drivers],
+                                     [(v_dict["state"].position_x, v_dict["state"].position_y) for v_dict in drivers]):
+            v1_dict, v2_dict = drivers[i], drivers[j]
+            crashed_drivers_and_their_state.append((v1_dict["driver"], v1_dict["state"]))
+            crashed_drivers_and_their_state.append((v2_dict["driver"], v2_dict["state"]))
 
         # Return the list of (driver, state) for reportedly CRASHED vehicles
         return crashed_drivers_and_their_state
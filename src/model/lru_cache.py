@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache():
+    """
+    Process-wide, size-bounded LRU cache that counts its hits and misses. The caches of parsed scenarios, planner
+    bundles, reference paths, and road layers are built on it.
+
+    Flask serves requests in threads, and AVs and rendering jobs might run in threads as well, so every operation holds
+    a lock. Callers compute the missing values outside of it, since that is the slow part: two threads might compute
+    the same value; that's fine.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Return the value cached under the given key, or None """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        """ Cache the value under the given key, evicting the least recently used entries if the cache is full """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_if(self, predicate) -> None:
+        """ Drop all the entries whose key satisfies the predicate """
+        with self._lock:
+            for key in [k for k in self._entries.keys() if predicate(k)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size
+            }
@@ -1,9 +1,8 @@
 import tempfile
 import os
-import io
 
 # This is to convert this class to a CommonRoad object. TODO Move it to anntoher package
-from commonroad.common.file_reader import CommonRoadFileReader
+from model.scenario_cache import scenario_cache, hash_xml
 
 # Import the "singleton" db object for creating the model
 from persistence.database import db
@@ -39,10 +38,13 @@ class MixedTrafficScenarioTemplate(db.Model):
                self.xml == other.xml
 
     def as_commonroad_scenario(self):
-        # TODO Find a workaround to avoid using temporary files
-        # Note: we need this specific code to avoid issues in Windows
-        with io.BytesIO(self.xml.encode('utf8')) as binary_file:
-            with io.TextIOWrapper(binary_file, encoding='utf8') as file_obj:
-                commonroad_file_reader = CommonRoadFileReader(file_obj)
-                commonroad_scenario, _ = commonroad_file_reader.open()
-                return commonroad_scenario
+        # Parsing the XML is expensive, so we go through the cache. The returned scenario shares the road with the
+        # cache, but it is safe to add obstacles to it
+        return scenario_cache.get_scenario(self.template_id, self.xml)
+
+    def as_lanelet_network(self):
+        return scenario_cache.get_lanelet_network(self.template_id, self.xml)
+
+    def get_road_layer_key(self):
+        # The road layout changes only if the template is uploaded again, i.e., with another XML
+        return self.template_id, hash_xml(self.xml)
@@ -0,0 +1,53 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from configuration.config import REFERENCE_PATH_CACHE_SIZE
+
+from model.lru_cache import LRUCache
+
+
+class ReferencePath(NamedTuple):
+    """ The reference path of a driver, the coordinate system it defines, and the arrays the sampler reads from it """
+    ref_path: np.ndarray
+    coordinate_system: object
+    ref_pos: np.ndarray
+    ref_theta: np.ndarray
+    unwrapped_ref_theta: np.ndarray
+    ref_curv: np.ndarray
+    ref_curv_d: np.ndarray
+
+
+def reference_path_fingerprint(mixed_traffic_scenario, initial_state, goal_region_as_rectangle) -> tuple:
+    """ Everything the reference path depends on, besides snap_to_road """
+    return (mixed_traffic_scenario.template_id, mixed_traffic_scenario.duration,
+            initial_state.timestamp, initial_state.position_x, initial_state.position_y, initial_state.rotation,
+            tuple(goal_region_as_rectangle.center), goal_region_as_rectangle.orientation,
+            goal_region_as_rectangle.length, goal_region_as_rectangle.width)
+
+
+class ReferencePathCache(LRUCache):
+    """
+    Cache of the reference paths of the drivers.
+
+    Entries are keyed by (scenario_id, driver_id, snap_to_road) plus a fingerprint of the initial state and goal
+    region of the driver, so a scenario id reused for another scenario never hits a stale entry. Reference paths
+    are shared by the samplers: they must not modify them.
+    """
+
+    def __init__(self, max_size=REFERENCE_PATH_CACHE_SIZE):
+        super().__init__(max_size)
+
+    def get(self, scenario_id, driver_id, snap_to_road, fingerprint) -> Optional[ReferencePath]:
+        return super().get((scenario_id, driver_id, snap_to_road, fingerprint))
+
+    def put(self, scenario_id, driver_id, snap_to_road, fingerprint, reference_path: ReferencePath) -> None:
+        super().put((scenario_id, driver_id, snap_to_road, fingerprint), reference_path)
+
+    def invalidate(self, scenario_id) -> None:
+        """ Drop the reference paths of all the drivers of the given scenario """
+        self.evict_if(lambda key: key[0] == scenario_id)
+
+
+# The reference paths of the drivers whose trajectories this process samples
+reference_path_cache = ReferencePathCache()
@@ -0,0 +1,88 @@
+import hashlib
+import io
+
+from commonroad.common.file_reader import CommonRoadFileReader
+from commonroad.scenario.scenario import Scenario
+
+from configuration.config import SCENARIO_CACHE_SIZE
+
+from model.lru_cache import LRUCache
+
+
+def _parse_xml(xml: str):
+    # Note: we need this specific code to avoid issues in Windows
+    with io.BytesIO(xml.encode('utf8')) as binary_file:
+        with io.TextIOWrapper(binary_file, encoding='utf8') as file_obj:
+            commonroad_file_reader = CommonRoadFileReader(file_obj)
+            commonroad_scenario, _ = commonroad_file_reader.open()
+            return commonroad_scenario
+
+
+def create_overlay_scenario(base_commonroad_scenario) -> Scenario:
+    """
+    Create a scenario that shares the lanelet network and the obstacles of the base scenario, so we can add the
+    other vehicles to it without copying the entire map
+    """
+    overlay_scenario = Scenario(dt=base_commonroad_scenario.dt, scenario_id=base_commonroad_scenario.scenario_id,
+                                author=base_commonroad_scenario.author, tags=base_commonroad_scenario.tags,
+                                affiliation=base_commonroad_scenario.affiliation,
+                                source=base_commonroad_scenario.source, location=base_commonroad_scenario.location)
+    # Note: this does not copy the lanelet network
+    overlay_scenario.add_objects(base_commonroad_scenario.lanelet_network)
+    overlay_scenario.add_objects(base_commonroad_scenario.obstacles)
+    return overlay_scenario
+
+
+def hash_xml(xml: str) -> str:
+    """ Identify the given template XML, e.g., to key what we derive from it """
+    return hashlib.sha1(xml.encode('utf8')).hexdigest()
+
+
+class ParsedScenarioCache(LRUCache):
+    """
+    Cache of the CommonRoad scenarios parsed from the templates' XML.
+
+    Entries are keyed by (template_id, hash of the xml), so a template uploaded again with a different XML never
+    hits a stale entry. Callers get a new scenario over the cached lanelet network and obstacles (see
+    create_overlay_scenario): they can add obstacles to it without corrupting the cache, but the road is shared and
+    read-only. Callers that must change the road must deep copy it.
+    """
+
+    def __init__(self, max_size=SCENARIO_CACHE_SIZE):
+        super().__init__(max_size)
+
+    def _get_or_parse(self, template_id, xml):
+        key = (template_id, hash_xml(xml))
+        commonroad_scenario = self.get(key)
+        if commonroad_scenario is None:
+            commonroad_scenario = _parse_xml(xml)
+            self.put(key, commonroad_scenario)
+        return commonroad_scenario
+
+    def get_scenario(self, template_id, xml):
+        """ Return the CommonRoad scenario defined by the given template XML, sharing its road """
+        return create_overlay_scenario(self._get_or_parse(template_id, xml))
+
+    def get_lanelet_network(self, template_id, xml):
+        """ Return the (shared, read-only) lanelet network of the scenario defined by the given template XML """
+        return self._get_or_parse(template_id, xml).lanelet_network
+
+    def get_scenario_by_xml_hash(self, template_id, xml_hash):
+        """
+        Return the CommonRoad scenario of the given template, sharing its road, if its XML, identified by its hash,
+        was already parsed. Otherwise, return None
+        """
+        commonroad_scenario = self.get((template_id, xml_hash))
+        return None if commonroad_scenario is None else create_overlay_scenario(commonroad_scenario)
+
+    def warm_up(self, template_id, xml) -> None:
+        """ Parse the given template XML, unless it is already cached """
+        self._get_or_parse(template_id, xml)
+
+    def invalidate(self, template_id) -> None:
+        """ Drop all the entries of the given template, whatever their XML """
+        self.evict_if(lambda key: key[0] == template_id)
+
+
+# The parsed templates shared by this process
+scenario_cache = ParsedScenarioCache()
@@ -0,0 +1,40 @@
+from sqlalchemy import Enum
+
+from model.driver import Driver
+from model.mixed_traffic_scenario import MixedTrafficScenario
+from model.vehicle_state import VehicleStatusEnum
+
+from persistence.database import db
+
+
+def is_settled(status_counts_at_timestamp) -> bool:
+    """ A timestamp is settled if all the vehicle states therein are ACTIVE, CRASHED or GOAL_REACHED """
+    not_actionable = {VehicleStatusEnum.ACTIVE, VehicleStatusEnum.CRASHED, VehicleStatusEnum.GOAL_REACHED}
+    return all(status in not_actionable for status in status_counts_at_timestamp.keys())
+
+
+class ScenarioFrontier(db.Model):
+    """
+    Materialize "where is the scenario now", i.e., the last timestamp in which the vehicle states of all the drivers
+    are ACTIVE, CRASHED or GOAL_REACHED. This is maintained by the VehicleStateDAO while the scenario evolves, so
+    we do not need to scan all the vehicle states to find it.
+    """
+
+    __tablename__ = 'Scenario_Frontier'
+
+    scenario_id = db.Column(db.Integer, db.ForeignKey(MixedTrafficScenario.scenario_id, ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    timestamp = db.Column(db.Integer, nullable=False, unique=False)
+
+
+class DriverFrontier(db.Model):
+    """
+    Materialize whether a driver is still in game (ACTIVE) or is done (CRASHED, GOAL_REACHED) and since when.
+    """
+
+    __tablename__ = 'Driver_Frontier'
+
+    driver_id = db.Column(db.Integer, db.ForeignKey(Driver.driver_id, ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    scenario_id = db.Column(db.Integer, db.ForeignKey(MixedTrafficScenario.scenario_id, ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    status = db.Column(Enum(VehicleStatusEnum), nullable=False)
+    # The timestamp at which the driver CRASHED or REACHED the GOAL. None if the driver is still ACTIVE
+    timestamp = db.Column(db.Integer, nullable=True, unique=False)
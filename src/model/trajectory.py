@@ -12,9 +12,11 @@ from commonroad_rp.parameter import TimeSampling, PositionSampling, VelocitySamp
 from commonroad_rp.polynomial_trajectory import QuinticTrajectory, QuarticTrajectory
 from commonroad_rp.trajectories import TrajectoryBundle, TrajectorySample, CartesianSample, CurviLinearSample
 from commonroad_rp.cost_function import CostFunction
-from commonroad_rp.utils import CoordinateSystem, interpolate_angle
+from commonroad_rp.utils import CoordinateSystem
 from commonroad_route_planner.route_planner import RoutePlanner
 
+from model.reference_path_cache import ReferencePath, reference_path_cache, reference_path_fingerprint
+
 from commonroad.scenario.trajectory import State
 from commonroad.common.util import Interval
 from commonroad.planning.goal import GoalRegion
@@ -146,12 +148,60 @@ def extend_ref_path_by(ref_path, step, times):
     return np.array([[px, py] for px, py in zip(xext, yext)])
 
 
+# The rules that make a trajectory infeasible, in the order check_kinematics evaluates them at each step
+_UNDEFINED_DP, _BEYOND_REFERENCE_PATH, _UNDEFINED_DPP, _KAPPA, _KAPPA_DOT, _ACCELERATION, _THETA_DOT = range(7)
+
+
+def _reference_path_indices(ref_pos, s):
+    """
+    For each s, the index of the closest point of the reference path, moved to the next one if it lies before s.
+    This is np.argmin(np.abs(ref_pos - s)) (+1) with a binary search, including the overlapping points that
+    extend_ref_path_by introduces: argmin takes the first of them
+    """
+    after = np.searchsorted(ref_pos, s, side="left")
+    before = np.maximum(after - 1, 0)
+    closest_is_before = (after > 0) & ((after == len(ref_pos)) |
+                                       (s - ref_pos[before] <= ref_pos[np.minimum(after, len(ref_pos) - 1)] - s))
+    first_before = np.searchsorted(ref_pos, ref_pos[before], side="left")
+    return np.where(closest_is_before, first_before + 1, after)
+
+
+def _interpolate_angles(x, x1, x2, y1, y2):
+    """ Vectorized interpolate_angle, including the fix for overlapping points from flexcrash.monkeypatch_commonroad_rp """
+    x2 = np.where(x1 == x2, x2 + 0.001, x2)
+    angle = (y2 - y1) * (x - x1) / (x2 - x1) + y1
+    # Same as commonroad.common.util.make_valid_orientation, one 2 * pi at a time. Near overlapping points, angles
+    # might be far off, so we keep going only with the angles that are still out of range
+    flat_angle = angle.reshape(-1)
+    out_of_range = np.flatnonzero(flat_angle > 2.0 * np.pi)
+    while out_of_range.size > 0:
+        flat_angle[out_of_range] -= 2.0 * np.pi
+        out_of_range = out_of_range[flat_angle[out_of_range] > 2.0 * np.pi]
+    out_of_range = np.flatnonzero(flat_angle < -2.0 * np.pi)
+    while out_of_range.size > 0:
+        flat_angle[out_of_range] += 2.0 * np.pi
+        out_of_range = out_of_range[flat_angle[out_of_range] < -2.0 * np.pi]
+    return angle
+
+
+def _wrap_angles(angle):
+    angle = np.where(angle < -np.pi, angle + 2 * np.pi, angle)
+    return np.where(angle > np.pi, angle - 2 * np.pi, angle)
+
+
+def _keep_first(values, n_values, length):
+    """ Keep the first n_values, the others are zeros """
+    kept_values = np.zeros(length)
+    kept_values[:n_values] = values[:n_values]
+    return kept_values
+
 
 class TrajectorySampler():
     """ Wraps and extends the closed-source samplers from TUM """
     # TODO This could probably be a static method or something... I do not think it will be reused ever
 
-    def __init__(self, mixed_traffic_scenario, initial_state: State, goal_region_as_rectangle, snap_to_road: bool, N: int = 20):
+    def __init__(self, mixed_traffic_scenario, initial_state: State, goal_region_as_rectangle, snap_to_road: bool, N: int = 20,
+                 driver_id=None):
 
         # TODO Sampling T control how long it takes the vehicle to move to a distance d at the given speed
         # TODO So t = 0 means that it will shift to the left/right
@@ -170,8 +220,6 @@ class TrajectorySampler():
 
         self.constraints = VehModelParameters()
 
-        self.commonroad_scenario = mixed_traffic_scenario.scenario_template.as_commonroad_scenario()
-
         self.dT = 0.1 # TODO Where is this defined?
 
         self.n_samples = 5 # Fixed for the moment
@@ -179,8 +227,27 @@ class TrajectorySampler():
         self.N = N #20 # Max length of trajectory
         self.horizon = self.dT * self.N
 
-        # Compute the reference path from the given initial state. This can be the current state.
+        # The reference path depends only on the initial state and goal region of the driver, so if we know the
+        # driver we compute it once per scenario
+        if driver_id is None:
+            self._reference_path = self._create_reference_path(mixed_traffic_scenario, initial_state,
+                                                               goal_region_as_rectangle, snap_to_road)
+        else:
+            fingerprint = reference_path_fingerprint(mixed_traffic_scenario, initial_state, goal_region_as_rectangle)
+            self._reference_path = reference_path_cache.get(mixed_traffic_scenario.scenario_id, driver_id,
+                                                            snap_to_road, fingerprint)
+            if self._reference_path is None:
+                self._reference_path = self._create_reference_path(mixed_traffic_scenario, initial_state,
+                                                                   goal_region_as_rectangle, snap_to_road)
+                reference_path_cache.put(mixed_traffic_scenario.scenario_id, driver_id, snap_to_road, fingerprint,
+                                         self._reference_path)
+
+        self._ref_path = self._reference_path.ref_path
+        self._co: CoordinateSystem = self._reference_path.coordinate_system
 
+    @staticmethod
+    def _create_reference_path(mixed_traffic_scenario, initial_state, goal_region_as_rectangle, snap_to_road) -> ReferencePath:
+        """ Compute the reference path from the given initial state. This can be the current state. """
         commonroad_initial_state = State(**{
             "time_step": initial_state.timestamp,
             "position": np.array([initial_state.position_x, initial_state.position_y]),
@@ -190,20 +257,21 @@ class TrajectorySampler():
             "slip_angle": 0
         })
 
-        goal_state_list = [
-            State(position=goal_region_as_rectangle, time_step=Interval(initial_state.timestamp,
-                                                                        mixed_traffic_scenario.duration))]
+        if snap_to_road:
+            commonroad_scenario = mixed_traffic_scenario.scenario_template.as_commonroad_scenario()
 
-        commonroad_goal_region = GoalRegion(goal_state_list)
-        self.commonroad_planning_problem = PlanningProblem(mixed_traffic_scenario.scenario_id,
-                                                           commonroad_initial_state,
-                                                           commonroad_goal_region)
-        if self.snap_to_road:
+            goal_state_list = [
+                State(position=goal_region_as_rectangle, time_step=Interval(initial_state.timestamp,
+                                                                            mixed_traffic_scenario.duration))]
+
+            commonroad_goal_region = GoalRegion(goal_state_list)
+            commonroad_planning_problem = PlanningProblem(mixed_traffic_scenario.scenario_id,
+                                                          commonroad_initial_state,
+                                                          commonroad_goal_region)
             # The trajectories will try to follow the road
             # Configure the Route Planner
             # initialize route planner
-            # TODO Here we use the altered = self.commonroad_scenario
-            route_planner = RoutePlanner(self.commonroad_scenario, self.commonroad_planning_problem)
+            route_planner = RoutePlanner(commonroad_scenario, commonroad_planning_problem)
             # TODO No idea what's this... This is to avoid that the planner stars on a multiple lanelet situation
             assert len(route_planner.id_lanelets_start) == 1
             initial_id = route_planner.id_lanelets_start[0]
@@ -212,12 +280,12 @@ class TrajectorySampler():
             # TODO Sometimes this is broken?
             # get reference path
             follow_initial_lanelet = True
-            if follow_initial_lanelet is True and len(self.commonroad_scenario.lanelet_network.intersections) == 0:
+            if follow_initial_lanelet is True and len(commonroad_scenario.lanelet_network.intersections) == 0:
                 # follow initial lanelet
-                self._ref_path = initial_lanelet.center_vertices
+                ref_path = initial_lanelet.center_vertices
             else:
                 # custom reference path
-                self._ref_path = route_planner.plan_routes().retrieve_first_route().reference_path
+                ref_path = route_planner.plan_routes().retrieve_first_route().reference_path
 
 
             step, times = 0.1, 400
@@ -225,7 +293,7 @@ class TrajectorySampler():
             # Ideally we should follow the curvature... but for the moment just interpolate the last 2 points or somethign
 
             # TODO CHECK THIS ONE !!!
-            self._ref_path = extend_ref_path_by(self._ref_path, step, times)
+            ref_path = extend_ref_path_by(ref_path, step, times)
 
         else:
             # The trajectories will be computed from the current vehicles rotation
@@ -233,10 +301,14 @@ class TrajectorySampler():
             xs = [commonroad_initial_state.position[0] + distance * math.cos(commonroad_initial_state.orientation) for distance in range(-20, 100, 5)]
             ys = [commonroad_initial_state.position[1] + distance * math.sin(commonroad_initial_state.orientation) for distance in range(-20, 100, 5)]
             linear_reference_path = np.array([[px, py] for px, py in zip(xs, ys)])
-            self._ref_path = linear_reference_path
+            ref_path = linear_reference_path
 
         # The ref path is nothing more than a sequence of points
-        self._co: CoordinateSystem = CoordinateSystem(self._ref_path)
+        coordinate_system = CoordinateSystem(ref_path)
+        return ReferencePath(ref_path=ref_path, coordinate_system=coordinate_system,
+                             ref_pos=coordinate_system.ref_pos(), ref_theta=coordinate_system.ref_theta(),
+                             unwrapped_ref_theta=np.unwrap(coordinate_system.ref_theta()),
+                             ref_curv=coordinate_system.ref_curv(), ref_curv_d=coordinate_system.ref_curv_d())
 
     def get_reference_path(self):
         return self._ref_path
@@ -281,6 +353,20 @@ class TrajectorySampler():
         # Otherwise, we can simply go with it?
         self.sampled_d = sorted(list(self._sampling_d.to_range(samp_level)))
 
+        trajectory_bundle = self._create_trajectory_bundle(x_0_lon, x_0_lat)
+
+        # This transform the trajectory object into a sequence of states -
+        # TODO ACCEPT ALL OF THEM FOR THE MOMENT WE NEED TO LET THE USER DO WHATEVER THEY WANT
+        #
+        feasible_trajectories, non_feasible_trajectories, infeasibility_reasons = self.check_kinematics(trajectory_bundle, accept_all=DISABLE_FEASIBILITY)
+
+        total_count = len(feasible_trajectories)
+        logger.debug('{} feasible trajectories'.format(total_count))
+
+        return feasible_trajectories, non_feasible_trajectories, infeasibility_reasons
+
+    def _create_trajectory_bundle(self, x_0_lon, x_0_lat) -> TrajectoryBundle:
+        """ Create the trajectory samples for all the combinations of sampled v, t, and d """
         trajectories = list()
         for v in self.sampled_v:
 
@@ -326,20 +412,15 @@ class TrajectorySampler():
         total_count = len(trajectory_bundle._trajectory_bundle)
         logger.debug('{} trajectories sampled'.format(total_count))
 
-        # This transform the trajectory object into a sequence of states -
-        # TODO ACCEPT ALL OF THEM FOR THE MOMENT WE NEED TO LET THE USER DO WHATEVER THEY WANT
-        #
-        feasible_trajectories, non_feasible_trajectories, infeasibility_reasons = self.check_kinematics(trajectory_bundle, accept_all=DISABLE_FEASIBILITY)
-
-        total_count = len(feasible_trajectories)
-        logger.debug('{} feasible trajectories'.format(total_count))
-
-        return feasible_trajectories, non_feasible_trajectories, infeasibility_reasons
+        return trajectory_bundle
 
     def check_kinematics(self, trajectory_bundle: TrajectoryBundle, accept_all=False):
         """
         Checks the kinematics of given trajectories in a bundle and computes the cartesian trajectory information
-        Faster function: Lazy evaluation, only kinematically feasible trajectories are evaluated
+
+        All the trajectories are checked at once: their curvilinear samples are padded to the same length and the
+        feasibility rules are evaluated with array operations over all their steps. Each trajectory is rejected by
+        the first rule it violates, so the outcome is the same as checking the steps one by one
 
         :param trajectory_bundle: The trajectory bundle to check
         :return: The list of trajectories which are kinematically feasible
@@ -348,209 +429,81 @@ class TrajectorySampler():
         infeasible_trajectories = list()
         infeasibility_reasons = list()
 
-        for tr_index, trajectory in enumerate(trajectory_bundle.trajectories):
-
-            feasible = True
-
+        # Trajectories whose samples cannot be computed are infeasible, we report their error below
+        curvilinear_samples = list()
+        for trajectory in trajectory_bundle.trajectories:
             try:
-                # create time array and precompute time interval information
-                t = np.arange(0, np.round(trajectory.trajectory_long.delta_tau + self.dT, 5), self.dT)
-                t2 = np.square(t)
-                t3 = t2 * t
-                t4 = np.square(t2)
-                t5 = t4 * t
-
-                # Why do we care about the 4th power of time? space, velocity, acceralation, jerk, ??
-
-                # compute position, velocity, acceleration from trajectory sample
-                s = trajectory.trajectory_long.calc_position(t, t2, t3, t4, t5)  # lon pos
-                # Speed goes down, why?
-                s_velocity = trajectory.trajectory_long.calc_velocity(t, t2, t3, t4)  # lon velocity
-                # Acceleration is not constant... why? The methods are not explained...
-                s_acceleration = trajectory.trajectory_long.calc_acceleration(t, t2, t3)  # lon acceleration
-
-                # At low speeds, we have to sample the lateral motion over the travelled distance rather than time.
-                if not _LOW_VEL_MODE:
-                    d = trajectory.trajectory_lat.calc_position(t, t2, t3, t4, t5)  # lat pos
-                    d_velocity = trajectory.trajectory_lat.calc_velocity(t, t2, t3, t4)  # lat velocity
-                    d_acceleration = trajectory.trajectory_lat.calc_acceleration(t, t2, t3)  # lat acceleration
-
-                else:
-                    # compute normalized travelled distance for low velocity mode of lateral planning
-                    s1 = s - s[0]
-                    s2 = np.square(s1)
-                    s3 = s2 * s1
-                    s4 = np.square(s2)
-                    s5 = s4 * s1
-
-                    d = trajectory.trajectory_lat.calc_position(s1, s2, s3, s4, s5)  # lat pos
-                    # in LOW_VEL_MODE d_velocity is actually d' (see Diss. Moritz Werling  p.124)
-                    d_velocity = trajectory.trajectory_lat.calc_velocity(s1, s2, s3, s4)  # lat velocity
-                    d_acceleration = trajectory.trajectory_lat.calc_acceleration(s1, s2, s3)  # lat acceleration
-
-                # Compute cartesian information of trajectory
-                s_length = len(s)
-                x = np.zeros(s_length)
-                y = np.zeros(s_length)
-                theta_gl = np.zeros(s_length)
-                theta_cl = np.zeros(s_length)
-                v = np.zeros(s_length)
-                a = np.zeros(s_length)
-                kappa_gl = np.zeros(s_length)
-                kappa_cl = np.zeros(s_length)
-
-                oopd = False # Out of Projection Domain
-
-                for i in range(0, s_length):
-                    # compute Global position from the coordinate system defined by the reference path. Not sure what is s and d, maybe longitudinal and lateral/latitudinal positions?
-                    pos: np.ndarray = self._co.convert_to_cartesian_coords(s[i], d[i])
-
-                    if pos is not None:
-                        x[i] = pos[0]
-                        y[i] = pos[1]
-                    else:
-                        feasible = False
-                        oopd = True
-                        # TODO What's this? When this triggers we cannot generate the Cartesian Trajectory
-                        # This happens when the ref path is shorter than the plannable trajectory
-                        logger.info("Out of projection domain")
-                        break
-
-                    # compute orientations - what dp is supposed to be?
-                    if not _LOW_VEL_MODE:
-                        if s_velocity[i] > 0.001:
-                            dp = d_velocity[i] / s_velocity[i]
-                        else:
-                            if d_velocity[i] > 0.001:
-                                dp = None
-                            else:
-                                dp = 0.
-                        ddot = d_acceleration[i] - dp * s_acceleration[i]
-                        # What dpp is supposed to be?
-                        if s_velocity[i] > 0.001:
-                            dpp = ddot / (s_velocity[i] ** 2)
-                        else:
-                            if np.abs(ddot) > 0.00003:
-                                # TODO When this happens everything crashes.
-                                # THIS CONDITION IS TRIGGERED BY SOME SPECIFIC INITIAL STATE, WHICH IS RANDOM AT THE MOMENT
-                                dpp = None
-                            else:
-                                dpp = 0.
-                    else:
-                        dp = d_velocity[i]
-                        dpp = d_acceleration[i]
-
-                    # At this point dpp might not have been initialized?
+                curvilinear_samples.append(self._compute_curvilinear_sample(trajectory))
+            except Exception as ex_info:
+                curvilinear_samples.append(ex_info)
 
-                    s_idx = np.argmin(np.abs(self._co.ref_pos() - s[i]))
-                    if self._co.ref_pos()[s_idx] < s[i]:
-                        s_idx += 1
+        kinematics = self._compute_kinematics([sample for sample in curvilinear_samples if not isinstance(sample, Exception)])
 
-                    if s_idx + 1 >= len(self._co.ref_pos()):
-                        feasible = False
-                        break
+        k_index = 0
+        for tr_index, (trajectory, curvilinear_sample) in enumerate(zip(trajectory_bundle.trajectories, curvilinear_samples)):
 
-                    s_lambda = (self._co.ref_pos()[s_idx] - s[i]) / (
-                            self._co.ref_pos()[s_idx + 1] - self._co.ref_pos()[s_idx])
+            try:
+                if isinstance(curvilinear_sample, Exception):
+                    raise curvilinear_sample
 
-                    # add cl and gl orientation
-                    if s_velocity[i] > 0.005:
-                        if _LOW_VEL_MODE:
-                            theta_cl[i] = np.arctan2(dp, 1.0)
-                        else:
-                            theta_cl[i] = np.arctan2(d_velocity[i], s_velocity[i])
-                        theta_gl[i] = theta_cl[i] + interpolate_angle(
-                            s[i],
-                            self._co.ref_pos()[s_idx],
-                            self._co.ref_pos()[s_idx + 1],
-                            self._co.ref_theta()[s_idx],
-                            self._co.ref_theta()[s_idx + 1]
-                        )
-                        if theta_gl[i] < -np.pi:
-                            theta_gl[i] += 2 * np.pi
-                        if theta_gl[i] > np.pi:
-                            theta_gl[i] -= 2 * np.pi
-                        # theta_gl[i] = theta_cl[i] + (
-                        #         self._co.ref_theta()[s_idx + 1] - self._co.ref_theta()[s_idx]) * s_lambda + \
-                        #               self._co.ref_theta()[s_idx]
+                s, s_velocity, s_acceleration, d, d_velocity, d_acceleration = curvilinear_sample
+                theta_gl, v, a, kappa_gl, kappa_dot, theta_dot, violations = [values[k_index] for values in kinematics]
+                k_index += 1
 
-                    else:
-                        # theta_cl.append(np.interp(s[i], self._co.ref_pos(), self._co.ref_theta()))
-                        # theta_cl[i] = (self._co.ref_theta()[s_idx + 1] - self._co.ref_theta()[s_idx]) * s_lambda + \
-                        #               self._co.ref_theta()[s_idx]
-                        theta_cl[i] = interpolate_angle(
-                            s[i],
-                            self._co.ref_pos()[s_idx],
-                            self._co.ref_pos()[s_idx + 1],
-                            self._co.ref_theta()[s_idx],
-                            self._co.ref_theta()[s_idx + 1]
-                        )
-                        if theta_cl[i] < -np.pi:
-                            theta_cl[i] += 2 * np.pi
-                        if theta_cl[i] > np.pi:
-                            theta_cl[i] -= 2 * np.pi
-                        theta_gl[i] = theta_cl[i]
-
-                    # Compute curvature of reference at current position
-                    k_r = (self._co.ref_curv()[s_idx + 1] - self._co.ref_curv()[s_idx]) * s_lambda + \
-                          self._co.ref_curv()[
-                              s_idx]
-                    k_r_d = (self._co.ref_curv_d()[s_idx + 1] - self._co.ref_curv_d()[s_idx]) * s_lambda + \
-                            self._co.ref_curv_d()[s_idx]
-
-                    # compute global curvature based on appendix A of Moritz Werling's PhD thesis ... well sadly this is written in German!
-                    # TODO What happens if dpp is None?
-                    oneKrD = (1 - k_r * d[i])
-                    cosTheta = np.cos(theta_cl[i])
-                    tanTheta = np.tan(theta_cl[i])
-                    kappa_gl[i] = (dpp + k_r * dp * tanTheta) * cosTheta * (cosTheta / oneKrD) ** 2 + (
-                            cosTheta / oneKrD) * k_r
-                    kappa_cl[i] = kappa_gl[i] - k_r
-
-                    # velocity
-                    v[i] = s_velocity[i] * (oneKrD / (np.cos(theta_cl[i])))
-
-                    # compute acceleration
-                    a[i] = s_acceleration[i] * oneKrD / cosTheta + ((s_velocity[i] ** 2) / cosTheta) * (
-                            oneKrD * tanTheta * (kappa_gl[i] * oneKrD / cosTheta - k_r) - (
-                            k_r_d * d[i] + k_r * d_velocity[i]))
-
-                    # check kinematics to already discard infeasible trajectories
-                    infeasibility_reason = None
-                    if abs(kappa_gl[i] > self.constraints.kappa_max):
-                        infeasibility_reason = f"Rejected trajectory for Kappa {kappa_gl[i]} at step {i}"
-                        feasible = False
-                        break
-                    if abs((kappa_gl[i] - kappa_gl[i - 1]) / self.dT if i > 0 else 0.) > self.constraints.kappa_dot_max:
-                        infeasibility_reason = f"Rejected trajectory for KappaDOT {abs((kappa_gl[i] - kappa_gl[i - 1]) / self.dT if i > 0 else 0.)} between step {i - 1} and {i}"
-                        feasible = False
-                        break
-                    if abs(a[i]) > self.constraints.a_max:
-                        infeasibility_reason = f"Rejected trajectory for Acceleration {a[i]} at step {i}"
-                        feasible = False
-                        break
-                    if abs(v[i]) < -0.01:
-                        infeasibility_reason = f"Rejected trajectory for Velocity {v[i]} at step {i}"
-                        feasible = False
-                        break
-
-                    # de-normalization
-                    theta_gl = np.unwrap(theta_gl)
-
-                    if abs((theta_gl[i - 1] - theta_gl[i]) / self.dT if i > 0 else 0.) > self.constraints.theta_dot_max:
-                        infeasibility_reason =f"Rejected trajectory for Theta_dot {(theta_gl[i - 1] - theta_gl[i]) / self.dT if i > 0 else 0.} between step {i - 1} and {i}"
-                        feasible = False
-                        break
-
-                if oopd:
+                s_length = len(s)
+                # The step and the rule of the first violation, if any
+                if violations.any():
+                    step, rule = np.unravel_index(np.argmax(violations), violations.shape)
+                else:
+                    step, rule = s_length - 1, None
+
+                # Compute global position from the coordinate system defined by the reference path, up to the step
+                # we checked
+                cartesian_position = self._convert_to_cartesian_coords(s, d, step + 1)
+                if cartesian_position is None:
+                    # TODO What's this? When this triggers we cannot generate the Cartesian Trajectory
+                    # This happens when the ref path is shorter than the plannable trajectory
+                    logger.info("Out of projection domain")
                     # Do not show the one Out of Projection Domain!
                     continue
+                x, y = cartesian_position
+
+                if rule == _UNDEFINED_DP or rule == _UNDEFINED_DPP:
+                    # TODO When this happens everything crashes.
+                    # THIS CONDITION IS TRIGGERED BY SOME SPECIFIC INITIAL STATE, WHICH IS RANDOM AT THE MOMENT
+                    raise ValueError(f"Cannot compute the curvature at step {step}")
+
+                # Like the step-by-step check, keep only the values computed before stopping. The orientation is
+                # unwrapped after checking the other rules, so the orientation at the rejected step might be wrapped
+                n_computed = step if rule == _BEYOND_REFERENCE_PATH else step + 1
+                n_unwrapped = step if rule in (_BEYOND_REFERENCE_PATH, _KAPPA, _KAPPA_DOT, _ACCELERATION) else step + 1
+
+                theta = np.zeros(s_length)
+                theta[:n_unwrapped] = theta_gl[:n_unwrapped]
+                # de-normalization
+                theta = np.unwrap(theta)
+                theta[n_unwrapped:n_computed] = theta_gl[n_unwrapped:n_computed]
+
+                v, a, kappa_gl = [_keep_first(values, n_computed, s_length) for values in (v, a, kappa_gl)]
+
+                infeasibility_reason = None
+                if rule == _BEYOND_REFERENCE_PATH:
+                    infeasibility_reason = f"Rejected trajectory for leaving the reference path at step {step}"
+                elif rule == _KAPPA:
+                    infeasibility_reason = f"Rejected trajectory for Kappa {kappa_gl[step]} at step {step}"
+                elif rule == _KAPPA_DOT:
+                    infeasibility_reason = f"Rejected trajectory for KappaDOT {kappa_dot[step]} between step {step - 1} and {step}"
+                elif rule == _ACCELERATION:
+                    infeasibility_reason = f"Rejected trajectory for Acceleration {a[step]} at step {step}"
+                elif rule == _THETA_DOT:
+                    infeasibility_reason = f"Rejected trajectory for Theta_dot {theta_dot[step]} between step {step - 1} and {step}"
+                feasible = rule is None
 
                 # store Cartesian trajectory
-                trajectory.cartesian = CartesianSample(x, y, theta_gl, v, a, kappa_gl,
+                trajectory.cartesian = CartesianSample(x, y, theta, v, a, kappa_gl,
                                                        np.append([0], np.diff(kappa_gl)))
                 # store Curvilinear trajectory
-                trajectory.curvilinear = CurviLinearSample(s, d, theta_gl, ss=s_velocity, sss=s_acceleration,
+                trajectory.curvilinear = CurviLinearSample(s, d, theta, ss=s_velocity, sss=s_acceleration,
                                                            dd=d_velocity,
                                                            ddd=d_acceleration)
 
@@ -586,6 +539,152 @@ class TrajectorySampler():
 
         return feasible_trajectories, infeasible_trajectories, infeasibility_reasons
 
+    def _compute_curvilinear_sample(self, trajectory: TrajectorySample):
+        """
+        Compute position, velocity, acceleration of the trajectory sample along (s) and across (d) the reference path
+        """
+        # create time array and precompute time interval information
+        t = np.arange(0, np.round(trajectory.trajectory_long.delta_tau + self.dT, 5), self.dT)
+        t2 = np.square(t)
+        t3 = t2 * t
+        t4 = np.square(t2)
+        t5 = t4 * t
+
+        # compute position, velocity, acceleration from trajectory sample
+        s = trajectory.trajectory_long.calc_position(t, t2, t3, t4, t5)  # lon pos
+        s_velocity = trajectory.trajectory_long.calc_velocity(t, t2, t3, t4)  # lon velocity
+        s_acceleration = trajectory.trajectory_long.calc_acceleration(t, t2, t3)  # lon acceleration
+
+        # At low speeds, we have to sample the lateral motion over the travelled distance rather than time.
+        if not _LOW_VEL_MODE:
+            d = trajectory.trajectory_lat.calc_position(t, t2, t3, t4, t5)  # lat pos
+            d_velocity = trajectory.trajectory_lat.calc_velocity(t, t2, t3, t4)  # lat velocity
+            d_acceleration = trajectory.trajectory_lat.calc_acceleration(t, t2, t3)  # lat acceleration
+
+        else:
+            # compute normalized travelled distance for low velocity mode of lateral planning
+            s1 = s - s[0]
+            s2 = np.square(s1)
+            s3 = s2 * s1
+            s4 = np.square(s2)
+            s5 = s4 * s1
+
+            d = trajectory.trajectory_lat.calc_position(s1, s2, s3, s4, s5)  # lat pos
+            # in LOW_VEL_MODE d_velocity is actually d' (see Diss. Moritz Werling  p.124)
+            d_velocity = trajectory.trajectory_lat.calc_velocity(s1, s2, s3, s4)  # lat velocity
+            d_acceleration = trajectory.trajectory_lat.calc_acceleration(s1, s2, s3)  # lat acceleration
+
+        return s, s_velocity, s_acceleration, d, d_velocity, d_acceleration
+
+    def _compute_kinematics(self, curvilinear_samples):
+        """
+        Compute the cartesian orientation, velocity, acceleration, and curvature of all the curvilinear samples at
+        once, and flag the rules they violate at each step.
+
+        :return: (n_samples x n_steps) arrays of theta (not unwrapped), v, a, kappa, kappa_dot, theta_dot, and a
+            (n_samples x n_steps x _N_RULES) array of violations. Samples shorter than n_steps are padded with their
+            last values, which never violate any rule
+        """
+        n_steps = max([len(sample[0]) for sample in curvilinear_samples], default=0)
+        padded_samples = np.empty((6, len(curvilinear_samples), n_steps))
+        valid_steps = np.zeros((len(curvilinear_samples), n_steps), dtype=bool)
+        for index, sample in enumerate(curvilinear_samples):
+            sample = np.asarray(sample, dtype=float)
+            padded_samples[:, index, :sample.shape[1]] = sample
+            padded_samples[:, index, sample.shape[1]:] = sample[:, -1:]
+            valid_steps[index, :sample.shape[1]] = True
+        s, s_velocity, s_acceleration, d, d_velocity, d_acceleration = padded_samples
+
+        ref_pos, ref_theta = self._reference_path.ref_pos, self._reference_path.ref_theta
+        ref_curv, ref_curv_d = self._reference_path.ref_curv, self._reference_path.ref_curv_d
+
+        # Square with pow, as x ** 2 does on scalars: the x * x of arrays might round differently
+        def square(values):
+            return np.float_power(values, 2)
+
+        # The rules we do not check (e.g., dp is undefined) produce nan and inf, that we later discard
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            # compute orientations - what dp is supposed to be?
+            if not _LOW_VEL_MODE:
+                undefined_dp = (s_velocity <= 0.001) & (d_velocity > 0.001)
+                dp = np.where(s_velocity > 0.001, d_velocity / s_velocity, 0.)
+                ddot = d_acceleration - dp * s_acceleration
+                # What dpp is supposed to be?
+                undefined_dpp = (s_velocity <= 0.001) & (np.abs(ddot) > 0.00003)
+                dpp = np.where(s_velocity > 0.001, ddot / square(s_velocity), 0.)
+            else:
+                undefined_dp = undefined_dpp = np.zeros_like(valid_steps)
+                dp = d_velocity
+                dpp = d_acceleration
+
+            s_idx = _reference_path_indices(ref_pos, s)
+            beyond_reference_path = s_idx + 1 >= len(ref_pos)
+            # Those steps are rejected anyway, but keep their indices in range
+            s_idx = np.minimum(s_idx, len(ref_pos) - 2)
+
+            s_lambda = (ref_pos[s_idx] - s) / (ref_pos[s_idx + 1] - ref_pos[s_idx])
+
+            # add cl and gl orientation
+            ref_angle = _interpolate_angles(s, ref_pos[s_idx], ref_pos[s_idx + 1], ref_theta[s_idx], ref_theta[s_idx + 1])
+            moving = s_velocity > 0.005
+            if _LOW_VEL_MODE:
+                theta_cl = np.where(moving, np.arctan2(dp, 1.0), _wrap_angles(ref_angle))
+            else:
+                theta_cl = np.where(moving, np.arctan2(d_velocity, s_velocity), _wrap_angles(ref_angle))
+            theta_gl = np.where(moving, _wrap_angles(theta_cl + ref_angle), theta_cl)
+
+            # Compute curvature of reference at current position
+            k_r = (ref_curv[s_idx + 1] - ref_curv[s_idx]) * s_lambda + ref_curv[s_idx]
+            k_r_d = (ref_curv_d[s_idx + 1] - ref_curv_d[s_idx]) * s_lambda + ref_curv_d[s_idx]
+
+            # compute global curvature based on appendix A of Moritz Werling's PhD thesis
+            oneKrD = (1 - k_r * d)
+            cosTheta = np.cos(theta_cl)
+            tanTheta = np.tan(theta_cl)
+            kappa_gl = (dpp + k_r * dp * tanTheta) * cosTheta * square(cosTheta / oneKrD) + (cosTheta / oneKrD) * k_r
+
+            # velocity
+            v = s_velocity * (oneKrD / (np.cos(theta_cl)))
+
+            # compute acceleration
+            a = s_acceleration * oneKrD / cosTheta + (square(s_velocity) / cosTheta) * (
+                    oneKrD * tanTheta * (kappa_gl * oneKrD / cosTheta - k_r) - (k_r_d * d + k_r * d_velocity))
+
+            kappa_dot = np.zeros_like(kappa_gl)
+            kappa_dot[:, 1:] = np.abs((kappa_gl[:, 1:] - kappa_gl[:, :-1]) / self.dT)
+
+            theta_dot = np.zeros_like(theta_gl)
+            unwrapped_theta_gl = np.unwrap(theta_gl, axis=1)
+            theta_dot[:, 1:] = (unwrapped_theta_gl[:, :-1] - unwrapped_theta_gl[:, 1:]) / self.dT
+
+            # check kinematics to discard infeasible trajectories. Note: the check on kappa does not take its absolute
+            # value, and velocity is never too low (abs(v) < -0.01)
+            violations = np.stack([undefined_dp,
+                                   beyond_reference_path,
+                                   undefined_dpp,
+                                   kappa_gl > self.constraints.kappa_max,
+                                   kappa_dot > self.constraints.kappa_dot_max,
+                                   np.abs(a) > self.constraints.a_max,
+                                   np.abs(theta_dot) > self.constraints.theta_dot_max], axis=-1)
+            violations &= valid_steps[:, :, np.newaxis]
+
+        return theta_gl, v, a, kappa_gl, kappa_dot, theta_dot, violations
+
+    def _convert_to_cartesian_coords(self, s, d, n_points):
+        """
+        Convert the first n_points of the curvilinear trajectory, the others are zeros. Return None if any of them is
+        out of the projection domain
+        """
+        x = np.zeros(len(s))
+        y = np.zeros(len(s))
+        for i in range(0, n_points):
+            pos: np.ndarray = self._co.convert_to_cartesian_coords(s[i], d[i])
+            if pos is None:
+                return None
+            x[i] = pos[0]
+            y[i] = pos[1]
+        return x, y
+
     def _compute_initial_states(self, x_0: State) -> (np.ndarray, np.ndarray):
         """
         Computes the initial states for the polynomial planner based on a CommonRoad state
@@ -617,12 +716,12 @@ class TrajectorySampler():
             s, d = self._co.convert_to_curvilinear_coords(x_0.position[0], x_0.position[1])
 
         # compute orientation in curvilinear coordinate frame
-        ref_theta = np.unwrap(self._co.ref_theta())
-        theta_cl = x_0.orientation - np.interp(s, self._co.ref_pos(), ref_theta)
+        ref_pos = self._reference_path.ref_pos
+        theta_cl = x_0.orientation - np.interp(s, ref_pos, self._reference_path.unwrapped_ref_theta)
 
         # compute curvatures
-        kr = np.interp(s, self._co.ref_pos(), self._co.ref_curv())
-        kr_d = np.interp(s, self._co.ref_pos(), self._co.ref_curv_d())
+        kr = np.interp(s, ref_pos, self._reference_path.ref_curv)
+        kr_d = np.interp(s, ref_pos, self._reference_path.ref_curv_d)
 
         # compute d prime and d prime prime -> derivation after arc length
         d_p = (1 - kr * d) * np.tan(theta_cl)
@@ -684,18 +783,7 @@ class TrajectorySampler():
         # low: float, up: float, n_samples: int):
         self._sampling_v = VelocitySampling(v_range[0], v_range[1], self.n_samples)
 
-        # Translate current_state in x_0_lon and x_0_lat
-        x_0 = State(**{
-            "time_step": current_state.timestamp,
-            "position": np.array([current_state.position_x, current_state.position_y]),
-            "velocity": current_state.speed_ms,
-            "orientation": current_state.rotation,
-            "acceleration": current_state.acceleration_m2s,
-            "yaw_rate": 0,
-            "slip_angle": 0
-        })
-
-        x_0_lon, x_0_lat = self._compute_initial_states(x_0)
+        x_0_lon, x_0_lat = self._compute_initial_states(self._as_initial_state(current_state))
 
 
         # plan trajectory bundle - We replaced the ref path at beginning
@@ -707,4 +795,45 @@ class TrajectorySampler():
             [Trajectory.from_trajectory_sample(t) for t in non_feasible_trajectories],\
             infeasibility_reasons
 
+    def sample_trajectory_grid(self, current_state, t_values, d_values, v_values):
+        """
+        Sample one trajectory for each combination of the given values, instead of sampling the ranges between
+        min/max. The values are taken as they are, so the trajectories match the ones sample_trajectories returns
+        when min and max are both set to them.
+
+        :return: feasible_trajectory, non_feasible_trajectory, infeasibility_reason
+        """
+        assert all(T_SEC_MIN <= t < self.horizon for t in t_values)
+
+        self.sampled_t = sorted(t_values)
+        self.sampled_d = sorted(d_values)
+        self.sampled_v = sorted(v_values)
+
+        x_0_lon, x_0_lat = self._compute_initial_states(self._as_initial_state(current_state))
+
+        trajectory_bundle = self._create_trajectory_bundle(x_0_lon, x_0_lat)
+        feasible_trajectories, non_feasible_trajectories, infeasibility_reasons = self.check_kinematics(trajectory_bundle, accept_all=DISABLE_FEASIBILITY)
+
+        # One trajectory that failed before computing its Cartesian states should not fail the whole grid: drop it
+        non_feasible = [(t, reason) for t, reason in zip(non_feasible_trajectories, infeasibility_reasons)
+                        if t.cartesian is not None]
+
+        return \
+            [Trajectory.from_trajectory_sample(t) for t in feasible_trajectories],\
+            [Trajectory.from_trajectory_sample(t) for t, _ in non_feasible],\
+            [reason for _, reason in non_feasible]
+
+    @staticmethod
+    def _as_initial_state(current_state) -> State:
+        """ Translate current_state in the State from which we compute x_0_lon and x_0_lat """
+        return State(**{
+            "time_step": current_state.timestamp,
+            "position": np.array([current_state.position_x, current_state.position_y]),
+            "velocity": current_state.speed_ms,
+            "orientation": current_state.rotation,
+            "acceleration": current_state.acceleration_m2s,
+            "yaw_rate": 0,
+            "slip_angle": 0
+        })
+
 
@@ -1,6 +1,8 @@
 import numpy as np
 import enum
 
+from typing import NamedTuple
+
 from sqlalchemy import Enum
 
 from commonroad.scenario.trajectory import State
@@ -23,21 +25,34 @@ class VehicleStatusEnum(str, enum.Enum):
     GOAL_REACHED = "GOAL_REACHED" # SUBMITTED AND CANNOT BE CHANGED (END CASE - AUTOMATICALLY ENFORCED)
 
 
+class PlainVehicleState(NamedTuple):
+    """ A vehicle state as a plain tuple, which is cheap to pickle and does not depend on the ORM """
+    timestamp: int
+    position_x: float
+    position_y: float
+    rotation: float
+    speed_ms: float
+    acceleration_m2s: float
+    user_id: int
+    driver_id: int
+    scenario_id: int
+    # The value of the VehicleStatusEnum, which compares equal to the enum itself
+    status: str
+
+
 class VehicleState(db.Model):
     """
     A Vehicle state is an immutable object that represents the "physical" state of a vehicle in a simulator.
     TODO Check Common RoadStates
     """
-    class Object:
-        """ Internal Object class. To avoid messing around with other object classes """
-        pass
 
     __tablename__ = 'Vehicle_State'
 
     vehicle_state_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
     # https://stackoverflow.com/questions/2676133/best-way-to-do-enum-in-sqlalchemy
-    status = db.Column(Enum(VehicleStatusEnum))
+    # MariaDB stores native ENUMs as a 1-byte index, SQLite as a short VARCHAR without CHECK constraint
+    status = db.Column(Enum(VehicleStatusEnum, native_enum=True, create_constraint=False))
     timestamp = db.Column(db.Integer, nullable=False, unique=False)
 
     # Why is this necessary?
@@ -51,6 +66,15 @@ class VehicleState(db.Model):
     #     # onupdate="CASCADE", ondelete="CASCADE"?
     #     db.ForeignKeyConstraint(["user_id", "scenario_id"], [Driver.user_id, Driver.scenario_id], ondelete="CASCADE", onupdate="CASCADE"), # Note this must be tuple!
     # )
+    #
+    # The hot queries always filter by scenario first, then by timestamp, user or driver. Note that the unique
+    # index on (scenario_id, driver_id, timestamp) also serves the queries on (scenario_id, driver_id).
+    # Existing databases get these indexes from persistence.migrations
+    __table_args__ = (
+        db.Index("ix_vehicle_state_scenario_driver_timestamp", "scenario_id", "driver_id", "timestamp", unique=True),
+        db.Index("ix_vehicle_state_scenario_timestamp_status", "scenario_id", "timestamp", "status"),
+        db.Index("ix_vehicle_state_scenario_user_timestamp", "scenario_id", "user_id", "timestamp"),
+    )
     position_x = db.Column(db.Float, nullable=True, unique=False)
     position_y = db.Column(db.Float, nullable=True, unique=False)
     rotation = db.Column(db.Float, nullable=True, unique=False)
@@ -79,18 +103,8 @@ class VehicleState(db.Model):
     def as_plain_state(self):
         """
         Returns a "serializable" version of this object to be passed to the background image rendering process
-        :return: a copy of this object as an object compatible with CommonRoad basic state
+        :return: a copy of this object as a plain tuple with the same attributes
         """
-        plain_state = VehicleState.Object()
-        setattr(plain_state, "timestamp", self.timestamp)
-        setattr(plain_state, "position_x", self.position_x)
-        setattr(plain_state, "position_y", self.position_y)
-        setattr(plain_state, "rotation", self.rotation)
-        setattr(plain_state, "speed_ms", self.speed_ms)
-        setattr(plain_state, "acceleration_m2s", self.acceleration_m2s)
-        setattr(plain_state, "user_id", self.user_id)
-        setattr(plain_state, "driver_id", self.driver_id)
-        setattr(plain_state, "scenario_id", self.scenario_id)
-        setattr(plain_state, "status", self.status)
-
-        return plain_state
\ No newline at end of file
+        status = self.status.value if isinstance(self.status, VehicleStatusEnum) else self.status
+        return PlainVehicleState(self.timestamp, self.position_x, self.position_y, self.rotation, self.speed_ms,
+                                 self.acceleration_m2s, self.user_id, self.driver_id, self.scenario_id, status)
\ No newline at end of file
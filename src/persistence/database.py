@@ -71,12 +71,16 @@ def init_app(app):
     from model.driver import Driver
     from model.vehicle_state import VehicleState
     from model.tokens import UserToken
+    from model.scenario_frontier import ScenarioFrontier, DriverFrontier
 
     # Get ready to store Trajectories
     # TODO Why model contains CollisionChecking?
 
     with app.app_context():
         db.create_all()
+        # Tables created by older versions of the platform miss some of the indexes
+        from persistence.migrations import upgrade_schema
+        upgrade_schema(app)
 
 
 
@@ -0,0 +1,51 @@
+"""
+db.create_all() only creates the tables that do not exist, so it cannot update the schema of the tables that were
+created by older versions of the platform. The functions in this module bring those tables up to date.
+They are idempotent and use only portable DDL (CREATE INDEX), so they work on both MariaDB and SQLite.
+"""
+from sqlalchemy import inspect, func
+
+from persistence.database import db
+
+
+def _count_duplicated_vehicle_states(connection) -> int:
+    """ Count the (scenario_id, driver_id, timestamp) triples that appear more than once in Vehicle_State """
+    from model.vehicle_state import VehicleState
+
+    duplicates = db.select(VehicleState.scenario_id, VehicleState.driver_id, VehicleState.timestamp). \
+        group_by(VehicleState.scenario_id, VehicleState.driver_id, VehicleState.timestamp). \
+        having(func.count(VehicleState.vehicle_state_id) > 1).subquery()
+    return connection.execute(db.select(func.count()).select_from(duplicates)).scalar()
+
+
+def create_missing_vehicle_state_indexes(app) -> None:
+    """
+    Create the indexes declared on VehicleState that are not yet in the database.
+    If Vehicle_State already contains duplicated states, the unique index cannot be created. In this case, we
+    report the problem and create the other indexes.
+    """
+    from model.vehicle_state import VehicleState
+
+    table = VehicleState.__table__
+    with db.engine.begin() as connection:
+        existing_indexes = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing_indexes:
+                continue
+
+            if index.unique:
+                n_duplicates = _count_duplicated_vehicle_states(connection)
+                if n_duplicates > 0:
+                    app.logger.warning(f"Cannot create unique index {index.name}: "
+                                       f"found {n_duplicates} duplicated vehicle states")
+                    continue
+
+            app.logger.info(f"Create index {index.name} on {table.name}")
+            index.create(bind=connection)
+
+
+def upgrade_schema(app) -> None:
+    """
+    Bring the existing tables up to date. Must be called inside the app context, after db.create_all()
+    """
+    create_missing_vehicle_state_indexes(app)
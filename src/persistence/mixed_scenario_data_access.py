@@ -14,6 +14,8 @@ from model.mixed_traffic_scenario import MixedTrafficScenario, MixedTrafficScena
 from model.collision_checking import CollisionChecker
 from model.driver import Driver
 from model.vehicle_state import VehicleStatusEnum, VehicleState
+from model.scenario_frontier import ScenarioFrontier, DriverFrontier, is_settled
+from model.reference_path_cache import reference_path_cache
 #
 # from commonroad.geometry.shape import Rectangle
 # # Enable this ONLY in unit testing
@@ -21,15 +23,16 @@ from model.vehicle_state import VehicleStatusEnum, VehicleState
 
 # Import the singleton db instance
 from persistence.database import db
-from background.scheduler import render_in_background
+from background.scheduler import render_in_background, undeploy_av
 
 from persistence.utils import inject_where_statement_using_attributes
+from persistence.trajectory_cache import get_trajectory_cache
 # DAOs
 from persistence.user_data_access import UserDAO
 from persistence.driver_data_access import DriverDAO
 from persistence.vehicle_state_data_access import VehicleStateDAO
 
-# from visualization.mixed_traffic_scenario import generate_embeddable_html_snippet, generate_picture
+# from visualization.mixed_traffic_scenario import generate_embeddable_html_snippets, generate_picture
 
 from commonroad_route_planner.route_planner import RoutePlanner
 from controller.controller import MixedTrafficScenarioGenerator
@@ -149,17 +152,26 @@ class MixedTrafficScenarioDAO:
         scenario_states = self.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id,
                                                                                            initial_state_timestamp,
                                                                                                 nested=nested)
-        render_in_background(self.images_folder, scenario, scenario_states)
-
-        # Focus on each driver and render the state again
-        for driver in scenario.drivers:
+        # The initial states might have been forced, so the frames rendered so far might be stale
+        for scenario_image_file in glob.glob(os.path.join(self.images_folder,
+                                                          'scenario_{}_timestamp_{}[._]*'.format(scenario.scenario_id,
+                                                                                                 initial_state_timestamp))):
+            os.remove(scenario_image_file)
+
+        # Render only the frames of the human drivers, since they must act on them. The other frames are rendered only
+        # if someone asks for them (see ScenarioFrameDAO)
+        humans = [driver for driver in scenario.drivers if driver.user and not driver.user.username.startswith("bot_")]
+        goal_regions_as_rectangles = {}
+        for driver in self.vehicle_state_dao.get_drivers_about_to_act(scenario, initial_state_timestamp, humans):
             logger.debug("Rendering states at timestamp {} in scenario {} for driver {}".format(initial_state_timestamp,
                                                                                                 scenario.scenario_id,
                                                                                                 driver.user_id))
             # TODO Is this necessary?!
-            goal_region_as_rectangle = self.get_goal_region_for_driver_in_scenario(driver, scenario, nested=nested)
+            goal_regions_as_rectangles[driver.user_id] = self.get_goal_region_for_driver_in_scenario(driver, scenario, nested=nested)
 
-            render_in_background(self.images_folder, scenario, scenario_states, focus_on_driver=driver, goal_region_as_rectangle=goal_region_as_rectangle)
+        if len(goal_regions_as_rectangles) > 0:
+            render_in_background(self.images_folder, scenario, scenario_states, goal_regions_as_rectangles,
+                                 global_view=False)
 
     def get_waiting_driver(self, scenario):
         return self.driver_dao.get_waiting_driver(scenario)
@@ -409,53 +421,11 @@ class MixedTrafficScenarioDAO:
     def _cleanup(self, scenario: MixedTrafficScenario):
         """ Get the last state, i.e., the first with DONE and delete all the states in this scenarios and in
         the vehicles for which timestamp > Done.timestamp"""
-        # TODO This requires a nested transaction
-
-        # connection = sqlite3.connect(self.database_name)
-        # try:
-        #     # Enable Foreing Keys Support
-        #     connection.execute('PRAGMA foreign_keys = ON')
-            # cursor = connection.cursor()
-            # cursor.execute(
-        # TODO Move this one in VehicleStateDAO!
-        from sqlalchemy.sql import text
-        stmt = text(f"""
-        SELECT Count(*), MAX(timestamp)
-        FROM Vehicle_State
-        WHERE (user_id, timestamp) IN (
-	        SELECT user_id, MIN(timestamp)
-	        FROM Vehicle_State
-	        WHERE scenario_id = {scenario.scenario_id} and (status = "GOAL_REACHED" OR status = "CRASHED")
-	        GROUP BY user_id 
-	    )""")
-
-        # from sqlalchemy import func, or_, tuple_
-        # from model.vehicle_state import VehicleState
-        # THIS ONE MISSES the GROUP BY! Fix it in the next refactoring
-        # subquery = db.session.query(VehicleState.user_id, func.min(VehicleState.timestamp))\
-        #     .where(VehicleState.scenario_id == scenario.scenario_id) \
-        #     .where(or_(VehicleState.status == "GOAL_REACHED", VehicleState.status == "CRASHED")) \
-        #     .subquery()
-        #
-        # stmt = db.session.query(func.count(VehicleState.scenario_id), func.max(VehicleState.timestamp)).where(
-        #     tuple_(VehicleState.user_id, VehicleState.timestamp).in_(subquery)
-        # )
-
-        tokens = db.session.execute(stmt).first()
-        # If the number of drivers is equal to the count, we need to delete all the states!
-        if int(tokens[0]) == len(scenario.drivers): #and tokens[1] < scenario.duration:
-            # It means that all are we might need to update
-
-            scenario_stopped_at_timestamp = int(tokens[1])
+        first_terminal_timestamps = self.vehicle_state_dao.get_first_terminal_timestamp_by_driver(scenario)
+        # If all the drivers are done, we need to delete all the states after the last one finished
+        if len(first_terminal_timestamps) > 0 and len(first_terminal_timestamps) == len(scenario.drivers):
+            scenario_stopped_at_timestamp = max(first_terminal_timestamps.values())
             self.vehicle_state_dao.delete_state_from_scenario_at_timestamp(scenario, scenario_stopped_at_timestamp)
-            # cursor.execute(
-            #     """
-            #         DELETE
-            #         FROM Vehicle_State
-            #         WHERE scenario_id = ? and timestamp > ?
-            #     """, (scenario.scenario_id, scenario_stopped_at_timestamp)
-            # )
-            db.session.commit()
         else:
             # In this branch, there's no states to delete.
             pass
@@ -473,6 +443,33 @@ class MixedTrafficScenarioDAO:
         self._update_status(scenario, MixedTrafficScenarioStatusEnum.DONE)
         # Make sure that if the scenario ended before its max duration, we remove all the future states after its completion
         self._cleanup(scenario)
+        # Nobody samples trajectories in this scenario anymore
+        reference_path_cache.invalidate(scenario.scenario_id)
+        get_trajectory_cache(self.app_config).invalidate(scenario.scenario_id)
+
+    def close_scenario_if_over(self, scenario) -> bool:
+        """
+        Check whether the scenario is over, i.e., all the vehicles reached its last timestamp, and close it. The API
+        and the AVs driving in process call this after they update the states of a driver.
+
+        :return: True if the scenario is over
+        """
+        if scenario.status == MixedTrafficScenarioStatusEnum.WAITING:
+            return False
+
+        # TODO This is an approximation, we should check all the states !
+        # Get the state of all the vehicles
+        last_scenario_state = self.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id, scenario.duration)
+        if not all([vehicle_state.status in [VehicleStatusEnum.ACTIVE, VehicleStatusEnum.CRASHED, VehicleStatusEnum.GOAL_REACHED]
+                    for vehicle_state in last_scenario_state]):
+            return False
+
+        logger.info("Scenario {} is over".format(scenario.scenario_id))
+        self.close_scenario(scenario)
+        for driver in scenario.drivers:
+            if driver.user.username.startswith("bot_"):
+                undeploy_av(driver)
+        return True
 
     def activate_scenario(self, scenario):
         # TODO This might be unsafe. Use a transaction
@@ -581,6 +578,8 @@ class MixedTrafficScenarioDAO:
             stmt = db.delete(MixedTrafficScenario).where(MixedTrafficScenario.scenario_id == scenario_id)
             db.session.execute(stmt)
             db.session.commit()
+            reference_path_cache.invalidate(int(scenario_id))
+            get_trajectory_cache(self.app_config).invalidate(scenario_id)
             # connection = sqlite3.connect(self.database_name)
             #
             # # Enable Foreing Keys Support
@@ -658,44 +657,67 @@ class MixedTrafficScenarioDAO:
         initial_states = self.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id, 0, nested=nested)
         return next((vs for vs in initial_states if vs.user_id == driver.user_id), None)
 
-    # TODO This is Really complex. We should either store the status in the scenario table or compute it with a QUERY
-    #   Or maybe some FSM
-    def get_scenario_state_at_timestamp(self, scenario_id, timestamp, propagate=True) -> Optional[MixedTrafficScenarioStatusEnum]:
+    @staticmethod
+    def _derive_scenario_states(status_counts, timestamps) -> List[Optional[MixedTrafficScenarioStatusEnum]]:
         """
-        Compute the state of the scenario from the state of the vehicles therein
+        Compute the state of the scenario at each of the given timestamps from the (timestamp, status) counts of its
+        vehicle states. A timestamp is "settled" when all its vehicle states are either ACTIVE, CRASHED or
+        GOAL_REACHED. A settled timestamp is DONE if the next one is settled as well (or does not exist), otherwise
+        it is ACTIVE, i.e., it is the one drivers are acting upon. Timestamps without states are WAITING.
         """
+        scenario_states = []
+        for timestamp in timestamps:
+            if timestamp not in status_counts:
+                # We need to wait for others to join, the scenario is not yet started
+                scenario_states.append(MixedTrafficScenarioStatusEnum.WAITING)
+            elif not is_settled(status_counts[timestamp]):
+                # We are waiting some input
+                scenario_states.append(MixedTrafficScenarioStatusEnum.PENDING)
+            elif timestamp + 1 not in status_counts or is_settled(status_counts[timestamp + 1]):
+                scenario_states.append(MixedTrafficScenarioStatusEnum.DONE)
+            else:
+                scenario_states.append(MixedTrafficScenarioStatusEnum.ACTIVE)
+        return scenario_states
+
+    def get_scenario_timeline(self, scenario_id, until_timestamp) -> List[MixedTrafficScenarioStatusEnum]:
+        """
+        Compute the state of the scenario at every timestamp from 0 to until_timestamp (included) with one query.
+        The result is indexed by timestamp.
+        """
+        # We need one more timestamp to decide whether the last one is ACTIVE or DONE
+        status_counts = self.vehicle_state_dao.count_states_by_timestamp_and_status(scenario_id,
+                                                                                    to_timestamp=int(until_timestamp) + 1)
+        return self._derive_scenario_states(status_counts, range(0, int(until_timestamp) + 1))
 
-        # The scenario state is defined by the state of the drivers.
-        # However, if not all the drivers are registered, the scenario is not yet READY!
-
-        vehicle_states = self.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario_id, timestamp)
-
-        if len(vehicle_states) == 0 and propagate:
-            # We need to wait for others to join, the scenario is not yet started
-            return MixedTrafficScenarioStatusEnum.WAITING
-        elif len(vehicle_states) == 0 and not propagate:
+    def get_scenario_state_at_timestamp(self, scenario_id, timestamp, propagate=True) -> Optional[MixedTrafficScenarioStatusEnum]:
+        """
+        Compute the state of the scenario from the state of the vehicles therein.
+        If propagate is False, do not look at the next timestamp, so a settled timestamp is simply ACTIVE and a
+        timestamp without states is None
+        """
+        timestamp = int(timestamp)
+        if propagate:
+            status_counts = self.vehicle_state_dao.count_states_by_timestamp_and_status(scenario_id,
+                                                                                        from_timestamp=timestamp,
+                                                                                        to_timestamp=timestamp + 1)
+            return self._derive_scenario_states(status_counts, [timestamp])[0]
+
+        status_counts = self.vehicle_state_dao.count_states_by_timestamp_and_status(scenario_id,
+                                                                                    from_timestamp=timestamp,
+                                                                                    to_timestamp=timestamp)
+        if timestamp not in status_counts:
             # TODO Is this OPTIONAL or WRONG?
             return None
-
-        # Compute the state of the scenario from the vehicle states if they exist
-        active_states = [vs for vs in vehicle_states if vs.status == VehicleStatusEnum.ACTIVE]
-        crashed_states = [vs for vs in vehicle_states if vs.status == VehicleStatusEnum.CRASHED]
-        goal_reached_states = [vs for vs in vehicle_states if vs.status == VehicleStatusEnum.GOAL_REACHED]
-
-        if len(active_states) + len(crashed_states) + len(goal_reached_states) == len(vehicle_states):
-            # This state is not actionable because either the vehicles are active or crashed/goal_reached
-            if propagate:
-                # If the following state exists and is active or does not exist then this state is DONE otherwise is ACTIVE
-                next_state = self.get_scenario_state_at_timestamp(scenario_id, int(timestamp) + 1, propagate=False)
-                if next_state == VehicleStatusEnum.ACTIVE or next_state is None:
-                    return MixedTrafficScenarioStatusEnum.DONE
-            return MixedTrafficScenarioStatusEnum.ACTIVE
-
-        # We are waiting some input? Should be this dependent on the current user state?
-        return MixedTrafficScenarioStatusEnum.PENDING
-
+        return MixedTrafficScenarioStatusEnum.ACTIVE if is_settled(status_counts[timestamp]) else MixedTrafficScenarioStatusEnum.PENDING
 
     # TODO Move this into Mixedscenario ADT. Assuming the model is syncronized with the DB
+    def get_scenario_frontier(self, scenario: MixedTrafficScenario) -> Optional[Tuple[ScenarioFrontier, List[DriverFrontier]]]:
+        """
+        Return where the scenario is now, i.e., the last timestamp in which all the drivers acted, and whether each
+        driver is still in game. Return None if the scenario has not started yet.
+        """
+        return self.vehicle_state_dao.get_frontier(scenario)
+
     def is_driver_in_game(self, _scenario: MixedTrafficScenario, user: User):
         # A user not driving in this scenario is not in_game
         scenario = self.get_scenario_by_scenario_id(_scenario.scenario_id)
@@ -708,13 +730,22 @@ class MixedTrafficScenarioDAO:
         if scenario.status != MixedTrafficScenarioStatusEnum.ACTIVE:
             return False
 
-        # Scenario is ACTIVE, find when this is. This requires some weird computation, so we need to do it brute force
-        # TODO This loop makes a lot of queries... maybe we can get all states at once
-        for timestamp in range(0, scenario.duration+1):
-            scenario_state = self.get_scenario_state_at_timestamp(scenario.scenario_id, timestamp)
-            if scenario_state == MixedTrafficScenarioStatusEnum.ACTIVE:
-                driver_last_known_state = self.vehicle_state_dao.get_vehicle_state_by_scenario_timestamp_driver(scenario, timestamp, driver)
-                return not (driver_last_known_state.status == VehicleStatusEnum.CRASHED or driver_last_known_state.status == VehicleStatusEnum.GOAL_REACHED)
+        # Scenario is ACTIVE, find where it is
+        frontier = self.get_scenario_frontier(scenario)
+        # The states of the scenario are not initialized yet, so nobody can act
+        if frontier is None:
+            return False
+        scenario_frontier, drivers_frontier = frontier
+
+        # All the states are settled, nothing left to do for anybody
+        if scenario_frontier.timestamp >= scenario.duration:
+            return False
+
+        driver_frontier = next((df for df in drivers_frontier if df.driver_id == driver.driver_id), None)
+        if driver_frontier is None:
+            # The frontier is missing this driver, so compute it again from the vehicle states
+            _, drivers_frontier = self.vehicle_state_dao.rebuild_frontier(scenario)
+            driver_frontier = next((df for df in drivers_frontier if df.driver_id == driver.driver_id), None)
+        assert driver_frontier is not None, f"Problem in is_driver_in_game for {driver.user_id} in scenario {scenario.scenario_id} "
 
-        # THIS SHOULD NEVER HAPPEN!
-        assert False, f"Problem in is_driver_in_game for {driver.user_id} in scenario {scenario.scenario_id} "
\ No newline at end of file
+        return driver_frontier.status == VehicleStatusEnum.ACTIVE
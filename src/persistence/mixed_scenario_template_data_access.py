@@ -4,6 +4,7 @@ from typing import Tuple, List, Optional
 import traceback
 
 from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
+from model.scenario_cache import scenario_cache
 
 from visualization.mixed_traffic_scenario_template import generate_static_image
 
@@ -32,6 +33,9 @@ class MixedTrafficScenarioTemplateDAO:
             # Store the Template in the DB. Ensures it has a template_id, hence we return the updated object
             new_template = self.insert_and_get(new_template)
 
+            # If the template was re-uploaded, the cached scenario is stale
+            scenario_cache.invalidate(new_template.template_id)
+
             # Store the Template on the FS
             template_image_path = generate_static_image(self.images_folder, new_template)
 
@@ -64,6 +68,9 @@ class MixedTrafficScenarioTemplateDAO:
         scenario_template.is_active = False
         db.session.commit()
 
+        # Disabled templates should not hold memory in the cache
+        scenario_cache.invalidate(scenario_template_id)
+
     def enable_template(self, scenario_template_id: int) -> None:
 
         # TODO Better silently return nothing?
@@ -0,0 +1,113 @@
+import logging as logger
+import os
+import threading
+
+from typing import Optional
+
+from background.scheduler import render_in_background
+
+from model.mixed_traffic_scenario import MixedTrafficScenario
+from model.vehicle_state import VehicleStatusEnum
+
+from visualization.scene import generate_road_spec, generate_scene, get_road_file_name
+
+# Concurrent requests for the same file (e.g., from many tabs) wait for the first one to render it. We use a fixed set
+# of locks, so they do not grow with the number of files
+_FRAME_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def get_frame_file_name(scenario_id, timestamp, user_id=None) -> str:
+    """ The name of the PNG showing the scenario at the given timestamp, possibly focusing on the given driver """
+    if user_id is None:
+        frame_name = "_".join(["scenario", str(scenario_id), "timestamp", str(timestamp)])
+    else:
+        frame_name = "_".join(["scenario", str(scenario_id), "timestamp", str(timestamp), "driver", str(user_id)])
+    return ".".join([frame_name, "png"])
+
+
+def _render_once(file_path, render) -> str:
+    """ Call render unless the file already exists, or another request is rendering it. Return the path of the file """
+    if os.path.exists(file_path):
+        return file_path
+
+    with _FRAME_LOCKS[hash(file_path) % len(_FRAME_LOCKS)]:
+        # Another request might have rendered it while we were waiting
+        if not os.path.exists(file_path):
+            render()
+
+    assert os.path.exists(file_path), f"Cannot render {os.path.basename(file_path)}"
+    return file_path
+
+
+class ScenarioFrameDAO:
+    """
+    Render-once file cache of the frames, i.e., the PNGs showing a scenario at a given timestamp, stored in the
+    SCENARIO_IMAGES_FOLDER, and of the road specs of the templates, stored in the TEMPLATE_IMAGES_FOLDER.
+
+    Frames are rendered the first time someone requests them and served from the file afterward. Only the frames that
+    the human drivers are about to act on are rendered in advance (see VehicleStateDAO._render_scenario_state).
+
+    The interactive views are not rendered at all: browsers draw their scene over the road spec (see
+    visualization.scene)
+    """
+
+    def __init__(self, app_config, scenario_dao):
+        self.images_folder = app_config["SCENARIO_IMAGES_FOLDER"]
+        self.road_specs_folder = app_config["TEMPLATE_IMAGES_FOLDER"]
+        self.scenario_dao = scenario_dao
+
+    def get_frame(self, scenario: MixedTrafficScenario, timestamp: int, user_id: Optional[int] = None) -> str:
+        """
+        Return the path of the PNG showing the scenario at the given timestamp, possibly focusing on the given
+        driver. Render it if it does not exist yet
+        """
+        file_path = os.path.join(self.images_folder, get_frame_file_name(scenario.scenario_id, timestamp, user_id))
+        return _render_once(file_path, lambda: self._render_frame(scenario, timestamp, user_id))
+
+    def get_road_spec(self, scenario: MixedTrafficScenario) -> str:
+        """ Return the path of the road spec of the template of the scenario. Generate it if it does not exist yet """
+        scenario_template = scenario.scenario_template
+        road_layer_key = scenario_template.get_road_layer_key()
+        file_path = os.path.join(self.road_specs_folder, get_road_file_name(road_layer_key))
+        return _render_once(file_path, lambda: generate_road_spec(self.road_specs_folder,
+                                                                  scenario_template.as_commonroad_scenario(),
+                                                                  road_layer_key))
+
+    def get_scene(self, scenario: MixedTrafficScenario, timestamp: int, user_id: Optional[int] = None) -> dict:
+        """
+        Return the scene of the scenario at the given timestamp, possibly focusing on the given driver. The scene
+        refers to its road spec by the path of the file ("road")
+        """
+        scenario_states, goal_regions_as_rectangles = self._get_what_to_show(scenario, timestamp, user_id)
+
+        scene = generate_scene(scenario_states, user_id, goal_regions_as_rectangles.get(user_id))
+        scene["road"] = self.get_road_spec(scenario)
+        return scene
+
+    def _get_what_to_show(self, scenario, timestamp, user_id):
+        """ Return the states of the scenario at the given timestamp and the goal region of the given driver, if any """
+        scenario_states = self.scenario_dao.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(
+            scenario.scenario_id, timestamp)
+
+        # Frames are rendered only once, so they must show states that cannot change anymore
+        assert len(scenario_states) > 0 and \
+               all(s.status in [VehicleStatusEnum.ACTIVE, VehicleStatusEnum.GOAL_REACHED, VehicleStatusEnum.CRASHED]
+                   for s in scenario_states), \
+            f"Cannot render scenario {scenario.scenario_id} at timestamp {timestamp} yet"
+
+        goal_regions_as_rectangles = {}
+        if user_id is not None:
+            driver = next((d for d in scenario.drivers if d.user_id == user_id), None)
+            assert driver is not None, f"User {user_id} is not driving in scenario {scenario.scenario_id}"
+            goal_regions_as_rectangles[user_id] = self.scenario_dao.get_goal_region_for_driver_in_scenario(driver,
+                                                                                                           scenario)
+        return scenario_states, goal_regions_as_rectangles
+
+    def _render_frame(self, scenario, timestamp, user_id) -> None:
+        scenario_states, goal_regions_as_rectangles = self._get_what_to_show(scenario, timestamp, user_id)
+
+        logger.debug("Rendering timestamp {} in scenario {} for driver {}".format(timestamp, scenario.scenario_id,
+                                                                                 user_id))
+        # Render the frame in this thread, since someone is waiting for it
+        render_in_background(self.images_folder, scenario, scenario_states, goal_regions_as_rectangles,
+                             global_view=user_id is None, force_render_now=True)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Optional, Tuple
+
+# Entries are ordered by a counter instead of the clock, which might not tell apart entries used at the same time
+_NEXT_USE = "SELECT COALESCE(MAX(last_used), 0) + 1 FROM trajectories"
+# Each process records the hits, the misses, and the entries it used at most this often, or with its next write
+USES_FLUSH_INTERVAL_IN_SECONDS = 10.0
+
+# The caches of this process, by cache file. See get_trajectory_cache
+_trajectory_caches = {}
+_lock = threading.Lock()
+
+
+def driver_state_fingerprint(driver_state) -> str:
+    """ Everything the trajectories depend on in the state of the driver """
+    return hashlib.sha1(repr((driver_state.status, driver_state.position_x, driver_state.position_y,
+                              driver_state.rotation, driver_state.speed_ms,
+                              driver_state.acceleration_m2s)).encode('utf8')).hexdigest()
+
+
+class TrajectoryCache:
+    """
+    Size-bounded LRU cache of the serialized trajectory responses, stored in a SQLite file so all the processes
+    (e.g., the uWSGI workers) share the same entries and statistics. Hits only read the file: each cache records its
+    hits, misses, and the entries it used with its next write, or at least every USES_FLUSH_INTERVAL_IN_SECONDS, so
+    the requests of a process must share the same cache (see get_trajectory_cache).
+
+    Entries are keyed by (scenario_id, driver_id, timestamp, sampling parameters) plus a fingerprint of the state of
+    the driver at that timestamp, so a state that changes never hits a stale entry. The DAOs drop the entries of a
+    driver when it submits new states, and the entries of a scenario when it closes or it is deleted.
+    """
+
+    def __init__(self, app_config):
+        self.cache_file = app_config["TRAJECTORY_CACHE_FILE"]
+        self.max_size = app_config["TRAJECTORY_CACHE_SIZE"]
+        # The uses that this cache did not record yet: the number of hits and misses, and the keys of the entries
+        # used since the last flush, from the least to the most recently used
+        self._hits = 0
+        self._misses = 0
+        self._used_keys = {}
+        self._last_flush = time.monotonic()
+        self._schema_created = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per operation: connections cannot be shared between threads, and SQLite locks the file
+        # for the other processes. The schema is created only by the first connection, unless someone removed the
+        # file in the meantime
+        with self._lock:
+            create_schema = not self._schema_created or not os.path.exists(self.cache_file)
+            connection = sqlite3.connect(self.cache_file, timeout=10.0)
+            if create_schema:
+                with connection:
+                    self._create_schema(connection)
+                self._schema_created = True
+        return connection
+
+    @staticmethod
+    def _create_schema(connection) -> None:
+        connection.execute("CREATE TABLE IF NOT EXISTS trajectories ("
+                           "scenario_id INTEGER, driver_id INTEGER, timestamp INTEGER, key TEXT PRIMARY KEY, "
+                           "response TEXT, code INTEGER, last_used INTEGER)")
+        connection.execute("CREATE INDEX IF NOT EXISTS trajectories_by_driver "
+                           "ON trajectories (scenario_id, driver_id, timestamp)")
+        connection.execute("CREATE INDEX IF NOT EXISTS trajectories_by_last_used ON trajectories (last_used)")
+        connection.execute("CREATE TABLE IF NOT EXISTS statistics (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @staticmethod
+    def _key(scenario_id, driver_id, timestamp, fingerprint, parameters) -> str:
+        return hashlib.sha1(repr((int(scenario_id), int(driver_id), int(timestamp), fingerprint,
+                                  tuple(parameters))).encode('utf8')).hexdigest()
+
+    def _record_use(self, key: Optional[str]) -> bool:
+        """ Remember the hit (the key of the entry) or the miss, and return whether it is time to record the uses """
+        with self._lock:
+            if key is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._used_keys.pop(key, None)
+                self._used_keys[key] = None
+            return time.monotonic() - self._last_flush >= USES_FLUSH_INTERVAL_IN_SECONDS
+
+    def _take_uses(self) -> Tuple[int, int, list]:
+        """ Return the uses that this cache did not record yet, and start over """
+        with self._lock:
+            uses = (self._hits, self._misses, list(self._used_keys))
+            self._hits, self._misses, self._used_keys = 0, 0, {}
+            self._last_flush = time.monotonic()
+        return uses
+
+    def _flush_uses(self, connection) -> None:
+        """ Record the uses that this cache did not record yet, as part of the current transaction """
+        hits, misses, used_keys = self._take_uses()
+        for name, value in [("hits", hits), ("misses", misses)]:
+            if value > 0:
+                connection.execute("INSERT INTO statistics (name, value) VALUES (?, ?) "
+                                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+        connection.executemany(f"UPDATE trajectories SET last_used = ({_NEXT_USE}) WHERE key = ?",
+                               [(key,) for key in used_keys])
+
+    def get(self, scenario_id, driver_id, timestamp, fingerprint, parameters) -> Optional[Tuple[str, int]]:
+        """ Return the cached response and status code, if any """
+        key = self._key(scenario_id, driver_id, timestamp, fingerprint, parameters)
+        # Reading does not lock the file for the other processes, so we record the uses only once in a while
+        with closing(self._connect()) as connection:
+            entry = connection.execute("SELECT response, code FROM trajectories WHERE key = ?", (key,)).fetchone()
+            if self._record_use(key if entry is not None else None):
+                with connection:
+                    self._flush_uses(connection)
+        return (entry[0], entry[1]) if entry is not None else None
+
+    def put(self, scenario_id, driver_id, timestamp, fingerprint, parameters, response: str, code: int) -> None:
+        key = self._key(scenario_id, driver_id, timestamp, fingerprint, parameters)
+        with closing(self._connect()) as connection, connection:
+            # Record the previous uses first, so they do not count as more recent than this entry
+            self._flush_uses(connection)
+            connection.execute(f"INSERT OR REPLACE INTO trajectories VALUES (?, ?, ?, ?, ?, ?, ({_NEXT_USE}))",
+                               (int(scenario_id), int(driver_id), int(timestamp), key, response, code))
+            # Evict the least recently used entries
+            connection.execute("DELETE FROM trajectories WHERE key IN ("
+                               "SELECT key FROM trajectories ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                               (self.max_size,))
+
+    def invalidate(self, scenario_id, driver_id=None) -> None:
+        """ Drop the entries of the given scenario, or only the ones of the given driver """
+        if not os.path.exists(self.cache_file):
+            return
+        with closing(self._connect()) as connection, connection:
+            self._flush_uses(connection)
+            if driver_id is None:
+                connection.execute("DELETE FROM trajectories WHERE scenario_id = ?", (int(scenario_id),))
+            else:
+                connection.execute("DELETE FROM trajectories WHERE scenario_id = ? AND driver_id = ?",
+                                   (int(scenario_id), int(driver_id)))
+
+    def clear(self) -> None:
+        self._take_uses()
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM trajectories")
+            connection.execute("DELETE FROM statistics")
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as connection:
+            with connection:
+                self._flush_uses(connection)
+            statistics = dict(connection.execute("SELECT name, value FROM statistics").fetchall())
+            size = connection.execute("SELECT COUNT(*) FROM trajectories").fetchone()[0]
+        hits, misses = statistics.get("hits", 0), statistics.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.0,
+            "size": size,
+            "max_size": self.max_size
+        }
+
+
+def get_trajectory_cache(app_config) -> TrajectoryCache:
+    """
+    Return the cache of this process over the configured cache file, so the uses it did not record yet are not lost
+    between requests. Forked processes (e.g., the uWSGI workers) create their own cache, so they do not record the uses
+    of their parent again
+    """
+    key = (os.getpid(), app_config["TRAJECTORY_CACHE_FILE"], app_config["TRAJECTORY_CACHE_SIZE"])
+    with _lock:
+        if key not in _trajectory_caches:
+            _trajectory_caches[key] = TrajectoryCache(app_config)
+        return _trajectory_caches[key]
@@ -1,18 +1,57 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from sqlalchemy import or_
-
 def hash_the_password(password):
     hashed_password = generate_password_hash(password)
     assert check_password_hash(hashed_password, password)
     return hashed_password
 
 
+class Between:
+    """
+    Filter spec for values in the closed range [lower, upper]. If one of the bounds is None, the range is open
+    on that side, i.e., Between(lower=5) means >= 5
+    """
+    def __init__(self, lower=None, upper=None):
+        assert lower is not None or upper is not None, "At least one bound must be specified"
+        self.lower = lower
+        self.upper = upper
+
+    def as_clause(self, attribute):
+        if self.lower is not None and self.upper is not None:
+            return attribute.between(self.lower, self.upper)
+        elif self.lower is not None:
+            return attribute >= self.lower
+        else:
+            return attribute <= self.upper
+
+
+class In:
+    """ Filter spec for values that are any of the given ones """
+    def __init__(self, values):
+        self.values = list(values)
+
+    def as_clause(self, attribute):
+        # Expanding parameters: the statement stays the same no matter how many values we pass
+        return attribute.in_(self.values)
+
+
+class NotNull:
+    """ Filter spec for values that are not NULL """
+    def as_clause(self, attribute):
+        return attribute.is_not(None)
+
+
 def inject_where_statement_using_attributes(stmt, mapped_class, **kwargs):
     """
     Utility function to build a conjunction of attributes with AND and OR by appending (.where) to the given stmt
     We need the mapped_class to get its attributes...
     see: https://stackoverflow.com/questions/72132330/can-i-pass-a-dict-to-where-in-sqlalchemy
+
+    Values can be:
+        - None, to match NULL
+        - a string like "A|B", to match any of A or B (same as In(["A", "B"]))
+        - a filter spec, i.e., Between, In, NotNull
+        - anything else, to match by equality
     """
 
     # No parameters
@@ -25,14 +64,9 @@ def inject_where_statement_using_attributes(stmt, mapped_class, **kwargs):
         if value is None:
             updated_stmt = updated_stmt.where(getattr(mapped_class, key).is_(None))
         elif type(value) == str and "|" in value:
-            or_clauses = []
-            for v in value.split("|"):
-                if v is not None:
-                    or_clauses.append(getattr(mapped_class, key) == v)
-                else:
-                    or_clauses.append(getattr(mapped_class, key).is_(None))
-
-            updated_stmt = updated_stmt.where(or_(*or_clauses))
+            updated_stmt = updated_stmt.where(In(value.split("|")).as_clause(getattr(mapped_class, key)))
+        elif isinstance(value, (Between, In, NotNull)):
+            updated_stmt = updated_stmt.where(value.as_clause(getattr(mapped_class, key)))
         else:
             updated_stmt = updated_stmt.where(getattr(mapped_class, key) == value)
 
@@ -1,9 +1,10 @@
 import logging as logger
 
 # Typing
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 
 import sqlalchemy.exc
+from sqlalchemy import bindparam, or_
 
 from model.collision_checking import CollisionChecker
 from model.vehicle_state import VehicleStatusEnum
@@ -12,9 +13,10 @@ from model.vehicle_state import VehicleStatusEnum
 
 # Import the singleton db instance
 from persistence.database import db
-from background.scheduler import render_in_background
+from background.scheduler import render_in_background, dispatch_scenario_in_background
 
-from persistence.utils import inject_where_statement_using_attributes
+from persistence.utils import inject_where_statement_using_attributes, Between, In
+from persistence.trajectory_cache import get_trajectory_cache
 
 # DAOs - Do I really need them!? We probably should rely in getting the models as dep
 from persistence.user_data_access import UserDAO
@@ -22,10 +24,11 @@ from persistence.user_data_access import UserDAO
 
 from controller.controller import MixedTrafficScenarioGenerator
 
-# from visualization.mixed_traffic_scenario import generate_embeddable_html_snippet
+# from visualization.mixed_traffic_scenario import generate_embeddable_html_snippets
 from model.mixed_traffic_scenario import MixedTrafficScenario
 from model.vehicle_state import VehicleState
 from model.driver import Driver
+from model.scenario_frontier import ScenarioFrontier, DriverFrontier, is_settled
 
 # INSERT_USER = "INSERT INTO User VALUES(?, ?, ?, ?);"
 # INSERT_MIXED_TRAFFIC_SCENARIO = "INSERT INTO Mixed_Traffic_Scenario VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
@@ -71,11 +74,23 @@ class VehicleStateDAO:
         self._max_init_speed_m_s = app_config["MAX_INIT_SPEED_M_S"]
 
     def delete_state_from_scenario_at_timestamp(self, scenario:MixedTrafficScenario, scenario_stopped_at_timestamp:int):
-        stmt = db.delete(VehicleState).\
-            where(VehicleState.scenario_id == scenario.scenario_id).\
-            where(VehicleState.timestamp > scenario_stopped_at_timestamp)
+        stmt = db.delete(VehicleState)
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "timestamp": Between(lower=scenario_stopped_at_timestamp + 1)
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        db.session.execute(updated_stmt)
+
+        # The frontier cannot go beyond the last state
+        stmt = db.update(ScenarioFrontier).values(**{ScenarioFrontier.timestamp.name: scenario_stopped_at_timestamp})
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "timestamp": Between(lower=scenario_stopped_at_timestamp + 1)
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, ScenarioFrontier, **kwargs)
+        db.session.execute(updated_stmt)
 
-        db.session.execute(stmt)
         db.session.commit()
         # cursor.execute(
         #     """
@@ -177,6 +192,49 @@ class VehicleStateDAO:
         }
         return self._get_vehicle_state_by_attributes(nested=nested, **kwargs)
 
+    def get_vehicle_states_by_scenario_id_between_timestamps(self, scenario_id, from_timestamp, to_timestamp) -> List[VehicleState]:
+        """
+        Return all the states associated to the given scenario between from_timestamp and to_timestamp (both included)
+        using a single query. The states are sorted by driver and timestamp, so they can be grouped by driver
+
+        :param scenario_id:
+        :param from_timestamp:
+        :param to_timestamp:
+        :return:
+        """
+        stmt = db.select(VehicleState)
+        kwargs = {
+            "scenario_id": scenario_id,
+            "timestamp": Between(from_timestamp, to_timestamp)
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        updated_stmt = updated_stmt.order_by(VehicleState.driver_id, VehicleState.timestamp)
+        return list(db.session.execute(updated_stmt).scalars())
+
+    def count_states_by_timestamp_and_status(self, scenario_id, from_timestamp=None, to_timestamp=None) -> Dict[int, Dict[VehicleStatusEnum, int]]:
+        """
+        Count the vehicle states of the given scenario grouped by timestamp and status using a single query.
+        Optionally, consider only the timestamps between from_timestamp and to_timestamp (both included)
+
+        :return: a dictionary timestamp -> { status -> count }
+        """
+        from sqlalchemy.sql.expression import func
+        stmt = db.select(VehicleState.timestamp, VehicleState.status, func.count(VehicleState.vehicle_state_id))
+        kwargs = {
+            "scenario_id": scenario_id
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        if from_timestamp is not None:
+            updated_stmt = updated_stmt.where(VehicleState.timestamp >= from_timestamp)
+        if to_timestamp is not None:
+            updated_stmt = updated_stmt.where(VehicleState.timestamp <= to_timestamp)
+        updated_stmt = updated_stmt.group_by(VehicleState.timestamp, VehicleState.status)
+
+        status_counts = {}
+        for timestamp, status, count in db.session.execute(updated_stmt):
+            status_counts.setdefault(timestamp, {})[status] = count
+        return status_counts
+
     def get_vehicle_state_by_scenario_timestamp_driver(self, scenario: MixedTrafficScenario, timestamp: int, driver: Driver) -> Optional[VehicleState]:
         """
              Return all the states associated to the given scenario at the given timestamp for the given driver
@@ -214,9 +272,6 @@ class VehicleStateDAO:
             state_to_propagate.status, driver.user_id, state_to_propagate.timestamp, scenario.duration,
             scenario.scenario_id)
         )
-        # We need to exclude the current state, since its already set, and we need to include the duration + 1 since
-        # timestamps are 1-indexed
-        timestamps_to_update = list(range(state_to_propagate.timestamp, scenario.duration + 1))
         update_vals = {
             VehicleState.status.name: state_to_propagate.status,
             VehicleState.position_x.name: state_to_propagate.position_x,
@@ -231,8 +286,8 @@ class VehicleStateDAO:
         kwargs = {
             "scenario_id": scenario.scenario_id,
             "user_id": driver.user_id,
-            # Update the state with the given timestamp (unique for each driver/scenario)
-            "timestamp": "|".join([str(t) for t in timestamps_to_update])
+            # Update all the states from the given one until the end of the scenario (included)
+            "timestamp": Between(state_to_propagate.timestamp, scenario.duration)
         }
         update_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
         db.session.begin(nested=nested)
@@ -286,7 +341,7 @@ class VehicleStateDAO:
             # We can only update states that are PENDING or WAITING. We cannot update ACTIVE or CRASH states
             # Can we deal with this using enums?
             # "status": "PENDING|WAITING"
-            "status": f"{VehicleStatusEnum.PENDING}|{VehicleStatusEnum.WAITING}"
+            "status": f"{VehicleStatusEnum.PENDING.value}|{VehicleStatusEnum.WAITING.value}"
         }
         update_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
         result = db.session.execute(update_stmt)
@@ -316,25 +371,166 @@ class VehicleStateDAO:
                                           scenario.scenario_id))  # , the_state.status))
                 raise AssertionError("Cannot update vehicle state {}".format(state.vehicle_state_id))
 
+        state_of_vehicles_that_are_done = self._evaluate_scenario_state(scenario, state.timestamp)
+
+        db.session.commit()
+
+        self._dispatch_avs(scenario, state.timestamp)
+        # At this point we should return whether the called shall skip the planned steps!
+        return driver.user_id in [s.user_id for s in state_of_vehicles_that_are_done]
+
+    def update_driver_states_in_scenario(self, scenario: MixedTrafficScenario, driver: Driver, planned_states: List[VehicleState]) -> bool:
+        """
+        Bulk version of update_driver_state_in_scenario for a whole trajectory. Write all the planned states with one
+        statement, reset the following states with one range update, and evaluate (synchronize, check collisions and
+        goals, render) only the timestamps at which all the drivers submitted their states.
+
+        Planned states after the end of the scenario are ignored.
+
+        :param scenario:
+        :param driver:
+        :param planned_states: the states sorted by timestamp
+        :return: True if the driver crashed or reached the goal, so the remaining planned states do not count
+        """
+        states_to_update = [s for s in planned_states if s.timestamp <= scenario.duration]
+        if len(states_to_update) < len(planned_states):
+            logger.info("Ignore planned states for driver {} after timestamp {}, the duration of scenario {}".format(
+                driver.user_id, scenario.duration, scenario.scenario_id))
+        timestamps = [s.timestamp for s in states_to_update]
+
+        logger.info('Updating states from timestamp {} to timestamp {} for driver {} in scenario {}'.format(
+            timestamps[0], timestamps[-1], driver.user_id, scenario.scenario_id))
+
+        # We cannot update ACTIVE states. CRASHED and GOAL_REACHED states are silently left untouched
+        from sqlalchemy.sql.expression import func
+        stmt = db.select(func.min(VehicleState.timestamp))
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "driver_id": driver.driver_id,
+            "timestamp": In(timestamps),
+            "status": "ACTIVE"
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        active_timestamp = db.session.execute(updated_stmt).scalar()
+        if active_timestamp is not None:
+            db.session.rollback()
+            logger.error('Cannot update state at timestamp {} for driver {} in scenario {}.'.format(
+                active_timestamp, driver.user_id, scenario.scenario_id))
+            raise AssertionError("Cannot update vehicle state at timestamp {}".format(active_timestamp))
+
+        # One statement, executed for all the planned states (executemany). Note: executemany does not support IN
+        table = VehicleState.__table__
+        stmt = db.update(table).values(**{
+            VehicleState.status.name: VehicleStatusEnum.WAITING,
+            VehicleState.position_x.name: bindparam("planned_position_x"),
+            VehicleState.position_y.name: bindparam("planned_position_y"),
+            VehicleState.rotation.name: bindparam("planned_rotation"),
+            VehicleState.speed_ms.name: bindparam("planned_speed_ms"),
+            VehicleState.acceleration_m2s.name: bindparam("planned_acceleration_m2s")
+        }).where(table.c.scenario_id == scenario.scenario_id). \
+            where(table.c.driver_id == driver.driver_id). \
+            where(table.c.timestamp == bindparam("planned_timestamp")). \
+            where(or_(table.c.status == VehicleStatusEnum.PENDING, table.c.status == VehicleStatusEnum.WAITING))
+        db.session.execute(stmt, [{
+            "planned_timestamp": s.timestamp,
+            "planned_position_x": s.position_x,
+            "planned_position_y": s.position_y,
+            "planned_rotation": s.rotation,
+            "planned_speed_ms": s.speed_ms,
+            "planned_acceleration_m2s": s.acceleration_m2s
+        } for s in states_to_update])
+
+        # Delete any future state to ensure nothing spurious remains from previous planning
+        if planned_states[-1].timestamp + 1 <= scenario.duration:
+            self.reset_states_for_driver_in_scenario_from_timestamp(driver, scenario, planned_states[-1].timestamp + 1)
+
+        db.session.commit()
+        # The driver moved on, so the trajectories sampled from its previous states are not needed anymore
+        get_trajectory_cache(self.app_config).invalidate(scenario.scenario_id, driver.driver_id)
+
+        # Evaluate, in order, only the timestamps that became fully submitted, i.e., with WAITING but no PENDING states
+        driver_is_done = False
+        last_evaluated_timestamp = None
+        last_timestamp = timestamps[-1]
+        status_counts = self.count_states_by_timestamp_and_status(scenario.scenario_id, timestamps[0], last_timestamp)
+        timestamp = timestamps[0]
+        while timestamp <= last_timestamp:
+            status_count = status_counts.get(timestamp, {})
+            if VehicleStatusEnum.WAITING in status_count and VehicleStatusEnum.PENDING not in status_count:
+                state_of_vehicles_that_are_done = self._evaluate_scenario_state(scenario, timestamp)
+                db.session.commit()
+                last_evaluated_timestamp = timestamp
+
+                if driver.user_id in [s.user_id for s in state_of_vehicles_that_are_done]:
+                    driver_is_done = True
+
+                if len(state_of_vehicles_that_are_done) > 0:
+                    # Propagating the states of the drivers that are done might have completed the following
+                    # timestamps, even after the last planned state
+                    last_timestamp = scenario.duration
+                    status_counts = self.count_states_by_timestamp_and_status(scenario.scenario_id, timestamp + 1, last_timestamp)
+            timestamp += 1
+
+        if last_evaluated_timestamp is not None:
+            self._dispatch_avs(scenario, last_evaluated_timestamp)
+
+        return driver_is_done
+
+    def get_drivers_about_to_act(self, scenario: MixedTrafficScenario, timestamp: int, drivers: List[Driver]) -> List[Driver]:
+        """
+        Return the given drivers that must act on the given timestamp, i.e., their state is ACTIVE at timestamp and
+        PENDING right after it
+        """
+        if timestamp + 1 > scenario.duration or len(drivers) == 0:
+            return []
+
+        stmt = db.select(VehicleState.driver_id, VehicleState.timestamp, VehicleState.status)
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "driver_id": In([driver.driver_id for driver in drivers]),
+            "timestamp": Between(timestamp, timestamp + 1)
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        statuses = {(driver_id, state_timestamp): status for driver_id, state_timestamp, status in db.session.execute(updated_stmt)}
+
+        return [driver for driver in drivers
+                if statuses.get((driver.driver_id, timestamp)) == VehicleStatusEnum.ACTIVE and
+                statuses.get((driver.driver_id, timestamp + 1)) == VehicleStatusEnum.PENDING]
+
+    def _dispatch_avs(self, scenario: MixedTrafficScenario, timestamp: int) -> None:
+        """
+        Wake up the AVs of the scenario if any of them can plan, i.e., its state is ACTIVE at timestamp and PENDING
+        right after it
+        """
+        avs = [driver for driver in scenario.drivers if driver.user and driver.user.username.startswith("bot_")]
+
+        if len(self.get_drivers_about_to_act(scenario, timestamp, avs)) > 0:
+            dispatch_scenario_in_background(scenario.scenario_id, timestamp)
+
+    def _evaluate_scenario_state(self, scenario: MixedTrafficScenario, timestamp: int) -> List[VehicleState]:
+        """
+        Make the scenario evolve at the given timestamp: activate the states if all the drivers submitted them, check
+        collisions and goals, render, and propagate the states of the drivers who crashed or reached the goal.
+
+        :return: the states of the drivers that crashed or reached the goal at timestamp
+        """
         # This makes WAITING states into ACTIVE states at the same timestamp
-        self._synchronize_scenario_states(scenario, state.timestamp, nested=True)
+        self._synchronize_scenario_states(scenario, timestamp, nested=True)
 
         # This makes ACTIVE states into CRASHED at this time stamp - it stores into the DB at timestamp
         # Does not return an UPDATED version of the states
-        state_of_vehicles_that_collided = self._vehicles_that_collided(scenario, state.timestamp, nested=True)
+        state_of_vehicles_that_collided = self._vehicles_that_collided(scenario, timestamp, nested=True)
 
         # This makes ACTIVE states into GOAL_REACHED at this time stamp - it stores into the DB at timestamp
-        state_of_vehicles_that_reached_goal = self._vehicles_that_reached_goal(scenario, state.timestamp, nested=True)
+        state_of_vehicles_that_reached_goal = self._vehicles_that_reached_goal(scenario, timestamp, nested=True)
 
         # Plot all the graphics (MIGHT TAKE SOME TIME if many players!)
         # This also queries the DB to get the latest state
-        self._render_scenario_state(scenario, state.timestamp)
+        self._render_scenario_state(scenario, timestamp)
 
         # At this point we need to "propagate" the state of GOAL_REACHED and CRASH states if any!
         # At timestamp t is stored already in the DB
-        timestamp = state.timestamp + 1
-
-        if timestamp <= scenario.duration:
+        if timestamp + 1 <= scenario.duration:
             for state_of_vehicle in state_of_vehicles_that_collided:
                 # Select the Driver who is in the Propagable state
                 driver_to_update = self.user_dao.get_user_by_user_id(state_of_vehicle.user_id, nested=True)
@@ -347,48 +543,11 @@ class VehicleStateDAO:
                 # Propagate its states
                 self.propagate_state_for_driver_in_scenario(scenario, driver_to_update, state_of_vehicle, nested=True)
 
-        db.session.commit()
-        # At this point we should return whether the called shall skip the planned steps!
-        return driver.user_id in [s.user_id for s in
-                                  state_of_vehicles_that_reached_goal + state_of_vehicles_that_collided]
-
-    def driver_crashed_at_timestamp_in_scenario(self, scenario, driver, vehicle_state_at_timestamp):
-        """
-        Set the status of all the vehicle states after timestamp (inclusive of timestamp)
-        that belong to the driver in the scenario as CRASHED and copy over all the attributes (beside timestamp!)
-
-        :param scenario:
-        :param driver:
-        :param timestamp:
-        :return:
-        """
-        timestamp = vehicle_state_at_timestamp.timestamp
-
-        logger.info('Driver {} Crashed at timestamp {} in scenario {}'.format(driver.user_id, timestamp,
-                                                                              scenario.scenario_id))
-        timestamps = "|".join(
-            str(t) for t in range(timestamp, scenario.duration + 1))  # Include the last timestamp at duration
-
-        stmt = db.update(VehicleState).values(**{
-            VehicleState.status.name: "CRASHED"
-        })
-        kwargs = {
-            "scenario_id": scenario.scenario_id,
-            "user_id": driver.user_id,
-            # Update the state any of the given timestamps (unique for each driver/scenario)
-            "timestamp": timestamps
-        }
-        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
-        result = db.session.execute(updated_stmt).rowcount
-        if result == 0:
-            logger.error(
-                'Cannot set Crash state at timestamp {} for driver {} in scenario {}'.format(timestamp,
-                                                                                             driver.user_id,
-                                                                                             scenario.scenario_id))
-            db.session.rollback()
-            raise AssertionError("Cannot update driver state {}".format(driver.user_id))
+        # The drivers are done even if there is nothing to propagate, i.e., at the last timestamp
+        for state_of_vehicle in state_of_vehicles_that_collided + state_of_vehicles_that_reached_goal:
+            self._driver_is_done(scenario, state_of_vehicle.driver_id, state_of_vehicle.status, timestamp)
 
-        db.session.commit()
+        return state_of_vehicles_that_collided + state_of_vehicles_that_reached_goal
 
     def _render_scenario_state(self, scenario, timestamp, nested=False):
         # Check if we need to render this timestamp
@@ -399,23 +558,22 @@ class VehicleStateDAO:
         # Check that all the states are NOT actionable
         if all(s.status == "ACTIVE" or s.status == "GOAL_REACHED" or s.status == "CRASHED" for s in
                vehicles_states_at_timestamp):
-            # We can render the scenario at this timestamp (for all the drivers)
-            logger.debug(
-                "Rendering scenario state at timestamp {} for scenario {}".format(timestamp, scenario.scenario_id))
-            # Generate a global view, including all the drivers
-            render_in_background(self.images_folder, scenario, vehicles_states_at_timestamp)
-
-            # Focus on each driver and render the state again
-            for driver in scenario.drivers:
+            # We can render the scenario at this timestamp. The frames are rendered only if someone asks for them (see
+            # ScenarioFrameDAO), but the human drivers that must act on this timestamp see their frame right away in
+            # the overview of the scenario
+            humans = [driver for driver in scenario.drivers if driver.user and not driver.user.username.startswith("bot_")]
+            goal_regions_as_rectangles = {}
+            for driver in self.get_drivers_about_to_act(scenario, timestamp, humans):
                 # TODO I do not like this nesting of DAOs but cannot do anything about it now
-                goal_region_as_rectangle = self.scenario_dao.get_goal_region_for_driver_in_scenario(driver, scenario, nested)
+                goal_regions_as_rectangles[driver.user_id] = self.scenario_dao.get_goal_region_for_driver_in_scenario(driver, scenario, nested)
 
                 logger.debug("Rendering states at timestamp {} in scenario {} for driver {}".format(timestamp,
                                                                                                     scenario.scenario_id,
                                                                                                     driver.user_id))
-                render_in_background(self.images_folder, scenario, vehicles_states_at_timestamp,
-                                                 focus_on_driver=driver,
-                                                 goal_region_as_rectangle=goal_region_as_rectangle)
+            if len(goal_regions_as_rectangles) > 0:
+                # A single job renders all of them
+                render_in_background(self.images_folder, scenario, vehicles_states_at_timestamp, goal_regions_as_rectangles,
+                                     global_view=False)
 
         db.session.commit()
 
@@ -644,6 +802,8 @@ class VehicleStateDAO:
             else:
                 logger.info("******* Activating states at timestamp {} in scenario {} ******* ".format(timestamp,
                                                                                                        scenario.scenario_id))
+                # All the drivers are done with this timestamp, so the scenario moves forward
+                self._advance_frontier(scenario, timestamp)
         else:
             logger.info(
                 "******* Cannot activating states at timestamp {} in scenario {} MISSING {} ******* ".format(
@@ -710,6 +870,154 @@ class VehicleStateDAO:
                 db.session.rollback()
                 raise AssertionError(error_msg)
 
+    def reset_states_for_driver_in_scenario_from_timestamp(self, driver: Driver, scenario: MixedTrafficScenario, timestamp: int):
+        """
+        Reset all the states of the driver from timestamp until the end of the scenario (included) with a single
+        UPDATE. States that are GOAL_REACHED or CRASHED are left untouched, while ACTIVE states cannot be reset.
+        """
+        from sqlalchemy.sql.expression import func
+        # Make sure none of the states is ACTIVE before touching them
+        stmt = db.select(func.min(VehicleState.timestamp))
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "driver_id": driver.driver_id,
+            "timestamp": Between(timestamp, scenario.duration),
+            "status": "ACTIVE"
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        active_timestamp = db.session.execute(updated_stmt).scalar()
+        if active_timestamp is not None:
+            error_msg = 'Cannot RESET state at timestamp {} for driver {} in ' \
+                        'scenario {}.'.format(active_timestamp, driver.user_id, scenario.scenario_id)
+            logger.warning(error_msg)
+            db.session.rollback()
+            raise AssertionError(error_msg)
+
+        update_vals = {
+            VehicleState.status.name: "PENDING",
+            VehicleState.position_x.name: None,
+            VehicleState.position_y.name: None,
+            VehicleState.rotation.name: None,
+            VehicleState.speed_ms.name: None,
+            VehicleState.acceleration_m2s.name: None
+        }
+        stmt = db.update(VehicleState).values(**update_vals)
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "driver_id": driver.driver_id,
+            "timestamp": Between(timestamp, scenario.duration),
+            # We can only update states that are PENDING or WAITING. We cannot update ACTIVE or CRASH states
+            "status": "PENDING|WAITING"
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        logger.debug('Resetting states from timestamp {} to timestamp {} for driver {} in scenario {}'.format(
+            timestamp, scenario.duration, driver.user_id, scenario.scenario_id))
+        db.session.execute(updated_stmt)
+
+    def get_first_terminal_timestamp_by_driver(self, scenario: MixedTrafficScenario) -> Dict[int, int]:
+        """ Return the first timestamp at which each driver CRASHED or REACHED THE GOAL, if any """
+        from sqlalchemy.sql.expression import func
+        stmt = db.select(VehicleState.driver_id, func.min(VehicleState.timestamp))
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "status": "GOAL_REACHED|CRASHED"
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        updated_stmt = updated_stmt.group_by(VehicleState.driver_id)
+        return {driver_id: first_timestamp for driver_id, first_timestamp in db.session.execute(updated_stmt)}
+
+    def _initialize_frontier(self, scenario: MixedTrafficScenario) -> None:
+        db.session.merge(ScenarioFrontier(scenario_id=scenario.scenario_id, timestamp=0))
+        for driver in scenario.drivers:
+            db.session.merge(DriverFrontier(driver_id=driver.driver_id, scenario_id=scenario.scenario_id,
+                                            status=VehicleStatusEnum.ACTIVE, timestamp=None))
+
+    def _advance_frontier(self, scenario: MixedTrafficScenario, timestamp: int) -> None:
+        """ Move the frontier of the scenario to the given timestamp. The frontier never goes back """
+        stmt = db.update(ScenarioFrontier).values(**{ScenarioFrontier.timestamp.name: timestamp})
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "timestamp": Between(upper=timestamp - 1)
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, ScenarioFrontier, **kwargs)
+        db.session.execute(updated_stmt)
+
+    def _driver_is_done(self, scenario: MixedTrafficScenario, driver_id: int, status: VehicleStatusEnum, timestamp: int) -> None:
+        """ Record that the driver CRASHED or REACHED THE GOAL at the given timestamp. Only the first time counts """
+        stmt = db.update(DriverFrontier).values(**{
+            DriverFrontier.status.name: status,
+            DriverFrontier.timestamp.name: timestamp
+        })
+        kwargs = {
+            "driver_id": driver_id,
+            "status": VehicleStatusEnum.ACTIVE
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, DriverFrontier, **kwargs)
+        db.session.execute(updated_stmt)
+
+        # If nobody is in game anymore, all the remaining states are propagated, so the scenario reached its end
+        from sqlalchemy.sql.expression import func
+        stmt = db.select(func.count(DriverFrontier.driver_id))
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "status": VehicleStatusEnum.ACTIVE
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, DriverFrontier, **kwargs)
+        if db.session.execute(updated_stmt).scalar() == 0:
+            self._advance_frontier(scenario, scenario.duration)
+
+    def rebuild_frontier(self, scenario: MixedTrafficScenario) -> Optional[Tuple[ScenarioFrontier, List[DriverFrontier]]]:
+        """
+        Compute the frontier from the vehicle states and store it. This is necessary only for the scenarios
+        that started before we materialized the frontier. Return None if the scenario has no states yet.
+        """
+        status_counts = self.count_states_by_timestamp_and_status(scenario.scenario_id)
+        if len(status_counts) == 0:
+            return None
+
+        # The frontier is the last timestamp of the initial sequence of settled timestamps
+        timestamp = 0
+        while timestamp + 1 in status_counts and is_settled(status_counts[timestamp + 1]):
+            timestamp += 1
+
+        from sqlalchemy.sql.expression import func
+        stmt = db.select(VehicleState.driver_id, VehicleState.status, func.min(VehicleState.timestamp))
+        kwargs = {
+            "scenario_id": scenario.scenario_id,
+            "status": "GOAL_REACHED|CRASHED"
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, VehicleState, **kwargs)
+        updated_stmt = updated_stmt.group_by(VehicleState.driver_id, VehicleState.status)
+
+        drivers_frontier = {driver.driver_id: DriverFrontier(driver_id=driver.driver_id, scenario_id=scenario.scenario_id,
+                                                             status=VehicleStatusEnum.ACTIVE, timestamp=None)
+                            for driver in scenario.drivers}
+        for driver_id, status, first_timestamp in db.session.execute(updated_stmt):
+            driver_frontier = drivers_frontier[driver_id]
+            if driver_frontier.timestamp is None or first_timestamp < driver_frontier.timestamp:
+                driver_frontier.status, driver_frontier.timestamp = status, first_timestamp
+
+        scenario_frontier = db.session.merge(ScenarioFrontier(scenario_id=scenario.scenario_id, timestamp=timestamp))
+        drivers_frontier = [db.session.merge(driver_frontier) for driver_frontier in drivers_frontier.values()]
+        db.session.commit()
+        return scenario_frontier, drivers_frontier
+
+    def get_frontier(self, scenario: MixedTrafficScenario) -> Optional[Tuple[ScenarioFrontier, List[DriverFrontier]]]:
+        """
+        Return the frontier of the scenario, i.e., the last timestamp in which all the drivers acted and the
+        status of each driver. Return None if the scenario has no states yet.
+        """
+        scenario_frontier = db.session.get(ScenarioFrontier, scenario.scenario_id)
+        if scenario_frontier is None:
+            return self.rebuild_frontier(scenario)
+
+        stmt = db.select(DriverFrontier)
+        kwargs = {
+            "scenario_id": scenario.scenario_id
+        }
+        updated_stmt = inject_where_statement_using_attributes(stmt, DriverFrontier, **kwargs)
+        return scenario_frontier, list(db.session.execute(updated_stmt).scalars())
+
     def get_max_timestamp_in_scenario(self, scenario: MixedTrafficScenario) -> Optional[int]:
 
         from sqlalchemy.sql.expression import func
@@ -721,6 +1029,51 @@ class VehicleStateDAO:
         max_timestamp = db.session.execute(updated_stmt).scalar()
         return max_timestamp
 
+    def _preallocate_vehicle_states(self, scenario: MixedTrafficScenario, all_initial_states: Dict) -> None:
+        """
+        Store the initial states and preallocate all the other states as PENDING with a single bulk insert,
+        without creating one ORM object per state.
+
+        :param all_initial_states: the initial state (as tuple) of each driver, indexed by driver_id
+        """
+        vehicle_states = []
+        for driver_id in all_initial_states.keys():
+            state_id, status, timestamp, user_id, scenario_id, position_x, position_y, rotation, speed_ms, acceleration_m2s = all_initial_states[driver_id]
+            vehicle_states.append({
+                VehicleState.status.name: status,
+                VehicleState.timestamp.name: timestamp,
+                VehicleState.driver_id.name: driver_id,
+                VehicleState.user_id.name: user_id,
+                VehicleState.scenario_id.name: scenario_id,
+                VehicleState.position_x.name: position_x,
+                VehicleState.position_y.name: position_y,
+                VehicleState.rotation.name: rotation,
+                VehicleState.speed_ms.name: speed_ms,
+                VehicleState.acceleration_m2s.name: acceleration_m2s
+            })
+
+        # Preallocate the vehicle states. Note: resolving the column names is slow, so we do it only once
+        timestamp_key, driver_id_key = VehicleState.timestamp.name, VehicleState.driver_id.name
+        user_id_key = VehicleState.user_id.name
+        pending_state = {
+            VehicleState.status.name: VehicleStatusEnum.PENDING,
+            VehicleState.scenario_id.name: scenario.scenario_id,
+            VehicleState.position_x.name: None,
+            VehicleState.position_y.name: None,
+            VehicleState.rotation.name: None,
+            VehicleState.speed_ms.name: None,
+            VehicleState.acceleration_m2s.name: None
+        }
+        for driver in scenario.drivers:
+            # Note: we start from timestamp 1 not 0, 0 is the initial state and will be filled later
+            for timestamp in range(1, scenario.duration + 1):
+                vehicle_states.append({**pending_state,
+                                       timestamp_key: timestamp, driver_id_key: driver.driver_id, user_id_key: driver.user_id})
+
+        # Use the table (Core) instead of the ORM class and the same keys for all the states, so this is a plain
+        # executemany of the same INSERT
+        db.session.execute(db.insert(VehicleState.__table__), vehicle_states)
+
     def initialize_scenario_states(self, scenario: MixedTrafficScenario, nested=False) -> None:
         """ At this point, all the info about drivers, initial state position and speed, and goal area position are available.
         We need to transform those into actual State and Rectangles """
@@ -744,32 +1097,9 @@ class VehicleStateDAO:
         # Does this work? At this point there might not even be a vehicle state!
         # self.vehicle_state_dao.update_initial_state_for_driver_in_scenario(init_state_dict, user_id, scenario_id)
 
-        for driver_id in all_initial_states.keys():
-            state_id, status, timestamp, user_id, scenario_id, position_x, position_y, rotation, speed_ms, acceleration_m2s = all_initial_states[driver_id]
-            vehicle_state = VehicleState(status=status, timestamp=timestamp, user_id=user_id,
-                                         driver_id=driver_id,
-                                         scenario_id=scenario_id,
-                                         position_x=position_x, position_y=position_y,
-                                         rotation=rotation, speed_ms=speed_ms, acceleration_m2s=acceleration_m2s)
-            db.session.add(vehicle_state)
-
-        # Initialize all the other states. We need bulk update here!
+        self._preallocate_vehicle_states(scenario, all_initial_states)
 
-        position_x = None
-        position_y = None
-        rotation = None
-        speed_ms = None
-        acceleration_m2s = None
-        status = "PENDING"
-        # Preallocate the vehicle states
-        for driver in scenario.drivers:
-            # Note: we start from timestamp 1 not 0, 0 is the initial state and will be filled later
-            for timestamp in range(1, scenario.duration + 1):
-                vehicle_state = VehicleState(status=status, timestamp=timestamp, driver_id = driver.driver_id,
-                                             user_id=driver.user_id,
-                                             scenario_id=scenario.scenario_id,
-                                             position_x=position_x, position_y=position_y,
-                                             rotation=rotation, speed_ms=speed_ms, acceleration_m2s=acceleration_m2s)
-                db.session.add(vehicle_state)
+        # By construction, all the vehicles are ACTIVE at timestamp 0
+        self._initialize_frontier(scenario)
 
         db.session.commit()
\ No newline at end of file
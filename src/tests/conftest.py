@@ -11,8 +11,10 @@ from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
 from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
 from persistence.vehicle_state_data_access import VehicleStateDAO
 from persistence.driver_data_access import DriverDAO
+from persistence.database import db
 
 from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
+from model.mixed_traffic_scenario import MixedTrafficScenario
 
 
 @pytest.fixture
@@ -66,6 +68,7 @@ def flexcrash_test_app(tmp_path):
     temp_database_sqlalchemy = f"sqlite:///{temp_database_file}"
     # Create the temporary static folders
     temp_scenario_image_folder = tmp_path
+    temp_trajectory_cache_file = tmp_path / "trajectory_cache.sqlite"
     # Reference https://stackoverflow.com/questions/24877025/runtimeerror-working-outside-of-application-context-when-unit-testing-with-py
     configuration = """
 DATABASE_NAME = '{}'
@@ -84,6 +87,7 @@ SECRET_KEY = "Bogus"
 IMAGES_FOLDER = '{}'
 TEMPLATE_IMAGES_FOLDER = '{}'
 SCENARIO_IMAGES_FOLDER = '{}'
+TRAJECTORY_CACHE_FILE = '{}'
 # Default configuration of the goal region = TODO Check Tobias' config !
 GOAL_REGION_LENGTH = 10.0
 GOAL_REGION_WIDTH = 4.0
@@ -102,7 +106,8 @@ SCHEDULER_API_ENABLED = False
 # SCHEDULER_EXECUTORS["driving"] = dict()
 # SCHEDULER_EXECUTORS["driving"]["type"] = "processpool"
 # SCHEDULER_EXECUTORS["driving"]["max_workers"] = 4
-""".format(temp_database_file, temp_database_sqlalchemy, temp_scenario_image_folder, temp_scenario_image_folder, temp_scenario_image_folder)
+""".format(temp_database_file, temp_database_sqlalchemy, temp_scenario_image_folder, temp_scenario_image_folder, temp_scenario_image_folder,
+           temp_trajectory_cache_file)
 
     temp_cfg_file.write_text(configuration)
 
@@ -254,6 +259,8 @@ def flexcrash_test_app_with_a_scenario_template_and_given_users(flexcrash_test_a
         mocked_function.side_effect = _nop
         mocked_function = mocker.patch('views.scenario.undeploy_av')
         mocked_function.side_effect = _nop
+        mocked_function = mocker.patch('persistence.mixed_scenario_data_access.undeploy_av')
+        mocked_function.side_effect = _nop
 
 
         # At this point the flexcrash_test_app is already setup with an empty db
@@ -347,4 +354,37 @@ def mixed_traffic_scenario_dao(flexcrash_test_app):
 
 @pytest.fixture
 def vehicle_state_dao(flexcrash_test_app, mixed_traffic_scenario_dao):
-    return VehicleStateDAO(flexcrash_test_app.config, mixed_traffic_scenario_dao)
\ No newline at end of file
+    return VehicleStateDAO(flexcrash_test_app.config, mixed_traffic_scenario_dao)
+
+
+@pytest.fixture
+def scenario_with_two_drivers(user_dao, mixed_traffic_scenario_dao, mixed_traffic_scenario_template_dao,
+                              xml_scenario_template, mocker):
+    """
+    Store an ACTIVE scenario (scenario_id=1) with two human drivers (user_id=11 and user_id=12) that lasts 5
+    timestamps, and whose vehicle states are initialized as initialize_scenario_states does. Rendering is not relevant
+    here, so we skip it
+    """
+    mocker.patch.object(VehicleStateDAO, "_render_scenario_state")
+
+    creator = user_dao.insert_and_get(User(user_id=1, username="creator", email="creator@mail.com", password="foobar"))
+    users = [user_dao.insert_and_get(User(user_id=user_id, username=f"user_{user_id}", email=f"user_{user_id}@mail.com",
+                                          password="foobar")) for user_id in [11, 12]]
+    scenario_template = mixed_traffic_scenario_template_dao.insert_and_get(
+        MixedTrafficScenarioTemplate(template_id=1, name="template_name", description="template_description",
+                                     xml=xml_scenario_template))
+    scenario = mixed_traffic_scenario_dao.insert_and_get(
+        MixedTrafficScenario(scenario_id=1, name="name", description="description",
+                             created_by=creator.user_id, max_players=2, n_avs=0, n_users=2,
+                             status="ACTIVE", template_id=scenario_template.template_id, duration=5))
+    drivers = [mixed_traffic_scenario_dao.add_user_to_scenario(user, scenario) for user in users]
+
+    vehicle_state_dao = mixed_traffic_scenario_dao.vehicle_state_dao
+    vehicle_state_dao._preallocate_vehicle_states(scenario, {
+        driver.driver_id: (None, "ACTIVE", 0, driver.user_id, scenario.scenario_id, 0.0, float(driver.user_id), 0.0,
+                           10.0, 0.0)
+        for driver in drivers})
+    vehicle_state_dao._initialize_frontier(scenario)
+    db.session.commit()
+
+    return mixed_traffic_scenario_dao
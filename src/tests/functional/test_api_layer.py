@@ -1,8 +1,13 @@
 import json
 import glob, os
 
-from flask import url_for
+import numpy as np
 
+from flask import g, url_for
+
+from commonroad.geometry.shape import Rectangle
+
+from persistence.database import db
 from persistence.user_data_access import UserDAO
 from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
 from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
@@ -399,4 +404,121 @@ def test_deleting_a_scenario_clears_everything(mocker, flexcrash_test_app_with_a
         vehicle_state_dao = VehicleStateDAO(flask_app.config, scenario_dao)
         # TODO Assert that the users are still there?
         all_vehicle_states = vehicle_state_dao.get_vehicle_states_by_scenario_id(scenario_id)
-        assert len(all_vehicle_states) == 0
\ No newline at end of file
+        assert len(all_vehicle_states) == 0
+
+
+def test_get_scenario_states_between_timestamps(flexcrash_test_app_with_a_scenario_template_and_given_users):
+    user_1_id = 11
+    user_2_id = 12
+
+    scenario_creator_user_id = 1
+    scenario_template_id = 1
+    n_avs = 0
+    n_users = 2
+    scenario_duration_in_seconds = 0.5
+    scenario_id = 1
+    preregistered_users = [user_1_id, user_2_id]
+
+    scenario_data = _generate_scenario_data(scenario_creator_user_id, scenario_template_id, n_avs, n_users,
+                                            scenario_duration_in_seconds, scenario_id, preregistered_users)
+
+    flask_app = flexcrash_test_app_with_a_scenario_template_and_given_users(
+        [scenario_creator_user_id, user_1_id, user_2_id],
+        scenario_template_id)
+
+    with flask_app.test_client() as test_client:
+        response = test_client.post(url_for("api.scenarios.create"), data=scenario_data)
+        assert response.status_code == 201
+
+        response = test_client.get(url_for("api.scenarios.get_scenario_states_between_timestamps",
+                                           scenario_id=scenario_id, from_timestamp=0, to_timestamp=3))
+        assert response.status_code == 200
+
+        scenario_states = json.loads(response.data.decode("utf-8"))
+        assert scenario_states["from_timestamp"] == 0
+        assert scenario_states["to_timestamp"] == 3
+        # One entry per driver, one value per timestamp
+        assert sorted([driver_states["user_id"] for driver_states in scenario_states["drivers"]]) == preregistered_users
+        for driver_states in scenario_states["drivers"]:
+            assert driver_states["timestamps"] == [0, 1, 2, 3]
+            assert driver_states["statuses"][0] == "ACTIVE"
+            assert all([len(driver_states[column]) == 4 for column in ["statuses", "positions_x", "positions_y",
+                                                                        "rotations", "speeds_ms", "accelerations_m2s"]])
+
+        # Invalid ranges are rejected
+        response = test_client.get(url_for("api.scenarios.get_scenario_states_between_timestamps",
+                                           scenario_id=scenario_id, from_timestamp=3, to_timestamp=0))
+        assert response.status_code == 422
+
+        # Non existing scenarios are not found
+        response = test_client.get(url_for("api.scenarios.get_scenario_states_between_timestamps",
+                                           scenario_id=scenario_id + 1, from_timestamp=0, to_timestamp=3))
+        assert response.status_code == 404
+
+
+def _login(test_client, user_id):
+    """ Log the user in the web frontend """
+    with test_client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    # The app context outlives the requests in the tests, so flask-login would keep the user of the previous request
+    g.pop("_login_user", None)
+
+
+def test_get_scene(flexcrash_test_app, user_dao, scenario_with_two_drivers):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    user_1_id = 11
+    user_2_id = 12
+    other_user_id = 13
+    scenario_id = 1
+
+    # Only the first driver has a goal region, and the other user is not driving
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    driver = next(driver for driver in scenario.drivers if driver.user_id == user_1_id)
+    driver.goal_region = Rectangle(4.0, 2.0, center=np.array([529.628465, -651.5852025]))
+    user_dao.insert_and_get(User(user_id=other_user_id, username=f"user_{other_user_id}",
+                                 email=f"user_{other_user_id}@mail.com", password="foobar"))
+    db.session.commit()
+
+    # The scene is requested by the page of the driver, so it requires logging in the web frontend
+    flexcrash_test_app.config["LOGIN_DISABLED"] = False
+    for user_id in [user_1_id, user_2_id, other_user_id]:
+        user_dao.generate_token(user_id, is_primary=True)
+
+    with flexcrash_test_app.test_client() as test_client:
+        scene_url = url_for("api.scenarios.get_scene", scenario_id=scenario_id, timestamp=0, user_id=user_1_id)
+        response = test_client.get(scene_url)
+        assert response.status_code != 200
+
+        _login(test_client, user_1_id)
+
+        response = test_client.get(scene_url)
+        assert response.status_code == 200
+
+        scene = json.loads(response.data.decode("utf-8"))
+        assert scene["timestamp"] == 0
+        assert sorted([vehicle["user_id"] for vehicle in scene["vehicles"]]) == [user_1_id, user_2_id]
+        assert scene["goal_region"] is not None
+        # The road layout is a static file, the same for all the scenes of the template
+        assert scene["road"].endswith(".json")
+        road_spec_file_name = os.path.basename(scene["road"])
+        assert os.path.exists(os.path.join(flexcrash_test_app.config["TEMPLATE_IMAGES_FOLDER"], road_spec_file_name))
+
+        response = test_client.get(url_for("api.scenarios.get_scene", scenario_id=scenario_id, timestamp=0))
+        scene = json.loads(response.data.decode("utf-8"))
+        assert scene["goal_region"] is None
+        assert os.path.basename(scene["road"]) == road_spec_file_name
+
+        # Users cannot see the scenes focused on other drivers
+        response = test_client.get(url_for("api.scenarios.get_scene", scenario_id=scenario_id, timestamp=0,
+                                           user_id=user_2_id))
+        assert response.status_code == 403
+
+        # Non existing scenarios and users that are not driving are not found
+        response = test_client.get(url_for("api.scenarios.get_scene", scenario_id=scenario_id + 1, timestamp=0))
+        assert response.status_code == 404
+
+        _login(test_client, other_user_id)
+
+        response = test_client.get(url_for("api.scenarios.get_scene", scenario_id=scenario_id, timestamp=0,
+                                           user_id=other_user_id))
+        assert response.status_code == 404
@@ -0,0 +1,114 @@
+import json
+import pickle
+
+import numpy as np
+from flask import url_for
+from types import SimpleNamespace
+
+from controller.av_transport import InProcessTransport, WORKER_APP_CONFIG_KEYS
+
+from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+from persistence.vehicle_state_data_access import VehicleStateDAO
+
+from model.vehicle_state import VehicleStatusEnum
+
+from tests.utils import generate_scenario_data
+
+
+def _as_dictionaries(plain_objects):
+    return [vars(plain_object) for plain_object in plain_objects]
+
+
+def test_in_process_transport_returns_the_same_data_as_the_api(flexcrash_test_app_with_a_scenario_template_and_given_users):
+    """
+    GIVEN an active scenario with two drivers
+    WHEN the AV reads the scenario using the in-process transport
+    THEN it gets the same data that the API returns
+    """
+    user_1_id = 11
+    user_2_id = 12
+    scenario_creator_user_id = 1
+    scenario_template_id = 1
+    scenario_id = 1
+    preregistered_users = [user_1_id, user_2_id]
+
+    scenario_data = generate_scenario_data(scenario_creator_user_id, scenario_template_id, 0, 2, 0.5, scenario_id,
+                                           preregistered_users)
+
+    flask_app = flexcrash_test_app_with_a_scenario_template_and_given_users(
+        [scenario_creator_user_id, user_1_id, user_2_id], scenario_template_id)
+
+    transport = InProcessTransport(flask_app.config, flask_app.instance_path)
+
+    with flask_app.test_client() as test_client:
+        response = test_client.post(url_for("api.scenarios.create"), data=scenario_data)
+        assert response.status_code == 201
+
+        response = test_client.get(url_for("api.scenarios.get_vehicle_states", scenario_id=scenario_id, user_id=user_1_id))
+        assert _as_dictionaries(transport.get_vehicle_states(scenario_id, user_1_id)) == json.loads(response.data.decode("utf-8"))
+
+        response = test_client.get(url_for("api.scenarios.get_driver", scenario_id=scenario_id, user_id=user_1_id))
+        assert vars(transport.get_driver(scenario_id, user_1_id)) == json.loads(response.data.decode("utf-8"))
+
+        response = test_client.get(url_for("api.scenarios.get_scenario_template_xml", scenario_id=scenario_id))
+        assert transport.get_template_xml(scenario_id) == response.data.decode("utf-8")
+
+        response = test_client.get(url_for("api.scenarios.get_scenario_states_between_timestamps", scenario_id=scenario_id,
+                                           from_timestamp=0, to_timestamp=2))
+        scenario_states = transport.get_vehicle_states_by_driver_between_timestamps(scenario_id, 0, 2)
+        assert json.loads(json.dumps(scenario_states, default=vars)) == json.loads(response.data.decode("utf-8"))
+
+
+def test_in_process_transport_updates_the_states(flexcrash_test_app_with_a_scenario_template_and_given_users):
+    """
+    GIVEN an active scenario with two drivers
+    WHEN both drivers submit their next state using the in-process transport
+    THEN the scenario evolves
+    """
+    user_1_id = 11
+    user_2_id = 12
+    scenario_creator_user_id = 1
+    scenario_template_id = 1
+    scenario_id = 1
+    preregistered_users = [user_1_id, user_2_id]
+
+    scenario_data = generate_scenario_data(scenario_creator_user_id, scenario_template_id, 0, 2, 0.5, scenario_id,
+                                           preregistered_users)
+
+    flask_app = flexcrash_test_app_with_a_scenario_template_and_given_users(
+        [scenario_creator_user_id, user_1_id, user_2_id], scenario_template_id)
+
+    transport = InProcessTransport(flask_app.config, flask_app.instance_path)
+
+    with flask_app.test_client() as test_client:
+        response = test_client.post(url_for("api.scenarios.create"), data=scenario_data)
+        assert response.status_code == 201
+
+    for user_id in preregistered_users:
+        initial_state = transport.get_initial_state(scenario_id, user_id)
+        # Keep the vehicles where they are, so they do not collide
+        planned_state = SimpleNamespace(time_step=1, position=np.array([initial_state.position_x, initial_state.position_y]),
+                                        orientation=initial_state.rotation, velocity=0.0, acceleration=0.0)
+        transport.update_vehicle_states(scenario_id, user_id, [planned_state])
+
+    scenario_dao = MixedTrafficScenarioDAO(flask_app.config)
+    vehicle_state_dao = VehicleStateDAO(flask_app.config, scenario_dao)
+    vehicle_states = vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario_id, 1)
+    assert len(vehicle_states) == 2
+    assert all([vehicle_state.status == VehicleStatusEnum.ACTIVE for vehicle_state in vehicle_states])
+
+
+def test_in_process_transport_keeps_only_the_configuration_of_the_worker_app(flexcrash_test_app):
+    """
+    GIVEN the app configuration, which includes secrets and the configuration of the executors
+    WHEN the in-process transport is created
+    THEN it keeps, and pickles, only the configuration that the DAOs need
+    """
+    transport = InProcessTransport(flexcrash_test_app.config, flexcrash_test_app.instance_path)
+
+    assert set(transport.app_config.keys()) <= set(WORKER_APP_CONFIG_KEYS)
+    assert transport.app_config["SQLALCHEMY_DATABASE_URI"] == flexcrash_test_app.config["SQLALCHEMY_DATABASE_URI"]
+
+    pickled_transport = pickle.dumps(transport)
+    assert b"SECRET_KEY" not in pickled_transport
+    assert b"SCHEDULER_EXECUTORS" not in pickled_transport
@@ -0,0 +1,229 @@
+#
+# Those tests check that the VehicleStateDAO keeps the frontier of the scenarios (i.e., where the scenario is and
+# which drivers are still in game) in sync with the vehicle states, and that the frontier rebuilt for scenarios
+# that started before we materialized it matches what we used to compute by scanning all the timestamps.
+#
+from persistence.database import db
+from persistence.vehicle_state_data_access import VehicleStateDAO
+
+from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
+from model.scenario_frontier import ScenarioFrontier, DriverFrontier
+from model.vehicle_state import VehicleState, VehicleStatusEnum
+
+# Those are the users and the scenario that the scenario_with_two_drivers fixture stores
+user_1_id = 11
+user_2_id = 12
+scenario_id = 1
+
+
+def _driver_of(scenario, user_id):
+    return next(driver for driver in scenario.drivers if driver.user_id == user_id)
+
+
+def _submit(mixed_traffic_scenario_dao, user_id, timestamps):
+    """ Let the driver of the given user plan a (straight) trajectory over the given timestamps """
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    driver = _driver_of(scenario, user_id)
+    planned_states = [VehicleState(status="PENDING", timestamp=timestamp, driver_id=driver.driver_id,
+                                   user_id=user_id, scenario_id=scenario_id,
+                                   position_x=float(timestamp), position_y=float(user_id), rotation=0.0,
+                                   speed_ms=10.0, acceleration_m2s=0.0)
+                      for timestamp in timestamps]
+    return mixed_traffic_scenario_dao.vehicle_state_dao.update_driver_states_in_scenario(scenario, driver,
+                                                                                        planned_states)
+
+
+def _scan_for_the_frontier(mixed_traffic_scenario_dao, scenario):
+    """
+    Find where the scenario is and whether each driver is in game as we did before materializing the frontier, i.e.,
+    by scanning the timeline of the scenario for the timestamp drivers are acting upon
+    """
+    timeline = mixed_traffic_scenario_dao.get_scenario_timeline(scenario.scenario_id, scenario.duration)
+    timestamp = next((t for t, state in enumerate(timeline) if state == MixedTrafficScenarioStatusEnum.ACTIVE),
+                     scenario.duration)
+
+    drivers_in_game = {}
+    for driver in scenario.drivers:
+        state = mixed_traffic_scenario_dao.vehicle_state_dao.get_vehicle_state_by_scenario_timestamp_driver(
+            scenario, timestamp, driver)
+        drivers_in_game[driver.driver_id] = state.status not in ["CRASHED", "GOAL_REACHED"]
+    return timestamp, drivers_in_game
+
+
+def _frontier(mixed_traffic_scenario_dao, scenario):
+    """ Return the frontier of the scenario and the (status, timestamp) of its drivers, indexed by user """
+    scenario_frontier, drivers_frontier = mixed_traffic_scenario_dao.get_scenario_frontier(scenario)
+    return scenario_frontier.timestamp, {
+        user_id: next((df.status, df.timestamp) for df in drivers_frontier
+                      if df.driver_id == _driver_of(scenario, user_id).driver_id)
+        for user_id in [user_1_id, user_2_id]}
+
+
+def test_the_frontier_starts_at_the_initial_states(scenario_with_two_drivers):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == (0, {user_1_id: (VehicleStatusEnum.ACTIVE, None),
+                                                                   user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+
+
+def test_the_frontier_advances_over_the_settled_timestamps(scenario_with_two_drivers, user_dao, mocker):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    mocker.patch('model.collision_checking.CollisionChecker.check_for_collisions').return_value = []
+    mocker.patch.object(VehicleStateDAO, "_vehicles_that_reached_goal").return_value = []
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+
+    # The first driver alone cannot move the frontier
+    _submit(mixed_traffic_scenario_dao, user_1_id, [1, 2, 3])
+    assert _frontier(mixed_traffic_scenario_dao, scenario)[0] == 0
+
+    # The second driver settles the timestamps 1 and 2, but not 3
+    _submit(mixed_traffic_scenario_dao, user_2_id, [1, 2])
+    assert _frontier(mixed_traffic_scenario_dao, scenario)[0] == 2
+
+    # The second driver planned further than the first one, so the frontier stops at 3
+    _submit(mixed_traffic_scenario_dao, user_2_id, [3, 4])
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == (3, {user_1_id: (VehicleStatusEnum.ACTIVE, None),
+                                                                   user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+    assert _frontier(mixed_traffic_scenario_dao, scenario)[0] == _scan_for_the_frontier(mixed_traffic_scenario_dao,
+                                                                                         scenario)[0]
+    assert mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_dao.get_user_by_user_id(user_1_id))
+    assert mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_dao.get_user_by_user_id(user_2_id))
+
+
+def test_the_frontier_tracks_crashes_and_goals(scenario_with_two_drivers, user_dao, mocker):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    user_1, user_2 = user_dao.get_user_by_user_id(user_1_id), user_dao.get_user_by_user_id(user_2_id)
+
+    # The first driver crashes at timestamp 2
+    def _collisions(scenario, timestamp, nested=False):
+        return [(user_1, None)] if timestamp == 2 else []
+
+    mocker.patch('model.collision_checking.CollisionChecker.check_for_collisions').side_effect = _collisions
+
+    # The second driver reaches the goal at timestamp 3
+    def _goals(vehicle_state_dao, scenario, timestamp, nested=False):
+        states = vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id, timestamp)
+        states_that_reached_goal = [s for s in states if s.user_id == user_2_id and timestamp == 3]
+        for state in states_that_reached_goal:
+            state.status = "GOAL_REACHED"
+        return states_that_reached_goal
+
+    mocker.patch.object(VehicleStateDAO, "_vehicles_that_reached_goal", autospec=True).side_effect = _goals
+
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+
+    _submit(mixed_traffic_scenario_dao, user_1_id, [1, 2, 3])
+    assert _submit(mixed_traffic_scenario_dao, user_2_id, [1, 2]) is False
+
+    # The states of the crashed driver are propagated, so only the second driver can move the frontier
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == (2, {user_1_id: (VehicleStatusEnum.CRASHED, 2),
+                                                                   user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+    assert not mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_1)
+    assert mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_2)
+
+    assert _submit(mixed_traffic_scenario_dao, user_2_id, [3, 4]) is True
+
+    # Nobody is in game anymore, so the scenario reached its end
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == (5, {user_1_id: (VehicleStatusEnum.CRASHED, 2),
+                                                                   user_2_id: (VehicleStatusEnum.GOAL_REACHED, 3)})
+    assert not mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_1)
+    assert not mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_2)
+
+
+def test_the_frontier_tracks_crashes_at_the_last_timestamp(scenario_with_two_drivers, user_dao, mocker):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    user_1 = user_dao.get_user_by_user_id(user_1_id)
+
+    # The first driver crashes at the last timestamp, so there is nothing to propagate
+    def _collisions(scenario, timestamp, nested=False):
+        return [(user_1, None)] if timestamp == 5 else []
+
+    mocker.patch('model.collision_checking.CollisionChecker.check_for_collisions').side_effect = _collisions
+    mocker.patch.object(VehicleStateDAO, "_vehicles_that_reached_goal").return_value = []
+
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    _submit(mixed_traffic_scenario_dao, user_1_id, [1, 2, 3, 4, 5])
+    _submit(mixed_traffic_scenario_dao, user_2_id, [1, 2, 3, 4, 5])
+
+    maintained_frontier = _frontier(mixed_traffic_scenario_dao, scenario)
+    assert maintained_frontier == (5, {user_1_id: (VehicleStatusEnum.CRASHED, 5),
+                                       user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+
+    # The frontier rebuilt from the vehicle states agrees
+    db.session.execute(db.delete(DriverFrontier))
+    db.session.execute(db.delete(ScenarioFrontier))
+    db.session.commit()
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == maintained_frontier
+
+
+def test_drivers_are_not_in_game_before_the_states_are_initialized(scenario_with_two_drivers, user_dao):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    db.session.execute(db.delete(DriverFrontier))
+    db.session.execute(db.delete(ScenarioFrontier))
+    db.session.execute(db.delete(VehicleState))
+    db.session.commit()
+
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    assert mixed_traffic_scenario_dao.get_scenario_frontier(scenario) is None
+    assert not mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_dao.get_user_by_user_id(user_1_id))
+
+
+def test_drivers_missing_from_the_frontier_are_rebuilt(scenario_with_two_drivers, user_dao):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    db.session.execute(db.delete(DriverFrontier))
+    db.session.commit()
+
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    assert mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_dao.get_user_by_user_id(user_1_id))
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == (0, {user_1_id: (VehicleStatusEnum.ACTIVE, None),
+                                                                   user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+
+
+def test_the_frontier_is_deleted_with_the_scenario(scenario_with_two_drivers):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    assert db.session.get(ScenarioFrontier, scenario_id) is not None
+
+    mixed_traffic_scenario_dao.delete_scenario_by_id(scenario_id)
+
+    assert db.session.get(ScenarioFrontier, scenario_id) is None
+    assert db.session.execute(db.select(DriverFrontier)).first() is None
+
+
+def test_rebuild_the_frontier_of_a_scenario_that_started_before_we_materialized_it(scenario_with_two_drivers,
+                                                                                   user_dao, mocker):
+    mixed_traffic_scenario_dao = scenario_with_two_drivers
+    user_1, user_2 = user_dao.get_user_by_user_id(user_1_id), user_dao.get_user_by_user_id(user_2_id)
+
+    # The first driver crashes at timestamp 1
+    def _collisions(scenario, timestamp, nested=False):
+        return [(user_1, None)] if timestamp == 1 else []
+
+    mocker.patch('model.collision_checking.CollisionChecker.check_for_collisions').side_effect = _collisions
+    mocker.patch.object(VehicleStateDAO, "_vehicles_that_reached_goal").return_value = []
+
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    _submit(mixed_traffic_scenario_dao, user_1_id, [1, 2, 3, 4])
+    _submit(mixed_traffic_scenario_dao, user_2_id, [1, 2])
+    _submit(mixed_traffic_scenario_dao, user_2_id, [3])
+
+    maintained_frontier = _frontier(mixed_traffic_scenario_dao, scenario)
+    assert maintained_frontier == (3, {user_1_id: (VehicleStatusEnum.CRASHED, 1),
+                                       user_2_id: (VehicleStatusEnum.ACTIVE, None)})
+
+    # Forget the frontier, as if the scenario started before we materialized it
+    db.session.execute(db.delete(DriverFrontier))
+    db.session.execute(db.delete(ScenarioFrontier))
+    db.session.commit()
+
+    # The frontier is rebuilt and stored the first time we need it
+    assert _frontier(mixed_traffic_scenario_dao, scenario) == maintained_frontier
+    assert db.session.get(ScenarioFrontier, scenario_id) is not None
+
+    # And it is the same we used to find by scanning the timestamps
+    scanned_timestamp, scanned_drivers_in_game = _scan_for_the_frontier(mixed_traffic_scenario_dao, scenario)
+    assert scanned_timestamp == 3
+    assert scanned_drivers_in_game == {_driver_of(scenario, user_1_id).driver_id: False,
+                                       _driver_of(scenario, user_2_id).driver_id: True}
+    assert not mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_1)
+    assert mixed_traffic_scenario_dao.is_driver_in_game(scenario, user_2)
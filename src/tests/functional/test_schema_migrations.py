@@ -0,0 +1,31 @@
+from sqlalchemy import inspect
+
+from model.vehicle_state import VehicleState
+
+from persistence.database import db
+from persistence.migrations import upgrade_schema
+
+
+def _vehicle_state_indexes():
+    return {index["name"] for index in inspect(db.engine).get_indexes(VehicleState.__tablename__)}
+
+
+def test_upgrade_schema_creates_missing_vehicle_state_indexes(flexcrash_test_app):
+    """
+    GIVEN a database created before the Vehicle_State indexes were declared
+    WHEN the schema is upgraded (twice)
+    THEN all the indexes exist
+    """
+    expected_indexes = {index.name for index in VehicleState.__table__.indexes}
+    assert expected_indexes.issubset(_vehicle_state_indexes())
+
+    # Simulate an old database
+    for index in VehicleState.__table__.indexes:
+        index.drop(bind=db.engine)
+    assert expected_indexes.isdisjoint(_vehicle_state_indexes())
+
+    upgrade_schema(flexcrash_test_app)
+    # Upgrading is idempotent
+    upgrade_schema(flexcrash_test_app)
+
+    assert expected_indexes.issubset(_vehicle_state_indexes())
@@ -0,0 +1,91 @@
+import base64
+import json
+
+import numpy as np
+from flask import url_for
+
+from views.scenario import FEASIBLE, NOT_AVAILABLE, INFEASIBILITY_REASONS, TRAJECTORY_GRID_FEATURES, \
+    MAX_TRAJECTORY_GRID_STEPS
+
+from tests.utils import generate_scenario_data
+
+
+def _unpack(packed_values, shape):
+    return np.frombuffer(base64.b64decode(packed_values), dtype="<f8").reshape(shape)
+
+
+def test_trajectory_grid_contains_the_single_trajectories(flexcrash_test_app_with_a_scenario_template_and_given_users):
+    """
+    GIVEN an active scenario
+    WHEN a driver asks for the grid of trajectories around some sampling parameters
+    THEN the grid contains, for each combination of the parameters, the trajectory that the single trajectory
+        endpoint returns
+    """
+    user_1_id = 11
+    user_2_id = 12
+    scenario_creator_user_id = 1
+    scenario_template_id = 1
+    scenario_id = 1
+    preregistered_users = [user_1_id, user_2_id]
+
+    scenario_data = generate_scenario_data(scenario_creator_user_id, scenario_template_id, 0, 2, 0.5, scenario_id,
+                                           preregistered_users)
+
+    flask_app = flexcrash_test_app_with_a_scenario_template_and_given_users(
+        [scenario_creator_user_id, user_1_id, user_2_id], scenario_template_id)
+
+    with flask_app.test_client() as test_client:
+        response = test_client.post(url_for("api.scenarios.create"), data=scenario_data)
+        assert response.status_code == 201
+
+        response = test_client.get(url_for("api.scenarios.get_driver", scenario_id=scenario_id, user_id=user_1_id))
+        driver_id = json.loads(response.data.decode("utf-8"))["driver_id"]
+
+        sampling_parameters = {"v": 5.0, "d": 0.0, "t": 1.5, "h": 2.0, "s": 0}
+        response = test_client.get(url_for("api.scenarios.get_trajectory_grid", scenario_id=scenario_id,
+                                           driver_id=driver_id, timestamp=0, n=1, **sampling_parameters))
+        assert response.status_code == 200
+        grid = json.loads(response.data.decode("utf-8"))
+
+        # t cannot reach the planning horizon
+        assert grid["v"] == [5.0 - 0.28, 5.0, 5.0 + 0.28]
+        assert grid["t"] == [1.5 - 0.1, 1.5, 1.5 + 0.1]
+        assert grid["d"] == [-0.5, 0.0, 0.5]
+        assert grid["n_states"] == 21
+
+        shape = (3, 3, 3, grid["n_states"], len(TRAJECTORY_GRID_FEATURES))
+        planned_states = _unpack(grid["planned_states"], shape)
+        feasibility = np.array(grid["feasibility"]).reshape(shape[:3])
+        assert len(grid["infeasibility_reasons"]) == len(INFEASIBILITY_REASONS)
+
+        for v_index, t_index, d_index in [(1, 1, 1), (0, 2, 0), (2, 0, 2)]:
+            response = test_client.get(url_for("api.scenarios.get_trajectory", scenario_id=scenario_id,
+                                               driver_id=driver_id, timestamp=0,
+                                               v=grid["v"][v_index], t=grid["t"][t_index], d=grid["d"][d_index],
+                                               h=2.0, s=0))
+            trajectory = json.loads(response.data.decode("utf-8"))
+
+            feasibility_code = feasibility[v_index, t_index, d_index]
+            assert (feasibility_code == FEASIBLE) == trajectory["is_feasible"]
+            if feasibility_code == NOT_AVAILABLE:
+                assert np.isnan(planned_states[v_index, t_index, d_index]).all()
+                continue
+
+            assert grid["infeasibility_reasons"][feasibility_code] == trajectory["infeasibility_reason"]
+            expected_states = [[state[feature] for feature in TRAJECTORY_GRID_FEATURES]
+                               for state in trajectory["trajectory"]["planned_states"]]
+            assert np.array_equal(planned_states[v_index, t_index, d_index], expected_states)
+
+
+def test_trajectory_grid_rejects_too_many_steps(flexcrash_test_app):
+    """
+    GIVEN the trajectory grid endpoint
+    WHEN a client asks for a grid that spans more steps than allowed, or that is not a number of steps
+    THEN the request is rejected, before looking up the scenario
+    """
+    sampling_parameters = {"v": 5.0, "d": 0.0, "t": 1.5, "h": 2.0, "s": 0}
+    with flexcrash_test_app.test_client() as test_client:
+        for steps in [MAX_TRAJECTORY_GRID_STEPS + 1, -1, "many"]:
+            response = test_client.get(url_for("api.scenarios.get_trajectory_grid", scenario_id=1, driver_id=1,
+                                               timestamp=0, n=steps, **sampling_parameters))
+            assert response.status_code == 400
@@ -0,0 +1,119 @@
+import pytest
+
+from types import SimpleNamespace
+
+from background import scheduler
+from background.scheduler import dispatch_scenario_in_background, drive_scenario_and_dispatch, visualize_planning_in_background
+
+from controller.internalav import drive_scenario, _should_visualize, VISUALIZATION_SAMPLED
+
+AVS = [(1, 11, "token", None)]
+
+
+def test_driving_processes_return_the_scenarios_to_wake_up(mocker):
+    def _drive_and_activate(*args, **kwargs):
+        # Submitting the states activates timestamp 7 for two scenarios
+        for scenario_id in [2, 3]:
+            dispatch_scenario_in_background(scenario_id, 7)
+        return []
+
+    mocked_function = mocker.patch('background.scheduler.drive_scenario')
+    mocked_function.side_effect = _drive_and_activate
+
+    assert drive_scenario_and_dispatch(1, AVS, "cache_dir").dispatches == [(2, 7), (3, 7)]
+    # Nothing is collected outside drive_scenario_and_dispatch
+    assert scheduler._worker_dispatches is None
+
+
+def test_driving_processes_do_not_return_the_scenarios_to_wake_up_if_driving_fails(mocker):
+    def _drive_and_fail(*args, **kwargs):
+        dispatch_scenario_in_background(2, 7)
+        raise AssertionError("Cannot update vehicle state at timestamp 7")
+
+    mocked_function = mocker.patch('background.scheduler.drive_scenario')
+    mocked_function.side_effect = _drive_and_fail
+
+    # The scheduler must see the exception
+    with pytest.raises(AssertionError):
+        drive_scenario_and_dispatch(1, AVS, "cache_dir")
+
+    assert scheduler._worker_dispatches is None
+
+
+def test_dispatching_without_scheduler_is_ignored():
+    # For instance, the scheduler is disabled during the tests
+    dispatch_scenario_in_background(2, 7)
+
+    assert scheduler._worker_dispatches is None
+
+
+def test_removing_the_job_forgets_the_dispatched_timestamps(mocker):
+    mocker.patch('background.scheduler.is_scheduler_running').return_value = True
+    mocked_wakeup = mocker.patch('background.scheduler._wakeup_avs')
+    mocked_scheduler = mocker.patch('background.scheduler.scheduler')
+    mocked_scheduler.get_job.return_value = SimpleNamespace(args=[5, AVS, "cache_dir"])
+    job_id = scheduler._get_job_id_by_scenario_id(5)
+
+    dispatch_scenario_in_background(5, 7)
+    dispatch_scenario_in_background(5, 7)
+    assert mocked_wakeup.call_count == 1
+
+    # The last AV of the scenario stops, so its job is removed
+    scheduler._remove_avs(job_id, [AVS[0][0]])
+    mocked_scheduler.remove_job.assert_called_once_with(job_id)
+    assert job_id not in scheduler._last_dispatched_timestamps
+
+    # The AVs deployed again in the scenario are woken up
+    dispatch_scenario_in_background(5, 7)
+    assert mocked_wakeup.call_count == 2
+
+    # Do not leak the dispatched timestamps into the other tests
+    scheduler._forget_dispatches(job_id)
+
+
+def test_driving_processes_return_the_planning_results_to_visualize(mocker):
+    def _drive_and_visualize(*args, **kwargs):
+        visualize_planning_in_background(1, 7, {"timestep": 7})
+        return []
+
+    mocked_function = mocker.patch('background.scheduler.drive_scenario')
+    mocked_function.side_effect = _drive_and_visualize
+    mocked_rendering = mocker.patch('background.scheduler.generate_planning_picture')
+
+    assert drive_scenario_and_dispatch(1, AVS, "cache_dir").visualizations == [(1, 7, {"timestep": 7})]
+    # The driving processes do not render
+    mocked_rendering.assert_not_called()
+    assert scheduler._worker_visualizations is None
+
+
+@pytest.mark.parametrize("visualization_sampling", [0, -1])
+def test_sampled_visualization_without_a_positive_sampling_is_off(visualization_sampling):
+    assert not _should_visualize(VISUALIZATION_SAMPLED, visualization_sampling, 10, False)
+    assert _should_visualize(VISUALIZATION_SAMPLED, 5, 10, False)
+
+
+def test_driving_processes_return_the_avs_to_stop(mocker):
+    mocked_function = mocker.patch('background.scheduler.drive_scenario')
+    mocked_function.return_value = [1]
+
+    assert drive_scenario_and_dispatch(1, AVS, "cache_dir").stopped_driver_ids == [1]
+
+
+def test_the_avs_of_a_scenario_share_its_states(mocker):
+    transport = mocker.Mock()
+    transport.get_scenario.return_value = SimpleNamespace(scenario_id=1, status="ACTIVE", duration=10)
+    mocked_function = mocker.patch('controller.internalav._drive_av')
+
+    def _fail_for_the_second_av(driver_id, *args, **kwargs):
+        if driver_id == 2:
+            raise AssertionError("The planner cannot find ANY trajectory!")
+
+    mocked_function.side_effect = _fail_for_the_second_av
+
+    avs = [(driver_id, 10 + driver_id, "token", transport) for driver_id in [1, 2, 3]]
+    assert drive_scenario(1, avs, "cache_dir") == [2]
+
+    # The scenario and its states are retrieved only once for all the AVs
+    transport.get_scenario.assert_called_once_with(1)
+    transport.get_vehicle_states_by_driver_between_timestamps.assert_called_once_with(1, 0, 10)
+    assert mocked_function.call_count == 3
@@ -0,0 +1,77 @@
+import copy
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from commonroad.geometry.shape import Rectangle
+
+from benchmarks.legacy_check_kinematics import legacy_check_kinematics
+from model.mixed_traffic_scenario_template import MixedTrafficScenarioTemplate
+from model.trajectory import TrajectorySampler
+from model.vehicle_state import VehicleState
+
+
+def _trajectory_bundle(xml_scenario_template, snap_to_road, speed_ms):
+    """ Sample a grid of trajectories starting on the first lanelet of the template, looking along it """
+    scenario_template = MixedTrafficScenarioTemplate(template_id=1, name="template", description="template",
+                                                     xml=xml_scenario_template)
+    center_vertices = scenario_template.as_commonroad_scenario().lanelet_network.lanelets[0].center_vertices
+    (position_x, position_y), (next_x, next_y) = center_vertices[1], center_vertices[2]
+    initial_state = VehicleState(timestamp=0, position_x=position_x, position_y=position_y,
+                                 rotation=math.atan2(next_y - position_y, next_x - position_x),
+                                 speed_ms=speed_ms, acceleration_m2s=0.0)
+    goal_region_as_rectangle = Rectangle(4.0, 4.0, np.array([position_x, position_y]), initial_state.rotation)
+
+    mixed_traffic_scenario = SimpleNamespace(scenario_id=1, duration=100, scenario_template=scenario_template)
+    sampler = TrajectorySampler(mixed_traffic_scenario, initial_state, goal_region_as_rectangle, snap_to_road)
+
+    sampler.sampled_t = [0.1, 0.5, 1.0, 1.5, 1.9]
+    sampler.sampled_d = [-2.0, -1.0, 0.0, 1.0, 2.0]
+    sampler.sampled_v = [0.0, 5.0, 10.0, 20.0, 25.0]
+    x_0_lon, x_0_lat = sampler._compute_initial_states(sampler._as_initial_state(initial_state))
+    return sampler, sampler._create_trajectory_bundle(x_0_lon, x_0_lat)
+
+
+def _positions(trajectories, trajectory_bundle):
+    positions = {id(trajectory): index for index, trajectory in enumerate(trajectory_bundle.trajectories)}
+    return [positions[id(trajectory)] for trajectory in trajectories]
+
+
+def _without_error_message(reason):
+    return "Error" if reason is not None and reason.startswith("Error") else reason
+
+
+@pytest.mark.parametrize("snap_to_road", [False, True], ids=["linear", "road"])
+@pytest.mark.parametrize("speed_ms", [1.0, 5.0, 10.0, 20.0])
+def test_check_kinematics_matches_the_step_by_step_check(xml_scenario_template, snap_to_road, speed_ms):
+    sampler, trajectory_bundle = _trajectory_bundle(xml_scenario_template, snap_to_road, speed_ms)
+    # Both checks store the Cartesian samples in the trajectories, so each one gets its own copy of them
+    legacy_trajectory_bundle = copy.deepcopy(trajectory_bundle)
+
+    legacy_feasible, legacy_infeasible, legacy_reasons = legacy_check_kinematics(sampler, legacy_trajectory_bundle)
+    feasible, infeasible, reasons = sampler.check_kinematics(trajectory_bundle)
+
+    # The step-by-step check lists twice the trajectories that leave the reference path at their first step (it fails
+    # reporting the reason), and gives no reason for those that leave it later
+    legacy_infeasible = [trajectory for index, trajectory in enumerate(legacy_infeasible)
+                         if index == 0 or legacy_infeasible[index - 1] is not trajectory]
+    assert len(legacy_infeasible) == len(legacy_reasons)
+    legacy_reasons = [reason if reason.startswith("Rejected trajectory for leaving the reference path") and
+                      (legacy_reason is None or legacy_reason.startswith("Error")) else legacy_reason
+                      for legacy_reason, reason in zip(legacy_reasons, reasons)]
+
+    assert _positions(feasible, trajectory_bundle) == _positions(legacy_feasible, legacy_trajectory_bundle)
+    assert _positions(infeasible, trajectory_bundle) == _positions(legacy_infeasible, legacy_trajectory_bundle)
+    assert len(feasible) > 0 and len(infeasible) > 0
+    # Both report the errors they run into, but with their own message
+    assert [_without_error_message(reason) for reason in reasons] == \
+           [_without_error_message(reason) for reason in legacy_reasons]
+
+    for trajectory, legacy_trajectory in zip(feasible + infeasible, legacy_feasible + legacy_infeasible):
+        if legacy_trajectory.cartesian is None:
+            continue
+        for name in ["x", "y", "theta", "v", "a", "kappa", "kappa_dot"]:
+            assert np.array_equal(getattr(trajectory.cartesian, name), getattr(legacy_trajectory.cartesian, name),
+                                  equal_nan=True), name
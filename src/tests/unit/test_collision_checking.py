@@ -1,4 +1,10 @@
-from model.collision_checking import CollisionChecker
+import math
+import random
+
+import commonroad_dc.pycrcc as pycrcc
+
+from configuration.config import VEHICLE_WIDTH, VEHICLE_LENGTH
+from model.collision_checking import CollisionChecker, _colliding_pairs, _VEHICLE_RADIUS
 
 from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
 from persistence.vehicle_state_data_access import VehicleStateDAO
@@ -268,4 +274,25 @@ def test_collisions_is_not_reported_for_two_nonoverlapping_vehicles(mocker, vehi
     any_timestamp = 1
     crashed_drivers_with_states = collision_checker.check_for_collisions(scenario, any_timestamp)
 
-    assert len(crashed_drivers_with_states) == 0
\ No newline at end of file
+    assert len(crashed_drivers_with_states) == 0
+
+
+def test_broad_phase_keeps_all_the_colliding_pairs():
+    """
+    GIVEN many vehicles, some of which touch each other
+    WHEN we check only the pairs of vehicles whose bounding circles overlap
+    THEN we find the same collisions that checking all the pairs finds, in the same order
+    """
+    rng = random.Random(0)
+    # Include vehicles that barely touch, and vehicles that are exactly as far as their bounding circles
+    positions = [(rng.uniform(0.0, 60.0), rng.uniform(0.0, 10.0)) for _ in range(200)]
+    positions += [(100.0, 0.0), (100.0 + VEHICLE_LENGTH, 0.0), (200.0, 0.0), (200.0 + 2 * _VEHICLE_RADIUS, 0.0)]
+    rotations = [rng.uniform(-math.pi, math.pi) for _ in range(200)] + [0.0, 0.0, 0.0, 0.0]
+    obstacles = [pycrcc.RectOBB(VEHICLE_LENGTH / 2, VEHICLE_WIDTH / 2, rotation, position_x, position_y)
+                 for (position_x, position_y), rotation in zip(positions, rotations)]
+
+    all_colliding_pairs = [(i, j) for i in range(len(obstacles)) for j in range(i + 1, len(obstacles))
+                           if obstacles[i].collide(obstacles[j])]
+
+    assert (200, 201) in all_colliding_pairs
+    assert _colliding_pairs(obstacles, positions) == all_colliding_pairs
@@ -0,0 +1,41 @@
+import pytest
+
+from model.lru_cache import LRUCache
+
+
+@pytest.fixture
+def cache():
+    return LRUCache(max_size=2)
+
+
+def test_cache_hits_after_first_put(cache):
+    assert cache.get("a") is None
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "max_size": 2}
+
+
+def test_cache_evicts_the_least_recently_used_entry(cache):
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # "a" is now the most recently used one
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2, "max_size": 2}
+
+
+def test_cache_evicts_entries_by_key(cache):
+    cache.put((1, "x"), 1)
+    cache.put((2, "x"), 2)
+
+    cache.evict_if(lambda key: key[0] == 1)
+    assert cache.get((1, "x")) is None
+    cache.evict((2, "x"))
+    assert cache.stats()["size"] == 0
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "max_size": 2}
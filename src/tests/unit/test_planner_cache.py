@@ -0,0 +1,21 @@
+import pytest
+
+from exceptions.exceptions import StopMeException
+
+from controller.internalav import drive
+from controller.planner_cache import PlannerBundle, planner_cache
+
+
+def _planner_bundle():
+    return PlannerBundle("scenario", "planning_problem", "planner", "road_collision_checker", "base_collision_checker")
+
+
+def test_stopping_the_av_evicts_its_planner(mocker, tmp_path):
+    driver_id = 1
+    planner_cache.put(driver_id, _planner_bundle())
+    mocker.patch('controller.internalav.get_scenario', side_effect=StopMeException())
+
+    with pytest.raises(StopMeException):
+        drive(driver_id, 11, 1, "token", str(tmp_path), transport=mocker.Mock())
+
+    assert planner_cache.get(driver_id) is None
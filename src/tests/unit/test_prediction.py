@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+
+from controller.prediction import as_state_array, as_commonroad_states, constant_velocity, constant_acceleration, \
+    constant_turn_rate_and_velocity, X, Y, ROTATION, SPEED, ACCELERATION
+
+DT = 0.1
+
+
+def _driver_states(timestamps, positions_x, positions_y, rotations, speeds_ms, accelerations_m2s):
+    return SimpleNamespace(timestamps=timestamps, positions_x=positions_x, positions_y=positions_y,
+                           rotations=rotations, speeds_ms=speeds_ms, accelerations_m2s=accelerations_m2s)
+
+
+def _state_array(*states):
+    # One vehicle per state
+    return np.array([[state] for state in states], dtype=float)
+
+
+def test_as_state_array_pads_the_drivers_with_fewer_states():
+    drivers_states = [
+        _driver_states([0, 1, 2, 3], [0.0, 1.0, 2.0, 3.0], [0.0] * 4, [0.0] * 4, [10.0] * 4, [0.0] * 4),
+        _driver_states([2, 3], [5.0, 6.0], [1.0, 1.0], [0.0] * 2, [10.0] * 2, [0.0] * 2)
+    ]
+
+    state_array = as_state_array(drivers_states, 1, 3)
+
+    assert state_array.shape == (2, 3, 5)
+    assert list(state_array[0, :, X]) == [1.0, 2.0, 3.0]
+    assert list(state_array[1, :, X]) == [5.0, 5.0, 6.0]
+
+
+def test_constant_velocity():
+    # One vehicle going east, one going north
+    state_array = _state_array([0.0, 0.0, 0.0, 10.0, 1.0], [0.0, 0.0, np.pi / 2, 5.0, 0.0])
+
+    predicted_states = constant_velocity(state_array, 10, DT)
+
+    assert predicted_states.shape == (2, 10, 5)
+    assert predicted_states[0, -1, X] == pytest.approx(10.0)
+    assert predicted_states[1, -1, Y] == pytest.approx(5.0)
+    assert np.all(predicted_states[:, :, ACCELERATION] == 0.0)
+
+
+def test_constant_acceleration_does_not_go_reverse():
+    state_array = _state_array([0.0, 0.0, 0.0, 1.0, -1.0])
+
+    predicted_states = constant_acceleration(state_array, 20, DT)
+
+    # The vehicle stops after 1 second and 0.5 meters
+    assert predicted_states[0, -1, X] == pytest.approx(0.5)
+    assert predicted_states[0, -1, SPEED] == pytest.approx(0.0)
+    assert predicted_states[0, -1, ACCELERATION] == 0.0
+
+
+def test_constant_turn_rate_and_velocity():
+    # Turning left at pi/2 rad/s and 10 m/s
+    state_array = np.array([[[0.0, 0.0, -np.pi / 2 * DT, 10.0, 0.0], [0.0, 0.0, 0.0, 10.0, 0.0]]])
+
+    predicted_states = constant_turn_rate_and_velocity(state_array, 10, DT)
+
+    # After one second, the vehicle covered a quarter of circle
+    radius = 10.0 / (np.pi / 2)
+    assert predicted_states[0, -1, X] == pytest.approx(radius)
+    assert predicted_states[0, -1, Y] == pytest.approx(radius)
+    assert predicted_states[0, -1, ROTATION] == pytest.approx(np.pi / 2)
+
+
+def test_constant_turn_rate_and_velocity_goes_straight_without_turning():
+    state_array = np.array([[[0.0, 0.0, 0.0, 10.0, 0.0], [1.0, 0.0, 0.0, 10.0, 0.0]]])
+
+    assert np.allclose(constant_turn_rate_and_velocity(state_array, 10, DT), constant_velocity(state_array, 10, DT))
+
+
+def test_predicted_states_can_reuse_buffers():
+    state_array = _state_array([0.0, 0.0, 0.0, 10.0, 0.0])
+    buffer = np.empty((1, 10, 5))
+
+    predicted_states = constant_velocity(state_array, 10, DT, out=buffer)
+    commonroad_states = as_commonroad_states(predicted_states[0], 4)
+
+    assert predicted_states is buffer
+    assert [state.time_step for state in commonroad_states] == list(range(4, 14))
+    # Reusing the buffer does not change the CommonRoad states
+    buffer.fill(0.0)
+    assert commonroad_states[-1].position[0] == pytest.approx(10.0)
@@ -0,0 +1,27 @@
+from model.vehicle_state import VehicleState
+
+from persistence.database import db
+from persistence.utils import inject_where_statement_using_attributes, Between, In, NotNull
+
+
+def _where_clause(**kwargs):
+    stmt = inject_where_statement_using_attributes(db.select(VehicleState), VehicleState, **kwargs)
+    return str(stmt.whereclause.compile(compile_kwargs={"literal_binds": True}))
+
+
+def test_between_with_both_bounds():
+    assert "BETWEEN 3 AND 300" in _where_clause(timestamp=Between(3, 300))
+
+
+def test_between_with_one_bound():
+    assert ">= 3" in _where_clause(timestamp=Between(lower=3))
+    assert "<= 300" in _where_clause(timestamp=Between(upper=300))
+
+
+def test_in_and_pipe_separated_values_are_the_same():
+    assert _where_clause(status=In(["PENDING", "WAITING"])) == _where_clause(status="PENDING|WAITING")
+    assert " IN " in _where_clause(status="PENDING|WAITING")
+
+
+def test_not_null():
+    assert "IS NOT NULL" in _where_clause(position_x=NotNull())
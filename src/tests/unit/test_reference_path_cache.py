@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+
+from commonroad.geometry.shape import Rectangle
+
+from model.reference_path_cache import ReferencePathCache, reference_path_cache
+from model.trajectory import TrajectorySampler
+from model.vehicle_state import VehicleState
+
+
+@pytest.fixture
+def cache():
+    return ReferencePathCache()
+
+
+@pytest.fixture
+def empty_reference_path_cache():
+    reference_path_cache.clear()
+    yield reference_path_cache
+    reference_path_cache.clear()
+
+
+def _scenario(scenario_id=1):
+    # The linear reference path does not need the template
+    return SimpleNamespace(scenario_id=scenario_id, template_id=1, duration=10, scenario_template=None)
+
+
+def _initial_state(position_x=0.0):
+    return VehicleState(timestamp=0, position_x=position_x, position_y=0.0, rotation=0.0, speed_ms=10.0,
+                        acceleration_m2s=0.0)
+
+
+def _goal_region():
+    return Rectangle(4.0, 4.0, np.array([50.0, 0.0]), 0.0)
+
+
+def test_cache_keys_on_the_driver_the_option_and_the_fingerprint(cache):
+    cache.put(1, 1, True, "fingerprint", "reference_path")
+
+    assert cache.get(1, 1, True, "fingerprint") == "reference_path"
+    # Another option, another driver, or another initial state
+    assert cache.get(1, 1, False, "fingerprint") is None
+    assert cache.get(1, 2, True, "fingerprint") is None
+    assert cache.get(1, 1, True, "another fingerprint") is None
+
+
+def test_cache_invalidates_all_the_drivers_of_a_scenario(cache):
+    for driver_id in [1, 2]:
+        cache.put(1, driver_id, True, "fingerprint", "reference_path")
+    cache.put(2, 1, True, "fingerprint", "reference_path")
+    cache.invalidate(1)
+
+    assert cache.get(1, 1, True, "fingerprint") is None
+    assert cache.get(1, 2, True, "fingerprint") is None
+    assert cache.get(2, 1, True, "fingerprint") == "reference_path"
+
+
+def test_samplers_of_the_same_driver_share_the_reference_path(empty_reference_path_cache):
+    first = TrajectorySampler(_scenario(), _initial_state(), _goal_region(), False, driver_id=1)
+    # Different requests use different planning horizons
+    second = TrajectorySampler(_scenario(), _initial_state(), _goal_region(), False, 10, driver_id=1)
+
+    assert second._co is first._co
+    assert empty_reference_path_cache.stats()["hits"] == 1
+
+
+def test_samplers_do_not_share_the_reference_path_of_another_scenario(empty_reference_path_cache):
+    first = TrajectorySampler(_scenario(), _initial_state(), _goal_region(), False, driver_id=1)
+    # The scenario was deleted, and its id reused by another scenario
+    second = TrajectorySampler(_scenario(), _initial_state(position_x=10.0), _goal_region(), False, driver_id=1)
+
+    assert second._co is not first._co
+    assert second.get_reference_path()[0][0] != first.get_reference_path()[0][0]
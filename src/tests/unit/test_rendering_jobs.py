@@ -0,0 +1,62 @@
+import pickle
+
+from flask import Flask
+
+from background import rendering
+from background.scheduler import _configure_rendering_processes
+from background.rendering import init_rendering_process, render_scenario_state
+from configuration import config
+from model.scenario_cache import scenario_cache, hash_xml
+from model.vehicle_state import PlainVehicleState, VehicleStatusEnum
+
+
+def test_configure_rendering_processes():
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    _configure_rendering_processes(app)
+
+    pool_kwargs = app.config["SCHEDULER_EXECUTORS"]["rendering"]["pool_kwargs"]
+    assert pool_kwargs["initializer"] == init_rendering_process
+    assert pool_kwargs["initargs"][1] == app.instance_path
+    # The processes must receive the configuration
+    pickle.dumps(pool_kwargs)
+    # The configuration module is shared, so we must not change it
+    assert "pool_kwargs" not in config.SCHEDULER_EXECUTORS["rendering"]
+    assert "pool_kwargs" not in app.config["SCHEDULER_EXECUTORS"]["driving"]
+
+
+def test_rendering_jobs_resolve_cached_templates(mocker, xml_scenario_template):
+    mocked_rendering = mocker.patch('background.rendering.generate_frames')
+    mocked_app_context = mocker.patch('background.rendering._app_context')
+
+    scenario_state = [PlainVehicleState(3, 1.0, 2.0, 0.0, 10.0, 0.0, 1, 1, 1, VehicleStatusEnum.ACTIVE.value)]
+    scenario_cache.warm_up(1001, xml_scenario_template)
+    try:
+        render_scenario_state("output_folder", 1001, hash_xml(xml_scenario_template), 10, 1, scenario_state,
+                              [None, 1], {1: None})
+    finally:
+        scenario_cache.invalidate(1001)
+
+    # The template was there, so we did not access the database
+    mocked_app_context.assert_not_called()
+    args, kwargs = mocked_rendering.call_args
+    assert args[1].lanelet_network is not None
+    assert args[4] == scenario_state
+    assert kwargs["road_layer_key"] == (1001, hash_xml(xml_scenario_template))
+
+
+def test_rendering_processes_start_without_database(mocker):
+    mocker.patch('background.rendering._app_context', side_effect=Exception("No database"))
+
+    init_rendering_process({"SQLALCHEMY_DATABASE_URI": "sqlite://"}, "instance_path")
+
+    assert rendering._app_config == {"SQLALCHEMY_DATABASE_URI": "sqlite://"}
+    rendering._app_config, rendering._instance_path = None, None
+
+
+def test_plain_vehicle_states_compare_to_the_status_enum():
+    plain_state = PlainVehicleState(3, 1.0, 2.0, 0.0, 10.0, 0.0, 1, 1, 1, VehicleStatusEnum.CRASHED.value)
+
+    assert plain_state.status == VehicleStatusEnum.CRASHED
+    assert pickle.loads(pickle.dumps(plain_state)) == plain_state
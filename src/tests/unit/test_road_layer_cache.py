@@ -0,0 +1,51 @@
+import matplotlib.pyplot as plt
+import pytest
+
+from commonroad.common.file_reader import CommonRoadFileReader
+
+from visualization.road_layer_cache import RoadLayerCache
+
+
+@pytest.fixture
+def cache():
+    return RoadLayerCache()
+
+
+@pytest.fixture
+def commonroad_scenario(xml_scenario_template_as_file):
+    commonroad_scenario, _ = CommonRoadFileReader(filename=xml_scenario_template_as_file).open()
+    return commonroad_scenario
+
+
+def test_cache_keys_on_the_template_and_the_size(cache, commonroad_scenario):
+    road_layer = cache.get((1, "xml hash"), commonroad_scenario, (16, 6))
+
+    assert cache.get((1, "xml hash"), commonroad_scenario, (16, 6)) is road_layer
+    # Another size needs another figure, and so does another template
+    assert cache.get((1, "xml hash"), commonroad_scenario, (8, 3)) is not road_layer
+    assert cache.get((2, "xml hash"), commonroad_scenario, (16, 6)) is not road_layer
+
+
+def test_cache_returns_new_figures(cache, commonroad_scenario):
+    road_layer = cache.get((1, "xml hash"), commonroad_scenario, (16, 6))
+    first_fig, first_ax = road_layer.new_figure()
+    second_fig, second_ax = road_layer.new_figure()
+    try:
+        assert first_fig is not second_fig
+        # Both show the road layout
+        assert len(first_ax.collections) == len(second_ax.collections) > 0
+        assert first_ax.get_xlim() == second_ax.get_xlim() == road_layer.xlim
+
+        # Drawing on a figure does not change the other ones
+        first_ax.plot([0, 1], [0, 1])
+        assert len(second_ax.lines) == 0
+        assert len(road_layer.new_figure()[1].lines) == 0
+    finally:
+        plt.close("all")
+
+
+def test_road_layers_without_key_are_not_cached(cache, commonroad_scenario):
+    road_layer = cache.get(None, commonroad_scenario, (16, 6))
+
+    assert cache.get(None, commonroad_scenario, (16, 6)) is not road_layer
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from commonroad.geometry.shape import Rectangle
+from commonroad.scenario.obstacle import ObstacleType, StaticObstacle
+from commonroad.scenario.scenario import State
+
+from model.scenario_cache import ParsedScenarioCache, hash_xml
+
+
+@pytest.fixture
+def cache():
+    return ParsedScenarioCache()
+
+
+def test_cache_shares_the_road_but_not_the_obstacles(cache, xml_scenario_template):
+    first = cache.get_scenario(1, xml_scenario_template)
+    second = cache.get_scenario(1, xml_scenario_template)
+
+    assert first is not second
+    assert first.lanelet_network is second.lanelet_network
+    assert cache.get_lanelet_network(1, xml_scenario_template) is first.lanelet_network
+
+    # Callers add the other vehicles to their own scenario
+    first.add_objects(StaticObstacle(first.generate_object_id(), ObstacleType.PARKED_VEHICLE, Rectangle(4.0, 2.0),
+                                     State(position=np.array([0.0, 0.0]), orientation=0.0, time_step=0)))
+    assert len(first.obstacles) == 1
+    assert len(second.obstacles) == 0
+    assert len(cache.get_scenario(1, xml_scenario_template).obstacles) == 0
+
+
+def test_cache_detects_changed_xml(cache, xml_scenario_template):
+    cache.get_scenario(1, xml_scenario_template)
+    # Same template id, but different content
+    cache.get_scenario(1, xml_scenario_template.replace("Alessio Gambi", "Someone Else"))
+
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_invalidates_all_the_versions_of_a_template(cache, xml_scenario_template):
+    cache.get_scenario(1, xml_scenario_template)
+    cache.get_scenario(1, xml_scenario_template.replace("Alessio Gambi", "Someone Else"))
+    cache.get_scenario(2, xml_scenario_template)
+    cache.invalidate(1)
+
+    assert cache.stats()["size"] == 1
+    assert cache.get_scenario_by_xml_hash(1, hash_xml(xml_scenario_template)) is None
+    assert cache.get_scenario_by_xml_hash(2, hash_xml(xml_scenario_template)) is not None
+
+
+def test_cache_by_xml_hash_after_warm_up(cache, xml_scenario_template):
+    # Nothing to return before the template is parsed
+    assert cache.get_scenario_by_xml_hash(1, hash_xml(xml_scenario_template)) is None
+
+    cache.warm_up(1, xml_scenario_template)
+    first = cache.get_scenario_by_xml_hash(1, hash_xml(xml_scenario_template))
+    second = cache.get_scenario_by_xml_hash(1, hash_xml(xml_scenario_template))
+
+    assert first is not None and first is not second
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from model.vehicle_state import VehicleStatusEnum
+from persistence.scenario_frame_data_access import ScenarioFrameDAO, get_frame_file_name
+
+
+@pytest.fixture
+def scenario():
+    return SimpleNamespace(scenario_id=1, drivers=[SimpleNamespace(user_id=2, driver_id=1)])
+
+
+def _scenario_dao(mocker, *statuses):
+    scenario_dao = mocker.MagicMock()
+    scenario_dao.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp.return_value = \
+        [SimpleNamespace(status=status) for status in statuses]
+    return scenario_dao
+
+
+def _app_config(tmp_path):
+    return {"SCENARIO_IMAGES_FOLDER": str(tmp_path), "TEMPLATE_IMAGES_FOLDER": str(tmp_path)}
+
+
+def _fake_rendering(images_folder, scenario, scenario_states, goal_regions_as_rectangles, global_view=True,
+                    force_render_now=False):
+    # Rendering is slow, so concurrent requests overlap
+    time.sleep(0.1)
+    for user_id in ([None] if global_view else []) + list(goal_regions_as_rectangles.keys()):
+        file_name = get_frame_file_name(scenario.scenario_id, scenario_states[0].timestamp, user_id)
+        open(os.path.join(images_folder, file_name), "w").close()
+
+
+def test_frame_file_names():
+    assert get_frame_file_name(1, 3) == "scenario_1_timestamp_3.png"
+    assert get_frame_file_name(1, 3, 2) == "scenario_1_timestamp_3_driver_2.png"
+
+
+def test_frames_are_rendered_once(mocker, tmp_path, scenario):
+    mocked_rendering = mocker.patch('persistence.scenario_frame_data_access.render_in_background',
+                                    side_effect=_fake_rendering)
+    scenario_dao = _scenario_dao(mocker, VehicleStatusEnum.ACTIVE, VehicleStatusEnum.CRASHED)
+    for vehicle_state in scenario_dao.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp.return_value:
+        vehicle_state.timestamp = 3
+    scenario_frame_dao = ScenarioFrameDAO(_app_config(tmp_path), scenario_dao)
+
+    # Many requests for the same frame at once
+    file_paths = []
+    requests = [threading.Thread(target=lambda: file_paths.append(scenario_frame_dao.get_frame(scenario, 3, 2)))
+                for _ in range(4)]
+    for request in requests:
+        request.start()
+    for request in requests:
+        request.join()
+
+    assert file_paths == [os.path.join(str(tmp_path), "scenario_1_timestamp_3_driver_2.png")] * 4
+    mocked_rendering.assert_called_once()
+    _, kwargs = mocked_rendering.call_args
+    assert kwargs["force_render_now"] and not kwargs["global_view"]
+
+    # The global view is another frame
+    scenario_frame_dao.get_frame(scenario, 3)
+    assert mocked_rendering.call_count == 2
+
+
+def test_frames_of_pending_states_are_not_rendered(mocker, tmp_path, scenario):
+    mocked_rendering = mocker.patch('persistence.scenario_frame_data_access.render_in_background')
+    scenario_dao = _scenario_dao(mocker, VehicleStatusEnum.ACTIVE, VehicleStatusEnum.PENDING)
+    scenario_frame_dao = ScenarioFrameDAO(_app_config(tmp_path), scenario_dao)
+
+    with pytest.raises(AssertionError):
+        scenario_frame_dao.get_frame(scenario, 3)
+
+    mocked_rendering.assert_not_called()
+
+
+def test_road_specs_are_generated_once(mocker, tmp_path, scenario):
+    def _fake_road_spec(output_folder, commonroad_scenario, road_layer_key):
+        time.sleep(0.1)
+        open(os.path.join(output_folder, "road_7_abc.json"), "w").close()
+
+    mocked_road_spec = mocker.patch('persistence.scenario_frame_data_access.generate_road_spec',
+                                    side_effect=_fake_road_spec)
+    mocker.patch('persistence.scenario_frame_data_access.generate_scene', return_value={"timestamp": 3})
+    scenario.scenario_template = mocker.MagicMock()
+    scenario.scenario_template.get_road_layer_key.return_value = (7, "abc")
+    scenario_dao = _scenario_dao(mocker, VehicleStatusEnum.ACTIVE, VehicleStatusEnum.GOAL_REACHED)
+    scenario_frame_dao = ScenarioFrameDAO(_app_config(tmp_path), scenario_dao)
+
+    # Many scenes of the same template at once
+    scenes = []
+    requests = [threading.Thread(target=lambda: scenes.append(scenario_frame_dao.get_scene(scenario, 3, 2)))
+                for _ in range(4)]
+    for request in requests:
+        request.start()
+    for request in requests:
+        request.join()
+
+    assert [scene["road"] for scene in scenes] == [os.path.join(str(tmp_path), "road_7_abc.json")] * 4
+    mocked_road_spec.assert_called_once()
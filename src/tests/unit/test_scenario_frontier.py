@@ -0,0 +1,9 @@
+from model.vehicle_state import VehicleStatusEnum
+from model.scenario_frontier import is_settled
+
+
+def test_is_settled():
+    assert is_settled({VehicleStatusEnum.ACTIVE: 1, VehicleStatusEnum.CRASHED: 1})
+    assert is_settled({VehicleStatusEnum.GOAL_REACHED: 2})
+    assert not is_settled({VehicleStatusEnum.ACTIVE: 1, VehicleStatusEnum.WAITING: 1})
+    assert not is_settled({VehicleStatusEnum.PENDING: 2})
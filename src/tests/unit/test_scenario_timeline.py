@@ -0,0 +1,34 @@
+from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
+from model.vehicle_state import VehicleStatusEnum
+from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
+
+
+def test_derive_scenario_states():
+    # Two drivers. Timestamps 0 and 1 are settled, 2 is waiting for one driver, 3 is still untouched
+    status_counts = {
+        0: {VehicleStatusEnum.ACTIVE: 2},
+        1: {VehicleStatusEnum.ACTIVE: 1, VehicleStatusEnum.CRASHED: 1},
+        2: {VehicleStatusEnum.WAITING: 1, VehicleStatusEnum.CRASHED: 1},
+        3: {VehicleStatusEnum.PENDING: 1, VehicleStatusEnum.CRASHED: 1},
+    }
+
+    timeline = MixedTrafficScenarioDAO._derive_scenario_states(status_counts, range(0, 5))
+
+    assert timeline == [
+        MixedTrafficScenarioStatusEnum.DONE,
+        MixedTrafficScenarioStatusEnum.ACTIVE,
+        MixedTrafficScenarioStatusEnum.PENDING,
+        MixedTrafficScenarioStatusEnum.PENDING,
+        MixedTrafficScenarioStatusEnum.WAITING
+    ]
+
+
+def test_derive_scenario_states_last_timestamp_is_done():
+    status_counts = {
+        0: {VehicleStatusEnum.ACTIVE: 1},
+        1: {VehicleStatusEnum.GOAL_REACHED: 1},
+    }
+
+    timeline = MixedTrafficScenarioDAO._derive_scenario_states(status_counts, range(0, 2))
+
+    assert timeline == [MixedTrafficScenarioStatusEnum.DONE, MixedTrafficScenarioStatusEnum.DONE]
@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from commonroad.common.file_reader import CommonRoadFileReader
+from commonroad.geometry.shape import Rectangle
+
+from configuration.config import VEHICLE_LENGTH, VEHICLE_WIDTH
+from tests.utils import initial_full_state
+from visualization.scene import generate_road_spec, generate_scene
+
+
+@pytest.fixture
+def scenario_state():
+    # 2 Drivers at the same timestamp. The first one crashed
+    state_gen = initial_full_state(2)
+    return [next(state_gen)._replace(user_id=1, driver_id=1, timestamp=3, status="CRASHED"),
+            next(state_gen)._replace(user_id=2, driver_id=2, timestamp=3)]
+
+
+def test_global_scene(scenario_state):
+    scene = generate_scene(scenario_state)
+
+    assert scene["timestamp"] == 3
+    assert scene["goal_region"] is None and scene["ego"] is None
+    assert [vehicle["user_id"] for vehicle in scene["vehicles"]] == [1, 2]
+
+    crashed, active = scene["vehicles"]
+    assert crashed["edgecolor"] == "rgba(255, 0, 0, 0.4)" and crashed["linewidth"] == 3.0
+    assert active["edgecolor"] == "rgba(0, 0, 0, 1.0)" and active["linewidth"] == 1.0
+
+    # The box has the size of the vehicle and is centered on it
+    box = np.array(active["box"])
+    assert np.allclose(box.mean(axis=0), active["position"], atol=0.01)
+    assert np.linalg.norm(box[1] - box[0]) == pytest.approx(VEHICLE_LENGTH, abs=0.02)
+    assert np.linalg.norm(box[2] - box[1]) == pytest.approx(VEHICLE_WIDTH, abs=0.02)
+    # No distances without an ego
+    assert "meters from you" not in active["tooltip"]
+
+
+def test_scene_focusing_on_driver(scenario_state):
+    ego_state = scenario_state[1]
+    goal_region = Rectangle(4.0, 2.0, center=np.array([ego_state.position_x + 10.0, ego_state.position_y]))
+
+    scene = generate_scene(scenario_state, 2, goal_region)
+
+    assert scene["ego"] == [round(ego_state.position_x, 2), round(ego_state.position_y, 2)]
+    assert np.allclose(np.array(scene["goal_region"]["box"]).mean(axis=0), goal_region.center, atol=0.01)
+    # The goal region has the color of the vehicle
+    assert scene["goal_region"]["facecolor"].rsplit(",", 1)[0] == scene["vehicles"][1]["facecolor"].rsplit(",", 1)[0]
+
+    other, ego = scene["vehicles"]
+    assert "Your vehicle" in ego["tooltip"]
+    assert "The vehicle is about 7.43 meters from you" in other["tooltip"]
+
+    # The scene goes to the browser as it is
+    json.dumps(scene)
+
+
+def test_road_spec(tmp_path, xml_scenario_template_as_file):
+    commonroad_scenario, _ = CommonRoadFileReader(filename=xml_scenario_template_as_file).open()
+
+    output_folder = tmp_path / "road_specs"
+    output_folder.mkdir()
+
+    file_path = generate_road_spec(str(output_folder), commonroad_scenario, (1001, "xml hash"))
+
+    assert file_path == os.path.join(str(output_folder), "road_1001_xml hash.json")
+    # Only the road spec is left in the folder
+    assert os.listdir(str(output_folder)) == ["road_1001_xml hash.json"]
+    with open(file_path) as road_spec_file:
+        road_spec = json.load(road_spec_file)
+    assert len(road_spec["axes"]) == 1
+    assert len(road_spec["axes"][0]["collections"]) > 0
@@ -0,0 +1,103 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from model.vehicle_state import VehicleState, VehicleStatusEnum
+from persistence import trajectory_cache
+from persistence.trajectory_cache import TrajectoryCache, driver_state_fingerprint, get_trajectory_cache
+
+
+@pytest.fixture
+def cache_config(tmp_path):
+    return {"TRAJECTORY_CACHE_FILE": str(tmp_path / "trajectory_cache.sqlite"), "TRAJECTORY_CACHE_SIZE": 2}
+
+
+def _driver_state(position_x=0.0):
+    return VehicleState(status=VehicleStatusEnum.ACTIVE, timestamp=0, position_x=position_x, position_y=0.0,
+                        rotation=0.0, speed_ms=10.0, acceleration_m2s=0.0)
+
+
+def test_cache_hits_and_misses(cache_config):
+    cache = TrajectoryCache(cache_config)
+    cache.put(1, 1, 0, "fingerprint", (0.0, 1.5, 10.0, 2.0, True), "response", 200)
+
+    assert cache.get(1, 1, 0, "fingerprint", (0.0, 1.5, 10.0, 2.0, True)) == ("response", 200)
+    # Other parameters, another timestamp, or another state of the driver
+    assert cache.get(1, 1, 0, "fingerprint", (0.5, 1.5, 10.0, 2.0, True)) is None
+    assert cache.get(1, 1, 1, "fingerprint", (0.0, 1.5, 10.0, 2.0, True)) is None
+    assert cache.get(1, 1, 0, "another fingerprint", (0.0, 1.5, 10.0, 2.0, True)) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["hit_rate"] == 0.25
+
+
+def test_processes_share_the_cache(cache_config):
+    # Each worker creates its own cache object over the same file
+    TrajectoryCache(cache_config).put(1, 1, 0, "fingerprint", ("parameters",), "response", 422)
+
+    cache = TrajectoryCache(cache_config)
+    assert cache.get(1, 1, 0, "fingerprint", ("parameters",)) == ("response", 422)
+    assert cache.stats()["hits"] == 1
+    assert TrajectoryCache(cache_config).stats()["hits"] == 1
+
+
+def test_cache_invalidate_and_eviction(cache_config):
+    cache = TrajectoryCache(cache_config)
+    cache.put(1, 1, 0, "fingerprint", ("parameters",), "response", 200)
+    cache.put(1, 2, 0, "fingerprint", ("parameters",), "response", 200)
+    cache.invalidate(1, driver_id=1)
+    assert cache.get(1, 1, 0, "fingerprint", ("parameters",)) is None
+    assert cache.get(1, 2, 0, "fingerprint", ("parameters",)) is not None
+
+    cache.invalidate(1)
+    assert cache.stats()["size"] == 0
+
+    for scenario_id in [2, 3]:
+        cache.put(scenario_id, 1, 0, "fingerprint", ("parameters",), "response", 200)
+    # Use scenario 2, so scenario 3 is the least recently used
+    assert cache.get(2, 1, 0, "fingerprint", ("parameters",)) is not None
+    cache.put(4, 1, 0, "fingerprint", ("parameters",), "response", 200)
+
+    assert cache.stats()["size"] == 2
+    assert cache.get(3, 1, 0, "fingerprint", ("parameters",)) is None
+    assert cache.get(2, 1, 0, "fingerprint", ("parameters",)) is not None
+
+
+def _recorded_hits(cache_config):
+    with closing(sqlite3.connect(cache_config["TRAJECTORY_CACHE_FILE"])) as connection:
+        entry = connection.execute("SELECT value FROM statistics WHERE name = 'hits'").fetchone()
+    return entry[0] if entry is not None else 0
+
+
+def test_hits_are_recorded_once_in_a_while(cache_config, mocker):
+    cache = TrajectoryCache(cache_config)
+    cache.put(1, 1, 0, "fingerprint", ("parameters",), "response", 200)
+
+    # Hits only read the file
+    for _ in range(3):
+        assert cache.get(1, 1, 0, "fingerprint", ("parameters",)) is not None
+    assert _recorded_hits(cache_config) == 0
+
+    # Until it is time to record them
+    mocker.patch.object(trajectory_cache, "USES_FLUSH_INTERVAL_IN_SECONDS", 0.0)
+    assert cache.get(1, 1, 0, "fingerprint", ("parameters",)) is not None
+    assert _recorded_hits(cache_config) == 4
+    assert cache.stats()["hits"] == 4
+
+
+def test_requests_share_the_cache_of_the_process(cache_config, mocker):
+    create_schema = mocker.spy(TrajectoryCache, "_create_schema")
+
+    get_trajectory_cache(cache_config).put(1, 1, 0, "fingerprint", ("parameters",), "response", 200)
+    get_trajectory_cache(cache_config).get(1, 1, 0, "fingerprint", ("parameters",))
+    # The hit was not recorded yet, but the cache did not forget it
+    assert get_trajectory_cache(cache_config).stats()["hits"] == 1
+    assert create_schema.call_count == 1
+
+
+def test_fingerprint_changes_with_the_driver_state():
+    assert driver_state_fingerprint(_driver_state()) == driver_state_fingerprint(_driver_state())
+    assert driver_state_fingerprint(_driver_state()) != driver_state_fingerprint(_driver_state(position_x=1.0))
@@ -83,4 +83,36 @@ def test_smoke_test(flexcrash_test_app_with_a_scenario_template_and_given_users)
         # rnd = MPRenderer()
         # # Create A trajectory
         # trajectory.draw(rnd)
-        plt.show()
\ No newline at end of file
+        plt.show()
+
+
+def test_reference_path_indices_match_the_closest_point():
+    from model.trajectory import _reference_path_indices, extend_ref_path_by
+
+    # extend_ref_path_by repeats the last point of the path, so the path length has two equal values
+    ref_path = extend_ref_path_by(np.array([[0.0, 0.0], [1.0, 0.0], [2.5, 0.0], [3.0, 0.0]]), 0.5, 4)
+    ref_pos = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(ref_path, axis=0), axis=1))])
+    s = np.linspace(-1.0, 6.0, 141)
+
+    expected = []
+    for s_i in s:
+        s_idx = np.argmin(np.abs(ref_pos - s_i))
+        if ref_pos[s_idx] < s_i:
+            s_idx += 1
+        expected.append(s_idx)
+
+    assert list(_reference_path_indices(ref_pos, s)) == expected
+
+
+def test_interpolate_angles_match_interpolate_angle():
+    from commonroad_rp.utils import interpolate_angle
+    from model.trajectory import _interpolate_angles
+
+    x1, x2 = np.array([0.0, 1.0, 2.0, 3.0]), np.array([1.0, 2.0, 3.0, 4.0])
+    # Around the wrapping point, and angles beyond 2 * pi
+    y1, y2 = np.array([3.0, -3.0, 6.0, -13.0]), np.array([-3.0, 3.0, 7.0, -12.0])
+    x = np.array([0.5, 1.25, 2.0, 3.75])
+
+    expected = [interpolate_angle(*values) for values in zip(x, x1, x2, y1, y2)]
+
+    assert list(_interpolate_angles(x, x1, x2, y1, y2)) == expected
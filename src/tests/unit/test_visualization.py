@@ -1,8 +1,10 @@
 import math
+import os
 import numpy as np
 import pytest
 
-from visualization.mixed_traffic_scenario import generate_picture
+from visualization.mixed_traffic_scenario import generate_picture, generate_pictures
+from commonroad.geometry.shape import Rectangle
 from commonroad.common.file_reader import CommonRoadFileReader
 from commonroad.common.file_writer import CommonRoadFileWriter
 from commonroad.scenario.scenario import State
@@ -37,10 +39,9 @@ def test_visualize_vehicle(tmp_path, xml_scenario_template_as_file):
     goal_region_as_rectangle = None
 
     # Generate the PNG
-    render_png = True
     figsize = (16, 6)
 
-    generate_picture(render_png, figsize,
+    generate_picture(figsize,
                      output_folder, commonroad_scenario, mixed_traffic_scenario_duration,
                      mixed_traffic_scenario_scenario_id,
                      scenario_state,
@@ -49,6 +50,37 @@ def test_visualize_vehicle(tmp_path, xml_scenario_template_as_file):
     pass
 
 
+def test_visualize_all_the_views_at_once(tmp_path, xml_scenario_template_as_file):
+
+    output_folder = tmp_path
+    commonroad_scenario, planning_problem_set = CommonRoadFileReader(filename=xml_scenario_template_as_file).open()
+    mixed_traffic_scenario_duration = 5
+    mixed_traffic_scenario_scenario_id = 1
+
+    # 2 Drivers at the same timestamp
+    state_gen = initial_full_state(2)
+    scenario_state = [next(state_gen)._replace(user_id=user_id, driver_id=user_id, timestamp=3) for user_id in [1, 2]]
+
+    goal_regions_as_rectangles = {
+        vehicle_state.user_id: Rectangle(4.0, 2.0, center=np.array([vehicle_state.position_x + 10.0, vehicle_state.position_y]))
+        for vehicle_state in scenario_state
+    }
+
+    # The global view and the views of both drivers
+    plt_paths = generate_pictures((16, 6),
+                                  output_folder, commonroad_scenario, mixed_traffic_scenario_duration,
+                                  mixed_traffic_scenario_scenario_id,
+                                  scenario_state,
+                                  [None, 1, 2], goal_regions_as_rectangles)
+
+    assert [os.path.basename(plt_path) for plt_path in plt_paths] == [
+        "scenario_1_timestamp_3.png",
+        "scenario_1_timestamp_3_driver_1.png",
+        "scenario_1_timestamp_3_driver_2.png"
+    ]
+    assert all(os.path.exists(plt_path) for plt_path in plt_paths)
+
+
 # Ensure the ORM and the rest is setup
 @pytest.mark.skip("Manual test. Requires showing plots")
 def test_visualize_vehicle_along_the_road(tmp_path, flexcrash_test_app, xml_scenario_template_as_file):
@@ -1,8 +1,13 @@
+import base64
+import math
+import os
 import uuid
 
 from itertools import cycle
 
-from flask import current_app, request
+import numpy as np
+
+from flask import current_app, request, url_for
 from flask import Blueprint
 
 from typing import Tuple
@@ -16,16 +21,18 @@ from persistence.mixed_scenario_template_data_access import MixedTrafficScenario
 from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
 from persistence.vehicle_state_data_access import VehicleStateDAO
 from persistence.driver_data_access import DriverDAO
+from persistence.trajectory_cache import get_trajectory_cache, driver_state_fingerprint
+from persistence.scenario_frame_data_access import ScenarioFrameDAO
 
 from model.vehicle_state import VehicleState, VehicleStatusEnum
-from model.collision_checking import CollisionChecker
-from model.trajectory import TrajectorySampler, TrajectorySchema
+from model.trajectory import TrajectorySampler, TrajectorySchema, T_SEC_MIN, V_METER_PER_SEC_MIN, V_METER_PER_SEC_MAX
 from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
 
-from api.serialization import MixedTrafficScenarioSchema, VehicleStateSchema, DriverSchema
+from api.serialization import MixedTrafficScenarioSchema, VehicleStateSchema, DriverSchema, dump_vehicle_states_by_driver
 
 from background.scheduler import deploy_av_in_background, undeploy_av
 from views.authentication import jwt_required, create_the_token
+from frontend.authentication import login_required, current_user
 import json
 
 # References:
@@ -50,23 +57,6 @@ trajectories_schema = TrajectorySchema(many=True)
 
 from background import scheduler
 
-def _check_scenario_completion(scenario):
-    """ Check whether the scenario is over and update its status in the db"""
-    if scenario.status == MixedTrafficScenarioStatusEnum.WAITING:
-        return
-
-    mixed_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
-    vehicle_state_dao = VehicleStateDAO(current_app.config, mixed_scenario_dao)
-    # TODO This is an approximation, we should check all the states !
-    # Get the state of all the vehicles
-    last_scenario_state = vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id, scenario.duration)
-    if all([vehicle_state.status == VehicleStatusEnum.ACTIVE or vehicle_state.status == VehicleStatusEnum.CRASHED or vehicle_state.status == VehicleStatusEnum.GOAL_REACHED for vehicle_state in last_scenario_state]):
-        current_app.logger.info("Scenario {} is over".format(scenario.scenario_id))
-        mixed_scenario_dao.close_scenario(scenario)
-        for driver in scenario.drivers:
-            if driver.user.username.startswith("bot_"):
-                undeploy_av(driver)
-
 @scenarios_api.route("/", methods=["GET"])
 @jwt_required()
 def get_scenarios():
@@ -433,32 +423,6 @@ def delete(scenario_id):
     return "", 200
 
 
-def _check_collisions(scenario, driver, scenario_state):
-    # TODO: We have check collisions in two places, here and in data_access#1500. Why?!
-
-    # Note there must be at least one state
-    # TODO Why not simply timestamp as input?
-    timestamp = scenario_state[0].timestamp
-    #
-    current_app.logger.info("Checking collision for scenario {} at timestamp {} ".format(scenario.scenario_id, timestamp))
-    # Invoke the collision checker and if a state is CRASH it cannot be restored (must remain CRASH)
-    mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
-    vehicle_state_dao = VehicleStateDAO(current_app.config,mixed_traffic_scenario_dao)
-
-    collision_checker = CollisionChecker(vehicle_state_dao)
-    crashed_drivers_with_states = collision_checker.check_for_collisions(scenario, timestamp)
-
-    for crashed_driver, crash_state in crashed_drivers_with_states:
-        # Update ONLY the states for this driver. This results in possibly checking the same collision multiple times
-        if crashed_driver.user_id == driver.user_id:
-            vehicle_state_dao.driver_crashed_at_timestamp_in_scenario(scenario, crashed_driver, crash_state)
-            # Notify the crash happened
-            return True
-
-    # Notify the crash did not happened for this driver
-    return False
-
-
 def _check_and_activate_scenario(scenario):
     """
     Check whether we filled all the positions for the scenario and whether the scenario is valid:
@@ -761,95 +725,38 @@ def update_vehicle_states(scenario_id: int, user_id: int):
 
     vehicle_state_dao = VehicleStateDAO(current_app.config, mixed_traffic_scenario_dao)
 
-    # To update many states, we update one state after the other in the context of the same request, unless those are ACTIVE or CRASH
-    skip_reset = False
-    for planned_state in planned_states:
-
-        # TODO Not sure this  is the best, but if we go over board, we silently capture the error (but do not fail)
-        if planned_state.timestamp <= scenario.duration:
-
-            # This update the scenario state to WAITING or ACTIVE, but if it is CRASH or GOAL_REACHED do not do anything...
-            skip_remaining_planned_states = vehicle_state_dao.update_driver_state_in_scenario(scenario, driver, planned_state)
-
-            if skip_remaining_planned_states:
-                current_app.logger.info("Driver {} is Done. Skip all the remaining planned states".format(driver.user_id))
-                skip_reset = True
-                break
-
-            # Refresh the scenario state
-            scenario_state = vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario.scenario_id,
-                                                                                              planned_state.timestamp)
-
-            # At this point we need to check for ALREADY HAPPENED collisions
-            # Is the state ready for checking? all ACTIVE or CRASH
-            # NOT SURE why we check collisions ONE BY ONE...
-            if all(s.status == VehicleStatusEnum.ACTIVE or s.status == VehicleStatusEnum.CRASHED for s in scenario_state):
-                if _check_collisions(scenario, driver, scenario_state):
-                    # Do not try to update the other states, as they are already updated by the previous call
-                    current_app.logger.info("> Do not try to update the other states, as they are already updated by the previous call")
-                    break
-
-            current_app.logger.info("Planned State for user {} at timestamp {}"
-                                    .format(driver.user_id, planned_state.timestamp))
-            #
-            # Not necessary anymore, AVS are autonomous now
-            # _trigger_avs(scenario, planned_state.timestamp)
-        else:
-            current_app.logger.info("Planned State for user {} at timestamp {} is over duration {}. "
-                                    "Ignore it".format(driver.user_id, planned_state.timestamp, scenario.duration))
-
-    # Delete any future state to ensure nothing spurious remains from previous planning if any planning took place.
-    # Reset should be skipped for CRASH and GOAL_REACHED
-    if not skip_reset:
-        timestamp_to_delete = planned_states[-1].timestamp + 1
-        while timestamp_to_delete <= scenario.duration:
-            current_app.logger.info("Resetting State for user {} at timestamp {}"
-                                    .format(driver.user_id, timestamp_to_delete))
-            # TODO Make this updates in bulk
-            vehicle_state_dao.reset_state_for_driver_in_scenario_at_timestamp(driver, scenario, timestamp_to_delete)
-            timestamp_to_delete = timestamp_to_delete + 1
+    # Write all the states at once, unless those are ACTIVE or CRASH, and delete any future state to ensure nothing
+    # spurious remains from previous planning. This also makes the scenario evolve if all the drivers have submitted
+    # their states
+    if vehicle_state_dao.update_driver_states_in_scenario(scenario, driver, planned_states):
+        current_app.logger.info("Driver {} is Done. Skip all the remaining planned states".format(driver.user_id))
 
     # Check whether the scenario is over
-    _check_scenario_completion(scenario)
+    mixed_traffic_scenario_dao.close_scenario_if_over(scenario)
 
     # We do not return anything here!
     return "", 204
 
 
-@scenarios_api.route("/<scenario_id>/drivers/<driver_id>/states/<timestamp>/trajectory", methods=["GET"])
-# @jwt_required()
-def get_trajectory(scenario_id, driver_id, timestamp):
-    """ Return a single trajectory with the given sampling parameters + reference path"""
-
-    assert "d" in request.args, "Missing lateral displacement parameter"
-    assert "t" in request.args, "Missing time to reach the state parameter"
-    assert "v" in request.args, "Missing speed parameter"
-    assert "h" in request.args, "Missing planning horizon parameter"
-    assert "s" in request.args, "Missing snap to road parameter"
-
-    # Get the current state of the driver in the scenario at given timestamp
-    # TODO This common logic might be refactored - START
-    # Does the scenario_id correspond to an existing scenario?
-    # here we want to get the value of user (i.e. ?user=some-value)
-    t = float(request.args.get('t'))
-    d = float(request.args.get('d'))
-    v = float(request.args.get('v'))
-    h = float(request.args.get('h'))
-    snap_to_road = request.args.get("s") != "0"
+def _get_driver_state(scenario_id, driver_id, timestamp):
+    """
+    Get the state of the driver at the given timestamp, from which we sample its trajectories.
 
+    :return: the scenario, the driver, and its state, or the error response if the scenario or the driver do not exist
+    """
     # Retrieve the scenario and all the elements needed to compute the trajectory given the sampling parameters
     mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
     scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
 
     if scenario is None:
-        return "Scenario not found", 404
+        return None, ("Scenario not found", 404)
 
     # user_dao = UserDAO()
     # driver = user_dao.get_user_by_user_id(driver_id)
     driver_dao = DriverDAO(current_app.config)
     driver = driver_dao.get_driver_by_driver_id(driver_id)
     if driver is None:
-        return "Driver not found", 404
+        return None, ("Driver not found", 404)
 
     vehicle_state_dao = VehicleStateDAO(current_app.config, mixed_traffic_scenario_dao)
 
@@ -863,18 +770,84 @@ def get_trajectory(scenario_id, driver_id, timestamp):
     # Which status should be ACTIVE? Meaning that from THAT state you can move on
     assert driver_state.status == VehicleStatusEnum.ACTIVE
 
+    return (scenario, driver, driver_state), None
+
+
+def _create_trajectory_sampler(scenario, driver, h, snap_to_road) -> TrajectorySampler:
+    """ Create the sampler of the trajectories of the driver with the planning horizon h """
+    mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
     mixed_traffic_scenario = scenario
     initial_state = mixed_traffic_scenario_dao.get_initial_state_for_driver_in_scenario(driver, scenario)
     goal_region_as_rectangle = mixed_traffic_scenario_dao.get_goal_region_for_driver_in_scenario(driver, scenario)
 
-    # Extracts the arguments from the URL, i.e., ?created_by=1&status="ACTIVE"
-    # args = request.args
     # Retrieve the N samples from the parameter h
     # TODO Might produce weird error for rounding?
     the_N = int(h / 0.1)
 
+    # Passing the driver, the sampler reuses the reference path computed by the previous requests
     trajectory_sampler = TrajectorySampler(mixed_traffic_scenario, initial_state, goal_region_as_rectangle,
-                                           snap_to_road, the_N)
+                                           snap_to_road, the_N, driver_id=driver.driver_id)
+    return trajectory_sampler
+
+
+# The feasibility codes of the trajectories, indexing the (human-understandable) reasons for their infeasibility
+FEASIBLE, TURN_TOO_FAST, ACCELERATE_TOO_FAST, MOVE_BACKWARDS, ROTATE_TOO_MUCH, WRONG_PARAMETERS, NOT_AVAILABLE = range(7)
+INFEASIBILITY_REASONS = ("",
+                         "you would turn too fast.",
+                         "you could not accelerate that fast.",
+                         "moving backwards is not allowed.",
+                         "you would rotate too much.",
+                         "the parameters are wrong.",
+                         "the trajectory is not available.")
+
+
+def _feasibility_code(infeasibility_reason) -> int:
+    """ Translate the infeasibility reason of the sampler into a feasibility code. TODO Might be imprecise! """
+    # Kappa and KappaDot
+    if "Kappa" in infeasibility_reason:
+        return TURN_TOO_FAST
+    elif "Acceleration" in infeasibility_reason:
+        return ACCELERATE_TOO_FAST
+    elif "Velocity" in infeasibility_reason:
+        return MOVE_BACKWARDS
+    elif "Theta_dot" in infeasibility_reason:
+        return ROTATE_TOO_MUCH
+    else:
+        return WRONG_PARAMETERS
+
+
+@scenarios_api.route("/<scenario_id>/drivers/<driver_id>/states/<timestamp>/trajectory", methods=["GET"])
+# @jwt_required()
+def get_trajectory(scenario_id, driver_id, timestamp):
+    """ Return a single trajectory with the given sampling parameters + reference path"""
+
+    assert "d" in request.args, "Missing lateral displacement parameter"
+    assert "t" in request.args, "Missing time to reach the state parameter"
+    assert "v" in request.args, "Missing speed parameter"
+    assert "h" in request.args, "Missing planning horizon parameter"
+    assert "s" in request.args, "Missing snap to road parameter"
+
+    # Extracts the arguments from the URL, i.e., ?t=1.5&d=0.0
+    t = float(request.args.get('t'))
+    d = float(request.args.get('d'))
+    v = float(request.args.get('v'))
+    h = float(request.args.get('h'))
+    snap_to_road = request.args.get("s") != "0"
+
+    scenario_driver_and_state, error_response = _get_driver_state(scenario_id, driver_id, timestamp)
+    if error_response is not None:
+        return error_response
+    scenario, driver, driver_state = scenario_driver_and_state
+
+    # Users go back and forth over the same parameters, so reuse the responses we already computed
+    trajectory_cache = get_trajectory_cache(current_app.config)
+    cache_key = (scenario.scenario_id, driver.driver_id, timestamp, driver_state_fingerprint(driver_state),
+                 ("trajectory", d, t, v, h, snap_to_road))
+    cached_response = trajectory_cache.get(*cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    trajectory_sampler = _create_trajectory_sampler(scenario, driver, h, snap_to_road)
 
     # TODO: Make sure this gets dumped to JSON properly
     # [state["position_x"], state["position_y"]]
@@ -901,19 +874,7 @@ def get_trajectory(scenario_id, driver_id, timestamp):
         # https://fjp.at/posts/optimal-frenet/
         if len(infeasible_trajectories) == 1:
             # Translate the error message in human-understandable message
-            # TODO Might be imprecise!
-
-            # Kappa and KappaDot
-            if "Kappa" in infeasibility_reasons[0]:
-                response_json["infeasibility_reason"] = "you would turn too fast."
-            elif "Acceleration" in infeasibility_reasons[0]:
-                response_json["infeasibility_reason"] = "you could not accelerate that fast."
-            elif "Velocity" in infeasibility_reasons[0]:
-                response_json["infeasibility_reason"] = "moving backwards is not allowed."
-            elif "Theta_dot" in infeasibility_reasons[0]:
-                response_json["infeasibility_reason"] = "you would rotate too much."
-            else:
-                response_json["infeasibility_reason"] = "the parameters are wrong."
+            response_json["infeasibility_reason"] = INFEASIBILITY_REASONS[_feasibility_code(infeasibility_reasons[0])]
 
         # The reference path
         response_json["reference_path"] = reference_path
@@ -942,7 +903,9 @@ def get_trajectory(scenario_id, driver_id, timestamp):
         code = 422
 
     # Send back the full JSON Object. We'll manage on the client to filter this out
-    return json.dumps(response_json), code
+    response = json.dumps(response_json)
+    trajectory_cache.put(*cache_key, response, code)
+    return response, code
 
     # # Simplify json we need to keep { sampling paramters + planned data as array of positions
     # simplified_json = {}
@@ -957,6 +920,132 @@ def get_trajectory(scenario_id, driver_id, timestamp):
     # return simplified_json
 
 
+# How many steps the trajectory grid spans by default on each side of the requested sampling parameters, and the
+# largest grid one can request ((2 * steps + 1)^3 trajectories)
+TRAJECTORY_GRID_STEPS = 2
+MAX_TRAJECTORY_GRID_STEPS = 4
+# The default step of the sampling parameters, the same of the driving page
+TRAJECTORY_GRID_DELTA_V = 0.28
+TRAJECTORY_GRID_DELTA_D = 0.5
+TRAJECTORY_GRID_DELTA_T = 0.1
+
+# The features of the planned states, in the order they are packed
+TRAJECTORY_GRID_FEATURES = ("position_x", "position_y", "rotation", "speed_ms", "acceleration_m2s")
+
+
+def _grid_axis(center, delta, steps, min_value=-math.inf, max_value=math.inf):
+    """ The values at the given number of steps around center (included) that fall in [min_value, max_value] """
+    return [center + step * delta for step in range(-steps, steps + 1) if min_value <= center + step * delta <= max_value]
+
+
+def _pack(values: np.ndarray) -> str:
+    """ Pack the values as base64 of little-endian float64, so the client can read them as a Float64Array """
+    return base64.b64encode(np.ascontiguousarray(values, dtype="<f8").tobytes()).decode("ascii")
+
+
+@scenarios_api.route("/<scenario_id>/drivers/<driver_id>/states/<timestamp>/trajectories", methods=["GET"])
+# @jwt_required()
+def get_trajectory_grid(scenario_id, driver_id, timestamp):
+    """
+    Return the grid of trajectories around the given sampling parameters + reference path, so the client can move
+    the sampling parameters without asking for each trajectory.
+
+    The grid spans n steps of dv, dd, and dt on each side of v, d, and t. Its axes are returned as "v", "t", and "d".
+    The planned states of all the trajectories are packed (see _pack) in a single array of shape
+    (len(v), len(t), len(d), n_states, len(features)); the feasibility codes are a (len(v) * len(t) * len(d)) list
+    in the same order, whose values index infeasibility_reasons. Trajectories that are not available are NaN.
+    """
+
+    assert "d" in request.args, "Missing lateral displacement parameter"
+    assert "t" in request.args, "Missing time to reach the state parameter"
+    assert "v" in request.args, "Missing speed parameter"
+    assert "h" in request.args, "Missing planning horizon parameter"
+    assert "s" in request.args, "Missing snap to road parameter"
+
+    t = float(request.args.get('t'))
+    d = float(request.args.get('d'))
+    v = float(request.args.get('v'))
+    h = float(request.args.get('h'))
+    snap_to_road = request.args.get("s") != "0"
+
+    try:
+        steps = int(request.args.get("n", TRAJECTORY_GRID_STEPS))
+    except ValueError:
+        steps = None
+    if steps is None or not 0 <= steps <= MAX_TRAJECTORY_GRID_STEPS:
+        return f"The grid must span between 0 and {MAX_TRAJECTORY_GRID_STEPS} steps", 400
+    delta_t = float(request.args.get("dt", TRAJECTORY_GRID_DELTA_T))
+    delta_d = float(request.args.get("dd", TRAJECTORY_GRID_DELTA_D))
+    delta_v = float(request.args.get("dv", TRAJECTORY_GRID_DELTA_V))
+
+    scenario_driver_and_state, error_response = _get_driver_state(scenario_id, driver_id, timestamp)
+    if error_response is not None:
+        return error_response
+    scenario, driver, driver_state = scenario_driver_and_state
+
+    trajectory_cache = get_trajectory_cache(current_app.config)
+    cache_key = (scenario.scenario_id, driver.driver_id, timestamp, driver_state_fingerprint(driver_state),
+                 ("grid", d, t, v, h, snap_to_road, steps, delta_d, delta_t, delta_v))
+    cached_response = trajectory_cache.get(*cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    trajectory_sampler = _create_trajectory_sampler(scenario, driver, h, snap_to_road)
+
+    # Skip the values that the sampler cannot handle
+    v_values = _grid_axis(v, delta_v, steps, V_METER_PER_SEC_MIN, V_METER_PER_SEC_MAX)
+    t_values = [value for value in _grid_axis(t, delta_t, steps, T_SEC_MIN) if value < trajectory_sampler.horizon]
+    d_values = _grid_axis(d, delta_d, steps)
+
+    n_states = trajectory_sampler.N + 1
+    planned_states = np.full((len(v_values), len(t_values), len(d_values), n_states, len(TRAJECTORY_GRID_FEATURES)), np.nan)
+    feasibility_codes = np.full(planned_states.shape[:3], NOT_AVAILABLE, dtype=int)
+
+    if v_values and t_values and d_values:
+        feasible_trajectories, infeasible_trajectories, infeasibility_reasons = \
+            trajectory_sampler.sample_trajectory_grid(driver_state, t_values, d_values, v_values)
+
+        # The sampler returns the same values we passed, so we can index them back. It skips the trajectories that
+        # leave the projection domain, those stay NOT_AVAILABLE
+        v_index = {value: index for index, value in enumerate(v_values)}
+        t_index = {value: index for index, value in enumerate(t_values)}
+        d_index = {value: index for index, value in enumerate(d_values)}
+
+        feasibility = [FEASIBLE] * len(feasible_trajectories) + [_feasibility_code(reason) for reason in infeasibility_reasons]
+        for trajectory, feasibility_code in zip(feasible_trajectories + infeasible_trajectories, feasibility):
+            if len(trajectory.planned_states) != n_states:
+                continue
+            grid_index = v_index[trajectory.the_v], t_index[trajectory.the_t], d_index[trajectory.the_d]
+            planned_states[grid_index] = [[getattr(state, feature) for feature in TRAJECTORY_GRID_FEATURES]
+                                          for state in trajectory.planned_states]
+            feasibility_codes[grid_index] = feasibility_code
+
+    response_json = {
+        "v": v_values,
+        "t": t_values,
+        "d": d_values,
+        "n_states": n_states,
+        "features": TRAJECTORY_GRID_FEATURES,
+        "planned_states": _pack(planned_states),
+        "feasibility": feasibility_codes.ravel().tolist(),
+        "infeasibility_reasons": INFEASIBILITY_REASONS,
+        "reference_path": [{"position_x": rp[0], "position_y": rp[1]} for rp in trajectory_sampler.get_reference_path()]
+    }
+    response = json.dumps(response_json)
+    trajectory_cache.put(*cache_key, response, 200)
+    return response, 200
+
+
+@scenarios_api.route("/trajectory_cache/", methods=["GET"])
+@jwt_required(admin_only=True)
+def get_trajectory_cache_stats():
+    """
+    Return the hits, misses, and hit rate of the trajectory cache shared by all the workers.
+    Note: This endpoint is restricted to admin users authenticated via JWT token
+    """
+    return get_trajectory_cache(current_app.config).stats()
+
+
 @scenarios_api.route("/<scenario_id>/states/<timestamp>/", methods=["GET"])
 @jwt_required()
 def get_scenario_state_at_timestamp(scenario_id: int, timestamp: int):
@@ -974,6 +1063,61 @@ def get_scenario_state_at_timestamp(scenario_id: int, timestamp: int):
     return vehicle_states_schema.dump(all_states)
 
 
+@scenarios_api.route("/<scenario_id>/states/<from_timestamp>/<to_timestamp>/", methods=["GET"])
+@jwt_required()
+def get_scenario_states_between_timestamps(scenario_id: int, from_timestamp: int, to_timestamp: int):
+    """
+    Return all the states of the scenario between from_timestamp and to_timestamp (both included) grouped by driver.
+    For each driver, the states are returned as lists of values (timestamps, statuses, positions_x, ...)
+    """
+    scenario_id = int(scenario_id)
+    from_timestamp = int(from_timestamp)
+    to_timestamp = int(to_timestamp)
+
+    assert 0 <= from_timestamp <= to_timestamp, f"Invalid range of timestamps {from_timestamp} - {to_timestamp}"
+
+    mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    if scenario is None:
+        return "Scenario not found", 404
+
+    vehicle_state_dao = VehicleStateDAO(current_app.config, mixed_traffic_scenario_dao)
+    all_states = vehicle_state_dao.get_vehicle_states_by_scenario_id_between_timestamps(scenario_id, from_timestamp, to_timestamp)
+    return dump_vehicle_states_by_driver(scenario_id, from_timestamp, to_timestamp, all_states)
+
+
+@scenarios_api.route("/<scenario_id>/states/<timestamp>/scene/", methods=["GET"])
+@login_required
+def get_scene(scenario_id: int, timestamp: int):
+    """
+    Return the scene of the scenario at the given timestamp, i.e., its compact description that the browsers draw over
+    the road layout of the template (see visualization.scene). The optional user_id focuses the scene on that driver.
+    The road layout is a static file ("road"), so browsers download it only once per template.
+
+    The page of the driver requests the scene, so this uses the session of the web frontend instead of the JWT, and
+    users can request only the scenes focused on themselves
+    """
+    scenario_id = int(scenario_id)
+    timestamp = int(timestamp)
+    user_id = request.args.get("user_id", default=None, type=int)
+
+    mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
+    scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
+    if scenario is None:
+        return "Scenario not found", 404
+
+    if user_id is not None:
+        if user_id != current_user.user_id:
+            return "Cannot see the scene of another driver", 403
+        if not any(driver.user_id == user_id for driver in scenario.drivers):
+            return "Driver not found", 404
+
+    scene = ScenarioFrameDAO(current_app.config, mixed_traffic_scenario_dao).get_scene(scenario, timestamp, user_id)
+    # Make the path relative to STATIC FOLDER
+    scene["road"] = url_for("static", filename=os.path.relpath(scene["road"], "static"))
+    return scene, 200
+
+
 @scenarios_api.route("<scenario_id>/template/xml/", methods=["GET"])
 @jwt_required()
 def get_scenario_template_xml(scenario_id: int):
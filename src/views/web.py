@@ -1,6 +1,8 @@
 import json
 import os
 
+import mpld3
+
 from model.trajectory import TrajectorySampler, D_METER_MIN, D_METER_MAX, T_SEC_MIN, T_SEC_MAX
 
 from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
@@ -13,8 +15,10 @@ from persistence.user_data_access import UserDAO
 from persistence.mixed_scenario_data_access import MixedTrafficScenarioDAO
 from persistence.vehicle_state_data_access import VehicleStateDAO
 from persistence.mixed_scenario_template_data_access import MixedTrafficScenarioTemplateDAO
+from persistence.scenario_frame_data_access import ScenarioFrameDAO, get_frame_file_name
 
 from visualization.mixed_traffic_scenario import generate_drag_and_drop_html, generate_commonroad_xml_file, generate_scenario_designer
+from frontend.mpld3_plugins import SceneView
 
 from background.scheduler import scheduler
 
@@ -152,10 +156,8 @@ def page_not_found(e):
             # NOTE: Having utility methods to do this will be more robust to changes in naming conventions
 
             driver_id = None
-            driver = None
             scenario_id = None
             time_stamp = None
-            goal_region_as_rectangle = None
 
             # Parse the file name tokens:
             file_name_tokens = file_name.replace(f".{file_type}", "").split("_")
@@ -170,28 +172,10 @@ def page_not_found(e):
             mixed_traffic_scenario_dao = MixedTrafficScenarioDAO(current_app.config)
             scenario = mixed_traffic_scenario_dao.get_scenario_by_scenario_id(scenario_id)
             if scenario is not None:
-                # Retrieve the states to render
-                scenario_states = mixed_traffic_scenario_dao.vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(
-                    scenario.scenario_id, time_stamp)
-
-                # Retrieve the driver and its goal_region
-                for d in scenario.drivers:
-                    # Driver ID or User ID?
-                    if d.user_id == driver_id:
-                        driver = d
-                        goal_region_as_rectangle = mixed_traffic_scenario_dao.get_goal_region_for_driver_in_scenario(driver, scenario)
-                        break
-
-                # Render the image(s) in "synch" mode
-                scheduler.render_in_background(current_app.config["SCENARIO_IMAGES_FOLDER"],
-                                               scenario, scenario_states,
-                                               focus_on_driver=driver,
-                                               goal_region_as_rectangle = goal_region_as_rectangle,
-                                               force_render_now = True)
-                # TODO This does not really work !
-                # Send the requested file
-                file_path = os.path.join(f"{current_app.config['TEMPLATE_IMAGES_FOLDER']}", file_name)
-                return send_file(file_path)
+                # Frames are rendered the first time someone asks for them. Render it in "synch" mode and send it
+                scenario_frame_dao = ScenarioFrameDAO(current_app.config, mixed_traffic_scenario_dao)
+                file_path = scenario_frame_dao.get_frame(scenario, time_stamp, driver_id)
+                return send_file(os.path.abspath(file_path))
         elif current_app.config["SCENARIO_IMAGES_FOLDER"] in path and file_type == 'xml' and \
                 (request.method == 'GET'):
 
@@ -670,9 +654,8 @@ def scenario_overview(scenario_id):
         if scenario.status == MixedTrafficScenarioStatusEnum.DONE:
             visualized_duration =  scenario_dao.compute_effective_duration(scenario)
 
-        scenario_states = []
-        for timestamp in range(0, visualized_duration + 1):
-            scenario_states.append(scenario_dao.get_scenario_state_at_timestamp(scenario_id, timestamp))
+        # Compute the state of all the timestamps at once
+        scenario_states = scenario_dao.get_scenario_timeline(scenario_id, visualized_duration)
 
         # # Update the Actionable Scenario States
         # for index in range(0, len(scenario_states) - 1):
@@ -685,11 +668,8 @@ def scenario_overview(scenario_id):
         if current_user_is_driving:
             # Retrieve the last known state of the current user driver in this scenario
             vehicle_state_dao = VehicleStateDAO(current_app.config, scenario_dao)
-            last_timestamp = None
-            for timestamp in range(0, visualized_duration + 1):
-                if scenario_states[timestamp] != VehicleStatusEnum.PENDING:
-                    last_timestamp = timestamp
-            assert last_timestamp is not None
+            scenario_frontier, _ = scenario_dao.get_scenario_frontier(scenario)
+            last_timestamp = min(scenario_frontier.timestamp, visualized_duration)
             current_user_driver_state = [ vs for vs in vehicle_state_dao.get_vehicle_states_by_scenario_id_at_timestamp(scenario_id, last_timestamp) if vs.user_id == current_user.user_id][0]
 
         for timestamp in range(0, visualized_duration + 1):
@@ -791,19 +771,13 @@ def _generate_scenario_image_rel_paths_for(scenario_id, timestamp):
     #  Is the current user also a driver? If not, unless the scenario is ready nobody can see it
     focus_on_driver = any([driver.user_id == current_user.user_id for driver in scenario.drivers])
 
-    # We are in a PAST STATE or in a CRASH STATE. We visualize a static view
-    if focus_on_driver:
-        static_image_file_name = "_".join(["scenario", str(scenario_id),
-                                           "timestamp", str(timestamp),
-                                           "driver", str(current_user.user_id)])
-    else:
-        # This is no driver, we can simply show the current state of the entire scenario as STATIC
-        static_image_file_name = "_".join(["scenario", str(scenario_id),
-                                           "timestamp", str(timestamp)])
+    # We are in a PAST STATE or in a CRASH STATE. We visualize a static view. If this is no driver, we can simply show
+    # the current state of the entire scenario as STATIC
+    static_image_file_name = get_frame_file_name(scenario_id, timestamp,
+                                                 current_user.user_id if focus_on_driver else None)
 
-    # Add extension
-    scenario_image_file_path = os.path.join(current_app.config["SCENARIO_IMAGES_FOLDER"],
-                                            ".".join([static_image_file_name, "png"]))
+    # The image might not be rendered yet, requesting it renders it (see page_not_found)
+    scenario_image_file_path = os.path.join(current_app.config["SCENARIO_IMAGES_FOLDER"], static_image_file_name)
 
     # Make the path relative to STATIC FOLDER
     relative_path = 'static'
@@ -826,8 +800,9 @@ def scenario_state_static():
 
     scenario = scenario_dao.get_scenario_by_scenario_id(scenario_id)
 
-    # Ensure that this state can be visualized
-    scenario_state_at_timestamp = scenario_dao.get_scenario_state_at_timestamp(scenario_id, timestamp)
+    # Ensure that this state can be visualized. We get all the states at once, so we can reuse them later
+    scenario_timeline = scenario_dao.get_scenario_timeline(scenario_id, max(scenario.duration, timestamp))
+    scenario_state_at_timestamp = scenario_timeline[timestamp]
 
     # Is the current user also a driver? If not, unless the scenario is ready nobody can see it
     focus_on_driver = any([driver.user_id == current_user.user_id for driver in scenario.drivers])
@@ -851,7 +826,7 @@ def scenario_state_static():
 
     if timestamp < scenario.duration:
         # Check the next state if exists
-        scenario_state_at_next_timestamp = scenario_dao.get_scenario_state_at_timestamp(scenario_id, timestamp+1)
+        scenario_state_at_next_timestamp = scenario_timeline[timestamp + 1]
         if scenario_state_at_next_timestamp == MixedTrafficScenarioStatusEnum.DONE:
             next_state_url = url_for("web.scenario_state_static", scenario_id=scenario_id, timestamp=timestamp + 1)
         elif scenario_state_at_next_timestamp == MixedTrafficScenarioStatusEnum.ACTIVE:
@@ -923,7 +898,8 @@ def scenario_state():
     scenario = scenario_dao.get_scenario_by_scenario_id(scenario_id)
 
     # TODO This is NOT OK WE STILL HAVE TO CHECK IF THE TIMESTAMP IS THE LAST ONE!
-    scenario_status_at_timestamp = scenario_dao.get_scenario_state_at_timestamp(scenario_id, timestamp)
+    scenario_timeline = scenario_dao.get_scenario_timeline(scenario_id, max(scenario.duration, timestamp))
+    scenario_status_at_timestamp = scenario_timeline[timestamp]
 
     if scenario_status_at_timestamp == MixedTrafficScenarioStatusEnum.PENDING:
         # PENDING STATES CANNOT BE VISUALIZED, because we need to input some actions in the previous ones (ACTIVE!)
@@ -938,17 +914,9 @@ def scenario_state():
     #   NOT RELIABLE
     if focus_on_driver and scenario_status_at_timestamp == MixedTrafficScenarioStatusEnum.ACTIVE and scenario_dao.is_driver_in_game(scenario, current_user):
         # In this case, we are ready to submit an action from the "last known" state
-        # Read the HTML from the file
-        interactive_image_file_name = "_".join(["scenario", str(scenario.scenario_id),
-                                                "timestamp", str(timestamp),
-                                                "driver", str(current_user.user_id)])
-        # Add extension
-        interactive_image_file_path = os.path.join(current_app.config["SCENARIO_IMAGES_FOLDER"],
-                                                   ".".join([interactive_image_file_name, "embeddable.html"]))
-
-        # Load the string
-        with open(interactive_image_file_path, "r") as input_file:
-            embeddable_html = input_file.read()
+        # The browser gets the scene from the API and draws it over the road layout (see visualization.scene)
+        scene_url = url_for("api.scenarios.get_scene", scenario_id=scenario_id, timestamp=timestamp,
+                            user_id=current_user.user_id)
 
         # Get default parameters for trajectory visualization and generation - or read them from the URL or from the session ?
         vehicle_state_dao = VehicleStateDAO(current_app.config, scenario_dao)
@@ -960,7 +928,10 @@ def scenario_state():
                                initial_timestamp=timestamp,
                                scenario_id=scenario_id,
                                driver_id=current_state.driver_id,
-                               embeddable_html=embeddable_html,
+                               scene_url=scene_url,
+                               d3_url=mpld3.urls.D3_URL,
+                               mpld3_url=mpld3.urls.MPLD3_URL,
+                               scene_javascript=SceneView.javascript(),
                                # Just round this to Km/h
                                current_speed_km_h=int(current_state.speed_ms * 3.6),
                                host_url=request.host_url,
@@ -8,13 +8,16 @@ from model.mixed_traffic_scenario import MixedTrafficScenarioStatusEnum
 import numpy as np
 import os
 import json
+import shutil
+import tempfile
 
 import mpld3
 
 import matplotlib.pyplot as plt
 from matplotlib.colors import to_rgba
+from matplotlib.collections import PatchCollection
 
-from frontend.mpld3_plugins import TrajectoryView, AllTrajectoriesView, ZoomEgoCarPlugin, ScenarioDragPlugin, NewScenarioDragPlugin
+from frontend.mpld3_plugins import ScenarioDragPlugin, NewScenarioDragPlugin
 
 from commonroad.geometry.shape import Rectangle
 from commonroad.planning.goal import GoalRegion
@@ -22,6 +25,10 @@ from commonroad.common.util import Interval
 
 from commonroad.visualization.mp_renderer import MPRenderer
 
+from visualization.road_layer_cache import road_layer_cache
+
+from commonroad_rp.visualization import visualize_planning_result
+
 # TODO Move this to an util module
 from matplotlib.cm import get_cmap
 _name = "Accent"
@@ -38,11 +45,6 @@ from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType
 from commonroad.scenario.trajectory import Trajectory, State
 from commonroad.prediction.prediction import TrajectoryPrediction
 
-from shapely.geometry import Point
-# Controls
-# TODO: Is this the overall number or the number of each batch?
-VISIBLE_TRAJECTORIES = 100
-
 # TODO: Not safe for refactoring and redefinition, better use app.config
 from configuration.config import VEHICLE_WIDTH, VEHICLE_LENGTH
 
@@ -108,80 +110,143 @@ def generate_commonroad_xml_file(output_file_path,
     fw.write_to_file(output_file_path, OverwriteExistingFile.ALWAYS)
 
 
-def generate_embeddable_html_snippet(output_folder,
-                                    commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
-                                    scenario_state,
-                                    focus_on_driver_user_id=None, goal_region_as_rectangle=None):
+def generate_frames(output_folder,
+                    commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
+                    scenario_state,
+                    focus_on_driver_user_ids, goal_regions_as_rectangles,
+                    road_layer_key=None):
+    """
+    Render the PNG of the provided states for each of the given drivers (None is the global view).
+    goal_regions_as_rectangles maps the user_id of those drivers to their goal region. The interactive views are drawn
+    by the browsers instead (see visualization.scene)
+    """
 
-    # print(f"generate_embeddable_html_snippet: {output_folder}")
+    # print(f"generate_frames: {output_folder}")
 
+    # The files are served as soon as they exist, so we render them in a temporary folder and move them to the output
+    # folder only once they are complete
+    rendering_folder = tempfile.mkdtemp(prefix=".rendering_", dir=output_folder)
     try:
         # Generate the PNG
-        render_png = True
         figsize = (16, 6)
-        generate_picture(render_png, figsize,
-                         output_folder, commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
-                         scenario_state,
-                         focus_on_driver_user_id, goal_region_as_rectangle)
-
-        # # Generate the HTML
-        render_png = False
-        figsize = (8, 3)
-        generate_picture(render_png, figsize,
-                         output_folder, commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
-                         scenario_state,
-                         focus_on_driver_user_id, goal_region_as_rectangle)
+        generate_pictures(figsize,
+                          rendering_folder, commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
+                          scenario_state,
+                          focus_on_driver_user_ids, goal_regions_as_rectangles, road_layer_key)
+
+        for file_name in os.listdir(rendering_folder):
+            os.replace(os.path.join(rendering_folder, file_name), os.path.join(output_folder, file_name))
     except Exception as e:
         print(f"Exception {e}")
+    finally:
+        shutil.rmtree(rendering_folder, ignore_errors=True)
+
+
+def generate_planning_picture(planning_result):
+    """
+    Render what an AV planned (to debug it). The planning_result contains the arguments of visualize_planning_result
+    """
+    try:
+        visualize_planning_result(**planning_result)
+    except Exception as e:
+        print(f"Exception {e}")
+    finally:
+        # The rendering processes live long, so do not accumulate figures
+        plt.close("all")
+
+
+def _render_over_road_layer(rnd):
+    """ Like MPRenderer.render, but keep the road layer that the axes already show. Return the rendered artists """
+    # Copy the list, clearing the renderer empties it
+    artists = list(rnd.render_dynamic())
+    rnd.ax.autoscale(True)
+    rnd.ax.set_aspect("equal")
+    rnd.clear()
+    return artists
 
 
-def generate_picture(render_png, figsize, # Tuple(Number, Number)?
+def get_vehicle_style(vehicle_index, status):
+    """
+    Return the facecolor and the edgecolor (as RGBA), the linewidth, and the opacity of the vehicle with the given
+    index (i.e., its position among the vehicles sorted by driver_id) and status
+    """
+    opacity = 1.0 if status == VehicleStatusEnum.ACTIVE else 0.4
+    linewidth = 1.0 if status == VehicleStatusEnum.ACTIVE else 3.0
+
+    edgecolor = "black"
+    if status == VehicleStatusEnum.CRASHED:
+        edgecolor = "red"
+    elif status == VehicleStatusEnum.GOAL_REACHED:
+        # https://stackoverflow.com/questions/34606601/how-can-i-set-different-opacity-of-edgecolor-and-facecolor-of-a-patch-in-matplot
+        opacity = 0.1
+
+    # Convert the colors to RGBA
+    return to_rgba(vehicle_colors[vehicle_index], opacity), to_rgba(edgecolor, opacity), linewidth, opacity
+
+
+def generate_picture(figsize, # Tuple(Number, Number)?
                      output_folder,
                      commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
                      scenario_state,
-                     focus_on_driver_user_id=None, goal_region_as_rectangle=None):
+                     focus_on_driver_user_id=None, goal_region_as_rectangle=None, road_layer_key=None):
     """
     Render the provided states of the given scenario, possibly focusing on the given driver.
-    Focusing means that the driver's vehicle is highlighted while the others have the default color
+    Focusing means that the driver's vehicle is highlighted while the others have the default color.
+    The road_layer_key identifies the road layout of the scenario, so we can draw it only once (see RoadLayerCache)
     """
+    goal_regions_as_rectangles = {}
+    if focus_on_driver_user_id:
+        # If focus on driver is active, so must be the goal region
+        assert goal_region_as_rectangle
+        goal_regions_as_rectangles[focus_on_driver_user_id] = goal_region_as_rectangle
 
-    # If focus on driver is active, so must be the goal region
-    # Store the ego state in a temp var
-    ego_state = None
+    return generate_pictures(figsize,
+                             output_folder, commonroad_scenario, mixed_traffic_scenario_duration,
+                             mixed_traffic_scenario_scenario_id,
+                             scenario_state,
+                             [focus_on_driver_user_id], goal_regions_as_rectangles, road_layer_key)[0]
 
-    if focus_on_driver_user_id:
-        for vehicle_index, vehicle_state in enumerate(sorted(scenario_state, key=lambda vs: vs.driver_id), start=0):
-            if vehicle_state.user_id == focus_on_driver_user_id:
-                ego_state = vehicle_state
-                break
 
-        assert goal_region_as_rectangle
+def generate_pictures(figsize, # Tuple(Number, Number)?
+                      output_folder,
+                      commonroad_scenario, mixed_traffic_scenario_duration, mixed_traffic_scenario_scenario_id,
+                      scenario_state,
+                      focus_on_driver_user_ids, goal_regions_as_rectangles, road_layer_key=None):
+    """
+    Render the provided states of the given scenario once for each of the given drivers, i.e., focusing on them, and
+    once without focus if focus_on_driver_user_ids contains None. Return the paths of the rendered files.
+
+    All the views show the same road and vehicles, so we plot them only once, and for each view we toggle only the goal
+    region of the driver
+    """
 
     # There MUST be at least one vehicle in the scenario. All of them have the same timestamp
     timestamp = scenario_state[0].timestamp
 
-    # Now plot the thing. We need to create an external figure to link it to mpld3
-    # TODO A lot of this code can be improved by caching partial results and objects
+    # Now plot the thing
     # ca 16:9
     # Somehow this changes the outer box but not the inner one?
-    fig, ax = plt.subplots(figsize=figsize)
+    # The road layout never changes, so the figure comes with the lanelets already plotted and we plot only the
+    # vehicles and the goal region
+    road_layer = road_layer_cache.get(road_layer_key, commonroad_scenario, figsize)
+    fig, ax = road_layer.new_figure()
 
+    plt_paths = []
     try:
 
         # The renderer uses the gca... I hope this does not break when used in flask...
         rnd = MPRenderer(ax=ax)
 
-        # commonroad_scenario = mixed_traffic_scenario.scenario_template.as_commonroad_scenario()
-
-        # Plot the lanelets
-        commonroad_scenario.draw(rnd)  # , draw_params={'time_begin': timestamps[0]}) # TODO What are the other paramters here?
-
         # Size of the rectangle representing the car.
         # dynamic_obstacle_shape = Rectangle(width=1.8, length=4.3)
         # TODO Not sure what's the issue here... it seems that at some point vehicles are rotated by 90?
         dynamic_obstacle_shape = Rectangle(VEHICLE_LENGTH, VEHICLE_WIDTH)
 
-        tooltip_content = []
+        # The renderer collects the patches of the goal regions and the vehicles, and plots them as one collection.
+        # We keep the patches of each goal region aside, with the position where they would be, and build a collection
+        # for each view instead
+        goal_region_patches = {}
+
         # Generate the for each driver
         # for scenario_state in scenario_states: -> Possible extension to visualize more than one timestamp at the time.
         # SORT BY USER_ID to assign colors
@@ -217,27 +282,20 @@ def generate_picture(render_png, figsize, # Tuple(Number, Number)?
             facecolor = vehicle_colors[vehicle_index]
 
             # Plot the Goal Region, use a different color to show focus
-            if focus_on_driver_user_id and vehicle_state.user_id == focus_on_driver_user_id:
-                # In this case, we also include the trajectory visualizer
+            if vehicle_state.user_id in goal_regions_as_rectangles:
                 # facecolor = _ego_vehicle_color
+                goal_region_as_rectangle = goal_regions_as_rectangles[vehicle_state.user_id]
                 goal_state_list = [State(position=goal_region_as_rectangle, time_step=Interval(0, mixed_traffic_scenario_duration))]
                 commonroad_goal_region = GoalRegion(goal_state_list)
+                # Set aside the patches plotted so far, then the goal region ones
+                vehicle_patches = list(rnd.obstacle_patches)
+                rnd.obstacle_patches.clear()
                 commonroad_goal_region.draw(rnd, draw_params={'goal_region': {'shape': {'rectangle': {'facecolor': facecolor, 'opacity': 0.5}}}})
+                goal_region_patches[vehicle_state.user_id] = (len(vehicle_patches), list(rnd.obstacle_patches))
+                rnd.obstacle_patches[:] = vehicle_patches
 
             # Plot the Vehicle. Highlight CRASHED (bold line around them) and GOAL_REACHED (opacity 0.1)
-            opacity = 1.0 if vehicle_state.status == VehicleStatusEnum.ACTIVE else 0.4
-            linewidth = 1.0 if vehicle_state.status == VehicleStatusEnum.ACTIVE else 3.0
-
-            edgecolor = "black"
-            if vehicle_state.status == VehicleStatusEnum.CRASHED:
-                edgecolor = "red"
-            elif vehicle_state.status == VehicleStatusEnum.GOAL_REACHED:
-                # https://stackoverflow.com/questions/34606601/how-can-i-set-different-opacity-of-edgecolor-and-facecolor-of-a-patch-in-matplot
-                opacity = 0.1
-
-            # Convert the colors to RGBA
-            facecolor = to_rgba(facecolor, opacity)
-            edgecolor = to_rgba(edgecolor, opacity)
+            facecolor, edgecolor, linewidth, opacity = get_vehicle_style(vehicle_index, vehicle_state.status)
 
             # Plot the vehicle icon
             vehicle_data = {
@@ -260,130 +318,38 @@ def generate_picture(render_png, figsize, # Tuple(Number, Number)?
             dynamic_obstacle.draw(rnd, draw_params={"time_begin": dynamic_obstacle.initial_state.time_step,
                                                     "dynamic_obstacle": vehicle_data})
 
-        file_name_prefix = \
-            "scenario_{}_timestamp_{}".format(mixed_traffic_scenario_scenario_id, timestamp) if focus_on_driver_user_id is None else \
-            "scenario_{}_timestamp_{}_driver_{}".format(mixed_traffic_scenario_scenario_id, timestamp, focus_on_driver_user_id)
-
-        # Render the as PNG
-        if render_png:
+        vehicle_patches = list(rnd.obstacle_patches)
+        # The last artist is the collection of the vehicles
+        obstacles_collection = _render_over_road_layer(rnd)[-1]
+        # Adding the goal regions to the axes enlarges their data limits, so we restore them before each view
+        vehicles_data_limits = ax.dataLim.frozen()
+
+        for focus_on_driver_user_id in focus_on_driver_user_ids:
+            # Toggle the goal region. Like MPRenderer, sort its patches and the vehicles' ones by zorder
+            obstacles_collection.remove()
+            position, patches = goal_region_patches.get(focus_on_driver_user_id, (0, []))
+            obstacle_patches = vehicle_patches[:position] + patches + vehicle_patches[position:]
+            obstacle_patches.sort(key=lambda patch: patch.zorder)
+            obstacles_collection = PatchCollection(obstacle_patches, match_original=True,
+                                                   zorder=obstacles_collection.get_zorder())
+            ax.dataLim.set(vehicles_data_limits)
+            ax.add_collection(obstacles_collection)
+            ax.autoscale_view()
+
+            file_name_prefix = \
+                "scenario_{}_timestamp_{}".format(mixed_traffic_scenario_scenario_id, timestamp) if focus_on_driver_user_id is None else \
+                "scenario_{}_timestamp_{}_driver_{}".format(mixed_traffic_scenario_scenario_id, timestamp, focus_on_driver_user_id)
+
+            # Render the as PNG
             plt_path = os.path.join(output_folder, "{}.png".format(file_name_prefix))
-            # This might remove and recreate all the elements added so far, so we need a way to include the Trajectory as well!
-            rnd.render(show=False, filename=plt_path)
-            #
-            return
-
-        # Enabling the Tooltip Plugin
-        rnd.render(show=False)
-
-        cars_x = []
-        cars_y = []
-
-        for vehicle_index, vehicle_state in enumerate(sorted(scenario_state, key=lambda vs: vs.user_id), start=0):
-
-            cars_x.append(vehicle_state.position_x)
-            cars_y.append(vehicle_state.position_y)
-
-            if focus_on_driver_user_id and vehicle_state.user_id == focus_on_driver_user_id:
-                if vehicle_state.acceleration_m2s > 0.0:
-                    acc_string = "Your vehicle is <b>accelerating</b>"
-                elif vehicle_state.acceleration_m2s < 0.0:
-                    acc_string = "Your vehicle is <b>braking</b>"
-                else:
-                    acc_string = "Your vehicle <b>maintains</b> its speed"
-            else:
-                # This is HTML code!
-                if vehicle_state.acceleration_m2s > 0.0:
-                    acc_string = "The vehicle is <b>accelerating</b>"
-                elif vehicle_state.acceleration_m2s < 0.0:
-                    acc_string = "The vehicle is <b>braking</b>"
-                else:
-                    acc_string = "The vehicle <b>maintains</b> its speed"
-
-            tooltip_content_string = f"User ID: {vehicle_state.user_id}<br>" \
-                                     f"Speed: {round(vehicle_state.speed_ms * 3.6, 2)}<br>" \
-                                     f"{acc_string}"
-
-            if focus_on_driver_user_id and vehicle_state.user_id != focus_on_driver_user_id:
-                # Include the distance to the ego
-                tooltip_content_string = tooltip_content_string + "<br>"
-                distance_to_ego = round(Point(vehicle_state.position_x, vehicle_state.position_y).distance(Point(ego_state.position_x, ego_state.position_y)), 2)
-                tooltip_content_string = tooltip_content_string + f"The vehicle is about {distance_to_ego} meters from you"
-
-
-            # Prepare the plugins for rendering the trajectories
-            if focus_on_driver_user_id and vehicle_state.user_id == focus_on_driver_user_id:
-                # Now add the selected trajectory on top of everything
-                x = [vehicle_state.position_x]
-                y = [vehicle_state.position_y]
+            road_layer.savefig(fig, plt_path)
+            plt_paths.append(plt_path)
 
-                # Note: Pay attention that ax.plot returns a tuple!
-                reference_path_line, = ax.plot(x, y, linestyle='-', lw=4, alpha=0.3, color="green", zorder=49)
-                trajectory_line,  = ax.plot(x, y, linestyle='-', lw=2, alpha=0.5, color="black", zorder=50)
-                selected_line, = ax.plot(x, y, linestyle='-', lw=4, alpha=1, color="black", zorder=51)
-
-                # Activate the plugin for this figure
-                mpld3.plugins.connect(fig, TrajectoryView(trajectory_line, selected_line, reference_path_line))
-
-
-                # Now add all the trajectories that can be chosen from
-                # ATM mpld3 requires to pre-allocate all the objects in a figure which might be altered later
-                visible_trajectory_placeholders = []
-                for i in range(0, VISIBLE_TRAJECTORIES):
-                    # Make sure they are rendered below the selected trajectory
-                    visible_trajectory_line, = ax.plot(x, y, linestyle='--', lw=2, alpha=0.2, color="blue", zorder=49)
-                    visible_trajectory_placeholders.append(visible_trajectory_line)
-
-                mpld3.plugins.connect(fig, AllTrajectoriesView(visible_trajectory_placeholders))
-
-                # Register the EgoCarZoom Plugin
-                mpld3.plugins.connect(fig, ZoomEgoCarPlugin(x, y))
-
-            # TODO Compute Euclidean distance to the ego vehicle if any?
-            tooltip_content.append(tooltip_content_string)
-
-        css = """
-            div.mpld3-tooltip {
-                color: white;  /* Set text color to black */
-                background-color: rgba(0, 0, 0, 0.8);  /* Set background color to transparent black */
-                border: none;  /* Remove border */
-                box-shadow: none;  /* Remove box shadow */
-            }
-        """
-
-        # <div id="control-tooltip" class="mpld3-tooltip" style="position: absolute; z-index: 100; visibility: visible; top: 304px; left: 288px;background-color:white;">
-        #     <table><thead><tr><th colspan="2" class="text-center">Vehicle's Parameters</th></tr></thead>
-        #
-        #         <tbody><tr><th>Speed (Km/h)</th><td>    <input type="range" id="speed-selector" name="speed-selector" min="0" max="90"></td></tr>
-        #         <tr><th>Color</th>    <td style="background-color:green" }=""></td></tr>
-        #         <tr><th>Type</th><td><label>Human Driver</label><div class="form-check form-switch">
-        #       <input class="form-check-input" type="checkbox" id="flexSwitchCheckDefault">
-        #     <label>AV</label>
-        # </div></td></tr>
-        #             <tr><th>User</th><td>TDB - Show the user selector</td></tr>
-        #     </tbody></table>
-        #
-        #     <a id="remove-btn" class="btn btn-info" role="button">Remove this driver</a><a class="btn btn-info" role="button">Cancel</a></div>
-
-        # tooltip_mask = [True] * len(tooltip_content)  # Enable tooltips for all cars tooltip_hover=tooltip_mask
-        # points = coordinates of all cars objects. make them transparent
-        points = ax.plot(cars_x, cars_y, 'o', color='b',
-                 mec='k', ms=15, mew=1, alpha=0, zorder=52)
-
-        tooltip = mpld3.plugins.PointHTMLTooltip(points[0], labels=tooltip_content, css=css)
-        mpld3.plugins.connect(fig, tooltip)
-
-        # Render as embeddable HTML snippet
-        plt_path = os.path.join(output_folder, "{}.embeddable.html".format(file_name_prefix))
-
-        # TODO Maybe there's something to plot directly to file?
-        theString = mpld3.fig_to_html(fig, template_type="simple")
-        with open(plt_path, "w") as output_file:
-            output_file.write( theString)
-
-        return plt_path
+        return plt_paths
     finally:
         plt.close(fig)
 
+
 def generate_scenario_designer(scenario_template, scenario_data={}, max_players=8):
     """
     Generate the interactive visualization of the scenario with preloaded (hidden) max_player markers.
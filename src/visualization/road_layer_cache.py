@@ -0,0 +1,86 @@
+import pickle
+from typing import NamedTuple
+
+import matplotlib
+matplotlib.use('Agg')  # disable interactive view
+
+import matplotlib.pyplot as plt
+
+from commonroad.visualization.mp_renderer import MPRenderer
+
+from configuration.config import ROAD_LAYER_CACHE_SIZE
+
+from model.lru_cache import LRUCache
+
+
+class RoadLayer(NamedTuple):
+    """ A figure that shows only the road layout, and the layout of the figure itself """
+    pickled_figure: bytes
+    xlim: tuple
+    ylim: tuple
+    # The tight bounding box of the figure, which depends on the tick labels, hence on the limits of the axes
+    bbox_inches: object
+
+    def new_figure(self):
+        """ Return a new figure showing the road layout, and its axes. Callers must close it """
+        fig = pickle.loads(self.pickled_figure)
+        return fig, fig.axes[0]
+
+    def savefig(self, fig, filename) -> None:
+        """ Like fig.savefig(filename, bbox_inches="tight"), but do not compute the bounding box again if we can """
+        ax = fig.axes[0]
+        if ax.get_xlim() == self.xlim and ax.get_ylim() == self.ylim:
+            fig.savefig(filename, bbox_inches=self.bbox_inches)
+        else:
+            # Something outside the road moved the limits
+            fig.savefig(filename, bbox_inches="tight")
+
+
+def _draw_road_layer(commonroad_scenario, figsize) -> RoadLayer:
+    """ Draw the scenario, i.e., the road layout, as the first thing of a new figure """
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        rnd = MPRenderer(ax=ax)
+        commonroad_scenario.draw(rnd)
+        rnd.render(show=False)
+        # Drawing the figure creates the ticks, so we store them as well
+        fig.canvas.draw()
+        bbox_inches = fig.get_tightbbox(fig.canvas.get_renderer()).padded(plt.rcParams["savefig.pad_inches"])
+        return RoadLayer(pickle.dumps(fig), ax.get_xlim(), ax.get_ylim(), bbox_inches)
+    finally:
+        plt.close(fig)
+
+
+class RoadLayerCache(LRUCache):
+    """
+    Cache of the figures showing only the road layout of the scenario templates, i.e., the road layers.
+
+    Entries are keyed by (road_layer_key, figsize, dpi). The road_layer_key identifies the template and its XML, so
+    a template uploaded again never hits a stale entry. The figures keep the artists that MPRenderer created for the
+    lanelets, so they look exactly the same and they can be zoomed in (e.g., with mpld3), but loading them is much
+    cheaper than drawing the lanelets again.
+
+    The figures are stored pickled, so callers always get a new figure: they can draw the vehicles on it without
+    corrupting the cache.
+    """
+
+    def __init__(self, max_size=ROAD_LAYER_CACHE_SIZE):
+        super().__init__(max_size)
+
+    def get(self, road_layer_key, commonroad_scenario, figsize) -> RoadLayer:
+        """
+        Return the road layer of the given scenario. Without a road_layer_key, the road layer is drawn from scratch
+        and not cached
+        """
+        key = (road_layer_key, tuple(figsize), plt.rcParams["figure.dpi"])
+        # Road layers without a key are never cached, so looking them up only counts the miss
+        road_layer = super().get(key)
+        if road_layer is None:
+            road_layer = _draw_road_layer(commonroad_scenario, figsize)
+            if road_layer_key is not None:
+                self.put(key, road_layer)
+        return road_layer
+
+
+# The road layers of the templates rendered by this process
+road_layer_cache = RoadLayerCache()
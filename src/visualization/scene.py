@@ -0,0 +1,147 @@
+# Scenes are the compact description of a scenario at a given timestamp that the browsers draw over the road layout of
+# its template (see frontend.mpld3_plugins.SceneView), instead of downloading the whole mpld3 figure.
+#
+# The road layout never changes, so we serialize its mpld3 figure once per template (the road spec). Scenes refer to it
+# and carry only the boxes of the vehicles, the goal region of the driver, and the content of the tooltips.
+import math
+import os
+import tempfile
+
+import matplotlib
+matplotlib.use('Agg')  # disable interactive view
+
+import matplotlib.pyplot as plt
+import mpld3
+import numpy as np
+
+from matplotlib.colors import to_rgba
+
+from configuration.config import VEHICLE_WIDTH, VEHICLE_LENGTH
+
+from visualization.mixed_traffic_scenario import vehicle_colors, get_vehicle_style
+from visualization.road_layer_cache import road_layer_cache
+
+# The interactive view is smaller than the PNGs
+ROAD_FIGSIZE = (8, 3)
+
+# Like CommonRoad draws the goal regions in the PNGs
+_GOAL_REGION_EDGECOLOR = "#831D20"
+_GOAL_REGION_OPACITY = 0.5
+
+# Centimeters are precise enough to draw the boxes
+_DIGITS = 2
+
+
+def get_road_file_name(road_layer_key) -> str:
+    """
+    The name of the file with the road spec of the template identified by road_layer_key, i.e., its id and the hash of
+    its XML. Templates uploaded again get another file, so browsers never show a stale road layout
+    """
+    template_id, xml_hash = road_layer_key
+    return f"road_{template_id}_{xml_hash}.json"
+
+
+def generate_road_spec(output_folder, commonroad_scenario, road_layer_key) -> str:
+    """ Store the mpld3 figure that shows the road layout of the template and return the path of the file """
+    road_layer = road_layer_cache.get(road_layer_key, commonroad_scenario, ROAD_FIGSIZE)
+    fig, _ = road_layer.new_figure()
+    try:
+        # The file is served as soon as it exists, so we write it aside and move it in place only once complete
+        file_descriptor, temp_file_path = tempfile.mkstemp(prefix=".road_", dir=output_folder)
+        try:
+            with os.fdopen(file_descriptor, "w") as output_file:
+                mpld3.save_json(fig, output_file)
+            file_path = os.path.join(output_folder, get_road_file_name(road_layer_key))
+            os.replace(temp_file_path, file_path)
+            return file_path
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+    finally:
+        plt.close(fig)
+
+
+def _css_color(rgba) -> str:
+    red, green, blue, alpha = rgba
+    return f"rgba({round(red * 255)}, {round(green * 255)}, {round(blue * 255)}, {alpha})"
+
+
+def _box(center_x, center_y, length, width, orientation) -> list:
+    """ The corners of the rectangle with the given center, size, and orientation """
+    corners = np.array([[-length, -width], [length, -width], [length, width], [-length, width]]) * 0.5
+    rotation = np.array([[math.cos(orientation), -math.sin(orientation)],
+                         [math.sin(orientation), math.cos(orientation)]])
+    return np.round(corners @ rotation.T + np.array([center_x, center_y]), _DIGITS).tolist()
+
+
+def _tooltip(vehicle_state, ego_state) -> str:
+    """ The HTML shown when hovering the vehicle. ego_state is the state of the driver we focus on, if any """
+    is_ego = ego_state is not None and vehicle_state.user_id == ego_state.user_id
+    subject = "Your vehicle" if is_ego else "The vehicle"
+    if vehicle_state.acceleration_m2s > 0.0:
+        acc_string = f"{subject} is <b>accelerating</b>"
+    elif vehicle_state.acceleration_m2s < 0.0:
+        acc_string = f"{subject} is <b>braking</b>"
+    else:
+        acc_string = f"{subject} <b>maintains</b> its speed"
+
+    tooltip = f"User ID: {vehicle_state.user_id}<br>" \
+              f"Speed: {round(vehicle_state.speed_ms * 3.6, 2)}<br>" \
+              f"{acc_string}"
+
+    if ego_state is not None and not is_ego:
+        # Include the distance to the ego
+        distance_to_ego = round(math.hypot(vehicle_state.position_x - ego_state.position_x,
+                                           vehicle_state.position_y - ego_state.position_y), 2)
+        tooltip = tooltip + f"<br>The vehicle is about {distance_to_ego} meters from you"
+    return tooltip
+
+
+def generate_scene(scenario_state, focus_on_driver_user_id=None, goal_region_as_rectangle=None) -> dict:
+    """
+    Describe the provided states of a scenario, possibly focusing on the given driver, like generate_picture draws
+    them: the vehicles have the same colors and the goal region is the one of the driver. The scene does not include
+    the road layout (see generate_road_spec)
+    """
+    # There MUST be at least one vehicle in the scenario. All of them have the same timestamp
+    timestamp = scenario_state[0].timestamp
+
+    ego_state = None
+    if focus_on_driver_user_id is not None:
+        ego_state = next(vs for vs in scenario_state if vs.user_id == focus_on_driver_user_id)
+        # If focus on driver is active, so must be the goal region
+        assert goal_region_as_rectangle
+
+    vehicles = []
+    goal_region = None
+    # SORT BY DRIVER_ID to assign colors
+    for vehicle_index, vehicle_state in enumerate(sorted(scenario_state, key=lambda vs: vs.driver_id), start=0):
+        facecolor, edgecolor, linewidth, _ = get_vehicle_style(vehicle_index, vehicle_state.status)
+        vehicles.append({
+            "user_id": vehicle_state.user_id,
+            "position": [round(vehicle_state.position_x, _DIGITS), round(vehicle_state.position_y, _DIGITS)],
+            "box": _box(vehicle_state.position_x, vehicle_state.position_y, VEHICLE_LENGTH, VEHICLE_WIDTH,
+                        vehicle_state.rotation),
+            "facecolor": _css_color(facecolor),
+            "edgecolor": _css_color(edgecolor),
+            "linewidth": linewidth,
+            "tooltip": _tooltip(vehicle_state, ego_state)
+        })
+
+        if ego_state is not None and vehicle_state.user_id == ego_state.user_id:
+            # The goal region has the color of the vehicle
+            goal_region = {
+                "box": _box(goal_region_as_rectangle.center[0], goal_region_as_rectangle.center[1],
+                            goal_region_as_rectangle.length, goal_region_as_rectangle.width,
+                            goal_region_as_rectangle.orientation),
+                "facecolor": _css_color(to_rgba(vehicle_colors[vehicle_index], _GOAL_REGION_OPACITY)),
+                "edgecolor": _css_color(to_rgba(_GOAL_REGION_EDGECOLOR, _GOAL_REGION_OPACITY))
+            }
+
+    return {
+        "timestamp": timestamp,
+        "vehicles": vehicles,
+        "goal_region": goal_region,
+        "ego": None if ego_state is None else [round(ego_state.position_x, _DIGITS),
+                                               round(ego_state.position_y, _DIGITS)]
+    }